@@ -5,9 +5,6 @@ import nbformat
 import json
 import re
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.ensemble import RandomForestRegressor
 import pickle
 import os
 from datetime import datetime
@@ -18,6 +15,14 @@ import requests
 import time
 import logging
 from typing import Dict, Any, Optional
+from utils.structured_output import extract_json_object
+from utils.lazy_imports import lazy
+from utils.feedback_sanitizer import (
+    DETAILED_ITEM_PHRASES, STORAGE_LINE_FILTER, STORED_COMMENT_ARTIFACT_PATTERN, scrub
+)
+
+# scikit-learn is only needed to train or apply the score model
+ml = lazy('ml_training')
 
 # Import two-model grading system
 try:
@@ -123,18 +128,7 @@ def _filter_detailed_feedback(detailed_feedback: Any) -> Any:
                 if isinstance(item, str) and len(item) > 20:
                     # Check if this looks like instructor feedback vs internal reasoning
                     # Expanded patterns to catch more internal AI dialog
-                    if not any(pattern in item.lower() for pattern in [
-                        "we need", "let's", "the student", "they have", "first,", "now", 
-                        "good.", "thus", "maybe", "overall score:", "business understanding:",
-                        "communication clarity:", "data interpretation:", "methodology appropriateness:",
-                        "reflection quality:", "now produce", "let's craft",
-                        "they answered", "they gave", "they completed", "they did", "they also",
-                        "they wrote", "they provided", "they used", "they could", "they should",
-                        "part 1:", "part 2:", "part 3:", "part 4:", "part 5:",
-                        "q1", "q2", "q3", "q4", "q5",
-                        "missing value strategy", "outlier interpretation", "data quality impact",
-                        "ethical considerations", "thorough answers"
-                    ]):
+                    if not DETAILED_ITEM_PHRASES.search(item.lower()):
                         clean_item = _filter_text_content(item)
                         if clean_item and len(clean_item) > 15:
                             filtered_items.append(clean_item)
@@ -154,37 +148,8 @@ def _filter_instructor_comments(comments: str) -> str:
     if not isinstance(comments, str):
         return str(comments) if comments else ""
     
-    # Remove internal reasoning patterns - EXPANDED LIST
-    patterns_to_remove = [
-        r"We need to.*?\.",
-        r"Let's.*?\.",
-        r"First,.*?\.",
-        r"Now.*?\.",
-        r"The student provided.*?\.",
-        r"They have.*?\.",
-        r"<\|.*?\|>",
-        r"\{.*?\}",
-        r"JSON.*?",
-        r"Overall score:.*?\.",
-        r"Business understanding:.*?\.",
-        r"Communication clarity:.*?\.",
-        r"Data interpretation:.*?\.",
-        r"Methodology appropriateness:.*?\.",
-        r"Reflection quality:.*?\.",
-        r"Now produce.*?\.",
-        r"Let's craft.*?\.",
-        r"<think>.*?</think>",
-        r"<reasoning>.*?</reasoning>",
-        r"\[thinking\].*?\[/thinking\]",
-        r"\[internal\].*?\[/internal\]",
-    ]
-    
-    clean_comments = comments
-    for pattern in patterns_to_remove:
-        clean_comments = re.sub(pattern, '', clean_comments, flags=re.IGNORECASE | re.DOTALL)
-    
-    # Clean up whitespace
-    clean_comments = re.sub(r'\s+', ' ', clean_comments).strip()
+    # Remove internal reasoning patterns
+    clean_comments = scrub(comments, STORED_COMMENT_ARTIFACT_PATTERN)
     
     # If too much was removed, return empty - NO FALLBACK
     if len(clean_comments) < 30:
@@ -198,79 +163,13 @@ def _filter_text_content(text: str) -> str:
     if not isinstance(text, str):
         return str(text) if text else ""
     
-    # Remove internal AI patterns - EXPANDED LIST
-    forbidden_patterns = [
-        "we need to", "let's", "first, check", "now evaluate", "now assign",
-        "now produce", "let's craft", "the student provided", "they have code",
-        "did they complete", "the assignment required", "good.", "thus they",
-        "reflection quality:", "business understanding:", "communication clarity:",
-        "data interpretation:", "methodology appropriateness:", "overall score:",
-        "maybe", "now produce json", "<|end|>", "<|start|>", "assistant", "channel",
-        "they answered", "they gave", "they completed", "they did", "they also",
-        "they wrote", "they provided", "they used", "they could", "they should",
-        "part 1:", "part 2:", "part 3:", "part 4:", "part 5:",
-        "q1 (", "q2 (", "q3 (", "q4 (", "q5 (",
-        "missing value strategy", "outlier interpretation", "data quality impact",
-        "ethical considerations", "thorough answers", "gave thorough"
-    ]
-    
-    lines = text.split('\n')
-    clean_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        
-        # Skip lines with forbidden patterns
-        if any(pattern in line.lower() for pattern in forbidden_patterns):
-            continue
-        
-        # Skip very short lines
-        if len(line) < 15:
-            continue
-        
-        # Skip lines that start with internal reasoning markers
-        if line.startswith(("We ", "Let's ", "First ", "Now ", "The student ", "They ", "Part ")):
-            continue
-        
-        # Skip lines that contain question references
-        if re.search(r'\bQ\d+\b', line):
-            continue
-        
-        clean_lines.append(line)
-    
-    return ' '.join(clean_lines[:3])  # Limit to first 3 clean lines
+    # Drop reasoning lines, keep the first 3 clean ones
+    return STORAGE_LINE_FILTER.filter(text)
 
 def _extract_json_from_response(ai_response: str) -> Optional[Dict[str, Any]]:
     """Extract JSON content from AI response, ignoring internal monologue"""
-    if not ai_response:
-        return None
-    
     try:
-        # Pattern to find JSON objects
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        json_matches = re.findall(json_pattern, ai_response, re.DOTALL)
-        
-        if not json_matches:
-            return None
-        
-        # Try to parse each JSON match, starting from the last one
-        for json_text in reversed(json_matches):
-            try:
-                clean_json = json_text.strip()
-                if clean_json.endswith('```'):
-                    clean_json = clean_json[:-3].strip()
-                
-                parsed_json = json.loads(clean_json)
-                
-                # Validate it has expected structure
-                if isinstance(parsed_json, dict) and ('detailed_feedback' in parsed_json or 'instructor_comments' in parsed_json):
-                    return parsed_json
-                    
-            except json.JSONDecodeError:
-                continue
-        
-        return None
-        
+        return extract_json_object(ai_response, any_of=('detailed_feedback', 'instructor_comments'))
     except Exception as e:
         logger.error(f"Error extracting JSON from AI response: {e}")
         return None
@@ -555,8 +454,8 @@ class LocalAIClient:
 class AIGrader:
     def __init__(self, grader):
         self.grader = grader
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+        self.vectorizer = ml.TfidfVectorizer(max_features=1000, stop_words='english')
+        self.model = ml.RandomForestRegressor(n_estimators=100, random_state=42)
         self.is_trained = False
         
         # Use unified model interface
@@ -662,9 +561,9 @@ class AIGrader:
             
             # Calculate similarity
             if student_code and solution_code:
-                vectorizer = TfidfVectorizer()
+                vectorizer = ml.TfidfVectorizer()
                 tfidf_matrix = vectorizer.fit_transform([student_code, solution_code])
-                similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+                similarity = ml.cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
                 return similarity
             
             return 0.0
@@ -1,30 +1,24 @@
 import streamlit as st
 import pandas as pd
-import json
+import importlib
 import os
 import sqlite3
-from datetime import datetime
-import nbformat
-from nbconvert import HTMLExporter
-import subprocess
-import tempfile
-import shutil
-from pathlib import Path
-import pickle
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+from utils.lazy_imports import lazy
 
-# Import our modules
-from assignment_manager import create_assignment_page, upload_submissions_page
-from assignment_editor import assignment_management_page, get_assignment_rubric
-from training_interface import TrainingInterface
-from enhanced_training_page import enhanced_training_page
-from connect_web_interface import grade_submissions_page
-from grading_interface import view_results_page
-from prompt_manager import render_prompt_manager_ui
-from model_status_display import show_two_model_status
+# Page -> (module, render function, whether it takes the HomeworkGrader).
+# A page's module (and everything it imports) loads the first time the page
+# is opened, not on every start
+PAGES = {
+    "Dashboard": None,
+    "Assignment Management": ("assignment_editor", "assignment_management_page", True),
+    "Upload Submissions": ("assignment_manager", "upload_submissions_page", True),
+    "Grade Submissions": ("connect_web_interface", "grade_submissions_page", True),
+    "Quick View": ("grading_interface", "view_results_page", True),
+    "Review & Grade": ("enhanced_training_page", "enhanced_training_page", False),  # Split screen and all features
+    "Prompt Manager": ("prompt_manager", "render_prompt_manager_ui", False)
+}
+
+model_backends = lazy('model_backends')
 
 # Configure page
 st.set_page_config(
@@ -151,17 +145,22 @@ class HomeworkGrader:
         conn.commit()
         conn.close()
 
+@st.cache_resource
+def get_homework_grader():
+    """One HomeworkGrader per server process, so the database setup doesn't rerun on every interaction"""
+    return HomeworkGrader()
+
 def main():
     st.title("📚 AI-Powered Homework Grader")
     st.markdown("---")
     
-    grader = HomeworkGrader()
+    grader = get_homework_grader()
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
     page = st.sidebar.selectbox(
         "Choose a page:",
-        ["Dashboard", "Assignment Management", "Upload Submissions", "Grade Submissions", "Quick View", "Review & Grade", "Prompt Manager"]
+        list(PAGES)
     )
     
     # Demo Mode Toggle (global for all pages)
@@ -187,34 +186,25 @@ def main():
     # Show two-model system status in sidebar
     try:
         # Check for distributed system first
-        import os
         if os.path.exists('distributed_config.json'):
-            from models.distributed_mlx_client import show_distributed_status
-            show_distributed_status()
+            model_backends.show_distributed_status()
         else:
-            from model_status_display import show_two_model_status
-            show_two_model_status()
+            model_backends.show_two_model_status()
     except Exception as e:
         st.sidebar.markdown("---")
         st.sidebar.subheader("🤖 Two-Model AI System")
         st.sidebar.error(f"Status check failed: {str(e)[:30]}...")
         st.sidebar.info("💡 Qwen 3.0 Coder + Gemma 3.0 system will load when needed")
     
-    if page == "Dashboard":
+    if PAGES[page] is None:
         show_dashboard(grader)
-    elif page == "Assignment Management":
-        assignment_management_page(grader)
-    elif page == "Upload Submissions":
-        upload_submissions_page(grader)
-    elif page == "Grade Submissions":
-        grade_submissions_page(grader)
-    elif page == "Review & Grade":
-        # Enhanced training page with split screen and all features
-        enhanced_training_page()
-    elif page == "Quick View":
-        view_results_page(grader)
-    elif page == "Prompt Manager":
-        render_prompt_manager_ui()
+    else:
+        module_name, function_name, takes_grader = PAGES[page]
+        render_page = getattr(importlib.import_module(module_name), function_name)
+        if takes_grader:
+            render_page(grader)
+        else:
+            render_page()
 
 def show_dashboard(grader):
     st.header("📊 Dashboard")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Grading Throughput Benchmark
+Grades real submissions/ notebooks end to end against mock model servers
+(servers/mock_model_server.py) with a set time to first token and decode
+speed (fixed or a seeded distribution), so the grading pipeline's own
+cost is measured on a CPU-only box and regressions show up before a
+grading week rather than during one.
+
+Pipelines:
+  - v2:    BusinessAnalyticsGraderV2.grade_submission alone (inputs
+           preprocessed up front)
+  - batch: what the batch grader does per submission - notebook execution,
+           slimming, preprocessing, output comparison, grading, result
+           validation and the database save (into a copy of the database),
+           without the cooldown sleeps
+
+Every submission runs under a trace (utils/tracing.py), so the report
+splits the time by stage. --memory turns on tracemalloc for per-stage
+allocation (slower). Save a run with --json and compare later runs to it
+with --baseline; the exit code is 1 when throughput or a stage regresses.
+
+Usage: python benchmarks/grading_throughput_benchmark.py --assignment-id 12 --limit 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+from utils.tracing import span, stage_totals, start_trace
+
+
+def start_mock_servers(args):
+    """Qwen and GPT-OSS stand-ins for the MLX path; the Qwen one also answers Ollama requests"""
+    qwen = MockModel('mock-qwen', 'code_analysis', args.ttft, args.tokens_per_sec, args.code_tokens, seed=args.seed)
+    gpt_oss = MockModel('mock-gpt-oss', 'feedback', args.ttft, args.tokens_per_sec, args.feedback_tokens, seed=args.seed)
+    qwen_url, qwen_server = serve_in_thread(create_mock_app(qwen))
+    gpt_oss_url, gpt_oss_server = serve_in_thread(create_mock_app(gpt_oss))
+    return (qwen_url, gpt_oss_url), (qwen_server, gpt_oss_server)
+
+
+def load_corpus(db_path, assignment_id, limit):
+    """Assignment row and its submissions whose notebooks are on disk (same order every run)"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    assignment = conn.execute("""
+        SELECT name, description, rubric, template_notebook, solution_notebook, total_points
+        FROM assignments WHERE id = ?
+    """, (assignment_id,)).fetchone()
+    rows = conn.execute("""
+        SELECT s.id, s.notebook_path, st.name AS student_name, st.student_id AS student_identifier
+        FROM submissions s
+        LEFT JOIN students st ON s.student_id = st.id
+        WHERE s.assignment_id = ? ORDER BY s.id
+    """, (assignment_id,)).fetchall()
+    conn.close()
+
+    if assignment is None:
+        raise SystemExit(f"❌ Assignment {assignment_id} not found in {db_path}")
+    submissions = [dict(row) for row in rows if row['notebook_path'] and os.path.exists(row['notebook_path'])]
+    return dict(assignment), submissions[:limit]
+
+
+def create_grader(assignment, backend, urls, ollama_url, fast_path=False):
+    from business_analytics_grader_v2 import BusinessAnalyticsGraderV2
+    from grading_pipeline import find_validation_paths
+    from models.distributed_mlx_client import DistributedMLXClient
+
+    rubric_path, solution_path = find_validation_paths(assignment)
+    grader = BusinessAnalyticsGraderV2(rubric_path=rubric_path, solution_path=solution_path,
+                                       ollama_url=ollama_url, connect_models=False, fast_path=fast_path)
+    if backend == 'mlx':
+        grader.distributed_client = DistributedMLXClient(*urls)
+        grader.use_distributed_mlx = True
+    return grader
+
+
+def prepare_v2_inputs(assignment, submission):
+    """grade_submission arguments, built outside the timed region"""
+    from submission_preprocessor import SubmissionPreprocessor
+    from utils.solution_cache import get_solution_artifact
+
+    student_code, student_markdown, _ = SubmissionPreprocessor().preprocess_notebook(submission['notebook_path'])
+    template = assignment.get('template_notebook')
+    solution = assignment.get('solution_notebook')
+    return {
+        'student_code': student_code,
+        'student_markdown': student_markdown,
+        'template_code': get_solution_artifact(template).code if template and os.path.exists(template) else "",
+        'solution_code': get_solution_artifact(solution).code if solution and os.path.exists(solution) else "",
+        'assignment_info': {'title': assignment['name'], 'name': assignment['name'],
+                            'description': assignment['description'], 'rubric': assignment['rubric'],
+                            'student_name': submission['student_name']},
+        'notebook_path': submission['notebook_path']
+    }
+
+
+def grade_batch_style(business_grader, db_grader, assignment_id, submission):
+    """The per-submission steps of connect_web_interface.grade_batch_submissions"""
+    from grading_pipeline import grade_submission_internal, save_grading_result
+    from grading_validator import GradingValidator
+
+    with span('grade'):
+        result = grade_submission_internal(business_grader, submission, assignment_id, db_grader)
+    with span('result.validate'):
+        validator = GradingValidator()
+        is_valid, _ = validator.validate_grading_result(result)
+        if not is_valid:
+            result = validator.fix_calculation_errors(result)
+    with span('db.save'):
+        save_grading_result(db_grader, submission['id'], result)
+    return result
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_benchmark(args):
+    urls, servers = start_mock_servers(args)
+    work_dir = tempfile.mkdtemp(prefix='grading_benchmark_')
+    db_copy = os.path.join(work_dir, 'grading_database.db')
+    shutil.copy(args.db, db_copy)
+    db_grader = SimpleNamespace(db_path=db_copy)
+
+    assignment, submissions = load_corpus(db_copy, args.assignment_id, args.limit)
+    if not submissions:
+        raise SystemExit(f"❌ No submissions with notebooks on disk for assignment {args.assignment_id}")
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    if not args.verbose:
+        logging.disable(logging.WARNING)  # Mock server request logs, executor and Streamlit bare-mode noise
+        warnings.simplefilter('ignore')
+    with quiet:
+        business_grader = create_grader(assignment, args.backend, urls, ollama_url=urls[0], fast_path=args.fast_path)
+        inputs = [prepare_v2_inputs(assignment, s) for s in submissions] if args.pipeline == 'v2' else None
+
+    print("\n" + "=" * 70)
+    print("GRADING THROUGHPUT BENCHMARK")
+    print("=" * 70)
+    print(f"Pipeline: {args.pipeline} | backend: {args.backend} | assignment: {assignment['name']} "
+          f"| submissions: {len(submissions)} x {args.repeat}")
+    print(f"Mock models: TTFT {args.ttft}s, {args.tokens_per_sec} tok/s, seed {args.seed}, "
+          f"~{args.code_tokens} code / ~{args.feedback_tokens} feedback tokens")
+
+    if args.memory:
+        tracemalloc.start()
+
+    durations = []
+    fast_paths = {}
+    totals = {}
+    allocations = {}
+    python_peaks = []
+    failed = 0
+    wall_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for i, submission in enumerate(submissions):
+            if args.memory:
+                tracemalloc.reset_peak()
+            with start_trace('benchmark', submission_id=submission['id']) as trace:
+                try:
+                    with quiet:
+                        if args.pipeline == 'v2':
+                            with span('grade'):
+                                business_grader.grade_submission(**inputs[i])
+                        else:
+                            grade_batch_style(business_grader, db_grader, args.assignment_id, submission)
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Submission {submission['id']} failed: {type(e).__name__}: {e}")
+            durations.append(trace.total_seconds)
+            decision = business_grader.grading_stats.get('fast_path')
+            if decision:
+                fast_paths[decision] = fast_paths.get(decision, 0) + 1
+            for name, seconds in stage_totals(trace.spans).items():
+                totals[name] = totals.get(name, 0.0) + seconds
+            for record in trace.spans:
+                if 'alloc_mb' in record['attrs']:
+                    allocations.setdefault(record['name'], []).append(record['attrs']['alloc_mb'])
+            if args.memory:
+                python_peaks.append(tracemalloc.get_traced_memory()[1] / 1e6)
+            print(f"  {len(durations):3d}. submission {submission['id']}: {trace.total_seconds:.2f}s")
+    wall_time = time.perf_counter() - wall_start
+
+    if args.memory:
+        tracemalloc.stop()
+    for server in servers:
+        server.shutdown()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    graded = len(durations)
+    stages = {}
+    for name, seconds in sorted(totals.items(), key=lambda item: -item[1]):
+        stages[name] = {
+            'seconds': seconds,
+            'per_submission': seconds / graded,
+            'share': seconds / sum(durations) if sum(durations) else 0.0,
+            'alloc_mb': statistics.mean(allocations[name]) if name in allocations else None
+        }
+
+    return {
+        'pipeline': args.pipeline,
+        'backend': args.backend,
+        'fast_path': args.fast_path,
+        'assignment_id': args.assignment_id,
+        'submissions': graded,
+        'failed': failed,
+        'fast_paths': fast_paths,
+        'wall_seconds': wall_time,
+        'submissions_per_minute': graded / wall_time * 60,
+        'per_submission': {
+            'mean': statistics.mean(durations),
+            'p50': percentile(durations, 0.5),
+            'p95': percentile(durations, 0.95)
+        },
+        'stages': stages,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'python_peak_mb': max(python_peaks) if python_peaks else None,
+        'mock': {'ttft': args.ttft, 'tokens_per_sec': args.tokens_per_sec, 'seed': args.seed,
+                 'code_tokens': args.code_tokens, 'feedback_tokens': args.feedback_tokens}
+    }
+
+
+def print_report(results):
+    per = results['per_submission']
+    print("-" * 70)
+    print(f"Submissions/minute: {results['submissions_per_minute']:.2f} "
+          f"({results['submissions']} in {results['wall_seconds']:.1f}s, {results['failed']} failed)")
+    if results['fast_paths']:
+        print("Fast path: " + ", ".join(f"{count} {decision}" for decision, count in results['fast_paths'].items()))
+    print(f"Per submission: mean {per['mean']:.2f}s | p50 {per['p50']:.2f}s | p95 {per['p95']:.2f}s")
+    memory = f"Peak RSS: {results['peak_rss_mb']:.0f} MB"
+    if results['python_peak_mb'] is not None:
+        memory += f" | Python peak per submission: {results['python_peak_mb']:.1f} MB"
+    print(memory)
+    print(f"\n{'Stage (self time)':<28}{'per sub (s)':>12}{'share':>9}{'alloc MB':>11}")
+    print("(the two model calls overlap, so shares can add up to more than 100%)")
+    for name, stage in results['stages'].items():
+        alloc = f"{stage['alloc_mb']:.2f}" if stage['alloc_mb'] is not None else '-'
+        print(f"{name:<28}{stage['per_submission']:>12.3f}{stage['share'] * 100:>8.1f}%{alloc:>11}")
+    print("=" * 70)
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds=0.05):
+    """Regressions beyond tolerance (a fraction) against a saved run; small stages are ignored"""
+    regressions = []
+    for key in ('pipeline', 'backend', 'fast_path', 'mock'):
+        before = baseline.get(key, False if key == 'fast_path' else None)  # Older runs predate --fast-path
+        if before != results[key]:
+            print(f"⚠️ Baseline {key} differs ({before} vs {results[key]}) - comparison is not like for like")
+    if results['submissions_per_minute'] < baseline['submissions_per_minute'] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['submissions_per_minute']:.2f} → "
+                           f"{results['submissions_per_minute']:.2f} submissions/min")
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name, {}).get('per_submission')
+        if before is None:
+            continue
+        after = stage['per_submission']
+        if after > before * (1 + tolerance) and after - before > min_seconds:
+            regressions.append(f"{name} {before:.3f}s → {after:.3f}s per submission")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end grading throughput benchmark with mock models')
+    parser.add_argument('--db', default='grading_database.db', help='Grading database (copied, never written)')
+    parser.add_argument('--assignment-id', type=int, default=12, help='Assignment whose submissions are graded')
+    parser.add_argument('--limit', type=int, default=10, help='Submissions graded per repeat')
+    parser.add_argument('--repeat', type=int, default=1, help='Times the corpus is graded')
+    parser.add_argument('--pipeline', choices=['v2', 'batch'], default='batch')
+    parser.add_argument('--backend', choices=['mlx', 'ollama'], default='mlx',
+                        help='Distributed MLX servers or the Ollama API')
+    parser.add_argument('--ttft', default='0.3', help='Mock seconds to first token (e.g. 0.3 or normal:0.3,0.05)')
+    parser.add_argument('--tokens-per-sec', default='100', help='Mock decode speed (same forms as --ttft)')
+    parser.add_argument('--seed', type=int, default=0, help='Mock response/latency seed')
+    parser.add_argument('--code-tokens', type=int, default=300, help='Mock code analysis length')
+    parser.add_argument('--feedback-tokens', type=int, default=500, help='Mock feedback length')
+    parser.add_argument('--fast-path', action='store_true', help='Grade template-only/perfect submissions from validation')
+    parser.add_argument('--memory', action='store_true', help='Per-stage allocation via tracemalloc (slower)')
+    parser.add_argument('--json', help='Write the results here')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown vs the baseline')
+    parser.add_argument('--verbose', action='store_true', help="Show the grader's own output")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressions beyond {args.tolerance:.0%} of {args.baseline}:")
+            for regression in regressions:
+                print(f"   • {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
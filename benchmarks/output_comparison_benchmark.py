@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Output Comparison Microbenchmark
+Times OutputComparator's semantic comparison against the previous
+implementation (full-string SequenceMatcher, regexes re-run per call) on
+real solution notebook outputs, and checks both make the same match calls.
+
+Pairs compared for every solution notebook in data/raw:
+  - each output against itself (identical student answer)
+  - each output against a perturbed copy (a few numbers changed)
+  - each output against the next cell's output (wrong cell / wrong answer)
+plus a sample of real student outputs from submissions/ (long tibble
+printouts included) against the solution outputs in turn.
+
+Usage: python benchmarks/output_comparison_benchmark.py [--repeat 3]
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nbformat
+
+from output_comparator import OutputSignature, jaccard, signature_similarity
+
+
+def legacy_similarity(text1, text2):
+    """calculate_similarity before the signature engine"""
+    if not text1 and not text2:
+        return 1.0
+    if not text1 or not text2:
+        return 0.0
+    text1_norm = ' '.join(text1.lower().split())
+    text2_norm = ' '.join(text2.lower().split())
+    numbers1 = set(re.findall(r'\d+\.?\d*', text1))
+    numbers2 = set(re.findall(r'\d+\.?\d*', text2))
+    if numbers1 and numbers2:
+        intersection = len(numbers1.intersection(numbers2))
+        union = len(numbers1.union(numbers2))
+        if union and intersection / union > 0.8:
+            return max(0.85, SequenceMatcher(None, text1_norm, text2_norm).ratio())
+    return SequenceMatcher(None, text1_norm, text2_norm).ratio()
+
+
+def legacy_metrics(text):
+    has_real_error = False
+    if 'Error:' in text or 'error' in text.lower():
+        has_real_error = not any(ignore in text for ignore in (
+            'Error in parse(text = input): <text>:1:1: unexpected', 'Unknown or uninitialised column'))
+    return {
+        'numbers': set(re.findall(r'\d+\.?\d*', text)),
+        'row_counts': set(re.findall(r'(\d+)\s+rows?', text.lower())),
+        'has_tibble': '# A tibble:' in text or 'tibble' in text.lower(),
+        'has_dataframe': 'data.frame' in text.lower() or 'DataFrame' in text,
+        'has_error': has_real_error
+    }
+
+
+def legacy_compare(student_out, solution_out):
+    """semantic_compare before the signature engine"""
+    s, t = legacy_metrics(student_out), legacy_metrics(solution_out)
+    if s['has_error'] and not t['has_error']:
+        return (0.0, False)
+    if (s['has_tibble'] or s['has_dataframe']) and (t['has_tibble'] or t['has_dataframe']):
+        if s['row_counts'] and t['row_counts']:
+            return (0.95, True) if s['row_counts'] == t['row_counts'] else (0.3, False)
+    if s['numbers'] and t['numbers']:
+        number_similarity = len(s['numbers'] & t['numbers']) / len(s['numbers'] | t['numbers'])
+        if number_similarity > 0.8:
+            return (0.90, True)
+        elif number_similarity > 0.5:
+            return (0.70, False)
+    similarity = legacy_similarity(student_out, solution_out)
+    return (similarity, similarity >= 0.75)
+
+
+def signature_compare(student_out, solution_out, solution_signatures):
+    """Same decision path as OutputComparator.semantic_compare"""
+    student = OutputSignature(student_out)
+    solution = solution_signatures.get(solution_out)
+    if solution is None:
+        solution = solution_signatures[solution_out] = OutputSignature(solution_out)
+    if student.has_error and not solution.has_error:
+        return (0.0, False)
+    if (student.has_tibble or student.has_dataframe) and (solution.has_tibble or solution.has_dataframe):
+        if student.row_counts and solution.row_counts:
+            return (0.95, True) if student.row_counts == solution.row_counts else (0.3, False)
+    if student.numbers and solution.numbers:
+        number_similarity = jaccard(student.numbers, solution.numbers)
+        if number_similarity > 0.8:
+            return (0.90, True)
+        elif number_similarity > 0.5:
+            return (0.70, False)
+    similarity = signature_similarity(student, solution)
+    return (similarity, similarity >= 0.75)
+
+
+def perturb(text):
+    """Change every 7th number, like a student with a slightly different filter"""
+    counter = iter(range(10 ** 9))
+    return re.sub(r'\d+', lambda m: str(int(m.group()) + 1) if next(counter) % 7 == 0 else m.group(), text)
+
+
+def load_outputs(pattern):
+    outputs = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r', encoding='utf-8') as f:
+            nb = nbformat.read(f, as_version=4)
+        for cell in nb.cells:
+            if cell.cell_type != 'code':
+                continue
+            texts = [o.get('text', '') if o.get('output_type') == 'stream' else o.get('data', {}).get('text/plain', '')
+                     for o in cell.get('outputs', [])]
+            text = '\n'.join(t for t in texts if t)
+            if text:
+                outputs.append(text)
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Output comparison microbenchmark')
+    parser.add_argument('--solutions', default='data/raw/*SOLUTION*.ipynb')
+    parser.add_argument('--students', default='submissions/*/*.ipynb')
+    parser.add_argument('--student-outputs', type=int, default=400, help='Student outputs sampled (0 to skip)')
+    parser.add_argument('--repeat', type=int, default=3, help='Times each student is compared (students per assignment)')
+    args = parser.parse_args()
+
+    outputs = load_outputs(args.solutions)
+    pairs = []
+    for i, solution_out in enumerate(outputs):
+        pairs.append((solution_out, solution_out))
+        pairs.append((perturb(solution_out), solution_out))
+        pairs.append((outputs[(i + 1) % len(outputs)], solution_out))
+
+    if args.student_outputs:
+        student_outputs = load_outputs(args.students)
+        step = max(1, len(student_outputs) // args.student_outputs)
+        for i, student_out in enumerate(student_outputs[::step][:args.student_outputs]):
+            pairs.append((student_out, outputs[i % len(outputs)]))
+
+    print("\n" + "=" * 70)
+    print("OUTPUT COMPARISON MICROBENCHMARK")
+    print("=" * 70)
+    print(f"Solution outputs: {len(outputs)} | pairs: {len(pairs)} x {args.repeat}")
+    print(f"Longest output: {max(len(student) for student, _ in pairs):,} chars")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        legacy = [legacy_compare(student, solution) for student, solution in pairs]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solution_signatures = {}
+    for _ in range(args.repeat):
+        fast = [signature_compare(student, solution, solution_signatures) for student, solution in pairs]
+    fast_time = time.perf_counter() - start
+
+    agree = sum(1 for a, b in zip(legacy, fast) if a[1] == b[1])
+    score_drift = max(abs(a[0] - b[0]) for a, b in zip(legacy, fast))
+
+    print(f"\nLegacy (SequenceMatcher on full text): {legacy_time * 1000:.1f} ms")
+    print(f"Signatures + shingles:                 {fast_time * 1000:.1f} ms")
+    print(f"Speedup: {legacy_time / fast_time:.1f}x")
+    print(f"Match decisions agree: {agree}/{len(pairs)} | max similarity drift: {score_drift:.3f}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures what a grader waits for before the app is usable:
+
+  - Import audit: each entry module is imported in a fresh interpreter with
+    python -X importtime, giving its cold import time and the third-party
+    packages that account for most of it
+  - Page renders: each page in app.PAGES is opened in a fresh Streamlit
+    AppTest session (first visit, including the page module's imports)
+    and then rerun (second visit, warm caches)
+
+Heavy subsystems should be loaded through utils/lazy_imports.py, so a
+package showing up in a module's audit that the module does not need at
+import time is the first thing to look at. Save a run with --json and
+compare later runs to it with --baseline; the exit code is 1 when an
+import or a page render regresses.
+
+Usage: python benchmarks/startup_benchmark.py
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODULES = [
+    'app', 'connect_web_interface', 'grading_interface', 'enhanced_training_page', 'assignment_manager',
+    'assignment_editor', 'prompt_manager', 'business_analytics_grader_v2', 'ai_grader'
+]
+
+
+def audit_import(module, top=5):
+    """Cold import of one module: total seconds and the packages with the most self time"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'
+        return {'seconds': None, 'error': error, 'packages': {}}
+
+    total_us = 0
+    by_package = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.strip() == module:
+            total_us = int(cumulative_us)
+        by_package[name.strip().split('.')[0]] += int(self_us)
+
+    by_package.pop(module, None)
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {'seconds': total_us / 1e6, 'error': None,
+            'packages': {name: us / 1e6 for name, us in packages}}
+
+
+def render_page(page, timeout):
+    """First and second render of one page in this process (run via --render-page)"""
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=timeout)
+    start = time.perf_counter()
+    app_test.run()
+    startup = time.perf_counter() - start
+
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        app_test.sidebar.selectbox[0].select(page).run()
+        timings.append(time.perf_counter() - start)
+
+    errors = [exception.message for exception in app_test.exception]
+    return {'startup': startup, 'first': timings[0], 'second': timings[1], 'error': errors[0] if errors else None}
+
+
+def measure_page(page, timeout):
+    """render_page in a fresh interpreter, so earlier pages do not warm the imports"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--render-page', page,
+                             '--timeout', str(timeout)], cwd=ROOT, capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'startup': None, 'first': None, 'second': None,
+            'error': (result.stderr.strip().splitlines() or ['render failed'])[-1]}
+
+
+def run_benchmark(args):
+    results = {'python': sys.version.split()[0], 'imports': {}, 'pages': {}}
+    for module in args.modules or MODULES:
+        print(f"📦 Importing {module}...")
+        results['imports'][module] = audit_import(module)
+
+    if not args.skip_pages:
+        if args.pages:
+            pages = args.pages
+        else:
+            from app import PAGES
+            pages = [page for page in PAGES if page != 'Dashboard']
+        for page in pages:
+            print(f"📄 Rendering {page}...")
+            results['pages'][page] = measure_page(page, args.timeout)
+    return results
+
+
+def print_report(results):
+    print("-" * 70)
+    print(f"{'Module (cold import)':<32}{'seconds':>9}   heaviest packages (self time)")
+    for module, audit in results['imports'].items():
+        if audit['error']:
+            print(f"{module:<32}{'-':>9}   ❌ {audit['error']}")
+            continue
+        packages = ", ".join(f"{name} {seconds:.2f}" for name, seconds in audit['packages'].items())
+        print(f"{module:<32}{audit['seconds']:>9.2f}   {packages}")
+
+    if results['pages']:
+        print(f"\n{'Page':<28}{'app start':>10}{'first (s)':>11}{'second (s)':>12}")
+        for page, timing in results['pages'].items():
+            if timing['first'] is None:
+                print(f"{page:<28}{'-':>10}{'-':>11}{'-':>12}   ❌ {timing['error']}")
+                continue
+            note = f"   ⚠️ {timing['error']}" if timing['error'] else ""
+            print(f"{page:<28}{timing['startup']:>10.2f}{timing['first']:>11.2f}{timing['second']:>12.2f}{note}")
+        print("(page exceptions are shown but not counted as regressions)")
+    print("=" * 70)
+
+
+def compare_to_baseline(results, baseline, tolerance, min_seconds=0.1):
+    """Regressions beyond tolerance (a fraction) against a saved run; small differences are ignored"""
+    def slower(before, after):
+        return before is not None and after is not None and after > before * (1 + tolerance) \
+            and after - before > min_seconds
+
+    regressions = []
+    for module, audit in results['imports'].items():
+        before = baseline['imports'].get(module, {}).get('seconds')
+        if slower(before, audit['seconds']):
+            regressions.append(f"import {module} {before:.2f}s → {audit['seconds']:.2f}s")
+    for page, timing in results['pages'].items():
+        for visit in ('startup', 'first', 'second'):
+            before = baseline['pages'].get(page, {}).get(visit)
+            if slower(before, timing[visit]):
+                regressions.append(f"{page} ({visit}) {before:.2f}s → {timing[visit]:.2f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold import audit and page render latency for the Streamlit app')
+    parser.add_argument('--modules', nargs='+', help='Modules to audit (default: app and the page modules)')
+    parser.add_argument('--pages', nargs='+', help='Pages to render (default: every page but the Dashboard)')
+    parser.add_argument('--skip-pages', action='store_true', help='Only run the import audit')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed per page render')
+    parser.add_argument('--json', help='Write the results here')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown vs the baseline')
+    parser.add_argument('--render-page', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render_page:
+        print(json.dumps(render_page(args.render_page, args.timeout)))
+        return
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressions beyond {args.tolerance:.0%} of {args.baseline}:")
+            for regression in regressions:
+                print(f"   • {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,8 +13,17 @@ import os
 from typing import Dict, List, Any, Optional
 from prompt_manager import PromptManager
 from notebook_validation import NotebookValidator
-from score_validator import validate_and_adjust_scores
+from model_config import get_model_config
+from score_validator import check_feedback_draft, validate_and_adjust_scores
 from output_comparator import OutputComparator, compare_and_generate_prompt
+from utils.notebook_truncator import slim_notebook_if_needed
+from utils.structured_output import (
+    CODE_ANALYSIS_SCHEMA, FEEDBACK_SCHEMA, MalformedJSONError, StreamingJSONParser, extract_json_object
+)
+from utils.tracing import add_phases, span
+
+# Generations to try per structured request (a malformed stream is retried once)
+STRUCTURED_ATTEMPTS = 2
 
 class BusinessAnalyticsGrader:
     """Grader optimized for business analytics students (first-year level)"""
@@ -22,11 +31,22 @@ class BusinessAnalyticsGrader:
     def __init__(self, 
                  code_model: str = "hopephoto/qwen3-coder-30b-a3b-instruct_q8:latest",
                  feedback_model: str = "gemma3:27b-it-q8_0",
-                 ollama_url: str = "http://localhost:11434"):
-        """Initialize business analytics grader"""
+                 ollama_url: str = "http://localhost:11434",
+                 feedback_cascade: List[str] = None,
+                 connect_models: bool = True):
+        """
+        Initialize business analytics grader
+        
+        feedback_cascade: smaller models (smallest first) that draft the
+        feedback before feedback_model; the first draft that passes
+        score_validator.check_feedback_draft is used (Ollama only)
+        connect_models=False never sets up the distributed MLX client (for
+        callers that only use the Ollama prompts and response parsers)
+        """
         
         self.code_model = code_model
         self.feedback_model = feedback_model
+        self.feedback_cascade = list(feedback_cascade or [])
         self.ollama_url = ollama_url
         self.api_url = f"{ollama_url}/api/generate"
         
@@ -38,7 +58,7 @@ class BusinessAnalyticsGrader:
         self.use_distributed_mlx = False
         self.distributed_client = None
         
-        if os.path.exists('distributed_config.json'):
+        if connect_models and os.path.exists('distributed_config.json'):
             try:
                 from models.distributed_mlx_client import DistributedMLXClient
                 import json
@@ -67,6 +87,8 @@ class BusinessAnalyticsGrader:
         print(f"📊 Optimized for first-year business students")
         print(f"🤖 Code Analyzer: {code_model}")
         print(f"📝 Feedback Generator: {feedback_model}")
+        if self.feedback_cascade:
+            print(f"🪜 Feedback Cascade: {' → '.join(self.feedback_cascade + [feedback_model])}")
         
         # Performance tracking
         self.grading_stats = {
@@ -84,6 +106,12 @@ class BusinessAnalyticsGrader:
         # Parallel processing
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
         self.models_ready = False
+        
+        # Feedback cascade per tier across submissions: calls, accepted drafts, seconds
+        self.cascade_stats = {}
+        
+        # Rubric summaries already built, by rubric (the same for a whole cohort)
+        self._rubric_summaries = {}
     
     def check_ollama_connection(self) -> bool:
         """Check if Ollama is running and accessible"""
@@ -132,8 +160,17 @@ class BusinessAnalyticsGrader:
         except Exception as e:
             return False
     
-    def generate_with_ollama(self, model: str, prompt: str, max_tokens: int = 2000) -> Optional[str]:
-        """Generate response using Ollama"""
+    def generate_with_ollama(self, model: str, prompt: str, max_tokens: int = 2000,
+                             schema: Optional[Dict] = None) -> Optional[str]:
+        """
+        Generate response using Ollama
+        
+        With a schema, decoding is constrained to it and the response is
+        streamed and checked as it arrives (returns just the JSON text)
+        """
+        if schema is not None:
+            return self._generate_structured_with_ollama(model, prompt, max_tokens, schema)
+        
         try:
             payload = {
                 "model": model,
@@ -157,8 +194,77 @@ class BusinessAnalyticsGrader:
         except Exception as e:
             return None
     
+    def _generate_structured_with_ollama(self, model: str, prompt: str, max_tokens: int,
+                                         schema: Dict) -> Optional[str]:
+        """
+        Schema-constrained streaming generation, retried when the JSON goes wrong mid-stream
+        
+        Falls back to a plain generation (JSON pulled out of the text) if the
+        server rejects the schema or every attempt comes back malformed
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "format": schema,
+            "options": {
+                "num_predict": max_tokens,
+                "temperature": 0.2,
+                "top_p": 0.9
+            }
+        }
+        
+        for attempt in range(1, STRUCTURED_ATTEMPTS + 1):
+            parser = StreamingJSONParser(schema, strict=True)
+            hit_length_limit = False
+            try:
+                with span('llm.attempt', attempt=attempt):
+                    start_time = time.perf_counter()
+                    first_token_time = None
+                    # Leaving the with block closes the connection, which stops the generation
+                    with requests.post(self.api_url, json=payload, stream=True, timeout=300) as response:
+                        if response.status_code != 200:
+                            print(f"⚠️ {model}: structured output rejected (HTTP {response.status_code}), using plain generation")
+                            break
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if first_token_time is None and chunk.get('response'):
+                                first_token_time = time.perf_counter()
+                            if parser.feed(chunk.get('response', '')) is not None:
+                                break
+                            if chunk.get('done'):
+                                hit_length_limit = chunk.get('done_reason') == 'length'
+                                break
+                    if first_token_time is not None:
+                        add_phases([('time_to_first_token', first_token_time - start_time),
+                                    ('decode', time.perf_counter() - first_token_time)])
+                    parser.finish()
+                return parser.text
+            except MalformedJSONError as e:
+                print(f"⚠️ {model}: malformed JSON (attempt {attempt}/{STRUCTURED_ATTEMPTS}): {e}")
+                self.grading_stats['structured_retries'] = self.grading_stats.get('structured_retries', 0) + 1
+                if hit_length_limit:
+                    # Cut off at num_predict: the same budget would be cut off again
+                    max_tokens *= 2
+                    payload['options']['num_predict'] = max_tokens
+            except Exception as e:
+                return None
+        
+        response = self.generate_with_ollama(model, prompt, max_tokens)
+        result = extract_json_object(response, any_of=schema['properties']) if response else None
+        return json.dumps(result) if result is not None else None
+    
     def _build_rubric_summary(self, rubric_criteria: Dict, rubric_elements: Dict) -> str:
-        """Build a concise rubric summary for AI prompts"""
+        """Build a concise rubric summary for AI prompts (once per rubric)"""
+        key = json.dumps([rubric_criteria, rubric_elements], sort_keys=True, default=str)
+        summary = self._rubric_summaries.get(key)
+        if summary is None:
+            summary = self._rubric_summaries[key] = self._render_rubric_summary(rubric_criteria, rubric_elements)
+        return summary
+    
+    def _render_rubric_summary(self, rubric_criteria: Dict, rubric_elements: Dict) -> str:
         summary = "\n=== ASSIGNMENT-SPECIFIC RUBRIC ===\n"
         
         # Add weights
@@ -257,11 +363,13 @@ class BusinessAnalyticsGrader:
             notebook_size_kb = os.path.getsize(notebook_path) / 1024
             print(f"📏 Notebook size: {notebook_size_kb:.1f} KB ({notebook_size_mb:.2f} MB)")
             
-            # Skip extremely large notebooks that will timeout
-            if notebook_size_kb > 600:  # More than 600KB (increased from 400KB for better coverage)
-                print(f"⚠️ SKIPPING: Notebook too large ({notebook_size_kb:.1f} KB)")
-                print(f"   This notebook exceeds processing limits and requires manual review.")
-                raise RuntimeError(f"Notebook too large ({notebook_size_kb:.1f} KB) - requires manual review")
+            # Large notebooks are mostly plot images and huge printed tables -
+            # grade a slimmed copy instead of sending them to manual review
+            notebook_path, slim_info = slim_notebook_if_needed(notebook_path)
+            self.grading_stats['notebook_slimming'] = slim_info
+            if slim_info['slimmed']:
+                notebook_size_kb = slim_info['slimmed_kb']
+                notebook_size_mb = notebook_size_kb / 1024
             
             if notebook_size_kb > 300:  # More than 300KB
                 print(f"⚠️ WARNING: Large notebook ({notebook_size_kb:.1f} KB) - this may take longer to process")
@@ -488,7 +596,7 @@ class BusinessAnalyticsGrader:
             
             future_feedback = self.executor.submit(
                 self._execute_business_feedback_generation,
-                student_code, student_markdown, assignment_info
+                student_code, student_markdown, assignment_info, template_code
             )
             
             # Wait for both results
@@ -536,6 +644,10 @@ class BusinessAnalyticsGrader:
         total_time = time.time() - start_time
         self.grading_stats['total_time'] = total_time
         
+        # Exact per-submission token counts (stored with the result in ai_feedback)
+        if self.use_distributed_mlx and self.distributed_client:
+            self.grading_stats['token_usage'] = self.distributed_client.get_token_usage()
+        
         final_result['grading_stats'] = self.grading_stats.copy()
         final_result['grading_method'] = 'business_analytics_system'
         
@@ -581,16 +693,19 @@ class BusinessAnalyticsGrader:
         
         # Use prompt manager for consistency (single source of truth)
         assignment_name = assignment_info.get('name', assignment_info.get('title', 'Unknown'))
-        prompt = self.prompt_manager.get_combined_prompt(
-            assignment_name,
-            "code_analysis",
-            assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
-            template_code=template_code if template_code else "# No template provided",
-            student_code=student_code,
-            solution_code=solution_code
-        )
+        with span('prompt.build'):
+            prompt = self.prompt_manager.get_combined_prompt(
+                assignment_name,
+                "code_analysis",
+                assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
+                template_code=template_code if template_code else "# No template provided",
+                student_code=student_code,
+                solution_code=solution_code
+            )
         
-        response = self.generate_with_ollama(self.code_model, prompt, max_tokens=1500)
+        with span('llm.code_analysis', model=self.code_model):
+            response = self.generate_with_ollama(self.code_model, prompt, max_tokens=1500,
+                                                 schema=CODE_ANALYSIS_SCHEMA)
         
         analysis_time = time.time() - start_time
         self.grading_stats['code_analysis_time'] = analysis_time
@@ -600,10 +715,11 @@ class BusinessAnalyticsGrader:
         if not response:
             return {"error": "Code analysis failed", "technical_score": 85}  # Default higher for business
         
-        return self._parse_business_code_response(response)
+        with span('parse'):
+            return self._parse_business_code_response(response)
     
     def _execute_business_feedback_generation(self, student_code: str, student_markdown: str,
-                                            assignment_info: Dict) -> Dict[str, Any]:
+                                            assignment_info: Dict, template_code: str = "") -> Dict[str, Any]:
         """Execute feedback generation with business context"""
         start_time = time.time()
         
@@ -611,15 +727,30 @@ class BusinessAnalyticsGrader:
         
         # Use prompt manager for consistency (single source of truth)
         assignment_name = assignment_info.get('name', assignment_info.get('title', 'Unknown'))
-        prompt = self.prompt_manager.get_combined_prompt(
-            assignment_name,
-            "feedback",
-            assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
-            student_markdown=student_markdown,
-            student_code_summary=student_code[:800]
-        )
+        with span('prompt.build'):
+            prompt = self.prompt_manager.get_combined_prompt(
+                assignment_name,
+                "feedback",
+                assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
+                student_markdown=student_markdown,
+                student_code_summary=student_code[:800]
+            )
+        
+        response = None
+        if self.feedback_cascade:
+            response = self._run_feedback_cascade(prompt, student_code, template_code, assignment_info)
+        
+        if response is None:
+            final_start = time.time()
+            with span('llm.feedback', model=self.feedback_model):
+                response = self.generate_with_ollama(self.feedback_model, prompt, max_tokens=2000,
+                                                     schema=FEEDBACK_SCHEMA)
+            if self.feedback_cascade:
+                self._record_cascade_tier(self.feedback_model, time.time() - final_start, accepted=bool(response))
         
-        response = self.generate_with_ollama(self.feedback_model, prompt, max_tokens=2000)
+        if self.feedback_cascade:
+            self.grading_stats['feedback_cascade_totals'] = self.cascade_summary()
+            print(f"🪜 [FEEDBACK] Cascade so far: {self._format_cascade_summary()}")
         
         feedback_time = time.time() - start_time
         self.grading_stats['feedback_generation_time'] = feedback_time
@@ -629,7 +760,78 @@ class BusinessAnalyticsGrader:
         if not response:
             return {"error": "Feedback generation failed", "overall_score": 85}  # Default higher for business
         
-        return self._parse_business_feedback_response(response)
+        with span('parse'):
+            return self._parse_business_feedback_response(response)
+    
+    def _run_feedback_cascade(self, prompt: str, student_code: str, template_code: str,
+                              assignment_info: Dict) -> Optional[str]:
+        """
+        Draft the feedback on each cascade model in turn; returns the first
+        draft that passes the checks, or None to escalate to feedback_model
+        """
+        rubric = assignment_info.get('rubric')
+        if isinstance(rubric, str):
+            try:
+                rubric = json.loads(rubric)
+            except json.JSONDecodeError:
+                rubric = None  # Some assignments store a rubric file path
+        
+        escalations = []
+        self.grading_stats['feedback_cascade'] = {'accepted_tier': self.feedback_model, 'escalations': escalations}
+        for model in self.feedback_cascade:
+            tier_start = time.time()
+            with span('llm.feedback', model=model, cascade=True) as record:
+                response = self.generate_with_ollama(model, prompt, max_tokens=get_model_config(model)['max_tokens'],
+                                                     schema=FEEDBACK_SCHEMA)
+                draft = extract_json_object(response, required=FEEDBACK_SCHEMA['required']) if response else None
+                problems = (check_feedback_draft(draft, student_code, template_code, rubric)
+                            if draft is not None else ["No parseable draft"])
+                if record is not None:
+                    record['attrs']['accepted'] = not problems
+            self._record_cascade_tier(model, time.time() - tier_start, accepted=not problems)
+            
+            if not problems:
+                print(f"🪜 [FEEDBACK] Draft from {model} accepted ({time.time() - tier_start:.1f}s)")
+                self.grading_stats['feedback_cascade']['accepted_tier'] = model
+                return response
+            print(f"🪜 [FEEDBACK] Draft from {model} escalated: {'; '.join(problems)}")
+            escalations.append({'model': model, 'problems': problems})
+        return None
+    
+    def _record_cascade_tier(self, model: str, seconds: float, accepted: bool):
+        tier = self.cascade_stats.setdefault(model, {'calls': 0, 'accepted': 0, 'seconds': 0.0})
+        tier['calls'] += 1
+        tier['accepted'] += int(accepted)
+        tier['seconds'] += seconds
+    
+    def cascade_summary(self) -> Dict[str, Any]:
+        """
+        Per-tier hit rates and latency since the grader started, and the time
+        saved against sending every submission to feedback_model (from its
+        mean latency, less the time spent on drafts that were escalated)
+        """
+        tiers = {}
+        for model in self.feedback_cascade + [self.feedback_model]:
+            tier = self.cascade_stats.get(model, {'calls': 0, 'accepted': 0, 'seconds': 0.0})
+            tiers[model] = {
+                **tier,
+                'hit_rate': tier['accepted'] / tier['calls'] if tier['calls'] else None,
+                'mean_seconds': tier['seconds'] / tier['calls'] if tier['calls'] else None
+            }
+        
+        final_mean = tiers[self.feedback_model]['mean_seconds']
+        seconds_saved = None
+        if final_mean is not None:
+            drafts = [tiers[model] for model in self.feedback_cascade]
+            seconds_saved = sum(t['accepted'] for t in drafts) * final_mean - sum(t['seconds'] for t in drafts)
+        return {'tiers': tiers, 'estimated_seconds_saved': seconds_saved}
+    
+    def _format_cascade_summary(self) -> str:
+        summary = self.cascade_summary()
+        parts = [f"{model} {tier['accepted']}/{tier['calls']}" + (f" ({tier['mean_seconds']:.1f}s avg)" if tier['calls'] else "")
+                 for model, tier in summary['tiers'].items()]
+        saved = summary['estimated_seconds_saved']
+        return " | ".join(parts) + (f" | est. time saved {saved:+.1f}s" if saved is not None else "")
     
     # NOTE: Prompts are now managed by PromptManager (single source of truth)
     # See prompt_templates/general_code_analysis_prompt.txt and general_feedback_prompt.txt
@@ -637,41 +839,17 @@ class BusinessAnalyticsGrader:
     
     def _parse_business_code_response(self, response: str) -> Dict[str, Any]:
         """Parse business-focused code analysis response"""
-        try:
-            # Try to parse JSON response
-            if "```json" in response:
-                json_part = response.split("```json")[1].split("```")[0].strip()
-                result = json.loads(json_part)
-                return result
-            elif "{" in response and "}" in response:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_part = response[start:end]
-                result = json.loads(json_part)
-                return result
-            else:
-                return self._create_default_code_analysis(response)
-        except Exception as e:
+        result = extract_json_object(response, any_of=CODE_ANALYSIS_SCHEMA['properties'])
+        if result is None:
             return self._create_default_code_analysis(response)
+        return result
     
     def _parse_business_feedback_response(self, response: str) -> Dict[str, Any]:
         """Parse business-focused feedback response"""
-        try:
-            # Try to parse JSON response
-            if "```json" in response:
-                json_part = response.split("```json")[1].split("```")[0].strip()
-                result = json.loads(json_part)
-                return result
-            elif "{" in response and "}" in response:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_part = response[start:end]
-                result = json.loads(json_part)
-                return result
-            else:
-                return self._create_default_feedback(response)
-        except Exception as e:
+        result = extract_json_object(response, any_of=FEEDBACK_SCHEMA['properties'])
+        if result is None:
             return self._create_default_feedback(response)
+        return result
     
     def _create_default_code_analysis(self, response: str) -> Dict[str, Any]:
         """Create default code analysis when parsing fails"""
@@ -1208,42 +1386,10 @@ CRITICAL: Output pure JSON only. Reference specific content from student work. P
         import json
         
         try:
-            # Clean the response first
-            response = response.strip()
+            # Last JSON object with code analysis keys (skips thinking text, fences and examples)
+            result = extract_json_object(response, any_of=CODE_ANALYSIS_SCHEMA['properties'])
             
-            # Try multiple JSON extraction methods
-            json_part = None
-            
-            # Method 1: Look for ```json blocks
-            if "```json" in response:
-                parts = response.split("```json")
-                if len(parts) > 1:
-                    json_part = parts[1].split("```")[0].strip()
-            
-            # Method 2: Look for { } blocks
-            elif "{" in response and "}" in response:
-                start = response.find("{")
-                end = response.rfind("}") + 1
-                json_part = response[start:end]
-            
-            # Method 3: Try to find JSON-like structure
-            else:
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    json_part = json_match.group()
-            
-            # Parse the JSON if found
-            if json_part:
-                # Clean common JSON issues
-                json_part = json_part.replace('\n', ' ').replace('\r', '')
-                json_part = re.sub(r'\s+', ' ', json_part)
-                
-                result = json.loads(json_part)
-                
-                # Ensure required fields exist
-                if not isinstance(result, dict):
-                    raise ValueError("Response is not a dictionary")
-                
+            if result is not None:
                 # Ensure minimum scores for business students
                 result["technical_score"] = max(result.get("technical_score", 85), 75)
                 result["syntax_correctness"] = max(result.get("syntax_correctness", 90), 80)
@@ -1285,73 +1431,18 @@ CRITICAL: Output pure JSON only. Reference specific content from student work. P
             print(f"{response[:500]}")
             print(f"🔍 DEBUG - Response length: {len(response)} chars")
             
-            # STEP 1: Remove GPT-OSS internal thinking patterns
-            # These patterns appear before the actual JSON output
-            thinking_patterns = [
-                r"We need to.*?(?=\{)",  # "We need to produce JSON..." before {
-                r"I need to.*?(?=\{)",   # "I need to analyze..." before {
-                r"Let me.*?(?=\{)",      # "Let me create..." before {
-                r"First,.*?(?=\{)",      # "First, I'll..." before {
-                r"The task is.*?(?=\{)", # "The task is to..." before {
-                r"^[^{]*?(?=\{)"         # Any text before first {
-            ]
-            
-            cleaned_response = response
-            for pattern in thinking_patterns:
-                cleaned_response = re.sub(pattern, '', cleaned_response, flags=re.DOTALL | re.IGNORECASE)
-            
-            print(f"🔍 DEBUG - After removing thinking patterns: {len(cleaned_response)} chars")
-            print(f"🔍 DEBUG - Cleaned preview: {cleaned_response[:200]}")
-            
-            # Try multiple JSON extraction methods (in order of likelihood)
-            json_part = None
-            
-            # Method 1: Look for ```json blocks (most explicit)
-            if "```json" in cleaned_response:
-                parts = cleaned_response.split("```json")
-                if len(parts) > 1:
-                    json_part = parts[1].split("```")[0].strip()
-                print(f"🔍 DEBUG - Extracted JSON from ```json blocks, length: {len(json_part)}")
+            # Fix common encoding issues (in every field, not just the ones cleaned below)
+            response = response.replace('■', '-').replace('▪', '-').replace('●', '-')
             
-            # Method 2: Look for { } blocks (most common for GPT-OSS)
-            elif "{" in cleaned_response and "}" in cleaned_response:
-                # Find the first { and last }
-                start = cleaned_response.find("{")
-                end = cleaned_response.rfind("}") + 1
-                json_part = cleaned_response[start:end]
-                print(f"🔍 DEBUG - Extracted JSON from {{ }} markers, length: {len(json_part)}")
+            # Last JSON object with feedback keys - GPT-OSS thinking text before it
+            # ("We need to produce JSON...") and ```json fences are skipped
+            result = extract_json_object(response, any_of=FEEDBACK_SCHEMA['properties'])
+            if result is None and '//' in response:
+                # Some models annotate their JSON with // comments
+                result = extract_json_object(re.sub(r'(?m)([,\[{"\d]|true|false|null)[ \t]*//[^\n"]*$', r'\1', response),
+                                             any_of=FEEDBACK_SCHEMA['properties'])
             
-            # Method 3: Try to find JSON-like structure with regex
-            else:
-                json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
-                if json_match:
-                    json_part = json_match.group()
-                    print(f"🔍 DEBUG - Extracted JSON from regex, length: {len(json_part)}")
-            
-            # Parse the JSON if found
-            if json_part:
-                # Clean common JSON issues
-                json_part = json_part.strip()
-                
-                # Remove any trailing text after the final }
-                last_brace = json_part.rfind('}')
-                if last_brace != -1:
-                    json_part = json_part[:last_brace + 1]
-                
-                # Fix common encoding issues
-                json_part = json_part.replace('■', '-').replace('▪', '-').replace('●', '-')
-                
-                # Remove internal comments that might appear in JSON
-                json_part = re.sub(r'//.*?(?=\n|$)', '', json_part)  # Remove // comments
-                
-                print(f"🔍 DEBUG - Final JSON to parse (first 300 chars): {json_part[:300]}")
-                
-                result = json.loads(json_part)
-                
-                # Ensure required fields exist
-                if not isinstance(result, dict):
-                    raise ValueError("Response is not a dictionary")
-                
+            if result is not None:
                 # Ensure minimum scores for business students
                 result["overall_score"] = max(result.get("overall_score", 85), 70)
                 result["business_understanding"] = max(result.get("business_understanding", 85), 75)
@@ -9,17 +9,26 @@ import time
 import requests
 import concurrent.futures
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from prompt_manager import PromptManager
 from notebook_validation import NotebookValidator
-from score_validator import validate_and_adjust_scores
+from score_validator import completion_cap, validate_and_adjust_scores
 from output_comparator import OutputComparator, compare_and_generate_prompt
+from utils.notebook_truncator import slim_notebook_if_needed
+from utils.solution_cache import code_line_set
+from utils.tracing import propagate, span
 
 # Import new validators
 from validators.assignment_6_systematic_validator import Assignment6SystematicValidator
 from validators.rubric_driven_validator import RubricDrivenValidator
 from validators.smart_output_validator import SmartOutputValidator
 
+# Feedback lines the grader writes from validation results (not from the models)
+VALIDATION_ENTRY_PREFIXES = (
+    "✅ Completed ", "• WHAT: Complete ", "Completion: ", "Variables found: ",
+    "Execution rate: ", "Output accuracy: "
+)
+
 
 class BusinessAnalyticsGraderV2:
     """
@@ -35,14 +44,41 @@ class BusinessAnalyticsGraderV2:
                  feedback_model: str = "gemma3:27b-it-q8_0",
                  ollama_url: str = "http://localhost:11434",
                  rubric_path: str = None,
-                 solution_path: str = None):
-        """Initialize enhanced business analytics grader"""
+                 solution_path: str = None,
+                 connect_models: bool = True,
+                 fast_path: bool = False,
+                 fast_path_floor: float = 10.0,
+                 fast_path_ceiling: float = 100.0,
+                 fast_path_model: str = None,
+                 feedback_cascade: List[str] = None):
+        """
+        Initialize enhanced business analytics grader
+        
+        connect_models=False skips probing the model servers (for replaying
+        validation offline with replay_submission)
+        
+        fast_path=True grades the easy tail from validation alone: template-only
+        submissions and ones with validation score <= fast_path_floor get
+        templated feedback without the models; submissions at or above fast_path_ceiling
+        with every output check passed run on fast_path_model (Ollama) if
+        given, otherwise get templated feedback too. The score comes from
+        validation either way.
+        
+        feedback_cascade: smaller models that draft the feedback before
+        feedback_model on the Ollama path (see BusinessAnalyticsGrader)
+        """
         
         self.code_model = code_model
         self.feedback_model = feedback_model
         self.ollama_url = ollama_url
         self.api_url = f"{ollama_url}/api/generate"
         
+        self.fast_path = fast_path
+        self.fast_path_floor = fast_path_floor
+        self.fast_path_ceiling = fast_path_ceiling
+        self.fast_path_model = fast_path_model
+        self.feedback_cascade = feedback_cascade
+        
         # Initialize prompt manager
         self.prompt_manager = PromptManager()
         
@@ -83,7 +119,7 @@ class BusinessAnalyticsGraderV2:
         self.use_distributed_mlx = False
         self.distributed_client = None
         
-        if os.path.exists('distributed_config.json'):
+        if connect_models and os.path.exists('distributed_config.json'):
             try:
                 from models.distributed_mlx_client import DistributedMLXClient
                 
@@ -108,6 +144,9 @@ class BusinessAnalyticsGraderV2:
         print(f"🤖 Code Analyzer: {code_model}")
         print(f"📝 Feedback Generator: {feedback_model}")
         print(f"✅ 4-Layer Validation: {'Enabled' if self.systematic_validator else 'Disabled (Legacy Mode)'}")
+        if fast_path:
+            print(f"⚡ Fast Path: score <= {fast_path_floor:.0f} or template → validation feedback, "
+                  f">= {fast_path_ceiling:.0f} → {fast_path_model or 'validation feedback'}")
         
         # Performance tracking
         self.grading_stats = {
@@ -119,6 +158,47 @@ class BusinessAnalyticsGraderV2:
         
         # Parallel processing
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        
+        # Run the Ollama prompts and parse model output, by model (built on first use)
+        self._ai_graders = {}
+        
+        # Rubric summaries already built, by rubric
+        self._rubric_summaries = {}
+    
+    def _get_ai_grader(self, model: str = None):
+        """
+        Two-model grader using this grader's Ollama URL and models (or `model`
+        for both roles), shared across submissions
+        """
+        if model not in self._ai_graders:
+            from business_analytics_grader import BusinessAnalyticsGrader
+            roles = (('code_model', model or self.code_model), ('feedback_model', model or self.feedback_model))
+            models = {key: value for key, value in roles if value}
+            cascade = None if model else self.feedback_cascade  # The fast-path model is already the small one
+            # This grader decides between distributed MLX and Ollama itself
+            self._ai_graders[model] = BusinessAnalyticsGrader(ollama_url=self.ollama_url, feedback_cascade=cascade,
+                                                              connect_models=False, **models)
+        return self._ai_graders[model]
+    
+    def _rubric_summary(self, rubric: Any) -> str:
+        """Rubric element weights for the prompts, built once per rubric"""
+        if not rubric:
+            return ""
+        key = rubric if isinstance(rubric, str) else json.dumps(rubric, sort_keys=True, default=str)
+        if key in self._rubric_summaries:
+            return self._rubric_summaries[key]
+        
+        rubric_summary = ""
+        try:
+            rubric_data = json.loads(rubric) if isinstance(rubric, str) else rubric
+            if 'rubric_elements' in rubric_data:
+                rubric_summary = "Rubric Elements:\n"
+                for key_name, value in rubric_data['rubric_elements'].items():
+                    rubric_summary += f"- {key_name}: {value.get('weight', 0)*100}%\n"
+        except:
+            pass
+        self._rubric_summaries[key] = rubric_summary
+        return rubric_summary
     
     def _run_4layer_validation(self, notebook_path: str) -> Dict[str, Any]:
         """
@@ -135,7 +215,8 @@ class BusinessAnalyticsGraderV2:
         print("\n[LAYER 1: SYSTEMATIC VALIDATION]")
         print("-"*80)
         print(f"DEBUG: Validator type: {type(self.systematic_validator).__name__}")
-        sys_result = self.systematic_validator.validate_notebook(notebook_path)
+        with span('validation.systematic', validator=type(self.systematic_validator).__name__):
+            sys_result = self.systematic_validator.validate_notebook(notebook_path)
         print(f"DEBUG: Section breakdown keys: {list(sys_result.get('section_breakdown', {}).keys())}")
         
         print(f"✅ Variables Found: {sys_result['variable_check']['found']}/{sys_result['variable_check']['total_required']}")
@@ -150,7 +231,8 @@ class BusinessAnalyticsGraderV2:
         if self.output_validator:
             print(f"\n[LAYER 2: SMART OUTPUT VALIDATION]")
             print("-"*80)
-            output_result = self.output_validator.validate_student_outputs(notebook_path)
+            with span('validation.output'):
+                output_result = self.output_validator.validate_student_outputs(notebook_path)
             
             print(f"✅ Output Match: {output_result['overall_match']*100:.1f}%")
             print(f"✅ Checks Passed: {output_result['passed_checks']}/{output_result['total_checks']}")
@@ -279,20 +361,44 @@ class BusinessAnalyticsGraderV2:
         
         print("🎓 Starting Enhanced Business Analytics Grading...")
         
+        # Validators read the notebook directly, so give them a bounded-size copy
+        if notebook_path:
+            with span('notebook.slim'):
+                notebook_path, slim_info = slim_notebook_if_needed(notebook_path)
+            self.grading_stats['notebook_slimming'] = slim_info
+        
         # Run validation (Layer 1 & 2)
-        if self.systematic_validator and notebook_path:
-            validation_results = self._run_4layer_validation(notebook_path)
-        else:
-            # Fallback to legacy validator
-            print("⚠️ Using legacy validator (4-layer system not available)")
-            validation_results = self.legacy_validator.validate_notebook(notebook_path)
+        with span('validation'):
+            if self.systematic_validator and notebook_path:
+                validation_results = self._run_4layer_validation(notebook_path)
+            else:
+                # Fallback to legacy validator
+                print("⚠️ Using legacy validator (4-layer system not available)")
+                validation_results = self.legacy_validator.validate_notebook(notebook_path)
+        
+        # Fast path: validation alone settles the easy tail of the cohort
+        fast_path, max_score = (self._fast_path_decision(validation_results, student_code, template_code)
+                                if self.fast_path else (None, 100))
+        self.grading_stats['fast_path'] = fast_path
+        fast_path_model = None
+        if fast_path == 'complete' and self.fast_path_model and not self.use_distributed_mlx:
+            fast_path_model = self.fast_path_model
+            print(f"⚡ Fast path ({fast_path}): feedback from {fast_path_model}")
+        elif fast_path:
+            with span('fast_path', decision=fast_path):
+                structured_feedback = self._create_fast_path_feedback(validation_results, fast_path, max_score)
+            self.grading_stats['parallel_time'] = 0
+            self.grading_stats['total_time'] = time.time() - start_time
+            print(f"\n⚡ Fast path ({fast_path}): graded from validation in {self.grading_stats['total_time']:.1f}s")
+            return structured_feedback
         
         # Layer 3 & 4: AI Code Analysis and Feedback Generation
         print("\n[LAYER 3 & 4: AI ANALYSIS AND FEEDBACK GENERATION]")
         print("-"*80)
         
         # Identify what code the student actually wrote (vs template)
-        student_changes = self._identify_student_changes(student_code, template_code, solution_code)
+        with span('student_changes'):
+            student_changes = self._identify_student_changes(student_code, template_code, solution_code)
         
         # Prepare prompts with validation context
         validation_summary = validation_results.get('validation_summary', '')
@@ -301,17 +407,7 @@ class BusinessAnalyticsGraderV2:
         assignment_name = assignment_info.get('name', assignment_info.get('title', 'Unknown'))
         
         # Build rubric summary
-        rubric_summary = ""
-        if assignment_info.get('rubric'):
-            try:
-                import json
-                rubric_data = json.loads(assignment_info['rubric']) if isinstance(assignment_info['rubric'], str) else assignment_info['rubric']
-                if 'rubric_elements' in rubric_data:
-                    rubric_summary = "Rubric Elements:\n"
-                    for key, value in rubric_data['rubric_elements'].items():
-                        rubric_summary += f"- {key}: {value.get('weight', 0)*100}%\n"
-            except:
-                pass
+        rubric_summary = self._rubric_summary(assignment_info.get('rubric'))
         
         # Execute AI analysis in parallel
         parallel_start = time.time()
@@ -323,42 +419,46 @@ class BusinessAnalyticsGraderV2:
             # Build enhanced context with student changes analysis
             enhanced_context = f"{student_changes['ai_context']}\n\n{validation_summary}"
             
-            code_prompt = self.prompt_manager.get_combined_prompt(
-                assignment_name,
-                "code_analysis",
-                assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
-                template_code=template_code if template_code else "# No template provided",
-                student_code=student_code,
-                solution_code=solution_code,
-                rubric_criteria=rubric_summary,
-                validation_context=enhanced_context
-            )
-            
-            feedback_prompt = self.prompt_manager.get_combined_prompt(
-                assignment_name,
-                "feedback",
-                assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
-                student_markdown=student_markdown,
-                student_code_summary=student_code[:800],
-                rubric_criteria=rubric_summary,
-                validation_context=enhanced_context
-            )
+            with span('prompt.build'):
+                code_prompt = self.prompt_manager.get_combined_prompt(
+                    assignment_name,
+                    "code_analysis",
+                    assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
+                    template_code=template_code if template_code else "# No template provided",
+                    student_code=student_code,
+                    solution_code=solution_code,
+                    rubric_criteria=rubric_summary,
+                    validation_context=enhanced_context
+                )
+                
+                feedback_prompt = self.prompt_manager.get_combined_prompt(
+                    assignment_name,
+                    "feedback",
+                    assignment_title=assignment_info.get('title', 'Business Analytics Assignment'),
+                    student_markdown=student_markdown,
+                    student_code_summary=student_code[:800],
+                    rubric_criteria=rubric_summary,
+                    validation_context=enhanced_context
+                )
             
+            self.grading_stats.pop('token_usage', None)  # Left over from the previous submission
             try:
-                result = self.distributed_client.generate_parallel_sync(code_prompt, feedback_prompt)
+                with span('llm', backend='distributed_mlx'):
+                    result = self.distributed_client.generate_parallel_sync(code_prompt, feedback_prompt)
                 
                 if result.get('error'):
                     raise RuntimeError(f"Distributed MLX generation failed: {result['error']}")
                 
                 # Parse the responses
-                from business_analytics_grader import BusinessAnalyticsGrader
-                temp_grader = BusinessAnalyticsGrader()
-                code_analysis = temp_grader._parse_code_analysis_response(result['code_analysis'])
-                comprehensive_feedback = temp_grader._parse_feedback_response(result['feedback'])
+                temp_grader = self._get_ai_grader()
+                with span('parse'):
+                    code_analysis = temp_grader._parse_code_analysis_response(result['code_analysis'])
+                    comprehensive_feedback = temp_grader._parse_feedback_response(result['feedback'])
                 
                 # Update timing stats
                 self.grading_stats['code_analysis_time'] = result.get('qwen_time', 0)
                 self.grading_stats['feedback_generation_time'] = result.get('gemma_time', 0)
+                self.grading_stats['token_usage'] = self.distributed_client.get_token_usage()
                 
                 print(f"✅ AI analysis completed")
                 print(f"   🔧 Qwen: {result.get('qwen_time', 0):.1f}s")
@@ -373,23 +473,27 @@ class BusinessAnalyticsGraderV2:
             # Use Ollama system
             print("🤖 Using Ollama for AI analysis...")
             try:
-                from business_analytics_grader import BusinessAnalyticsGrader
-                temp_grader = BusinessAnalyticsGrader()
+                temp_grader = self._get_ai_grader(fast_path_model)
                 
                 # Submit both tasks simultaneously
-                future_code = self.executor.submit(
-                    temp_grader._execute_business_code_analysis, 
-                    student_code, template_code, solution_code, assignment_info
-                )
+                with span('llm', backend='ollama', model=fast_path_model or self.feedback_model):
+                    future_code = self.executor.submit(
+                        propagate(temp_grader._execute_business_code_analysis), 
+                        student_code, template_code, solution_code, assignment_info
+                    )
+                    
+                    future_feedback = self.executor.submit(
+                        propagate(temp_grader._execute_business_feedback_generation),
+                        student_code, student_markdown, assignment_info, template_code
+                    )
+                    
+                    # Wait for both results
+                    code_analysis = future_code.result()
+                    comprehensive_feedback = future_feedback.result()
                 
-                future_feedback = self.executor.submit(
-                    temp_grader._execute_business_feedback_generation,
-                    student_code, student_markdown, assignment_info
-                )
-                
-                # Wait for both results
-                code_analysis = future_code.result()
-                comprehensive_feedback = future_feedback.result()
+                if temp_grader.feedback_cascade:
+                    for key in ('feedback_cascade', 'feedback_cascade_totals'):
+                        self.grading_stats[key] = temp_grader.grading_stats.get(key)
                 
                 print(f"✅ AI analysis completed")
                 
@@ -403,13 +507,14 @@ class BusinessAnalyticsGraderV2:
         self.grading_stats['parallel_time'] = parallel_time
         
         # Merge AI feedback with validation results
-        if code_analysis and comprehensive_feedback:
-            structured_feedback = self._merge_ai_and_validation_feedback(
-                validation_results, code_analysis, comprehensive_feedback
-            )
-        else:
-            # Fallback to validation-only feedback
-            structured_feedback = self._create_structured_feedback_from_validation(validation_results)
+        with span('feedback.merge'):
+            if code_analysis and comprehensive_feedback:
+                structured_feedback = self._merge_ai_and_validation_feedback(
+                    validation_results, code_analysis, comprehensive_feedback
+                )
+            else:
+                # Fallback to validation-only feedback
+                structured_feedback = self._create_structured_feedback_from_validation(validation_results)
         
         total_time = time.time() - start_time
         self.grading_stats['total_time'] = total_time
@@ -418,6 +523,136 @@ class BusinessAnalyticsGraderV2:
         
         return structured_feedback
     
+    def replay_submission(self, notebook_path: str, cached_result: Any = None) -> Dict[str, Any]:
+        """
+        Re-score a graded submission without calling the models: rerun the
+        deterministic layers (slimming, systematic validation with partial
+        credit, output validation) and reuse the AI analysis stored with the
+        previous result (submissions.ai_feedback)
+        
+        Returns the same structured feedback as grade_submission
+        """
+        if not self.systematic_validator:
+            raise ValueError("Replay needs a rubric for the systematic validator")
+        
+        notebook_path, slim_info = slim_notebook_if_needed(notebook_path)
+        self.grading_stats['notebook_slimming'] = slim_info
+        
+        validation_results = self._run_4layer_validation(notebook_path)
+        code_analysis, comprehensive_feedback = self._cached_ai_outputs(cached_result)
+        self.grading_stats['cached_ai_analysis'] = bool(code_analysis and comprehensive_feedback)
+        
+        if self.grading_stats['cached_ai_analysis']:
+            result = self._merge_ai_and_validation_feedback(
+                validation_results, code_analysis, comprehensive_feedback
+            )
+            result['grading_system'] = "4-Layer Validation (replayed, cached AI analysis)"
+        else:
+            result = self._create_structured_feedback_from_validation(validation_results)
+            result['grading_system'] = "4-Layer Validation (replayed, no cached AI analysis)"
+        return result
+    
+    def _cached_ai_outputs(self, cached_result: Any) -> tuple:
+        """
+        (code_analysis, comprehensive_feedback) from a stored result, with the
+        entries the merge step derives from validation removed so they are
+        rebuilt from the new validation instead of duplicated.
+        (None, None) if the stored result has no AI analysis.
+        """
+        if isinstance(cached_result, str):
+            try:
+                cached_result = json.loads(cached_result)
+            except json.JSONDecodeError:
+                return None, None
+        if not isinstance(cached_result, dict):
+            return None, None
+        
+        technical = cached_result.get('technical_analysis') or {}
+        feedback = cached_result.get('comprehensive_feedback') or {}
+        if not technical or not feedback:
+            return None, None
+        
+        def ai_only(entries):
+            return [e for e in entries or [] if not (isinstance(e, str) and e.startswith(VALIDATION_ENTRY_PREFIXES))]
+        
+        code_analysis = {key: ai_only(technical.get(key)) for key in
+                         ('code_strengths', 'code_suggestions', 'technical_observations')}
+        
+        detailed_feedback = dict(feedback.get('detailed_feedback') or {})
+        for key in ('analytical_strengths', 'areas_for_development'):
+            if key in detailed_feedback:
+                detailed_feedback[key] = ai_only(detailed_feedback[key])
+        
+        # Validation-only results store generated comments - regenerate those
+        instructor_comments = feedback.get('instructor_comments')
+        stored_validation = cached_result.get('validation_results')
+        if stored_validation and 'systematic_results' in stored_validation:
+            if instructor_comments == self._generate_instructor_comments(stored_validation):
+                instructor_comments = None
+        
+        comprehensive_feedback = {
+            'instructor_comments': instructor_comments,
+            'detailed_feedback': detailed_feedback
+        }
+        return code_analysis, comprehensive_feedback
+    
+    def _fast_path_decision(self, validation_results: Dict, student_code: str,
+                            template_code: str) -> Tuple[Optional[str], float]:
+        """
+        (decision, max_score): 'template' for submissions that are essentially
+        the template, 'low_score' for ones scoring at most fast_path_floor,
+        'complete' for ones at or above fast_path_ceiling with no issues and
+        every output check passed, None for everything in between (full
+        model grading).
+        max_score is completion_cap's limit, which the fast-path score must
+        respect just like a model-graded one
+        """
+        if 'systematic_results' not in validation_results:
+            return None, 100  # Legacy validation has no comparable score
+        
+        score = validation_results['adjusted_score']
+        max_score, _ = completion_cap(student_code, template_code)
+        if max_score <= 20:
+            return 'template', max_score
+        if score <= self.fast_path_floor:
+            return 'low_score', max_score
+        
+        output_result = validation_results.get('output_results')
+        if (score >= self.fast_path_ceiling and not validation_results['issues'] and output_result
+                and output_result['total_checks'] > 0 and output_result['passed_checks'] == output_result['total_checks']
+                and score <= max_score):
+            return 'complete', max_score
+        return None, max_score
+    
+    def _create_fast_path_feedback(self, validation_results: Dict, decision: str,
+                                   max_score: float = 100) -> Dict[str, Any]:
+        """Validation-only feedback worded for a fast-path decision, capped at max_score"""
+        if validation_results['adjusted_score'] > max_score:
+            print(f"🔒 Fast path score capped at {max_score}% (was {validation_results['adjusted_score']:.0f}%)")
+            validation_results = {**validation_results, 'adjusted_score': max_score}
+        result = self._create_structured_feedback_from_validation(validation_results)
+        feedback = result['comprehensive_feedback']
+        
+        if decision == 'template':
+            feedback['instructor_comments'] = (
+                "Your submission is mostly the unmodified assignment template, so it was scored from the "
+                "automated checks alone. " + feedback['instructor_comments']
+            )
+        elif decision == 'low_score':
+            feedback['instructor_comments'] = (
+                "Your submission passed very few of the automated checks, so it was scored from those "
+                "checks alone. " + feedback['instructor_comments']
+            )
+        else:
+            feedback['detailed_feedback']['recommendations'] = [
+                "All required sections are complete and every output matches the solution",
+                "Take the analysis further: test alternative approaches or add your own business questions",
+                "Keep explaining your reasoning in markdown so the interpretation is as strong as the code"
+            ]
+        
+        result['grading_system'] = f"4-Layer Validation (fast path: {decision})"
+        return result
+    
     def _create_structured_feedback_from_validation(self, validation_results: Dict) -> Dict[str, Any]:
         """
         Create structured feedback from validation results
@@ -680,15 +915,13 @@ class BusinessAnalyticsGraderV2:
         
         # Split into lines for comparison
         student_lines = student_code.split('\n')
-        template_lines = template_code.split('\n') if template_code else []
-        solution_lines = solution_code.split('\n') if solution_code else []
         
         # Identify student-written code
         student_written = []
         template_unchanged = []
         
-        # Simple line-by-line comparison
-        template_set = set(template_lines)
+        # Simple line-by-line comparison (template line set is cached across students)
+        template_set = code_line_set(template_code) if template_code else frozenset()
         
         for line in student_lines:
             # Skip empty lines and comments
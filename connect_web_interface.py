@@ -12,11 +12,18 @@ import time
 import nbformat
 from business_analytics_grader_v2 import BusinessAnalyticsGraderV2
 from grading_validator import GradingValidator
-from report_generator import PDFReportGenerator
-from ai_grader import filter_ai_feedback_for_storage
 from anonymization_utils import anonymize_name
 from notebook_executor import NotebookExecutor
-from submission_preprocessor import SubmissionPreprocessor
+from utils.notebook_truncator import slim_notebook_if_needed
+from utils.solution_cache import get_solution_artifact
+from disaggregated_inference.metrics_collector import CollectorClient
+from grading_pipeline import (FALLBACK_RUBRIC_PATH, find_validation_paths, grade_submission_internal,
+                              save_grading_result, save_submission_trace)
+from utils.lazy_imports import lazy
+from utils.tracing import span, start_trace
+
+# reportlab is only needed when reports are generated
+pdf = lazy('pdf')
 
 def grade_submissions_page(grader):
     """Enhanced grade submissions page using our business analytics grader"""
@@ -151,29 +158,9 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
         assignment_row = assignment_info_df.iloc[0]
         
         # Determine rubric and solution paths for V2 grader
-        rubric_path = None
-        solution_path = None
-        
-        # Try to find rubric JSON file
-        if assignment_row.get('rubric'):
-            # Check if rubric is a file path or JSON string
-            rubric_str = assignment_row['rubric']
-            if rubric_str.endswith('.json') and os.path.exists(rubric_str):
-                rubric_path = rubric_str
-            else:
-                # Try to find rubric file based on assignment name
-                assignment_name = assignment_row['name'].lower().replace(' ', '_')
-                potential_rubric = f"rubrics/{assignment_name}_rubric.json"
-                if os.path.exists(potential_rubric):
-                    rubric_path = potential_rubric
-                else:
-                    # Try assignment_6_rubric.json as fallback
-                    if os.path.exists("rubrics/assignment_6_rubric.json"):
-                        rubric_path = "rubrics/assignment_6_rubric.json"
-        
-        # Get solution notebook path
-        if assignment_row.get('solution_notebook') and os.path.exists(assignment_row['solution_notebook']):
-            solution_path = assignment_row['solution_notebook']
+        rubric_path, solution_path = find_validation_paths(assignment_row)
+        if rubric_path == FALLBACK_RUBRIC_PATH:
+            st.warning(f"⚠️ No rubric file for {assignment_row['name']} - grading with {FALLBACK_RUBRIC_PATH}")
         
         # Initialize our business analytics grader V2 (4-layer validation + two-model system)
         business_grader = BusinessAnalyticsGraderV2(
@@ -215,6 +202,12 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
             elif exec_info['execution_attempted']:
                 st.warning(f"⚠️ Execution failed: {exec_info['error_message']}. Using original notebook.")
         
+        # Slim oversized notebooks (plots, huge printed tables) so every later step reads a bounded copy
+        notebook_to_use, slim_info = slim_notebook_if_needed(notebook_to_use)
+        if slim_info['slimmed']:
+            st.info(f"✂️ Large notebook slimmed: {slim_info['original_kb']:.0f} KB → {slim_info['slimmed_kb']:.0f} KB "
+                    f"({slim_info['images_removed']} images removed, {slim_info['lines_omitted']} output lines omitted)")
+        
         # Read notebook (either executed or original)
         with open(notebook_to_use, 'r', encoding='utf-8') as f:
             nb = nbformat.read(f, as_version=4)
@@ -259,13 +252,8 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
         
         if assignment_row.get('template_notebook') and os.path.exists(assignment_row['template_notebook']):
             try:
-                with open(assignment_row['template_notebook'], 'r', encoding='utf-8') as f:
-                    template_nb = nbformat.read(f, as_version=4)
-                
-                # Extract code from template
-                for cell in template_nb.cells:
-                    if cell.cell_type == 'code':
-                        template_code += cell.source + "\n\n"
+                # Parsed once per template file and reused for every student
+                template_code = get_solution_artifact(assignment_row['template_notebook']).code
                 
                 st.info(f"✅ Loaded template notebook: {os.path.basename(assignment_row['template_notebook'])}")
             except Exception as e:
@@ -277,15 +265,10 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
         
         if assignment_row['solution_notebook'] and os.path.exists(assignment_row['solution_notebook']):
             try:
-                with open(assignment_row['solution_notebook'], 'r', encoding='utf-8') as f:
-                    solution_nb = nbformat.read(f, as_version=4)
-                
-                # Extract code and markdown from solution
-                for cell in solution_nb.cells:
-                    if cell.cell_type == 'code':
-                        solution_code += cell.source + "\n\n"
-                    elif cell.cell_type == 'markdown':
-                        solution_markdown += cell.source + "\n\n"
+                # Code and markdown from the cached solution artifact
+                solution_artifact = get_solution_artifact(assignment_row['solution_notebook'])
+                solution_code = solution_artifact.code
+                solution_markdown = solution_artifact.markdown
                 
                 st.info(f"✅ Loaded solution notebook: {os.path.basename(assignment_row['solution_notebook'])}")
             except Exception as e:
@@ -301,14 +284,16 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
         with st.spinner("🎓 Grading with Business Analytics AI..."):
             
             # Grade the submission (pass notebook path for validation and template for comparison)
-            result = business_grader.grade_submission(
-                student_code=student_code,
-                student_markdown=student_markdown,
-                template_code=template_code,
-                solution_code=solution_code,
-                assignment_info=assignment_info,
-                notebook_path=notebook_to_use
-            )
+            with start_trace('grading', submission_id=int(submission['id'])) as trace:
+                result = business_grader.grade_submission(
+                    student_code=student_code,
+                    student_markdown=student_markdown,
+                    template_code=template_code,
+                    solution_code=solution_code,
+                    assignment_info=assignment_info,
+                    notebook_path=notebook_to_use
+                )
+            save_submission_trace(grader, trace)
             
             # Validate if requested
             if use_validation:
@@ -459,13 +444,17 @@ def grade_single_submission(grader, submission, assignment_id, use_validation=Tr
         
         # Save to database
         if st.button("💾 Save Grade", type="primary"):
-            save_grading_result(grader, submission['id'], result)
+            with start_trace('save', submission_id=int(submission['id'])) as trace, span('db.save'):
+                save_grading_result(grader, submission['id'], result)
+            save_submission_trace(grader, trace)
             st.success("✅ Grade saved successfully!")
             st.rerun()
         
         # Generate PDF report
         if st.button("📄 Generate PDF Report"):
-            generate_pdf_report(assignment_info['student_name'], assignment_info['title'], result)
+            with start_trace('report', submission_id=int(submission['id'])) as trace:
+                generate_pdf_report(assignment_info['student_name'], assignment_info['title'], result)
+            save_submission_trace(grader, trace)
     
     except Exception as e:
         st.error(f"❌ Grading failed: {e}")
@@ -488,24 +477,9 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
     solution_path = None
     
     if not assignment_info_df.empty:
-        assignment_row = assignment_info_df.iloc[0]
-        
-        # Try to find rubric JSON file
-        if assignment_row.get('rubric'):
-            rubric_str = assignment_row['rubric']
-            if rubric_str.endswith('.json') and os.path.exists(rubric_str):
-                rubric_path = rubric_str
-            else:
-                assignment_name = assignment_row['name'].lower().replace(' ', '_')
-                potential_rubric = f"rubrics/{assignment_name}_rubric.json"
-                if os.path.exists(potential_rubric):
-                    rubric_path = potential_rubric
-                elif os.path.exists("rubrics/assignment_6_rubric.json"):
-                    rubric_path = "rubrics/assignment_6_rubric.json"
-        
-        # Get solution notebook path
-        if assignment_row.get('solution_notebook') and os.path.exists(assignment_row['solution_notebook']):
-            solution_path = assignment_row['solution_notebook']
+        rubric_path, solution_path = find_validation_paths(assignment_info_df.iloc[0])
+        if rubric_path == FALLBACK_RUBRIC_PATH:
+            st.warning(f"⚠️ No rubric file for {assignment_info_df.iloc[0]['name']} - grading with {FALLBACK_RUBRIC_PATH}")
     
     # Initialize grader V2 with 4-layer validation
     business_grader = BusinessAnalyticsGraderV2(
@@ -519,16 +493,24 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
     else:
         st.info("🤖 **Parallel Two-Model Processing**: Code analysis + feedback generation running simultaneously")
     
+    # Tag this run in the metrics history so its throughput can be compared with other runs
+    metrics_client = CollectorClient()
+    run_tag = f"{assignment_id}-{time.strftime('%Y%m%d-%H%M%S')}"
+    assignment_name = assignment_info_df.iloc[0]['name'] if not assignment_info_df.empty else str(assignment_id)
+    metrics_client.start_run(run_tag, assignment=assignment_name, notes=f"{total_submissions} submissions")
+    
     # Performance metrics tracking
     batch_performance = {
         'total_submissions': total_submissions,
+        'run_tag': run_tag,
         'start_time': time.time(),
         'submission_times': [],
         'qwen_metrics': [],
         'gemma_metrics': [],
         'parallel_efficiencies': [],
         'tokens_per_second_history': [],
-        'combined_throughput_history': []
+        'combined_throughput_history': [],
+        'token_usage': []
     }
     
     # Progress tracking
@@ -551,6 +533,7 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
     
     for i, (_, submission) in enumerate(submissions.iterrows()):
         
+        trace = None
         progress = (i + 1) / total_submissions
         progress_bar.progress(progress)
         
@@ -562,55 +545,65 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
             # Track submission start time
             submission_start = time.time()
             
-            # Grade this submission (similar to single submission logic)
-            result = grade_submission_internal(business_grader, submission, assignment_id, grader)
-            
-            # Add delay between submissions to prevent server overload and thermal throttling
-            # Give servers time to cool down and free memory
-            if i < total_submissions - 1:  # Don't delay after last submission
-                # Every 10 submissions, take a longer cooling break
-                if (i + 1) % 10 == 0:
-                    status_text.text(f"🌡️ Cooling break after {i+1} submissions... (30 seconds)")
-                    time.sleep(30)  # 30 second cooling break every 10 submissions
-                else:
-                    time.sleep(2)  # 2 second delay between submissions
-            
-            # Capture performance metrics from result
-            submission_time = time.time() - submission_start
-            batch_performance['submission_times'].append(submission_time)
-            
-            # Extract performance diagnostics if available
-            perf_diag = result.get('performance_diagnostics', {})
-            if perf_diag:
-                qwen_perf = perf_diag.get('qwen_performance', {})
-                gemma_perf = perf_diag.get('gemma_performance', {})
-                combined = perf_diag.get('combined_metrics', {})
+            with start_trace('grading', submission_id=int(submission['id']), run_tag=run_tag,
+                             student=display_name) as trace:
+                # Grade this submission (similar to single submission logic)
+                with span('grade'):
+                    result = grade_submission_internal(business_grader, submission, assignment_id, grader)
                 
-                batch_performance['qwen_metrics'].append(qwen_perf.get('tokens_per_second', 0))
-                batch_performance['gemma_metrics'].append(gemma_perf.get('tokens_per_second', 0))
-                batch_performance['parallel_efficiencies'].append(combined.get('parallel_efficiency', 0))
-                batch_performance['combined_throughput_history'].append(combined.get('combined_throughput_tokens_per_second', 0))
+                # Add delay between submissions to prevent server overload and thermal throttling
+                # Give servers time to cool down and free memory
+                if i < total_submissions - 1:  # Don't delay after last submission
+                    with span('cooldown'):
+                        # Every 10 submissions, take a longer cooling break
+                        if (i + 1) % 10 == 0:
+                            status_text.text(f"🌡️ Cooling break after {i+1} submissions... (30 seconds)")
+                            time.sleep(30)  # 30 second cooling break every 10 submissions
+                        else:
+                            time.sleep(2)  # 2 second delay between submissions
                 
-                # Update real-time metrics display
-                if batch_performance['qwen_metrics']:
-                    avg_qwen = sum(batch_performance['qwen_metrics']) / len(batch_performance['qwen_metrics'])
-                    avg_gemma = sum(batch_performance['gemma_metrics']) / len(batch_performance['gemma_metrics'])
-                    avg_efficiency = sum(batch_performance['parallel_efficiencies']) / len(batch_performance['parallel_efficiencies'])
-                    avg_throughput = sum(batch_performance['combined_throughput_history']) / len(batch_performance['combined_throughput_history'])
+                # Capture performance metrics from result
+                submission_time = time.time() - submission_start
+                batch_performance['submission_times'].append(submission_time)
+                
+                # Extract performance diagnostics if available
+                perf_diag = result.get('performance_diagnostics', {})
+                if perf_diag:
+                    qwen_perf = perf_diag.get('qwen_performance', {})
+                    gemma_perf = perf_diag.get('gemma_performance', {})
+                    combined = perf_diag.get('combined_metrics', {})
                     
-                    qwen_metric.metric("🔧 Qwen Avg", f"{avg_qwen:.1f} tok/s")
-                    gemma_metric.metric("📝 GPT-OSS Avg", f"{avg_gemma:.1f} tok/s")
-                    efficiency_metric.metric("⚡ Efficiency", f"{avg_efficiency:.1f}x")
-                    throughput_metric.metric("🚀 Throughput", f"{avg_throughput:.1f} tok/s")
-            
-            # Validate if requested
-            if validator:
-                is_valid, errors = validator.validate_grading_result(result)
-                if not is_valid:
-                    result = validator.fix_calculation_errors(result)
+                    batch_performance['qwen_metrics'].append(qwen_perf.get('tokens_per_second', 0))
+                    batch_performance['gemma_metrics'].append(gemma_perf.get('tokens_per_second', 0))
+                    batch_performance['parallel_efficiencies'].append(combined.get('parallel_efficiency', 0))
+                    batch_performance['combined_throughput_history'].append(combined.get('combined_throughput_tokens_per_second', 0))
+                    if combined.get('token_usage'):
+                        batch_performance['token_usage'].append(combined['token_usage'])
+                    
+                    # Update real-time metrics display
+                    if batch_performance['qwen_metrics']:
+                        avg_qwen = sum(batch_performance['qwen_metrics']) / len(batch_performance['qwen_metrics'])
+                        avg_gemma = sum(batch_performance['gemma_metrics']) / len(batch_performance['gemma_metrics'])
+                        avg_efficiency = sum(batch_performance['parallel_efficiencies']) / len(batch_performance['parallel_efficiencies'])
+                        avg_throughput = sum(batch_performance['combined_throughput_history']) / len(batch_performance['combined_throughput_history'])
+                        
+                        qwen_metric.metric("🔧 Qwen Avg", f"{avg_qwen:.1f} tok/s")
+                        gemma_metric.metric("📝 GPT-OSS Avg", f"{avg_gemma:.1f} tok/s")
+                        efficiency_metric.metric("⚡ Efficiency", f"{avg_efficiency:.1f}x")
+                        throughput_metric.metric("🚀 Throughput", f"{avg_throughput:.1f} tok/s")
+                
+                # Validate if requested
+                if validator:
+                    with span('result.validate'):
+                        is_valid, errors = validator.validate_grading_result(result)
+                        if not is_valid:
+                            result = validator.fix_calculation_errors(result)
+                
+                # Save result
+                with span('db.save'):
+                    save_grading_result(grader, submission['id'], result)
             
-            # Save result
-            save_grading_result(grader, submission['id'], result)
+            save_submission_trace(grader, trace)
             
             # Show progress
             with results_container:
@@ -631,15 +624,21 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
                 with st.expander("Show error details"):
                     st.code(error_trace)
             failed_count += 1
+            
+            # Keep the trace of a failed submission too (its last span shows where it failed)
+            if trace is not None:
+                save_submission_trace(grader, trace)
     
     # Calculate final batch performance metrics
     batch_performance['total_time'] = time.time() - batch_performance['start_time']
+    metrics_client.end_run(run_tag, submissions=graded_count)
     
     # Final results
     status_text.text("🎉 Batch grading complete!")
     
     # Display comprehensive performance summary
     st.subheader("📊 Batch Performance Summary")
+    st.caption(f"Metrics history run tag: {run_tag}")
     
     if batch_performance['submission_times']:
         avg_submission_time = sum(batch_performance['submission_times']) / len(batch_performance['submission_times'])
@@ -678,6 +677,20 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
                 st.metric("🚀 Combined Throughput", f"{avg_combined_throughput:.1f} tok/s",
                          delta=f"{max(batch_performance['combined_throughput_history']) - min(batch_performance['combined_throughput_history']):.1f} range")
             
+            # Token totals across the batch
+            if batch_performance['token_usage']:
+                usages = batch_performance['token_usage']
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("📥 Prompt Tokens", f"{sum(u.get('prompt_tokens', 0) for u in usages):,}")
+                with col2:
+                    st.metric("📤 Generated Tokens", f"{sum(u.get('generated_tokens', 0) for u in usages):,}")
+                with col3:
+                    st.metric("♻️ Cached Tokens", f"{sum(u.get('cached_tokens', 0) for u in usages):,}")
+                with col4:
+                    exact = sum(1 for u in usages if u.get('exact'))
+                    st.metric("🎯 Exact Counts", f"{exact}/{len(usages)}")
+            
             # Performance trends
             st.subheader("📈 Performance Trends")
             
@@ -733,164 +746,6 @@ def grade_batch_submissions(grader, submissions, assignment_id, use_validation=T
     with col3:
         st.metric("Success Rate", f"{(graded_count/total_submissions)*100:.1f}%")
 
-def grade_submission_internal(business_grader, submission, assignment_id, grader):
-    """Internal function to grade a single submission"""
-    
-    # Extract notebook content
-    notebook_path = submission['notebook_path']
-    
-    # Execute notebook if needed
-    try:
-        executor = NotebookExecutor(data_folder='data', timeout=30)
-        notebook_to_use, exec_info = executor.execute_if_needed(notebook_path)
-    except Exception as e:
-        print(f"⚠️ Notebook execution failed. Using original notebook.")
-        notebook_to_use = notebook_path
-        exec_info = {'needed_execution': False, 'message': 'Execution skipped due to error'}
-    
-    # 🔧 PREPROCESSING: Clean and normalize submission before AI grading
-    print("🔧 Preprocessing submission...")
-    preprocessor = SubmissionPreprocessor()
-    student_code, student_markdown, fixes_applied = preprocessor.preprocess_notebook(notebook_to_use)
-    
-    if fixes_applied:
-        print(f"✅ Applied {len(fixes_applied)} preprocessing fixes:")
-        for fix in fixes_applied:
-            print(f"   • {fix}")
-    else:
-        print("✅ No preprocessing needed - submission was clean")
-    
-    # Get assignment info from database (including template and solution notebooks)
-    conn = sqlite3.connect(grader.db_path)
-    assignment_info_df = pd.read_sql_query("""
-        SELECT name, description, rubric, template_notebook, solution_notebook, total_points FROM assignments WHERE id = ?
-    """, conn, params=(assignment_id,))
-    conn.close()
-    
-    if assignment_info_df.empty:
-        raise ValueError(f"Assignment {assignment_id} not found")
-    
-    assignment_row = assignment_info_df.iloc[0]
-    
-    # Prepare assignment info (include rubric for weight extraction)
-    assignment_info = {
-        "title": assignment_row['name'],
-        "name": assignment_row['name'],
-        "description": assignment_row['description'],
-        "student_name": submission['student_name'] or f"Student {submission['student_identifier']}",
-        "rubric": assignment_row['rubric']  # Include rubric for weight extraction
-    }
-    
-    # Rubric is now handled internally by the grader with fixed weights
-    
-    # Load template code (what students received) - CRITICAL for score validation
-    template_code = ""
-    if assignment_row.get('template_notebook') and os.path.exists(assignment_row['template_notebook']):
-        try:
-            with open(assignment_row['template_notebook'], 'r', encoding='utf-8') as f:
-                template_nb = nbformat.read(f, as_version=4)
-            
-            # Extract code from template
-            for cell in template_nb.cells:
-                if cell.cell_type == 'code':
-                    template_code += cell.source + "\n\n"
-            
-            print(f"✅ Batch grading: Loaded template notebook: {os.path.basename(assignment_row['template_notebook'])}")
-        except Exception as e:
-            print(f"⚠️ Batch grading: Could not load template notebook: {e}")
-    
-    # Load solution code from solution notebook
-    solution_code = ""
-    solution_markdown = ""
-    
-    if assignment_row['solution_notebook'] and os.path.exists(assignment_row['solution_notebook']):
-        try:
-            with open(assignment_row['solution_notebook'], 'r', encoding='utf-8') as f:
-                solution_nb = nbformat.read(f, as_version=4)
-            
-            # Extract code and markdown from solution
-            for cell in solution_nb.cells:
-                if cell.cell_type == 'code':
-                    solution_code += cell.source + "\n\n"
-                elif cell.cell_type == 'markdown':
-                    solution_markdown += cell.source + "\n\n"
-            
-            print(f"✅ Batch grading: Loaded solution notebook: {os.path.basename(assignment_row['solution_notebook'])}")
-        except Exception as e:
-            print(f"⚠️ Batch grading: Could not load solution notebook: {e}")
-            solution_code = "# Solution notebook not available\n# Grading based on general criteria"
-    else:
-        print("⚠️ Batch grading: No solution notebook found for this assignment")
-        solution_code = "# Solution notebook not available\n# Grading based on general criteria"
-    
-    # Compare outputs to solution if available
-    output_comparison = None
-    if assignment_row['solution_notebook'] and os.path.exists(assignment_row['solution_notebook']):
-        try:
-            print("📊 Comparing outputs to solution...")
-            from output_comparator import compare_notebook_outputs
-            output_comparison = compare_notebook_outputs(notebook_to_use, assignment_row['solution_notebook'])
-            print(f"   Match rate: {output_comparison['match_rate']:.1f}% ({output_comparison['matches']}/{output_comparison['total_comparisons']})")
-        except Exception as e:
-            print(f"⚠️ Output comparison failed: {e}")
-            output_comparison = None
-    
-    # Prepare preprocessing info with penalty and output comparison
-    preprocessing_info = {
-        'fixes_applied': fixes_applied,
-        'needs_manual_review': len(fixes_applied) > 5,
-        'penalty_points': preprocessor.calculate_penalty(),
-        'penalty_explanation': preprocessor.get_penalty_explanation(),
-        'output_comparison': output_comparison
-    }
-    
-    # Grade the submission (now includes template_code for validation and preprocessing info)
-    return business_grader.grade_submission(
-        student_code=student_code,
-        student_markdown=student_markdown,
-        template_code=template_code,
-        solution_code=solution_code,
-        assignment_info=assignment_info,
-        notebook_path=notebook_to_use,
-        preprocessing_info=preprocessing_info
-    )
-
-def save_grading_result(grader, submission_id, result):
-    """Save grading result to database"""
-    
-    conn = sqlite3.connect(grader.db_path)
-    cursor = conn.cursor()
-    
-    # Prepare feedback data
-    feedback_data = {
-        'final_score': result['final_score'],
-        'component_scores': result['component_scores'],
-        'component_percentages': result['component_percentages'],
-        'technical_analysis': result.get('technical_analysis', {}),
-        'comprehensive_feedback': result.get('comprehensive_feedback', {}),
-        'grading_stats': result.get('grading_stats', {}),
-        'preprocessing': result.get('preprocessing', {})  # Include preprocessing info
-    }
-    
-    # Filter AI feedback to remove internal monologue before storing
-    filtered_feedback = filter_ai_feedback_for_storage(feedback_data)
-    
-    # Update submission
-    cursor.execute("""
-        UPDATE submissions 
-        SET ai_score = ?, ai_feedback = ?, final_score = ?, graded_date = ?
-        WHERE id = ?
-    """, (
-        result['final_score'],
-        json.dumps(filtered_feedback),
-        result['final_score'],
-        result.get('grading_timestamp'),
-        submission_id
-    ))
-    
-    conn.commit()
-    conn.close()
-
 def generate_pdf_report(student_name, assignment_title, result):
     """Generate PDF report with comprehensive feedback from Business Analytics Grader"""
     
@@ -924,12 +779,13 @@ def generate_pdf_report(student_name, assignment_title, result):
         }
         
         # Generate report
-        report_generator = PDFReportGenerator()
-        pdf_path = report_generator.generate_report(
-            student_name=student_name,
-            assignment_id=assignment_title,
-            analysis_result=analysis_result
-        )
+        with span('pdf.generate'):
+            report_generator = pdf.PDFReportGenerator()
+            pdf_path = report_generator.generate_report(
+                student_name=student_name,
+                assignment_id=assignment_title,
+                analysis_result=analysis_result
+            )
         
         # Offer download
         with open(pdf_path, 'rb') as f:
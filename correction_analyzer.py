@@ -5,6 +5,7 @@ Analyzes patterns in human corrections to improve AI grading accuracy
 """
 
 import sqlite3
+import zlib
 import pandas as pd
 from typing import Dict, List, Tuple
 from datetime import datetime
@@ -52,6 +53,31 @@ class CorrectionAnalyzer:
         
         return df
     
+    def get_corrections_fingerprint(self, assignment_id: int = None) -> Tuple:
+        """Cheap summary of the corrections that changes whenever get_corrections() would"""
+        conn = sqlite3.connect(self.db_path)
+        # Per-row checksum, so editing feedback without changing its length still changes the fingerprint
+        conn.create_function('row_checksum', -1, lambda *values: zlib.crc32(repr(values).encode('utf-8')),
+                             deterministic=True)
+        
+        query = """
+            SELECT COUNT(*), MAX(graded_date),
+                TOTAL(row_checksum(id, ai_score, human_score, final_score, ai_feedback, human_feedback))
+            FROM submissions
+            WHERE human_score IS NOT NULL
+                AND ai_score IS NOT NULL
+                AND human_score != ai_score
+        """
+        params = []
+        if assignment_id:
+            query += " AND assignment_id = ?"
+            params.append(assignment_id)
+        
+        try:
+            return tuple(conn.execute(query, params).fetchone())
+        finally:
+            conn.close()
+    
     def analyze_patterns(self, assignment_id: int = None) -> Dict:
         """Analyze correction patterns to identify systematic AI biases"""
         corrections = self.get_corrections(assignment_id)
@@ -4,18 +4,27 @@ Decode Server for Mac Studio
 Receives KV cache from DGX and generates tokens using MLX
 """
 
-from flask import Flask, request, jsonify
-from mlx_lm import load, generate
+from aiohttp import web
+from mlx_lm import load
+from mlx_lm.generate import generate_step
+from mlx_lm.models.cache import make_prompt_cache
 import mlx.core as mx
+import numpy as np
+import inspect
+import io
 import time
-import pickle
 import base64
 import logging
 
+from server_runtime import (
+    InferenceRuntime, QueueFullError, busy_response, read_json,
+    create_app, add_runtime_arguments, token_usage
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+routes = web.RouteTableDef()
 
 # Global model variables
 model = None
@@ -23,172 +32,293 @@ tokenizer = None
 model_loaded = False
 model_path = None
 
+# Model calls run here so health/status never wait on a decode
+runtime = InferenceRuntime()
+
+# KV cache wire format produced by prefill_server_dgx
+KV_FORMAT = 'npz-f16'
+
 def load_model(model_path_arg):
     """Load MLX model for decode"""
     global model, tokenizer, model_loaded, model_path
-    
+
     try:
         logger.info(f"🔄 Loading MLX model from {model_path_arg}...")
         model_path = model_path_arg
-        
+
         model, tokenizer = load(model_path)
         model_loaded = True
-        
+
         logger.info("✅ MLX model loaded successfully!")
         return True
     except Exception as e:
         logger.error(f"❌ Failed to load model: {e}")
         return False
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@routes.get('/health')
+async def health_check(request):
     """Health check endpoint"""
-    return jsonify({
+    return web.json_response({
         'status': 'healthy' if model_loaded else 'loading',
         'model': model_path,
         'loaded': model_loaded,
-        'backend': 'MLX'
+        'backend': 'MLX',
+        'queue': runtime.stats()
     })
 
-@app.route('/decode', methods=['POST'])
-def decode():
+def _load_kv_cache(kv_base64, kv_format):
+    """Decode the prefill server's KV cache into per-layer (keys, values) MLX arrays"""
+    if kv_format != KV_FORMAT:
+        raise ValueError(f"Unsupported KV cache format: {kv_format}")
+
+    kv_bytes = base64.b64decode(kv_base64)
+    with np.load(io.BytesIO(kv_bytes), allow_pickle=False) as arrays:
+        num_layers = len(arrays.files) // 2
+        return [
+            (mx.array(arrays[f'k{i}']), mx.array(arrays[f'v{i}']))
+            for i in range(num_layers)
+        ]
+
+def _build_prompt_cache(kv_layers):
+    """
+    Load transferred KV tensors into a fresh MLX prompt cache.
+
+    The last prompt position is dropped so decode can feed that token back
+    through the model and get the logits for the first new token.
+    Returns None if the cache does not fit this model's layer layout.
+    """
+    prompt_cache = make_prompt_cache(model)
+
+    if len(prompt_cache) != len(kv_layers):
+        logger.warning(f"⚠️ KV cache has {len(kv_layers)} layers, model expects {len(prompt_cache)}")
+        return None
+
+    for layer_cache, (keys, values) in zip(prompt_cache, kv_layers):
+        # Sliding-window / rotating caches need extra metadata we don't transfer
+        if type(layer_cache).__name__ != 'KVCache':
+            logger.warning(f"⚠️ Unsupported cache type for handoff: {type(layer_cache).__name__}")
+            return None
+        layer_cache.state = (keys[..., :-1, :], values[..., :-1, :])
+
+    return prompt_cache
+
+def _step_kwargs(max_new_tokens, temperature):
+    """generate_step kwargs for both the sampler-based and the older temp-based mlx_lm API"""
+    params = inspect.signature(generate_step).parameters
+    kwargs = {}
+    if 'sampler' in params:
+        from mlx_lm.sample_utils import make_sampler
+        kwargs['sampler'] = make_sampler(temp=temperature)
+    else:
+        kwargs['temp'] = temperature
+    if 'max_tokens' in params:
+        kwargs['max_tokens'] = max_new_tokens
+    return kwargs
+
+def _generate_tokens(prompt_tokens, prompt_cache, max_new_tokens, temperature):
+    """
+    Run the MLX generation loop and count tokens as they are produced.
+
+    prompt_tokens is what still has to go through the model: the whole
+    prompt for a local generation, or just the last prompt token when
+    decoding from a transferred cache.
+    """
+    eos_ids = set(getattr(tokenizer, 'eos_token_ids', None) or [tokenizer.eos_token_id])
+
+    tokens = []
+    for step, (token, _) in enumerate(generate_step(
+        mx.array(prompt_tokens), model, prompt_cache=prompt_cache,
+        **_step_kwargs(max_new_tokens, temperature)
+    )):
+        token = token.item() if hasattr(token, 'item') else int(token)
+        if token in eos_ids:
+            break
+        tokens.append(token)
+        if step + 1 >= max_new_tokens:
+            break
+
+    return tokenizer.decode(tokens), tokens
+
+def _run_decode(prompt, max_new_tokens, temperature, kv_cache=None, kv_format=None, input_ids=None):
+    """Blocking MLX decode - runs on the model executor"""
+    start_time = time.time()
+
+    prompt_cache = None
+    if kv_cache and input_ids and len(input_ids) > 1:
+        try:
+            prompt_cache = _build_prompt_cache(_load_kv_cache(kv_cache, kv_format))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load transferred KV cache: {e}")
+            prompt_cache = None
+
+    cache_load_time = time.time() - start_time
+
+    if prompt_cache is not None:
+        # Decode straight from the transferred cache - only the last prompt
+        # token goes back through the model, no second prefill
+        response, tokens = _generate_tokens(input_ids[-1:], prompt_cache, max_new_tokens, temperature)
+        usage = token_usage(len(input_ids), len(tokens), prefill_tokens=1, cached_tokens=len(input_ids) - 1)
+    else:
+        if not prompt:
+            raise ValueError('No usable KV cache and no prompt provided')
+
+        logger.info("↩️ Falling back to full generation from prompt")
+        prompt_ids = tokenizer.encode(prompt)
+        response, tokens = _generate_tokens(prompt_ids, None, max_new_tokens, temperature)
+        usage = token_usage(len(prompt_ids), len(tokens))
+
+    decode_time = time.time() - start_time
+    generated_tokens = usage['generated_tokens']
+    tokens_per_sec = generated_tokens / decode_time if decode_time > 0 else 0
+
+    logger.info(f"✅ Decode completed in {decode_time:.3f}s")
+    logger.info(f"   KV cache used: {prompt_cache is not None} ({usage['cached_tokens']} cached tokens)")
+    logger.info(f"   Tokens generated: {generated_tokens}")
+    logger.info(f"   Speed: {tokens_per_sec:.1f} tok/s")
+
+    return {
+        'generated_text': response,
+        'decode_time': decode_time,
+        'cache_load_time': cache_load_time,
+        'kv_cache_used': prompt_cache is not None,
+        'cached_tokens': usage['cached_tokens'],
+        'tokens_generated': generated_tokens,
+        'tokens_per_sec': tokens_per_sec,
+        'usage': usage
+    }
+
+@routes.post('/decode')
+async def decode(request):
     """
     Generate tokens using KV cache from prefill
-    
+
     Request:
     {
         "kv_cache": "base64 encoded cache from DGX",
+        "kv_format": "npz-f16",
         "input_ids": [token ids],
+        "prompt": "original prompt (fallback only)",
         "max_new_tokens": 100,
         "temperature": 0.7
     }
-    
+
     Response:
     {
         "generated_text": "output text",
         "decode_time": 1.234,
+        "kv_cache_used": true,
+        "cached_tokens": 49,
         "tokens_generated": 50,
-        "tokens_per_sec": 40.5
+        "tokens_per_sec": 40.5,
+        "usage": {"prompt_tokens": 50, "prefill_tokens": 1,
+                  "generated_tokens": 50, "cached_tokens": 49}
     }
     """
-    global model, tokenizer, model_loaded
-    
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
     try:
-        data = request.json
+        data = await read_json(request)
         max_new_tokens = data.get('max_new_tokens', 100)
         temperature = data.get('temperature', 0.7)
-        
-        # For now, generate without KV cache (MLX doesn't support external KV cache easily)
-        # This is a simplified version - full implementation would need MLX KV cache integration
+
+        # The prompt is only used if the transferred KV cache can't be loaded
         prompt = data.get('prompt', '')
-        
-        if not prompt:
-            return jsonify({'error': 'No prompt provided'}), 400
-        
-        start_time = time.time()
-        
-        # Generate using MLX
-        response = generate(
-            model,
-            tokenizer,
-            prompt=prompt,
-            max_tokens=max_new_tokens,
-            temp=temperature,
-            verbose=False
+        kv_cache = data.get('kv_cache')
+        input_ids = data.get('input_ids')
+
+        if not prompt and not (kv_cache and input_ids):
+            return web.json_response({'error': 'No KV cache or prompt provided'}, status=400)
+
+        result = await runtime.submit(
+            _run_decode, prompt, max_new_tokens, temperature,
+            kv_cache=kv_cache, kv_format=data.get('kv_format'), input_ids=input_ids
         )
-        
-        decode_time = time.time() - start_time
-        
-        # Count tokens (approximate)
-        generated_tokens = len(tokenizer.encode(response)) - len(tokenizer.encode(prompt))
-        tokens_per_sec = generated_tokens / decode_time if decode_time > 0 else 0
-        
-        logger.info(f"✅ Decode completed in {decode_time:.3f}s")
-        logger.info(f"   Tokens generated: {generated_tokens}")
-        logger.info(f"   Speed: {tokens_per_sec:.1f} tok/s")
-        
-        return jsonify({
-            'generated_text': response,
-            'decode_time': decode_time,
-            'tokens_generated': generated_tokens,
-            'tokens_per_sec': tokens_per_sec
-        })
-        
+        return web.json_response(result)
+
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Decode rejected: {e}")
+        return busy_response(runtime, e)
     except Exception as e:
         logger.error(f"❌ Decode failed: {e}")
-        return jsonify({'error': str(e)}), 500
+        return web.json_response({'error': str(e)}, status=500)
+
+def _run_generate(prompt, max_tokens, temperature):
+    """Blocking full MLX generation - runs on the model executor"""
+    start_time = time.time()
 
-@app.route('/generate', methods=['POST'])
-def generate_full():
+    prompt_ids = tokenizer.encode(prompt)
+    response, tokens = _generate_tokens(prompt_ids, None, max_tokens, temperature)
+
+    total_time = time.time() - start_time
+
+    return {
+        'response': response,
+        'generation_time': total_time,
+        'model': model_path,
+        'usage': token_usage(len(prompt_ids), len(tokens))
+    }
+
+@routes.post('/generate')
+async def generate_full(request):
     """
     Full generation (prefill + decode on Mac)
     Fallback when DGX prefill not available
     """
-    global model, tokenizer, model_loaded
-    
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
     try:
-        data = request.json
+        data = await read_json(request)
         prompt = data.get('prompt', '')
         max_tokens = data.get('max_tokens', 100)
         temperature = data.get('temperature', 0.7)
-        
-        start_time = time.time()
-        
-        response = generate(
-            model,
-            tokenizer,
-            prompt=prompt,
-            max_tokens=max_tokens,
-            temp=temperature,
-            verbose=False
-        )
-        
-        total_time = time.time() - start_time
-        
-        return jsonify({
-            'response': response,
-            'generation_time': total_time,
-            'model': model_path
-        })
-        
+
+        result = await runtime.submit(_run_generate, prompt, max_tokens, temperature)
+        return web.json_response(result)
+
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Generation rejected: {e}")
+        return busy_response(runtime, e)
     except Exception as e:
         logger.error(f"❌ Generation failed: {e}")
-        return jsonify({'error': str(e)}), 500
+        return web.json_response({'error': str(e)}, status=500)
 
-@app.route('/status', methods=['GET'])
-def get_status():
+@routes.get('/status')
+async def get_status(request):
     """Get detailed server status"""
-    return jsonify({
+    return web.json_response({
         'server': 'Mac Decode Server',
         'model': model_path,
         'loaded': model_loaded,
         'backend': 'MLX',
-        'purpose': 'Token decode from DGX prefill'
+        'purpose': 'Token decode from DGX prefill',
+        'queue': runtime.stats()
     })
 
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Mac Decode Server')
     parser.add_argument('--model', type=str, required=True, help='Path to MLX model')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind')
     parser.add_argument('--port', type=int, default=8001, help='Port to bind')
-    
+    add_runtime_arguments(parser)
+
     args = parser.parse_args()
-    
+
+    runtime = InferenceRuntime(max_workers=args.workers, max_queue=args.max_queue)
+
     print("🖥️  Starting Mac Decode Server (MLX)...")
     print(f"📡 Model: {args.model}")
     print(f"🌐 Binding to: {args.host}:{args.port}")
+    print(f"📥 Queue: {args.workers} worker(s), max {args.max_queue} waiting")
     print()
-    
+
     if load_model(args.model):
-        print("🚀 Server ready! Starting Flask app...")
-        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+        print("🚀 Server ready! Starting async server...")
+        app = create_app(runtime)
+        app.add_routes(routes)
+        web.run_app(app, host=args.host, port=args.port)
     else:
         print("❌ Failed to start server - model loading failed")
@@ -4,25 +4,34 @@ Decode Server using Ollama
 Receives context from prefill and generates tokens
 """
 
-from flask import Flask, request, jsonify
+from aiohttp import web
+import asyncio
 import requests
 import time
 import logging
 
+from server_runtime import (
+    InferenceRuntime, QueueFullError, busy_response, read_json,
+    create_app, add_runtime_arguments, token_usage
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+routes = web.RouteTableDef()
 
 # Global configuration
 ollama_host = "http://localhost:11434"
 model_name = None
 model_loaded = False
 
+# Ollama calls run here so health/status never wait on a decode
+runtime = InferenceRuntime()
+
 def check_model(model):
     """Check if model is available in Ollama"""
     try:
-        response = requests.get(f"{ollama_host}/api/tags")
+        response = requests.get(f"{ollama_host}/api/tags", timeout=5)
         if response.status_code == 200:
             models = response.json().get('models', [])
             for m in models:
@@ -36,11 +45,11 @@ def check_model(model):
 def load_model(model):
     """Ensure model is loaded in Ollama"""
     global model_name, model_loaded
-    
+
     try:
         logger.info(f"🔄 Checking model {model} in Ollama...")
         model_name = model
-        
+
         if check_model(model):
             logger.info(f"✅ Model {model} is available!")
             model_loaded = True
@@ -49,26 +58,95 @@ def load_model(model):
             logger.error(f"❌ Model {model} not found in Ollama")
             logger.info(f"   Run: ollama pull {model}")
             return False
-            
+
     except Exception as e:
         logger.error(f"❌ Failed to check model: {e}")
         return False
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@routes.get('/health')
+async def health_check(request):
     """Health check endpoint"""
-    return jsonify({
+    return web.json_response({
         'status': 'healthy' if model_loaded else 'loading',
         'model': model_name,
         'loaded': model_loaded,
-        'backend': 'Ollama'
+        'backend': 'Ollama',
+        'queue': runtime.stats()
     })
 
-@app.route('/decode', methods=['POST'])
-def decode():
+def _run_decode(prompt, max_tokens, temperature):
+    """Blocking Ollama generation - runs on the model executor"""
+    start_time = time.time()
+
+    # Generate using Ollama
+    response = requests.post(
+        f"{ollama_host}/api/generate",
+        json={
+            'model': model_name,
+            'prompt': prompt,
+            'stream': False,
+            'options': {
+                'num_predict': max_tokens,
+                'temperature': temperature
+            }
+        },
+        timeout=120
+    )
+
+    if response.status_code != 200:
+        return None, f'Ollama error: {response.status_code}'
+
+    result = response.json()
+    generated_text = result.get('response', '')
+
+    decode_time = time.time() - start_time
+
+    # Extract Ollama metrics
+    eval_count = result.get('eval_count', 0)
+    eval_duration = result.get('eval_duration', 0)
+    prompt_eval_count = result.get('prompt_eval_count', 0)
+    prompt_eval_duration = result.get('prompt_eval_duration', 0)
+    total_duration = result.get('total_duration', 0)
+    load_duration = result.get('load_duration', 0)
+
+    # Calculate tokens per second
+    tokens_per_sec = 0
+    if eval_duration > 0:
+        tokens_per_sec = eval_count / (eval_duration / 1e9)
+
+    logger.info(f"✅ Decode completed in {decode_time:.3f}s")
+    logger.info(f"   Tokens generated: {eval_count}")
+    logger.info(f"   Decode speed: {tokens_per_sec:.1f} tok/s")
+
+    return {
+        'generated_text': prompt + generated_text,
+        'decode_time': decode_time,
+        'tokens_generated': eval_count,
+        'tokens_per_sec': tokens_per_sec,
+        'model': model_name,
+        # Ollama only reports the prompt tokens it evaluated, so a prompt it
+        # had already cached shows up as fewer prefill tokens
+        'usage': token_usage(prompt_eval_count, eval_count),
+        'metrics': {
+            'eval_count': eval_count,
+            'eval_duration_ns': eval_duration,
+            'eval_duration_s': eval_duration / 1e9,
+            'tokens_per_sec': tokens_per_sec,
+            'prompt_eval_count': prompt_eval_count,
+            'prompt_eval_duration_ns': prompt_eval_duration,
+            'prompt_eval_duration_s': prompt_eval_duration / 1e9,
+            'total_duration_ns': total_duration,
+            'total_duration_s': total_duration / 1e9,
+            'load_duration_ns': load_duration,
+            'load_duration_s': load_duration / 1e9
+        }
+    }, None
+
+@routes.post('/decode')
+async def decode(request):
     """
     Generate tokens using context from prefill
-    
+
     Request:
     {
         "context": "processed context from prefill",
@@ -76,194 +154,161 @@ def decode():
         "max_new_tokens": 100,
         "temperature": 0.7
     }
-    
+
     Response:
     {
         "generated_text": "output text",
         "decode_time": 1.234,
         "tokens_generated": 50,
-        "tokens_per_sec": 40.5
+        "tokens_per_sec": 40.5,
+        "usage": {"prompt_tokens": 50, "prefill_tokens": 50,
+                  "generated_tokens": 50, "cached_tokens": 0}
     }
     """
-    global model_name, model_loaded
-    
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
     try:
-        data = request.json
+        data = await read_json(request)
         prompt = data.get('prompt', data.get('context', ''))
         max_tokens = data.get('max_new_tokens', 100)
         temperature = data.get('temperature', 0.7)
-        
+
         if not prompt:
-            return jsonify({'error': 'No prompt provided'}), 400
-        
-        start_time = time.time()
-        
-        # Generate using Ollama
-        response = requests.post(
-            f"{ollama_host}/api/generate",
-            json={
-                'model': model_name,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'num_predict': max_tokens,
-                    'temperature': temperature
-                }
-            },
-            timeout=120
-        )
-        
-        if response.status_code != 200:
-            return jsonify({'error': f'Ollama error: {response.status_code}'}), 500
-        
-        result = response.json()
-        generated_text = result.get('response', '')
-        
-        decode_time = time.time() - start_time
-        
-        # Extract Ollama metrics
-        eval_count = result.get('eval_count', 0)
-        eval_duration = result.get('eval_duration', 0)
-        prompt_eval_count = result.get('prompt_eval_count', 0)
-        prompt_eval_duration = result.get('prompt_eval_duration', 0)
-        total_duration = result.get('total_duration', 0)
-        load_duration = result.get('load_duration', 0)
-        
-        # Calculate tokens per second
-        tokens_per_sec = 0
-        if eval_duration > 0:
-            tokens_per_sec = eval_count / (eval_duration / 1e9)
-        
-        logger.info(f"✅ Decode completed in {decode_time:.3f}s")
-        logger.info(f"   Tokens generated: {eval_count}")
-        logger.info(f"   Decode speed: {tokens_per_sec:.1f} tok/s")
-        
-        return jsonify({
-            'generated_text': prompt + generated_text,
-            'decode_time': decode_time,
-            'tokens_generated': eval_count,
-            'tokens_per_sec': tokens_per_sec,
-            'model': model_name,
-            'metrics': {
-                'eval_count': eval_count,
-                'eval_duration_ns': eval_duration,
-                'eval_duration_s': eval_duration / 1e9,
-                'tokens_per_sec': tokens_per_sec,
-                'prompt_eval_count': prompt_eval_count,
-                'prompt_eval_duration_ns': prompt_eval_duration,
-                'prompt_eval_duration_s': prompt_eval_duration / 1e9,
-                'total_duration_ns': total_duration,
-                'total_duration_s': total_duration / 1e9,
-                'load_duration_ns': load_duration,
-                'load_duration_s': load_duration / 1e9
-            }
-        })
-        
+            return web.json_response({'error': 'No prompt provided'}, status=400)
+
+        result, error = await runtime.submit(_run_decode, prompt, max_tokens, temperature)
+        if error:
+            return web.json_response({'error': error}, status=500)
+
+        return web.json_response(result)
+
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Decode rejected: {e}")
+        return busy_response(runtime, e)
     except Exception as e:
         logger.error(f"❌ Decode failed: {e}")
-        return jsonify({'error': str(e)}), 500
+        return web.json_response({'error': str(e)}, status=500)
+
+def _run_generate(prompt, max_tokens, temperature):
+    """Blocking full Ollama generation - runs on the model executor"""
+    start_time = time.time()
+
+    response = requests.post(
+        f"{ollama_host}/api/generate",
+        json={
+            'model': model_name,
+            'prompt': prompt,
+            'stream': False,
+            'options': {
+                'num_predict': max_tokens,
+                'temperature': temperature
+            }
+        },
+        timeout=120
+    )
+
+    if response.status_code != 200:
+        return None, f'Ollama error: {response.status_code}'
+
+    result = response.json()
+    generated_text = result.get('response', '')
+
+    total_time = time.time() - start_time
 
-@app.route('/generate', methods=['POST'])
-def generate_full():
+    return {
+        'response': prompt + generated_text,
+        'generation_time': total_time,
+        'model': model_name,
+        'usage': token_usage(result.get('prompt_eval_count', 0), result.get('eval_count', 0))
+    }, None
+
+@routes.post('/generate')
+async def generate_full(request):
     """
     Full generation (prefill + decode)
     Fallback when prefill server not available
     """
-    global model_name, model_loaded
-    
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
     try:
-        data = request.json
+        data = await read_json(request)
         prompt = data.get('prompt', '')
         max_tokens = data.get('max_tokens', 100)
         temperature = data.get('temperature', 0.7)
-        
-        start_time = time.time()
-        
-        response = requests.post(
-            f"{ollama_host}/api/generate",
-            json={
-                'model': model_name,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'num_predict': max_tokens,
-                    'temperature': temperature
-                }
-            },
-            timeout=120
-        )
-        
-        if response.status_code != 200:
-            return jsonify({'error': f'Ollama error: {response.status_code}'}), 500
-        
-        result = response.json()
-        generated_text = result.get('response', '')
-        
-        total_time = time.time() - start_time
-        
-        return jsonify({
-            'response': prompt + generated_text,
-            'generation_time': total_time,
-            'model': model_name
-        })
-        
+
+        result, error = await runtime.submit(_run_generate, prompt, max_tokens, temperature)
+        if error:
+            return web.json_response({'error': error}, status=500)
+
+        return web.json_response(result)
+
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Generation rejected: {e}")
+        return busy_response(runtime, e)
     except Exception as e:
         logger.error(f"❌ Generation failed: {e}")
-        return jsonify({'error': str(e)}), 500
+        return web.json_response({'error': str(e)}, status=500)
 
-@app.route('/status', methods=['GET'])
-def get_status():
+@routes.get('/status')
+async def get_status(request):
     """Get detailed server status"""
     try:
-        response = requests.get(f"{ollama_host}/api/tags")
+        # Probe Ollama off the event loop (and off the model executor)
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            None, lambda: requests.get(f"{ollama_host}/api/tags", timeout=3)
+        )
         ollama_running = response.status_code == 200
-        
-        return jsonify({
+
+        return web.json_response({
             'server': 'Ollama Decode Server',
             'model': model_name,
             'loaded': model_loaded,
             'backend': 'Ollama',
             'ollama_running': ollama_running,
-            'ollama_host': ollama_host
+            'ollama_host': ollama_host,
+            'queue': runtime.stats()
         })
     except Exception as e:
-        return jsonify({
+        return web.json_response({
             'server': 'Ollama Decode Server',
             'model': model_name,
             'loaded': model_loaded,
             'backend': 'Ollama',
             'ollama_running': False,
-            'error': str(e)
+            'error': str(e),
+            'queue': runtime.stats()
         })
 
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='Ollama Decode Server')
     parser.add_argument('--model', type=str, required=True, help='Ollama model name')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind')
     parser.add_argument('--port', type=int, default=8001, help='Port to bind')
     parser.add_argument('--ollama-host', type=str, default='http://localhost:11434', help='Ollama host')
-    
+    add_runtime_arguments(parser)
+
     args = parser.parse_args()
-    
+
     ollama_host = args.ollama_host
-    
+    runtime = InferenceRuntime(max_workers=args.workers, max_queue=args.max_queue)
+
     print("🖥️  Starting Ollama Decode Server...")
     print(f"📡 Model: {args.model}")
     print(f"🌐 Binding to: {args.host}:{args.port}")
     print(f"🔗 Ollama: {ollama_host}")
+    print(f"📥 Queue: {args.workers} worker(s), max {args.max_queue} waiting")
     print()
-    
+
     if load_model(args.model):
-        print("🚀 Server ready! Starting Flask app...")
-        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+        print("🚀 Server ready! Starting async server...")
+        app = create_app(runtime)
+        app.add_routes(routes)
+        web.run_app(app, host=args.host, port=args.port)
     else:
         print("❌ Failed to start server - model not available")
         print(f"   Run: ollama pull {args.model}")
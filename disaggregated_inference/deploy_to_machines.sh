@@ -24,19 +24,19 @@ echo "✅ Directories created"
 # Deploy to DGX Spark 1
 echo ""
 echo "📡 Deploying to DGX Spark 1 (169.254.150.103)..."
-scp disaggregated_inference/prefill_server_dgx.py humphrjk@169.254.150.103:~/disaggregated_inference/
+scp disaggregated_inference/prefill_server_dgx.py disaggregated_inference/server_runtime.py humphrjk@169.254.150.103:~/disaggregated_inference/
 echo "✅ DGX Spark 1 deployed"
 
 # Deploy to DGX Spark 2
 echo ""
 echo "📡 Deploying to DGX Spark 2 (169.254.150.104)..."
-scp disaggregated_inference/prefill_server_dgx.py humphrjk@169.254.150.104:~/disaggregated_inference/
+scp disaggregated_inference/prefill_server_dgx.py disaggregated_inference/server_runtime.py humphrjk@169.254.150.104:~/disaggregated_inference/
 echo "✅ DGX Spark 2 deployed"
 
 # Deploy to Mac Studio 2
 echo ""
 echo "📡 Deploying to Mac Studio 2 (169.254.150.102)..."
-scp disaggregated_inference/decode_server_mac.py humphrjk@169.254.150.102:~/disaggregated_inference/
+scp disaggregated_inference/decode_server_mac.py disaggregated_inference/server_runtime.py humphrjk@169.254.150.102:~/disaggregated_inference/
 echo "✅ Mac Studio 2 deployed"
 
 # Mac Studio 1 is local, just ensure file is there
@@ -49,19 +49,19 @@ echo "🔍 Checking dependencies..."
 
 echo ""
 echo "DGX Spark 1:"
-ssh humphrjk@169.254.150.103 "python3 -c 'import flask, torch, transformers' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install flask torch transformers accelerate'"
+ssh humphrjk@169.254.150.103 "python3 -c 'import aiohttp, torch, transformers' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install aiohttp torch transformers accelerate'"
 
 echo ""
 echo "DGX Spark 2:"
-ssh humphrjk@169.254.150.104 "python3 -c 'import flask, torch, transformers' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install flask torch transformers accelerate'"
+ssh humphrjk@169.254.150.104 "python3 -c 'import aiohttp, torch, transformers' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install aiohttp torch transformers accelerate'"
 
 echo ""
 echo "Mac Studio 1 (local):"
-python3 -c 'import flask, mlx.core, mlx_lm' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install flask mlx mlx-lm'
+python3 -c 'import aiohttp, mlx.core, mlx_lm' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install aiohttp mlx mlx-lm'
 
 echo ""
 echo "Mac Studio 2:"
-ssh humphrjk@169.254.150.102 "python3 -c 'import flask, mlx.core, mlx_lm' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install flask mlx mlx-lm'"
+ssh humphrjk@169.254.150.102 "python3 -c 'import aiohttp, mlx.core, mlx_lm' && echo '  ✅ Dependencies OK' || echo '  ❌ Missing dependencies - run: pip install aiohttp mlx mlx-lm'"
 
 # Verify models exist
 echo ""
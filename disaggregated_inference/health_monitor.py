@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Background health monitor for the model servers
+Probes every registered server on an interval, caches the result with a TTL
+and keeps a circuit breaker per server so callers can skip a failing server
+without waiting on a health check or a timeout
+"""
+
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker states
+CLOSED = 'closed'        # Healthy - requests go through
+OPEN = 'open'            # Failing - skip immediately until reset_timeout passes
+HALF_OPEN = 'half_open'  # Reset timeout passed - let one trial request/probe test it
+
+
+class HealthMonitor:
+    """Shared TTL health cache + circuit breaker, refreshed by a daemon thread"""
+
+    def __init__(self, interval: float = 10.0, ttl: float = 30.0, timeout: float = 3.0,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Args:
+            interval: Seconds between background probe rounds
+            ttl: Cached results older than this are re-probed before use
+            timeout: Per-probe HTTP timeout
+            failure_threshold: Consecutive request failures that open the breaker
+            reset_timeout: Seconds an open breaker waits before allowing a trial request
+        """
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.servers = {}  # url -> state dict
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, url: str, health_path: str = '/health'):
+        """Start tracking a server (no-op if already registered)"""
+        url = url.rstrip('/')
+        with self._lock:
+            if url not in self.servers:
+                self.servers[url] = {
+                    'health_path': health_path,
+                    'healthy': None,  # None = never probed
+                    'checked_at': 0.0,
+                    'latency': None,
+                    'details': {},
+                    'error': None,
+                    'state': CLOSED,
+                    'failures': 0,
+                    'opened_at': 0.0,
+                    'trial_started_at': None  # Set while a half-open trial request is in flight
+                }
+        return url
+
+    # ------------------------------------------------------------------
+    # Probing
+    # ------------------------------------------------------------------
+
+    def probe(self, url: str) -> bool:
+        """Probe one server now and update its cache entry"""
+        url = self.register(url)
+        health_path = self.servers[url]['health_path']
+        start = time.time()
+        healthy, details, error = False, {}, None
+
+        try:
+            response = requests.get(f"{url}{health_path}", timeout=self.timeout)
+            if response.status_code == 200:
+                try:
+                    details = response.json()
+                except ValueError:
+                    details = {}
+                # Servers report loaded=False while the model is still loading
+                healthy = details.get('loaded', True) if isinstance(details, dict) else True
+            else:
+                error = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+
+        with self._lock:
+            entry = self.servers[url]
+            entry.update({
+                'healthy': healthy,
+                'checked_at': time.time(),
+                'latency': time.time() - start,
+                'details': details if isinstance(details, dict) else {},
+                'error': error
+            })
+            if healthy and entry['state'] != CLOSED:
+                logger.info(f"✅ {url} healthy again - closing circuit")
+                self._close(entry)
+            elif not healthy and entry['state'] != OPEN:
+                # A failed health check is a clear signal - open right away
+                logger.warning(f"⚠️ {url} failed health check ({error}) - opening circuit")
+                self._open(entry)
+
+        return healthy
+
+    def probe_all(self):
+        """Probe every registered server"""
+        for url in list(self.servers):
+            self.probe(url)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"❌ Health probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background probe thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Circuit breaker
+    # ------------------------------------------------------------------
+
+    def _open(self, entry: Dict):
+        entry['state'] = OPEN
+        entry['opened_at'] = time.time()
+        entry['trial_started_at'] = None
+
+    def _close(self, entry: Dict):
+        entry['state'] = CLOSED
+        entry['failures'] = 0
+        entry['trial_started_at'] = None
+
+    def record_success(self, url: str):
+        """Report a successful request - closes the breaker"""
+        url = self.register(url)
+        with self._lock:
+            entry = self.servers[url]
+            entry['healthy'] = True
+            entry['checked_at'] = time.time()
+            self._close(entry)
+
+    def record_failure(self, url: str, error: str = None):
+        """Report a failed request (timeout, connection error, 5xx)"""
+        url = self.register(url)
+        with self._lock:
+            entry = self.servers[url]
+            entry['failures'] += 1
+            entry['error'] = error
+            # A failed trial request re-opens immediately
+            if entry['state'] == HALF_OPEN or entry['failures'] >= self.failure_threshold:
+                if entry['state'] != OPEN:
+                    logger.warning(f"⚠️ {url} failed {entry['failures']} time(s) - opening circuit")
+                self._open(entry)
+
+    def reset(self, url: str):
+        """Forget a server's failures (e.g. after it was restarted)"""
+        url = self.register(url)
+        with self._lock:
+            entry = self.servers[url]
+            self._close(entry)
+            entry['checked_at'] = 0.0  # Force a fresh probe on next use
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _allow(self, entry: Dict, trial: bool = True) -> bool:
+        """
+        Breaker check (caller holds the lock); moves open -> half-open after
+        reset_timeout. While half-open only one trial request is admitted
+        (trial=True claims it) until its success or failure is recorded; a
+        trial that never reports back is given up on after reset_timeout.
+        """
+        now = time.time()
+        if entry['state'] == CLOSED:
+            return True
+        if entry['state'] == OPEN:
+            if now - entry['opened_at'] < self.reset_timeout:
+                return False
+            entry['state'] = HALF_OPEN
+            entry['checked_at'] = 0.0  # Cached result predates the reset - re-probe
+            entry['trial_started_at'] = None
+
+        started = entry['trial_started_at']
+        if started is not None and now - started < self.reset_timeout:
+            return False
+        if trial:
+            entry['trial_started_at'] = now
+        return True
+
+    def allow_request(self, url: str) -> bool:
+        """
+        False while the server's circuit is open, or half-open with the trial
+        request already taken - no network, no health requirement
+        """
+        url = self.register(url)
+        with self._lock:
+            return self._allow(self.servers[url])
+
+    def is_available(self, url: str, refresh_stale: bool = True) -> bool:
+        """
+        Should a request go to this server right now?
+
+        Answers from the cache; only probes inline when the entry is older
+        than the TTL (e.g. the background thread isn't running) and
+        refresh_stale is True.
+        """
+        url = self.register(url)
+        with self._lock:
+            entry = self.servers[url]
+            # The probe below is the half-open test, so don't take the trial request
+            if not self._allow(entry, trial=False):
+                return False
+            stale = time.time() - entry['checked_at'] > self.ttl
+            healthy = entry['healthy']
+
+        if stale and refresh_stale:
+            return self.probe(url)
+        return bool(healthy)
+
+    def status(self, url: str) -> Dict[str, Any]:
+        """Cached health/breaker state for one server"""
+        url = self.register(url)
+        with self._lock:
+            entry = dict(self.servers[url])
+        entry['age'] = time.time() - entry['checked_at'] if entry['checked_at'] else None
+        return entry
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Cached state for every registered server"""
+        return {url: self.status(url) for url in list(self.servers)}
+
+    def unprobed(self, urls: List[str]) -> List[str]:
+        """Registered URLs that have never been probed"""
+        return [url for url in urls if self.status(url)['healthy'] is None]
+
+
+_default_monitor: Optional[HealthMonitor] = None
+_default_lock = threading.Lock()
+
+
+def get_health_monitor(start: bool = True, **kwargs) -> HealthMonitor:
+    """
+    Process-wide monitor shared by every client. start=False leaves the
+    background thread to a later start() (e.g. the first real request)
+    """
+    global _default_monitor
+    with _default_lock:
+        if _default_monitor is None:
+            _default_monitor = HealthMonitor(**kwargs)
+        if start:
+            _default_monitor.start()
+        return _default_monitor
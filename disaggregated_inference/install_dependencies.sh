@@ -7,17 +7,17 @@ echo "=========================================="
 # DGX Spark 1
 echo ""
 echo "📡 Installing on DGX Spark 1 (169.254.150.103)..."
-ssh humphrjk@169.254.150.103 "pip install flask torch transformers accelerate"
+ssh humphrjk@169.254.150.103 "pip install aiohttp torch transformers accelerate"
 
 # DGX Spark 2
 echo ""
 echo "📡 Installing on DGX Spark 2 (169.254.150.104)..."
-ssh humphrjk@169.254.150.104 "pip install flask torch transformers accelerate"
+ssh humphrjk@169.254.150.104 "pip install aiohttp torch transformers accelerate"
 
 # Mac Studio 2
 echo ""
 echo "📡 Installing on Mac Studio 2 (169.254.150.102)..."
-ssh humphrjk@169.254.150.102 "pip install flask mlx mlx-lm"
+ssh humphrjk@169.254.150.102 "pip install aiohttp mlx mlx-lm"
 
 echo ""
 echo "=========================================="
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Metrics agent for the model servers
+Runs next to a model server, samples CPU, memory, tokens/sec and active
+requests locally every second and pushes the samples in compact batches to
+the metrics collector (metrics_collector.py) that the dashboards read.
+Replaces SSH-ing into each Mac for `top`/`powermetrics` on every refresh.
+
+Sidecar next to a server:
+    python disaggregated_inference/metrics_agent.py --name "Mac Studio 2 (Qwen)" \\
+        --server http://127.0.0.1:5002 --collector http://10.55.0.100:5100
+
+Local stand-in agent (no model server) for testing the dashboards:
+    python disaggregated_inference/metrics_agent.py --name "Local" --collector http://127.0.0.1:5100
+"""
+
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTOR_URL = os.environ.get('METRICS_COLLECTOR_URL', 'http://127.0.0.1:5100')
+
+# Column order of every pushed sample row
+SAMPLE_FIELDS = (
+    'ts', 'cpu_user', 'cpu_system', 'cpu_idle',
+    'mem_used_gb', 'mem_total_gb', 'gpu_active_percent', 'power_watts',
+    'thermal_pressure', 'active_users', 'tokens_per_sec', 'active_requests', 'server_up'
+)
+
+GB = 1024 ** 3
+
+
+class GenerationCounter:
+    """
+    In-process request/token counters a model server updates around each
+    generation and reports on /health, so the agent can derive tokens/sec
+    and active requests without parsing logs
+    """
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self.active_requests = 0
+        self.tokens_generated = 0
+        self._recent = deque()  # (finished_at, tokens)
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.active_requests += 1
+
+    def finished(self, generated_tokens: int = 0):
+        with self._lock:
+            self.active_requests = max(0, self.active_requests - 1)
+            self.tokens_generated += generated_tokens
+            self._recent.append((time.time(), generated_tokens))
+
+    def tokens_per_second(self) -> float:
+        """Generated tokens per second over the last window seconds"""
+        cutoff = time.time() - self.window
+        with self._lock:
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            return sum(tokens for _, tokens in self._recent) / self.window
+
+    def stats(self) -> Dict[str, Any]:
+        """Fields merged into a server's /health response"""
+        return {
+            'active_requests': self.active_requests,
+            'tokens_generated': self.tokens_generated,
+            'tokens_per_second': round(self.tokens_per_second(), 2)
+        }
+
+
+class SystemSampler:
+    """
+    Local CPU/memory readings: psutil when installed, otherwise /proc on
+    Linux or `top -l 1` on macOS. GPU/power/thermal come from powermetrics
+    only when enabled (it needs passwordless sudo on the Mac).
+    """
+
+    def __init__(self, powermetrics: bool = False):
+        self.powermetrics = powermetrics and sys.platform == 'darwin'
+        self._last_cpu = None  # /proc/stat (user, system, idle, total)
+        if psutil is not None:
+            psutil.cpu_times_percent(interval=None)  # prime the first delta
+
+    def cpu_memory(self) -> Dict[str, float]:
+        if psutil is not None:
+            cpu = psutil.cpu_times_percent(interval=None)
+            mem = psutil.virtual_memory()
+            return {
+                'cpu_user': cpu.user, 'cpu_system': cpu.system, 'cpu_idle': cpu.idle,
+                'mem_used_gb': (mem.total - mem.available) / GB, 'mem_total_gb': mem.total / GB
+            }
+        if os.path.exists('/proc/stat'):
+            return {**self._proc_cpu(), **self._proc_memory()}
+        return self._top()
+
+    def _proc_cpu(self) -> Dict[str, float]:
+        with open('/proc/stat') as f:
+            values = [int(v) for v in f.readline().split()[1:]]
+        user, system, idle = values[0] + values[1], values[2], values[3] + values[4]
+        total = sum(values[:8])
+        last, self._last_cpu = self._last_cpu, (user, system, idle, total)
+        if last is None or total == last[3]:
+            return {'cpu_user': 0.0, 'cpu_system': 0.0, 'cpu_idle': 100.0}
+        elapsed = total - last[3]
+        return {
+            'cpu_user': 100.0 * (user - last[0]) / elapsed,
+            'cpu_system': 100.0 * (system - last[1]) / elapsed,
+            'cpu_idle': 100.0 * (idle - last[2]) / elapsed
+        }
+
+    def _proc_memory(self) -> Dict[str, float]:
+        meminfo = {}
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0]) * 1024
+        total = meminfo.get('MemTotal', 0)
+        available = meminfo.get('MemAvailable', meminfo.get('MemFree', 0))
+        return {'mem_used_gb': (total - available) / GB, 'mem_total_gb': total / GB}
+
+    def _top(self) -> Dict[str, float]:
+        stats = {'cpu_user': 0.0, 'cpu_system': 0.0, 'cpu_idle': 100.0, 'mem_used_gb': 0.0, 'mem_total_gb': 0.0}
+        result = subprocess.run(['top', '-l', '1', '-n', '0'], capture_output=True, text=True, timeout=10)
+        for line in result.stdout.split('\n'):
+            if 'CPU usage' in line:
+                parts = line.split()
+                if len(parts) >= 7:
+                    stats['cpu_user'] = float(parts[2].rstrip('%'))
+                    stats['cpu_system'] = float(parts[4].rstrip('%'))
+                    stats['cpu_idle'] = float(parts[6].rstrip('%'))
+            elif 'PhysMem' in line:
+                parts = line.split()
+                if len(parts) >= 6:
+                    stats['mem_used_gb'] = _parse_memory(parts[1])
+                    stats['mem_total_gb'] = stats['mem_used_gb'] + _parse_memory(parts[5])
+        return stats
+
+    def power(self) -> Dict[str, Any]:
+        """GPU active %, watts and thermal pressure from one powermetrics sample"""
+        stats = {'gpu_active_percent': 0.0, 'power_watts': 0.0, 'thermal_pressure': 'Unknown'}
+        if not self.powermetrics:
+            return stats
+        result = subprocess.run(
+            ['sudo', '-n', 'powermetrics', '-i', '200', '-n', '1', '--samplers', 'gpu_power,cpu_power,thermal'],
+            capture_output=True, text=True, timeout=10
+        )
+        for line in result.stdout.split('\n'):
+            if ':' not in line:
+                continue
+            label, value = line.split(':', 1)
+            value = value.strip()
+            try:
+                if 'GPU HW active residency' in label:
+                    stats['gpu_active_percent'] = float(value.split('%')[0])
+                elif 'pressure level' in label.lower():
+                    stats['thermal_pressure'] = value
+                elif 'Combined Power' in label and 'mW' in value:
+                    stats['power_watts'] = float(value.split()[0]) / 1000.0
+            except ValueError:
+                pass
+        return stats
+
+    def active_users(self) -> int:
+        if psutil is not None:
+            return len(psutil.users())
+        try:
+            result = subprocess.run(['who'], capture_output=True, text=True, timeout=5)
+            return len(result.stdout.strip().splitlines())
+        except (OSError, subprocess.SubprocessError):
+            return 0
+
+
+def _parse_memory(mem_str: str) -> float:
+    """top's '123G' / '512M' / '3376K' in GB"""
+    units = {'G': 1.0, 'M': 1 / 1024.0, 'K': 1 / (1024.0 * 1024.0)}
+    match = re.match(r'([\d.]+)([GMK])', mem_str)
+    return float(match.group(1)) * units[match.group(2)] if match else 0.0
+
+
+class MetricsAgent:
+    """Samples locally on an interval and pushes batches to the collector from a daemon thread"""
+
+    def __init__(self, name: str, collector_url: str = DEFAULT_COLLECTOR_URL,
+                 server_url: Optional[str] = None, counter: Optional[GenerationCounter] = None,
+                 interval: float = 1.0, push_interval: float = 5.0, slow_every: int = 10,
+                 powermetrics: bool = False, max_buffer: int = 600):
+        """
+        Args:
+            name: Host name shown on the dashboards
+            collector_url: Metrics collector base URL
+            server_url: Local model server to read /health from (sidecar mode)
+            counter: The server's GenerationCounter (agent started inside the server)
+            interval: Seconds between samples
+            push_interval: Seconds between pushes to the collector
+            slow_every: Take powermetrics/active-user readings every this many samples
+            powermetrics: Read GPU/power/thermal via `sudo -n powermetrics` (macOS)
+            max_buffer: Samples kept while the collector is unreachable
+        """
+        self.name = name
+        self.ip = _local_ip()
+        self.collector_url = collector_url.rstrip('/')
+        self.server_url = server_url.rstrip('/') if server_url else None
+        self.counter = counter
+        self.interval = interval
+        self.push_interval = push_interval
+        self.slow_every = max(1, slow_every)
+        self.sampler = SystemSampler(powermetrics=powermetrics)
+
+        self.pending = deque(maxlen=max_buffer)
+        self.pushed = 0
+        self.push_failures = 0
+        self._slow = {}
+        self._ticks = 0
+        self._last_tokens = None  # (time, tokens_generated) from the server's /health
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sample(self) -> List[Any]:
+        """One sample row in SAMPLE_FIELDS order"""
+        if self._ticks % self.slow_every == 0:
+            self._slow = {**self.sampler.power(), 'active_users': self.sampler.active_users()}
+        self._ticks += 1
+
+        stats = {'ts': round(time.time(), 3), **self.sampler.cpu_memory(), **self._slow, **self._server_stats()}
+        return [round(v, 2) if isinstance(v, float) else v for v in (stats.get(f, 0) for f in SAMPLE_FIELDS)]
+
+    def _server_stats(self) -> Dict[str, Any]:
+        if self.counter is not None:
+            return {
+                'tokens_per_sec': self.counter.tokens_per_second(),
+                'active_requests': self.counter.active_requests,
+                'server_up': True
+            }
+        if self.server_url is None:
+            return {'tokens_per_sec': 0.0, 'active_requests': 0, 'server_up': False}
+
+        try:
+            response = requests.get(f"{self.server_url}/health", timeout=2)
+            data = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError):
+            return {'tokens_per_sec': 0.0, 'active_requests': 0, 'server_up': False}
+
+        queue = data.get('queue', {})
+        active = data.get('active_requests', queue.get('in_flight', 0) + queue.get('queue_depth', 0))
+        return {
+            'tokens_per_sec': self._token_rate(data),
+            'active_requests': active,
+            'server_up': response.status_code == 200
+        }
+
+    def _token_rate(self, health: Dict) -> float:
+        """tokens/sec from the cumulative tokens_generated counter, else the server's own figure"""
+        if 'tokens_generated' not in health:
+            return float(health.get('tokens_per_second', 0.0))
+        now, tokens = time.time(), health['tokens_generated']
+        last, self._last_tokens = self._last_tokens, (now, tokens)
+        if last is None or now <= last[0] or tokens < last[1]:
+            return float(health.get('tokens_per_second', 0.0))
+        return (tokens - last[1]) / (now - last[0])
+
+    def push(self) -> bool:
+        """Send buffered samples; they stay buffered if the collector is unreachable"""
+        if not self.pending:
+            return True
+        batch = list(self.pending)
+        payload = {'host': self.name, 'ip': self.ip, 'fields': SAMPLE_FIELDS, 'samples': batch}
+        try:
+            response = requests.post(f"{self.collector_url}/samples", json=payload, timeout=3)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.push_failures += 1
+            logger.debug(f"Push to {self.collector_url} failed: {e}")
+            return False
+        for _ in batch:
+            self.pending.popleft()
+        self.pushed += len(batch)
+        return True
+
+    def start(self) -> 'MetricsAgent':
+        """Start sampling and pushing in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-agent', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and flush what's buffered"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        self.push()
+
+    def _run(self):
+        last_push = time.time()
+        while not self._stop.is_set():
+            try:
+                self.pending.append(self.sample())
+            except Exception as e:
+                logger.warning(f"Metrics sample failed: {e}")
+            if time.time() - last_push >= self.push_interval:
+                self.push()
+                last_push = time.time()
+            self._stop.wait(self.interval)
+
+
+def _local_ip() -> str:
+    """Address other machines reach this host on (no packets are sent)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('10.255.255.255', 1))
+            return s.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+
+
+def start_server_agent(name: str, counter: GenerationCounter) -> Optional[MetricsAgent]:
+    """Start an in-process agent for a model server when METRICS_COLLECTOR_URL is set"""
+    collector_url = os.environ.get('METRICS_COLLECTOR_URL')
+    if not collector_url:
+        return None
+    return MetricsAgent(name, collector_url, counter=counter,
+                        powermetrics=os.environ.get('METRICS_POWERMETRICS') == '1').start()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Push local server metrics to the metrics collector')
+    parser.add_argument('--name', default=socket.gethostname(), help='Host name shown on the dashboards')
+    parser.add_argument('--collector', default=DEFAULT_COLLECTOR_URL, help='Metrics collector URL')
+    parser.add_argument('--server', default=None, help='Local model server URL to read /health from')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between samples')
+    parser.add_argument('--push-interval', type=float, default=5.0, help='Seconds between pushes')
+    parser.add_argument('--powermetrics', action='store_true', help='Sample GPU/power via sudo -n powermetrics')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    agent = MetricsAgent(args.name, args.collector, server_url=args.server, interval=args.interval,
+                         push_interval=args.push_interval, powermetrics=args.powermetrics)
+    print(f"📡 Metrics agent '{args.name}' ({agent.ip}) → {agent.collector_url}")
+    agent.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {agent.pushed} samples pushed, {len(agent.pending)} pending, {agent.push_failures} failed pushes")
+    except KeyboardInterrupt:
+        agent.stop()
+        print("\n✅ Metrics agent stopped")
+
+
+if __name__ == '__main__':
+    main()
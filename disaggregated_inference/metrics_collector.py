@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Metrics collector
+Receives the sample batches metrics agents push (metrics_agent.py), keeps
+the recent history per host in memory for the live view and appends every
+sample to the SQLite time series (metrics_store.py) for range queries and
+grading-run comparisons. monitor_app.py and PerformanceLogger read it
+through CollectorClient instead of SSH-ing into each Mac, so a dashboard
+refresh is one local HTTP call whatever the number of hosts.
+
+    python disaggregated_inference/metrics_collector.py --port 5100
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import requests
+from flask import Flask, jsonify, request
+
+from disaggregated_inference.metrics_store import DEFAULT_STORE_PATH, MetricsStore
+
+DEFAULT_COLLECTOR_URL = os.environ.get('METRICS_COLLECTOR_URL', 'http://127.0.0.1:5100')
+
+
+class MetricsCollector:
+    """Per-host ring buffers of agent samples"""
+
+    def __init__(self, max_samples: int = 3600, stale_after: float = 15.0, store: Optional[MetricsStore] = None):
+        """
+        Args:
+            max_samples: Samples kept per host (an hour at the agent's 1s interval)
+            stale_after: Seconds without a push before a host's server counts as down
+            store: Time series every sample is also appended to
+        """
+        self.max_samples = max_samples
+        self.stale_after = stale_after
+        self.store = store
+        self.hosts = {}  # name -> {'ip', 'received_at', 'samples': deque of dicts}
+        self._lock = threading.Lock()
+
+    def ingest(self, payload: Dict[str, Any]) -> int:
+        """Store one pushed batch; returns the number of samples accepted"""
+        name = payload.get('host')
+        fields = payload.get('fields')
+        rows = payload.get('samples') or []
+        if not name or not fields:
+            raise ValueError("payload needs 'host' and 'fields'")
+
+        samples = [dict(zip(fields, row)) for row in rows if len(row) == len(fields)]
+        with self._lock:
+            host = self.hosts.setdefault(name, {'samples': deque(maxlen=self.max_samples)})
+            host['ip'] = payload.get('ip', '')
+            host['received_at'] = time.time()
+            host['samples'].extend(samples)
+        if self.store is not None:
+            self.store.append(name, samples)
+            self.store.maintain()
+        return len(samples)
+
+    def latest(self) -> Dict[str, Dict[str, Any]]:
+        """Newest sample per host, marked down if the agent has gone quiet"""
+        now = time.time()
+        with self._lock:
+            snapshot = {}
+            for name, host in self.hosts.items():
+                if not host['samples']:
+                    continue
+                sample = dict(host['samples'][-1])
+                sample['ip'] = host['ip']
+                sample['age'] = round(now - host['received_at'], 1)
+                if sample['age'] > self.stale_after:
+                    sample['server_up'] = False
+                snapshot[name] = sample
+            return snapshot
+
+    def history(self, name: Optional[str] = None, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Samples (oldest first) for one host or all, optionally only the last seconds"""
+        cutoff = time.time() - seconds if seconds else None
+        with self._lock:
+            names = [name] if name else list(self.hosts)
+            rows = []
+            for host_name in names:
+                host = self.hosts.get(host_name)
+                if host is None:
+                    continue
+                for sample in host['samples']:
+                    if cutoff is None or sample.get('ts', 0) >= cutoff:
+                        rows.append({'host': host_name, **sample})
+        rows.sort(key=lambda row: row.get('ts', 0))
+        return rows
+
+
+def create_collector_app(collector: MetricsCollector) -> Flask:
+    app = Flask(__name__)
+
+    @app.route('/samples', methods=['POST'])
+    def receive_samples():
+        try:
+            accepted = collector.ingest(request.get_json(force=True, silent=True) or {})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'accepted': accepted})
+
+    @app.route('/latest', methods=['GET'])
+    def latest():
+        return jsonify(collector.latest())
+
+    @app.route('/history', methods=['GET'])
+    def history():
+        host = request.args.get('host')
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        # Live view from memory; explicit ranges from the time series
+        if collector.store is not None and start is not None:
+            return jsonify(collector.store.query(host, start, end))
+        return jsonify(collector.history(host, request.args.get('seconds', type=float)))
+
+    @app.route('/runs', methods=['GET'])
+    def runs():
+        if collector.store is None:
+            return jsonify([])
+        runs = collector.store.runs(request.args.get('limit', 50, type=int))
+        if request.args.get('summary'):
+            for run in runs:
+                run['hosts'] = collector.store.run_summary(run['tag'])
+        return jsonify(runs)
+
+    @app.route('/runs/start', methods=['POST'])
+    def start_run():
+        data = request.get_json(force=True, silent=True) or {}
+        if collector.store is None or not data.get('tag'):
+            return jsonify({'error': 'no store or no tag'}), 400
+        collector.store.start_run(data['tag'], data.get('assignment'), data.get('notes'))
+        return jsonify({'tag': data['tag']})
+
+    @app.route('/runs/end', methods=['POST'])
+    def end_run():
+        data = request.get_json(force=True, silent=True) or {}
+        if collector.store is None or not data.get('tag'):
+            return jsonify({'error': 'no store or no tag'}), 400
+        collector.store.end_run(data['tag'], data.get('submissions'))
+        return jsonify({'tag': data['tag']})
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'healthy', 'hosts': sorted(collector.hosts)})
+
+    return app
+
+
+class CollectorClient:
+    """What the dashboards use to read the collector; empty results when it's unreachable"""
+
+    def __init__(self, url: str = DEFAULT_COLLECTOR_URL, timeout: float = 3.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.error = None
+
+    def _get(self, path: str, params: Dict = None, default=None):
+        try:
+            response = requests.get(f"{self.url}{path}", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            self.error = None
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.error = str(e)
+            return default
+
+    def latest(self) -> Dict[str, Dict[str, Any]]:
+        return self._get('/latest', default={})
+
+    def _post(self, path: str, payload: Dict) -> bool:
+        try:
+            response = requests.post(f"{self.url}{path}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            self.error = None
+            return True
+        except requests.RequestException as e:
+            self.error = str(e)
+            return False
+
+    def history(self, host: Optional[str] = None, seconds: Optional[float] = None,
+                start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Live samples from the last seconds, or stored samples between start and end"""
+        params = {k: v for k, v in (('host', host), ('seconds', seconds), ('start', start), ('end', end)) if v}
+        return self._get('/history', params, default=[])
+
+    def runs(self, limit: int = 50, summary: bool = False) -> List[Dict[str, Any]]:
+        params = {'limit': limit, **({'summary': 1} if summary else {})}
+        return self._get('/runs', params, default=[])
+
+    def start_run(self, tag: str, assignment: str = None, notes: str = None) -> bool:
+        """Tag the samples from now on as a grading run"""
+        return self._post('/runs/start', {'tag': tag, 'assignment': assignment, 'notes': notes})
+
+    def end_run(self, tag: str, submissions: int = None) -> bool:
+        return self._post('/runs/end', {'tag': tag, 'submissions': submissions})
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Collect metrics pushed by the model server agents')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=5100, help='Port to listen on')
+    parser.add_argument('--max-samples', type=int, default=3600, help='Samples kept per host in memory')
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH, help='SQLite time series path')
+    args = parser.parse_args()
+
+    collector = MetricsCollector(max_samples=args.max_samples, store=MetricsStore(args.store))
+    print(f"📥 Metrics collector listening on {args.host}:{args.port} (history in {args.store})")
+    create_collector_app(collector).run(host=args.host, port=args.port, debug=False, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
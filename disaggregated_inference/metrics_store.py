@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Metrics store
+Append-only SQLite time series behind the metrics collector. Raw agent
+samples are rolled up into 1-minute and 1-hour averages and each tier is
+dropped after its retention, so weeks of history stay small and a range
+query reads the finest tier that still covers it. Grading runs are
+recorded with their time span so throughput can be compared run by run.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_STORE_PATH = "performance_logs/metrics.db"
+
+# (bucket seconds, retention seconds); bucket 0 is the raw samples
+TIERS = (
+    (0, 2 * 86400),
+    (60, 30 * 86400),
+    (3600, 365 * 86400),
+)
+
+# Averaged when rolling up (weighted by each row's sample count)
+NUMERIC_FIELDS = (
+    'cpu_user', 'cpu_system', 'cpu_idle', 'mem_used_gb', 'mem_total_gb',
+    'gpu_active_percent', 'power_watts', 'active_users', 'tokens_per_sec',
+    'active_requests', 'server_up'
+)
+
+MAINTENANCE_INTERVAL = 60.0
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS samples (
+    host TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    n INTEGER NOT NULL DEFAULT 1,
+    {', '.join(f'{field} REAL' for field in NUMERIC_FIELDS)},
+    tokens_per_sec_max REAL,
+    thermal_pressure TEXT,
+    PRIMARY KEY (host, resolution, ts)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_samples_resolution_ts ON samples (resolution, ts);
+
+CREATE TABLE IF NOT EXISTS runs (
+    tag TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    assignment TEXT,
+    submissions INTEGER,
+    notes TEXT
+);
+"""
+
+
+class MetricsStore:
+    """SQLite time series with downsampling tiers and grading-run tags"""
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH, tiers: Tuple = TIERS):
+        self.db_path = db_path
+        self.tiers = tiers
+        self.last_maintenance = 0.0
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def append(self, host: str, samples: Iterable[Dict[str, Any]]) -> int:
+        """Store raw samples; a re-pushed sample (same host and ts) is ignored"""
+        columns = ('host', 'resolution', 'ts', 'n') + NUMERIC_FIELDS + ('tokens_per_sec_max', 'thermal_pressure')
+        rows = [
+            (host, 0, sample['ts'], 1)
+            + tuple(_number(sample.get(field)) for field in NUMERIC_FIELDS)
+            + (_number(sample.get('tokens_per_sec')), sample.get('thermal_pressure'))
+            for sample in samples if sample.get('ts') is not None
+        ]
+        with self._connect() as conn:
+            cursor = conn.executemany(
+                f"INSERT OR IGNORE INTO samples ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+        return cursor.rowcount
+
+    def maintain(self, now: Optional[float] = None, force: bool = False):
+        """Roll up complete buckets and drop rows past retention (at most once a minute)"""
+        now = now or time.time()
+        if not force and now - self.last_maintenance < MAINTENANCE_INTERVAL:
+            return
+        self.last_maintenance = now
+        with self._connect() as conn:
+            for (source, _), (bucket, _) in zip(self.tiers, self.tiers[1:]):
+                self._roll_up(conn, source, bucket, now)
+            for bucket, retention in self.tiers:
+                conn.execute("DELETE FROM samples WHERE resolution = ? AND ts < ?", (bucket, now - retention))
+
+    def _roll_up(self, conn: sqlite3.Connection, source: int, bucket: int, now: float):
+        """Average source rows into bucket-sized rows for every bucket that has closed since the last roll-up"""
+        averages = ', '.join(f"SUM({field} * n) / SUM(n)" for field in NUMERIC_FIELDS)
+        bucket_start = f"CAST(ts / {bucket} AS INTEGER) * {bucket}"
+        hosts = [row[0] for row in conn.execute("SELECT DISTINCT host FROM samples WHERE resolution = ?", (source,))]
+        for host in hosts:
+            rolled_up_to = conn.execute(
+                "SELECT MAX(ts) FROM samples WHERE host = ? AND resolution = ?", (host, bucket)
+            ).fetchone()[0]
+            conn.execute(f"""
+                INSERT OR IGNORE INTO samples (host, resolution, ts, n, {', '.join(NUMERIC_FIELDS)},
+                                               tokens_per_sec_max, thermal_pressure)
+                SELECT host, ?, {bucket_start}, SUM(n), {averages},
+                       MAX(tokens_per_sec_max), MAX(thermal_pressure)
+                FROM samples
+                WHERE host = ? AND resolution = ? AND ts >= ? AND {bucket_start} + ? <= ?
+                GROUP BY {bucket_start}
+            """, (bucket, host, source, rolled_up_to + bucket if rolled_up_to is not None else 0, bucket, now))
+
+    def resolution_for(self, start: float, end: float, max_points: int = 2000,
+                       now: Optional[float] = None) -> int:
+        """Finest tier that still holds start and gives at most max_points per host"""
+        now = now or time.time()
+        for bucket, retention in self.tiers:
+            if start >= now - retention and (end - start) / max(bucket, 1) <= max_points:
+                return bucket
+        return self.tiers[-1][0]
+
+    def query(self, host: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None,
+              resolution: Optional[int] = None, max_points: int = 2000) -> List[Dict[str, Any]]:
+        """Rows between start and end (oldest first) for one host or all"""
+        end = end or time.time()
+        start = start if start is not None else end - 3600
+        if resolution is None:
+            resolution = self.resolution_for(start, end, max_points)
+
+        sql = "SELECT * FROM samples WHERE resolution = ? AND ts >= ? AND ts <= ?"
+        params = [resolution, start, end]
+        if host:
+            sql += " AND host = ?"
+            params.append(host)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql + " ORDER BY ts", params)]
+
+    def hosts(self) -> List[str]:
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT host FROM samples ORDER BY host")]
+
+    def start_run(self, tag: str, assignment: str = None, notes: str = None, started_at: float = None):
+        """Mark the start of a grading run"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (tag, started_at, assignment, notes) VALUES (?, ?, ?, ?)",
+                (tag, started_at or time.time(), assignment, notes)
+            )
+
+    def end_run(self, tag: str, submissions: int = None, ended_at: float = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET ended_at = ?, submissions = ? WHERE tag = ?",
+                (ended_at or time.time(), submissions, tag)
+            )
+
+    def runs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent grading runs first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))
+            return [dict(row) for row in rows]
+
+    def run_summary(self, tag: str) -> Dict[str, Dict[str, Any]]:
+        """Per-host averages over a run's time span, from the finest tier that covers it"""
+        with self._connect() as conn:
+            run = conn.execute("SELECT * FROM runs WHERE tag = ?", (tag,)).fetchone()
+        if run is None:
+            return {}
+        start, end = run['started_at'], run['ended_at'] or time.time()
+        resolution = self.resolution_for(start, end, max_points=10 ** 9)
+        with self._connect() as conn:
+            rows = conn.execute(f"""
+                SELECT host, SUM(n) AS samples,
+                       SUM(tokens_per_sec * n) / SUM(n) AS tokens_per_sec,
+                       MAX(tokens_per_sec_max) AS tokens_per_sec_max,
+                       SUM(cpu_user * n) / SUM(n) AS cpu_user,
+                       MAX(mem_used_gb) AS mem_used_gb_max
+                FROM samples WHERE resolution = ? AND ts >= ? AND ts <= ?
+                GROUP BY host
+            """, (resolution, start, end))
+            return {row['host']: dict(row) for row in rows}
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    return value if isinstance(value, (int, float)) else None
@@ -6,13 +6,162 @@ Coordinates prefill (DGX) and decode (Mac) for optimal performance
 import requests
 import time
 import logging
-from typing import Dict, List, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 import asyncio
 import aiohttp
 
+try:
+    from health_monitor import get_health_monitor
+except ImportError:  # Imported as disaggregated_inference.orchestrator
+    from disaggregated_inference.health_monitor import get_health_monitor
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Request priorities - interactive (single-student) grading jumps ahead of bulk jobs
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a model's queue is full - callers should back off and retry"""
+
+
+def server_id(server: Dict) -> str:
+    return f"{server['host']}:{server['port']}"
+
+
+def server_url(server: Dict) -> str:
+    return f"http://{server['host']}:{server['port']}"
+
+
+class RequestScheduler:
+    """
+    Admission control in front of the prefill/decode servers
+
+    Each (stage, model) pair has its own FIFO queue with an interactive lane
+    that is always served before the bulk lane. A request only gets a server
+    when that server is below its concurrency limit, so a batch of prompts
+    waits here instead of landing on one prefill box at once.
+    """
+    
+    def __init__(self, default_concurrency: int = 1, max_pending: int = 64,
+                 max_pending_interactive: int = 8):
+        """
+        Args:
+            default_concurrency: In-flight requests per server unless the
+                                 server config sets 'max_concurrency'
+            max_pending: Bulk requests allowed to wait per (stage, model)
+            max_pending_interactive: Interactive requests allowed to wait per
+                                     (stage, model), counted separately so bulk
+                                     jobs can't lock out a single-student grade
+        """
+        self.default_concurrency = default_concurrency
+        self.max_pending = {
+            PRIORITY_INTERACTIVE: max_pending_interactive,
+            PRIORITY_BULK: max_pending
+        }
+        self.in_flight = {}   # server_id -> active requests
+        self.queues = {}      # (stage, model) -> {priority: deque of (future, servers)}
+        self.rejected = 0
+    
+    def _lanes(self, stage: str, model: str) -> Dict[str, deque]:
+        key = (stage, model)
+        if key not in self.queues:
+            self.queues[key] = {priority: deque() for priority in PRIORITIES}
+        return self.queues[key]
+    
+    def _limit(self, server: Dict) -> int:
+        return server.get('max_concurrency', self.default_concurrency)
+    
+    def _free_server(self, servers: List[Dict]) -> Optional[Dict]:
+        """Least-loaded server with a free slot, or None"""
+        free = [s for s in servers if self.in_flight.get(server_id(s), 0) < self._limit(s)]
+        if not free:
+            return None
+        return min(free, key=lambda s: self.in_flight.get(server_id(s), 0))
+    
+    def _take(self, server: Dict):
+        sid = server_id(server)
+        self.in_flight[sid] = self.in_flight.get(sid, 0) + 1
+    
+    def _dispatch(self, stage: str, model: str):
+        """Hand free servers to waiting requests, interactive lane first, FIFO within a lane"""
+        for priority in PRIORITIES:
+            lane = self._lanes(stage, model)[priority]
+            while lane:
+                future, servers = lane[0]
+                if future.done():
+                    lane.popleft()  # Caller gave up (cancelled/timed out)
+                    continue
+                server = self._free_server(servers)
+                if server is None:
+                    return  # Head of line waits; nothing behind it may overtake
+                lane.popleft()
+                self._take(server)
+                future.set_result(server)
+    
+    async def acquire(self, stage: str, model: str, servers: List[Dict],
+                      priority: str = PRIORITY_BULK) -> Dict:
+        """Wait for a slot on one of `servers` and return the chosen server"""
+        lanes = self._lanes(stage, model)
+        
+        # Only skip the queue if nobody of the same or higher priority is waiting
+        ahead = any(lanes[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        if not ahead:
+            server = self._free_server(servers)
+            if server is not None:
+                self._take(server)
+                return server
+        
+        if len(lanes[priority]) >= self.max_pending[priority]:
+            self.rejected += 1
+            raise SchedulerBusyError(
+                f"{stage} queue for {model} is full ({len(lanes[priority])} {priority} requests waiting)"
+            )
+        
+        future = asyncio.get_running_loop().create_future()
+        lanes[priority].append((future, servers))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # If the slot was granted just as we were cancelled, give it back
+            if future.done() and not future.cancelled():
+                self.release(stage, model, future.result())
+            raise
+    
+    def release(self, stage: str, model: str, server: Dict):
+        """Free a server slot and wake the next waiting request"""
+        sid = server_id(server)
+        self.in_flight[sid] = max(0, self.in_flight.get(sid, 0) - 1)
+        # A server can serve several queues (e.g. decode + fallback generate)
+        for queue_stage, queue_model in list(self.queues):
+            self._dispatch(queue_stage, queue_model)
+    
+    @asynccontextmanager
+    async def slot(self, stage: str, model: str, servers: List[Dict],
+                   priority: str = PRIORITY_BULK):
+        """async with scheduler.slot('prefill', 'qwen', servers) as server: ..."""
+        server = await self.acquire(stage, model, servers, priority)
+        try:
+            yield server
+        finally:
+            self.release(stage, model, server)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depths per (stage, model) and in-flight requests per server"""
+        return {
+            'queues': {
+                f"{stage}/{model}": {p: len(lanes[p]) for p in PRIORITIES}
+                for (stage, model), lanes in self.queues.items()
+            },
+            'in_flight': dict(self.in_flight),
+            'rejected': self.rejected
+        }
+
 
 class DisaggregatedInference:
     """Orchestrates prefill on DGX and decode on Mac"""
@@ -28,12 +177,29 @@ class DisaggregatedInference:
             'decode_servers': [
                 {'host': '169.254.150.101', 'port': 8001, 'model': 'qwen'},
                 {'host': '169.254.150.102', 'port': 8001, 'model': 'gpt-oss'}
-            ]
+            ],
+            'scheduler': {                  # optional
+                'default_concurrency': 1,   # per server, override with 'max_concurrency'
+                'max_pending': 64,          # bulk requests waiting per model
+                'max_pending_interactive': 8
+            },
+            'health': {                     # optional, first orchestrator/client wins
+                'interval': 10.0,           # background probe interval (s)
+                'ttl': 30.0,
+                'failure_threshold': 3,     # request failures before skipping a server
+                'reset_timeout': 30.0
+            }
         }
         """
         self.prefill_servers = config['prefill_servers']
         self.decode_servers = config['decode_servers']
         self.server_status = {}
+        self.scheduler = RequestScheduler(**config.get('scheduler', {}))
+        
+        # Shared background health monitor - status lookups never hit the network
+        self.health = get_health_monitor(**config.get('health', {}))
+        for server in self.prefill_servers + self.decode_servers:
+            self.health.register(server_url(server))
     
     async def check_server_health(self, server: Dict) -> bool:
         """Check if a server is healthy"""
@@ -50,16 +216,36 @@ class DisaggregatedInference:
             return False
     
     async def update_server_status(self):
-        """Update status of all servers"""
-        tasks = []
-        for server in self.prefill_servers + self.decode_servers:
-            tasks.append(self.check_server_health(server))
+        """Update status of all servers from the health monitor's cache"""
+        servers = self.prefill_servers + self.decode_servers
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Only probe inline on first use, before the background thread has a result
+        unprobed = self.health.unprobed([server_url(server) for server in servers])
+        if unprobed:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(None, self.health.probe, url) for url in unprobed])
         
-        for i, server in enumerate(self.prefill_servers + self.decode_servers):
-            server_id = f"{server['host']}:{server['port']}"
-            self.server_status[server_id] = results[i] if not isinstance(results[i], Exception) else False
+        for server in servers:
+            # Open circuit breakers report False here, so failing servers are skipped
+            self.server_status[server_id(server)] = self.health.is_available(
+                server_url(server), refresh_stale=False
+            )
+    
+    def _record_result(self, server: Dict, status: Optional[int] = None, error: str = None):
+        """Feed request outcomes into the circuit breaker"""
+        if status == 200:
+            self.health.record_success(server_url(server))
+        elif status == 503:
+            pass  # Queue full on the server - backpressure, not a failure
+        else:
+            self.health.record_failure(server_url(server), error or f"HTTP {status}")
+    
+    def get_available_servers(self, servers: List[Dict], model_type: str) -> List[Dict]:
+        """All healthy servers for a model type"""
+        return [
+            server for server in servers
+            if server['model'] == model_type and self.server_status.get(server_id(server), False)
+        ]
     
     def get_best_server(self, servers: List[Dict], model_type: str) -> Optional[Dict]:
         """Get the best available server for a model type"""
@@ -78,6 +264,7 @@ class DisaggregatedInference:
             
             async with aiohttp.ClientSession() as session:
                 async with session.post(url, json=data, timeout=30) as response:
+                    self._record_result(server, response.status)
                     if response.status == 200:
                         return await response.json()
                     else:
@@ -85,6 +272,7 @@ class DisaggregatedInference:
                         return None
         except Exception as e:
             logger.error(f"Prefill request failed: {e}")
+            self._record_result(server, error=str(e))
             return None
     
     async def decode_request(self, server: Dict, prefill_result: Dict, max_tokens: int = 100) -> Optional[Dict]:
@@ -93,6 +281,7 @@ class DisaggregatedInference:
             url = f"http://{server['host']}:{server['port']}/decode"
             data = {
                 'kv_cache': prefill_result.get('kv_cache'),
+                'kv_format': prefill_result.get('kv_format'),
                 'input_ids': prefill_result.get('input_ids'),
                 'max_new_tokens': max_tokens,
                 'prompt': prefill_result.get('original_prompt', '')  # Fallback for MLX
@@ -100,6 +289,7 @@ class DisaggregatedInference:
             
             async with aiohttp.ClientSession() as session:
                 async with session.post(url, json=data, timeout=60) as response:
+                    self._record_result(server, response.status)
                     if response.status == 200:
                         return await response.json()
                     else:
@@ -107,9 +297,42 @@ class DisaggregatedInference:
                         return None
         except Exception as e:
             logger.error(f"Decode request failed: {e}")
+            self._record_result(server, error=str(e))
+            return None
+    
+    async def generate_request(self, server: Dict, prompt: str, max_tokens: int = 100) -> Optional[Dict]:
+        """Send a full (prefill + decode) generation request to a Mac"""
+        try:
+            url = f"http://{server['host']}:{server['port']}/generate"
+            data = {
+                'prompt': prompt,
+                'max_tokens': max_tokens
+            }
+            
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json=data, timeout=60) as response:
+                    self._record_result(server, response.status)
+                    if response.status == 200:
+                        return await response.json()
+                    else:
+                        logger.error(f"Fallback generation failed: {response.status}")
+                        return None
+        except Exception as e:
+            logger.error(f"Fallback generation failed: {e}")
+            self._record_result(server, error=str(e))
             return None
     
-    async def generate(self, prompt: str, model_type: str = 'qwen', max_tokens: int = 100) -> Dict:
+    def _rejected(self, error: SchedulerBusyError) -> Dict:
+        """Backpressure result - the caller should wait and resubmit"""
+        logger.warning(f"⚠️ Request rejected: {error}")
+        return {
+            'error': str(error),
+            'method': 'rejected',
+            'queue': self.scheduler.stats()
+        }
+    
+    async def generate(self, prompt: str, model_type: str = 'qwen', max_tokens: int = 100,
+                       priority: str = PRIORITY_BULK) -> Dict:
         """
         Generate text using disaggregated inference
         
@@ -117,14 +340,17 @@ class DisaggregatedInference:
             prompt: Input text
             model_type: 'qwen' or 'gpt-oss'
             max_tokens: Maximum tokens to generate
+            priority: PRIORITY_INTERACTIVE for single-student grading,
+                      PRIORITY_BULK for batch jobs
             
         Returns:
             {
                 'response': 'generated text',
                 'prefill_time': 0.123,
                 'decode_time': 1.234,
+                'queue_time': 0.010,
                 'total_time': 1.357,
-                'method': 'disaggregated' or 'fallback'
+                'method': 'disaggregated', 'mac_fallback', 'rejected' or 'failed'
             }
         """
         start_time = time.time()
@@ -132,28 +358,37 @@ class DisaggregatedInference:
         # Update server status
         await self.update_server_status()
         
-        # Get best servers
-        prefill_server = self.get_best_server(self.prefill_servers, model_type)
-        decode_server = self.get_best_server(self.decode_servers, model_type)
+        prefill_servers = self.get_available_servers(self.prefill_servers, model_type)
+        decode_servers = self.get_available_servers(self.decode_servers, model_type)
         
-        if not prefill_server or not decode_server:
+        if not prefill_servers or not decode_servers:
             logger.warning("Servers not available, trying fallback...")
-            return await self.fallback_generate(prompt, model_type, max_tokens)
-        
-        logger.info(f"Using prefill: {prefill_server['host']} decode: {decode_server['host']}")
+            return await self.fallback_generate(prompt, model_type, max_tokens, priority)
         
-        # Step 1: Prefill on DGX
-        prefill_result = await self.prefill_request(prefill_server, prompt)
-        if not prefill_result:
-            logger.warning("Prefill failed, trying fallback...")
-            return await self.fallback_generate(prompt, model_type, max_tokens)
+        try:
+            # Step 1: Prefill on DGX (waits for a free prefill slot)
+            async with self.scheduler.slot('prefill', model_type, prefill_servers, priority) as prefill_server:
+                queue_time = time.time() - start_time
+                logger.info(f"Using prefill: {prefill_server['host']} (queued {queue_time:.3f}s)")
+                prefill_result = await self.prefill_request(prefill_server, prompt)
+            
+            if not prefill_result:
+                logger.warning("Prefill failed, trying fallback...")
+                return await self.fallback_generate(prompt, model_type, max_tokens, priority)
+            
+            # Step 2: Decode on Mac (waits for a free decode slot)
+            prefill_result['original_prompt'] = prompt  # For MLX fallback
+            decode_wait = time.time()
+            async with self.scheduler.slot('decode', model_type, decode_servers, priority) as decode_server:
+                queue_time += time.time() - decode_wait
+                logger.info(f"Using decode: {decode_server['host']}")
+                decode_result = await self.decode_request(decode_server, prefill_result, max_tokens)
+        except SchedulerBusyError as e:
+            return self._rejected(e)
         
-        # Step 2: Decode on Mac
-        prefill_result['original_prompt'] = prompt  # For MLX fallback
-        decode_result = await self.decode_request(decode_server, prefill_result, max_tokens)
         if not decode_result:
             logger.warning("Decode failed, trying fallback...")
-            return await self.fallback_generate(prompt, model_type, max_tokens)
+            return await self.fallback_generate(prompt, model_type, max_tokens, priority)
         
         total_time = time.time() - start_time
         
@@ -161,42 +396,46 @@ class DisaggregatedInference:
             'response': decode_result.get('generated_text', ''),
             'prefill_time': prefill_result.get('prefill_time', 0),
             'decode_time': decode_result.get('decode_time', 0),
+            'queue_time': queue_time,
             'total_time': total_time,
             'method': 'disaggregated',
             'prefill_server': f"{prefill_server['host']}:{prefill_server['port']}",
             'decode_server': f"{decode_server['host']}:{decode_server['port']}",
-            'tokens_per_sec': decode_result.get('tokens_per_sec', 0)
+            'tokens_per_sec': decode_result.get('tokens_per_sec', 0),
+            'kv_cache_used': decode_result.get('kv_cache_used', False),
+            # Exact counts from the servers: 'usage' is what the decode side did
+            # (cached_tokens came from the transferred KV cache), 'prefill_usage'
+            # is the DGX forward pass
+            'usage': decode_result.get('usage', {}),
+            'prefill_usage': prefill_result.get('usage', {})
         }
     
-    async def fallback_generate(self, prompt: str, model_type: str, max_tokens: int) -> Dict:
+    async def fallback_generate(self, prompt: str, model_type: str, max_tokens: int,
+                                priority: str = PRIORITY_BULK) -> Dict:
         """Fallback to Mac-only generation if disaggregated fails"""
-        decode_server = self.get_best_server(self.decode_servers, model_type)
+        decode_servers = self.get_available_servers(self.decode_servers, model_type)
         
-        if not decode_server:
+        if not decode_servers:
             return {
                 'error': 'No servers available',
                 'method': 'failed'
             }
         
         try:
-            url = f"http://{decode_server['host']}:{decode_server['port']}/generate"
-            data = {
-                'prompt': prompt,
-                'max_tokens': max_tokens
+            # Shares the decode servers' slots with disaggregated requests
+            async with self.scheduler.slot('decode', model_type, decode_servers, priority) as decode_server:
+                result = await self.generate_request(decode_server, prompt, max_tokens)
+        except SchedulerBusyError as e:
+            return self._rejected(e)
+        
+        if result:
+            return {
+                'response': result.get('response', ''),
+                'total_time': result.get('generation_time', 0),
+                'method': 'mac_fallback',
+                'server': server_id(decode_server),
+                'usage': result.get('usage', {})
             }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=data, timeout=60) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return {
-                            'response': result.get('response', ''),
-                            'total_time': result.get('generation_time', 0),
-                            'method': 'mac_fallback',
-                            'server': f"{decode_server['host']}:{decode_server['port']}"
-                        }
-        except Exception as e:
-            logger.error(f"Fallback generation failed: {e}")
         
         return {
             'error': 'All generation methods failed',
@@ -234,6 +473,10 @@ async def main():
     print(f"Total time: {result.get('total_time', 0):.3f}s")
     if 'tokens_per_sec' in result:
         print(f"Speed: {result['tokens_per_sec']:.1f} tok/s")
+    if result.get('usage'):
+        usage = result['usage']
+        print(f"Tokens: {usage.get('prompt_tokens', 0)} prompt "
+              f"({usage.get('cached_tokens', 0)} cached), {usage.get('generated_tokens', 0)} generated")
     print("="*60)
 
 
@@ -4,18 +4,24 @@ Prefill Server for DGX Spark
 Processes prompts and generates KV cache, sends to Mac for decode
 """
 
-from flask import Flask, request, jsonify
+from aiohttp import web
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
+import numpy as np
+import io
 import time
-import pickle
 import base64
 import logging
 
+from server_runtime import (
+    InferenceRuntime, QueueFullError, busy_response, read_json,
+    create_app, add_runtime_arguments, token_usage
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+routes = web.RouteTableDef()
 
 # Global model variables
 model = None
@@ -23,16 +29,22 @@ tokenizer = None
 model_loaded = False
 model_path = None
 
+# Model calls run here so health/status never wait on a prefill
+runtime = InferenceRuntime()
+
+# Wire format understood by decode_server_mac
+KV_FORMAT = 'npz-f16'
+
 def load_model(model_path_arg):
     """Load model for prefill"""
     global model, tokenizer, model_loaded, model_path
-    
+
     try:
         logger.info(f"🔄 Loading model from {model_path_arg}...")
         model_path = model_path_arg
-        
+
         tokenizer = AutoTokenizer.from_pretrained(model_path)
-        
+
         # Try to load with modelopt support for FP4 models
         try:
             import modelopt.torch.quantization as mtq
@@ -50,9 +62,9 @@ def load_model(model_path_arg):
                 device_map="auto",
                 trust_remote_code=True
             )
-        
+
         model.eval()
-        
+
         model_loaded = True
         logger.info("✅ Model loaded successfully!")
         return True
@@ -62,126 +74,149 @@ def load_model(model_path_arg):
         traceback.print_exc()
         return False
 
-@app.route('/health', methods=['GET'])
-def health_check():
+@routes.get('/health')
+async def health_check(request):
     """Health check endpoint"""
-    return jsonify({
+    return web.json_response({
         'status': 'healthy' if model_loaded else 'loading',
         'model': model_path,
         'loaded': model_loaded,
-        'device': str(next(model.parameters()).device) if model_loaded else None
+        'device': str(next(model.parameters()).device) if model_loaded else None,
+        'queue': runtime.stats()
     })
 
-@app.route('/prefill', methods=['POST'])
-def prefill():
+def _run_prefill(prompt):
+    """Blocking forward pass - runs on the model executor"""
+    start_time = time.time()
+
+    # Tokenize
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    input_ids = inputs['input_ids']
+
+    # Run prefill (forward pass to generate KV cache)
+    with torch.no_grad():
+        outputs = model(
+            input_ids=input_ids,
+            use_cache=True,
+            return_dict=True
+        )
+
+    # Extract KV cache
+    past_key_values = outputs.past_key_values
+
+    # Serialize KV cache as plain float16 arrays (k0, v0, k1, v1, ...)
+    # so the MLX decode side can load it without torch or pickle
+    kv_arrays = {}
+    for i, layer_cache in enumerate(past_key_values):
+        keys, values = layer_cache[0], layer_cache[1]
+        kv_arrays[f'k{i}'] = keys.to(torch.float16).cpu().numpy()
+        kv_arrays[f'v{i}'] = values.to(torch.float16).cpu().numpy()
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **kv_arrays)
+    kv_bytes = buffer.getvalue()
+    kv_base64 = base64.b64encode(kv_bytes).decode('utf-8')
+
+    prefill_time = time.time() - start_time
+
+    logger.info(f"✅ Prefill completed in {prefill_time:.3f}s")
+    logger.info(f"   Prompt tokens: {input_ids.shape[1]}")
+    logger.info(f"   KV cache size: {len(kv_bytes) / 1024 / 1024:.2f} MB")
+
+    return {
+        'kv_cache': kv_base64,
+        'kv_format': KV_FORMAT,
+        'num_layers': len(kv_arrays) // 2,
+        'input_ids': input_ids[0].tolist(),
+        'prefill_time': prefill_time,
+        'prompt_tokens': input_ids.shape[1],
+        'kv_cache_size_mb': len(kv_bytes) / 1024 / 1024,
+        'usage': token_usage(input_ids.shape[1], 0)
+    }
+
+@routes.post('/prefill')
+async def prefill(request):
     """
     Process prompt and return KV cache for decode
-    
+
     Request:
     {
         "prompt": "text to process",
         "max_new_tokens": 100
     }
-    
+
     Response:
     {
         "kv_cache": "base64 encoded cache",
+        "kv_format": "npz-f16",
+        "num_layers": 48,
         "input_ids": [token ids],
         "prefill_time": 0.123,
-        "prompt_tokens": 50
+        "prompt_tokens": 50,
+        "usage": {"prompt_tokens": 50, "prefill_tokens": 50,
+                  "generated_tokens": 0, "cached_tokens": 0}
     }
     """
-    global model, tokenizer, model_loaded
-    
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
     try:
-        data = request.json
+        data = await read_json(request)
         prompt = data.get('prompt', '')
-        
+
         if not prompt:
-            return jsonify({'error': 'No prompt provided'}), 400
-        
-        start_time = time.time()
-        
-        # Tokenize
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-        input_ids = inputs['input_ids']
-        
-        # Run prefill (forward pass to generate KV cache)
-        with torch.no_grad():
-            outputs = model(
-                input_ids=input_ids,
-                use_cache=True,
-                return_dict=True
-            )
-        
-        # Extract KV cache
-        past_key_values = outputs.past_key_values
-        
-        # Serialize KV cache
-        # Convert to CPU and serialize
-        kv_cache_cpu = []
-        for layer_cache in past_key_values:
-            layer_cpu = tuple(t.cpu() for t in layer_cache)
-            kv_cache_cpu.append(layer_cpu)
-        
-        # Pickle and base64 encode
-        kv_bytes = pickle.dumps(kv_cache_cpu)
-        kv_base64 = base64.b64encode(kv_bytes).decode('utf-8')
-        
-        prefill_time = time.time() - start_time
-        
-        logger.info(f"✅ Prefill completed in {prefill_time:.3f}s")
-        logger.info(f"   Prompt tokens: {input_ids.shape[1]}")
-        logger.info(f"   KV cache size: {len(kv_bytes) / 1024 / 1024:.2f} MB")
-        
-        return jsonify({
-            'kv_cache': kv_base64,
-            'input_ids': input_ids[0].tolist(),
-            'prefill_time': prefill_time,
-            'prompt_tokens': input_ids.shape[1],
-            'kv_cache_size_mb': len(kv_bytes) / 1024 / 1024
-        })
-        
+            return web.json_response({'error': 'No prompt provided'}, status=400)
+
+        result = await runtime.submit(_run_prefill, prompt)
+        return web.json_response(result)
+
+    except QueueFullError as e:
+        logger.warning(f"⚠️ Prefill rejected: {e}")
+        return busy_response(runtime, e)
     except Exception as e:
         logger.error(f"❌ Prefill failed: {e}")
-        return jsonify({'error': str(e)}), 500
+        return web.json_response({'error': str(e)}, status=500)
 
-@app.route('/status', methods=['GET'])
-def get_status():
+@routes.get('/status')
+async def get_status(request):
     """Get detailed server status"""
     if not model_loaded:
-        return jsonify({'error': 'Model not loaded'}), 503
-    
-    return jsonify({
+        return web.json_response({'error': 'Model not loaded'}, status=503)
+
+    return web.json_response({
         'server': 'DGX Prefill Server',
         'model': model_path,
         'loaded': model_loaded,
         'device': str(next(model.parameters()).device),
         'dtype': str(next(model.parameters()).dtype),
         'memory_allocated_gb': torch.cuda.memory_allocated() / 1e9 if torch.cuda.is_available() else 0,
-        'memory_reserved_gb': torch.cuda.memory_reserved() / 1e9 if torch.cuda.is_available() else 0
+        'memory_reserved_gb': torch.cuda.memory_reserved() / 1e9 if torch.cuda.is_available() else 0,
+        'queue': runtime.stats()
     })
 
 if __name__ == '__main__':
     import argparse
-    
+
     parser = argparse.ArgumentParser(description='DGX Prefill Server')
     parser.add_argument('--model', type=str, required=True, help='Path to model')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind')
     parser.add_argument('--port', type=int, default=8000, help='Port to bind')
-    
+    add_runtime_arguments(parser)
+
     args = parser.parse_args()
-    
+
+    runtime = InferenceRuntime(max_workers=args.workers, max_queue=args.max_queue)
+
     print("🖥️  Starting DGX Prefill Server...")
     print(f"📡 Model: {args.model}")
     print(f"🌐 Binding to: {args.host}:{args.port}")
+    print(f"📥 Queue: {args.workers} worker(s), max {args.max_queue} waiting")
     print()
-    
+
     if load_model(args.model):
-        print("🚀 Server ready! Starting Flask app...")
-        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+        print("🚀 Server ready! Starting async server...")
+        app = create_app(runtime)
+        app.add_routes(routes)
+        web.run_app(app, host=args.host, port=args.port)
     else:
         print("❌ Failed to start server - model loading failed")
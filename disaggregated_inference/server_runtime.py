@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Shared async runtime for the prefill/decode servers
+Runs model calls on a dedicated executor behind a bounded work queue so
+/health and /status stay responsive while a long decode is in progress
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the work queue is at capacity"""
+
+
+class InferenceRuntime:
+    """Bounded work queue in front of a dedicated model executor"""
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 16):
+        """
+        Args:
+            max_workers: Concurrent model calls (1 for MLX/torch models that
+                         are not safe to call from several threads)
+            max_queue: Requests allowed to wait for a worker before new
+                       requests are rejected with 503
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model')
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_time = 0.0
+        self.started_at = time.time()
+
+        # Created lazily so it binds to the server's event loop
+        self._slots = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._slots
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        """Queue a blocking model call and await its result on the executor"""
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Work queue full ({self.queue_depth}/{self.max_queue})")
+
+        self.queue_depth += 1
+        waiting = True
+        try:
+            async with self._get_slots():
+                self.queue_depth -= 1
+                waiting = False
+                self.in_flight += 1
+                start_time = time.time()
+                try:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        self.executor, functools.partial(fn, *args, **kwargs)
+                    )
+                    self.completed += 1
+                    return result
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    self.busy_time += time.time() - start_time
+        finally:
+            if waiting:
+                self.queue_depth -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and executor counters for /health and /status"""
+        uptime = time.time() - self.started_at
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'workers': self.max_workers,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'utilization': (self.busy_time / (uptime * self.max_workers)) if uptime > 0 else 0.0
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def busy_response(runtime: InferenceRuntime, error: Exception) -> web.Response:
+    """503 with a Retry-After hint so callers can back off"""
+    return web.json_response(
+        {'error': str(error), 'queue': runtime.stats()},
+        status=503,
+        headers={'Retry-After': '1'}
+    )
+
+
+def token_usage(prompt_tokens: int, generated_tokens: int,
+                prefill_tokens: int = None, cached_tokens: int = 0) -> Dict[str, int]:
+    """
+    Exact token counts returned by every server as 'usage'
+
+    prompt_tokens: tokens in the full prompt
+    prefill_tokens: prompt tokens this server actually ran through the model
+                    (defaults to prompt_tokens - cached_tokens)
+    generated_tokens: new tokens produced
+    cached_tokens: prompt tokens reused from a transferred/cached KV cache
+    """
+    if prefill_tokens is None:
+        prefill_tokens = prompt_tokens - cached_tokens
+    return {
+        'prompt_tokens': int(prompt_tokens),
+        'prefill_tokens': int(prefill_tokens),
+        'generated_tokens': int(generated_tokens),
+        'cached_tokens': int(cached_tokens)
+    }
+
+
+async def read_json(request: web.Request) -> Dict:
+    """Parse a JSON request body, treating an empty/invalid body as {}"""
+    try:
+        data = await request.json()
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def create_app(runtime: InferenceRuntime) -> web.Application:
+    """Create an aiohttp app that shuts the runtime down with the server"""
+    app = web.Application(client_max_size=1024 ** 3)  # KV caches can be large
+    app['runtime'] = runtime
+
+    async def _on_cleanup(app):
+        runtime.shutdown()
+
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def add_runtime_arguments(parser):
+    """Add --workers/--max-queue to a server's argument parser"""
+    parser.add_argument('--workers', type=int, default=1, help='Concurrent model calls')
+    parser.add_argument('--max-queue', type=int, default=16, help='Max requests waiting for a worker')
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark the DGX -> Mac KV cache handoff
+
+For each prompt:
+  1. Prefill on the DGX and decode on the Mac from the transferred KV cache
+  2. Generate the same prompt single-node on the Mac (/generate)
+Both runs use temperature 0 so the outputs should agree token-for-token
+(small drift is possible since the two sides run different quantizations).
+Reports the Mac-side time saved per request by skipping the second prefill.
+"""
+import argparse
+import json
+import time
+import requests
+
+
+DEFAULT_PROMPTS = [
+    "def fibonacci(n):",
+    "Explain what the R function group_by() does in dplyr, with an example:\n",
+    "Write an R pipeline that reads sales.csv, filters rows where revenue > 1000, "
+    "groups by region and summarises the mean revenue:\n"
+]
+
+
+def common_prefix_ratio(a: str, b: str) -> float:
+    """Fraction of the longer text covered by the shared prefix"""
+    if not a and not b:
+        return 1.0
+    n = 0
+    for ca, cb in zip(a, b):
+        if ca != cb:
+            break
+        n += 1
+    return n / max(len(a), len(b))
+
+
+def run_handoff(prefill_url: str, decode_url: str, prompt: str, max_tokens: int) -> dict:
+    """Prefill on DGX, decode on Mac from the KV cache"""
+    start = time.time()
+    prefill = requests.post(f"{prefill_url}/prefill", json={'prompt': prompt}, timeout=120)
+    prefill.raise_for_status()
+    prefill_result = prefill.json()
+
+    decode = requests.post(f"{decode_url}/decode", json={
+        'kv_cache': prefill_result['kv_cache'],
+        'kv_format': prefill_result.get('kv_format'),
+        'input_ids': prefill_result['input_ids'],
+        'prompt': prompt,
+        'max_new_tokens': max_tokens,
+        'temperature': 0.0
+    }, timeout=300)
+    decode.raise_for_status()
+    decode_result = decode.json()
+
+    return {
+        'text': decode_result.get('generated_text', ''),
+        'kv_cache_used': decode_result.get('kv_cache_used', False),
+        'prompt_tokens': prefill_result.get('prompt_tokens', 0),
+        'kv_cache_size_mb': prefill_result.get('kv_cache_size_mb', 0),
+        'prefill_time': prefill_result.get('prefill_time', 0),
+        'decode_time': decode_result.get('decode_time', 0),
+        'wall_time': time.time() - start
+    }
+
+
+def run_single_node(decode_url: str, prompt: str, max_tokens: int) -> dict:
+    """Full prefill + decode on the Mac"""
+    start = time.time()
+    response = requests.post(f"{decode_url}/generate", json={
+        'prompt': prompt,
+        'max_tokens': max_tokens,
+        'temperature': 0.0
+    }, timeout=300)
+    response.raise_for_status()
+    result = response.json()
+
+    return {
+        'text': result.get('response', ''),
+        'generation_time': result.get('generation_time', 0),
+        'wall_time': time.time() - start
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KV cache handoff correctness check and benchmark')
+    parser.add_argument('--prefill', default='http://169.254.150.103:8000', help='DGX prefill server URL')
+    parser.add_argument('--decode', default='http://169.254.150.101:8001', help='Mac decode server URL')
+    parser.add_argument('--max-tokens', type=int, default=64)
+    parser.add_argument('--prompts', help='JSON file with a list of prompts')
+    parser.add_argument('--min-agreement', type=float, default=0.9,
+                        help='Minimum shared-prefix ratio to count as matching')
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts) as f:
+            prompts = json.load(f)
+
+    print("\n" + "="*70)
+    print("KV CACHE HANDOFF: CORRECTNESS + BENCHMARK")
+    print("="*70)
+    print(f"Prefill: {args.prefill}")
+    print(f"Decode:  {args.decode}")
+
+    rows = []
+    for i, prompt in enumerate(prompts, 1):
+        print(f"\n📝 Prompt {i}/{len(prompts)}: {prompt[:60]!r}")
+        handoff = run_handoff(args.prefill, args.decode, prompt, args.max_tokens)
+        single = run_single_node(args.decode, prompt, args.max_tokens)
+
+        agreement = common_prefix_ratio(handoff['text'].strip(), single['text'].strip())
+        saved = single['generation_time'] - handoff['decode_time']
+        rows.append({'agreement': agreement, 'saved': saved, **handoff})
+
+        status = "✅" if agreement >= args.min_agreement and handoff['kv_cache_used'] else "❌"
+        print(f"   {status} KV cache used: {handoff['kv_cache_used']} | agreement: {agreement*100:.1f}%")
+        print(f"   Prompt tokens: {handoff['prompt_tokens']} | KV size: {handoff['kv_cache_size_mb']:.2f} MB")
+        print(f"   Mac single-node: {single['generation_time']:.3f}s | Mac decode from cache: {handoff['decode_time']:.3f}s")
+        print(f"   Mac time saved: {saved:.3f}s | End-to-end: {handoff['wall_time']:.3f}s vs {single['wall_time']:.3f}s")
+        if agreement < args.min_agreement:
+            print(f"   handoff:     {handoff['text'][:120]!r}")
+            print(f"   single-node: {single['text'][:120]!r}")
+
+    passed = sum(1 for r in rows if r['kv_cache_used'] and r['agreement'] >= args.min_agreement)
+    avg_saved = sum(r['saved'] for r in rows) / len(rows) if rows else 0
+
+    print("\n" + "="*70)
+    print(f"Matching outputs: {passed}/{len(rows)}")
+    print(f"Average Mac time saved per request: {avg_saved:.3f}s")
+    print("="*70)
+
+    return 0 if passed == len(rows) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -3,7 +3,10 @@
 Test orchestrator logic without requiring servers
 """
 import asyncio
-from orchestrator import DisaggregatedInference
+from orchestrator import (
+    DisaggregatedInference, RequestScheduler, SchedulerBusyError,
+    PRIORITY_INTERACTIVE, PRIORITY_BULK
+)
 
 
 async def test_config():
@@ -71,6 +74,60 @@ async def test_health_checks(orchestrator):
         print(f"⚠️  No Qwen decode server available (expected - not running)")
 
 
+async def test_scheduler():
+    """Test per-server concurrency, priority lane and backpressure"""
+    print("\n" + "="*70)
+    print("TEST 4: Request Scheduler")
+    print("="*70)
+    
+    scheduler = RequestScheduler(default_concurrency=1, max_pending=3, max_pending_interactive=2)
+    servers = [
+        {'host': 'dgx-1', 'port': 8000, 'model': 'qwen'},
+        {'host': 'dgx-2', 'port': 8000, 'model': 'qwen', 'max_concurrency': 2}
+    ]
+    order = []
+    active = {'dgx-1:8000': 0, 'dgx-2:8000': 0}
+    peak = dict(active)
+    
+    async def job(name, priority):
+        async with scheduler.slot('prefill', 'qwen', servers, priority) as server:
+            sid = f"{server['host']}:{server['port']}"
+            active[sid] += 1
+            peak[sid] = max(peak[sid], active[sid])
+            order.append(name)
+            await asyncio.sleep(0.05)
+            active[sid] -= 1
+    
+    # 3 bulk jobs fill every slot, 3 more bulk jobs queue, then an interactive one arrives
+    tasks = [asyncio.create_task(job(f"bulk-{i}", PRIORITY_BULK)) for i in range(6)]
+    await asyncio.sleep(0.01)
+    tasks.append(asyncio.create_task(job("interactive", PRIORITY_INTERACTIVE)))
+    await asyncio.sleep(0.01)
+    
+    try:
+        await scheduler.acquire('prefill', 'qwen', servers, PRIORITY_BULK)
+        print("❌ Expected SchedulerBusyError with a full bulk queue")
+        return False
+    except SchedulerBusyError as e:
+        print(f"✅ Backpressure: {e}")
+    
+    await asyncio.gather(*tasks)
+    
+    print(f"   Start order: {order}")
+    print(f"   Peak in-flight: {peak}")
+    
+    ok = (
+        order.index("interactive") == 3 and
+        order[:3] == ['bulk-0', 'bulk-1', 'bulk-2'] and
+        order[4:] == ['bulk-3', 'bulk-4', 'bulk-5'] and
+        peak['dgx-1:8000'] <= 1 and peak['dgx-2:8000'] <= 2 and
+        sum(scheduler.in_flight.values()) == 0
+    )
+    print("✅ Interactive lane served first, FIFO within lanes, limits respected" if ok
+          else "❌ Scheduler ordering/limits wrong")
+    return ok
+
+
 async def main():
     """Run all tests"""
     print("\n" + "="*70)
@@ -79,6 +136,8 @@ async def main():
     
     orchestrator = await test_config()
     await test_health_checks(orchestrator)
+    if not await test_scheduler():
+        return
     
     print("\n" + "="*70)
     print("✅ All Logic Tests Passed!")
@@ -31,6 +31,7 @@ print("SERVER CODE SYNTAX TESTS")
 print("="*70)
 
 results = []
+results.append(test_import('disaggregated_inference/server_runtime.py', 'Server Runtime'))
 results.append(test_import('disaggregated_inference/prefill_server_dgx.py', 'Prefill Server'))
 results.append(test_import('disaggregated_inference/decode_server_mac.py', 'Decode Server'))
 results.append(test_import('disaggregated_inference/orchestrator.py', 'Orchestrator'))
@@ -16,8 +16,8 @@ from enhanced_training_interface import EnhancedTrainingInterface, display_inter
 from enhanced_training_database import setup_enhanced_training_database
 import nbformat
 from nbformat import NotebookNode
-from nbconvert import HTMLExporter
 from anonymization_utils import anonymize_name, anonymize_student_id
+from grading_interface import notebook_html
 
 def display_notebook_with_outputs(notebook_path):
     """Display notebook with HTML rendering - same as review page"""
@@ -27,12 +27,7 @@ def display_notebook_with_outputs(notebook_path):
     
     try:
         # Convert notebook to HTML for display (same as review page)
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-        
-        html_exporter = HTMLExporter()
-        html_exporter.template_name = 'classic'
-        (body, resources) = html_exporter.from_notebook_node(nb)
+        body = notebook_html(notebook_path)
         
         # Display HTML in MUCH LONGER scrollable container
         st.components.v1.html(body, height=2000, scrolling=True)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Headless Grading Runner
+Grades an assignment's submissions from the command line with the same
+pipeline as the Grade Submissions page (grading_pipeline.py): notebook
+execution, preprocessing, 4-layer validation, the two models, result
+validation and the database save - without Streamlit, cooldown sleeps or
+page updates, so it can run under nohup or cron.
+
+Progress goes to stdout (or --progress FILE) as JSON lines, one event per
+line: start, graded / failed per submission, done. The grader's own
+output goes to stderr (--quiet drops it).
+
+Usage:
+  python grade_cli.py --assignment a7v3                      # every ungraded submission
+  python grade_cli.py --assignment 12 --workers 2 --limit 20
+  python grade_cli.py --assignment a7v3 --regrade --students S001 S002
+  nohup python grade_cli.py --assignment a7v3 --progress grading.jsonl &
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import warnings
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from anonymization_utils import anonymize_name
+from grading_pipeline import find_validation_paths, grade_submission_internal, save_grading_result, save_submission_trace
+from utils.tracing import span, start_trace
+
+
+def load_assignment(db_path: str, assignment: str) -> Dict[str, Any]:
+    """Assignment row by id or name"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    column = 'id' if assignment.isdigit() else 'name'
+    row = conn.execute(f"""
+        SELECT id, name, description, rubric, template_notebook, solution_notebook, total_points
+        FROM assignments WHERE {column} = ?
+    """, (int(assignment) if column == 'id' else assignment,)).fetchone()
+    conn.close()
+
+    if row is None:
+        raise SystemExit(f"❌ Assignment '{assignment}' not found in {db_path}")
+    return dict(row)
+
+
+def select_submissions(db_path: str, assignment_id: int, regrade: bool = False, submission_ids: List[int] = None,
+                       students: List[str] = None, limit: int = None) -> List[Dict[str, Any]]:
+    """Submissions to grade: ungraded ones unless regrading, optionally narrowed to ids or student ids"""
+    sql = """
+        SELECT s.id, s.notebook_path, st.name AS student_name, st.student_id AS student_identifier
+        FROM submissions s
+        LEFT JOIN students st ON s.student_id = st.id
+        WHERE s.assignment_id = ?
+    """
+    params = [assignment_id]
+    if not regrade and not submission_ids:
+        sql += " AND s.ai_score IS NULL"
+    if submission_ids:
+        sql += f" AND s.id IN ({', '.join('?' * len(submission_ids))})"
+        params += submission_ids
+    if students:
+        sql += f" AND st.student_id IN ({', '.join('?' * len(students))})"
+        params += students
+    sql += " ORDER BY s.submission_date DESC, s.id"
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    conn.close()
+    return rows[:limit] if limit else rows
+
+
+class ProgressWriter:
+    """JSON-lines progress events, safe to call from the worker threads"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='seconds'), **fields}
+        with self._lock:
+            self.stream.write(json.dumps(record, default=str) + "\n")
+            self.stream.flush()
+
+
+class GradingRunner:
+    """Grades a list of submissions with one V2 grader per worker thread"""
+
+    def __init__(self, db_path: str, assignment: Dict[str, Any], progress: ProgressWriter, workers: int = 1,
+                 backend: str = 'auto', ollama_url: str = "http://localhost:11434", validate: bool = True,
+                 fast_path: bool = False, feedback_cascade: List[str] = None):
+        self.db = SimpleNamespace(db_path=db_path)  # What the pipeline functions read the database path from
+        self.assignment = assignment
+        self.progress = progress
+        self.workers = max(1, workers)
+        self.backend = backend
+        self.ollama_url = ollama_url
+        self.validate = validate
+        self.fast_path = fast_path
+        self.feedback_cascade = feedback_cascade
+        self.rubric_path, self.solution_path = find_validation_paths(assignment)
+
+        self._local = threading.local()
+        self._save_lock = threading.Lock()  # One SQLite writer at a time
+        self._count_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def _grader(self):
+        """This thread's BusinessAnalyticsGraderV2 (grading_stats are per instance)"""
+        if getattr(self._local, 'grader', None) is None:
+            from business_analytics_grader_v2 import BusinessAnalyticsGraderV2
+            self._local.grader = BusinessAnalyticsGraderV2(
+                rubric_path=self.rubric_path, solution_path=self.solution_path, ollama_url=self.ollama_url,
+                connect_models=self.backend == 'auto', fast_path=self.fast_path,
+                feedback_cascade=self.feedback_cascade)
+        return self._local.grader
+
+    def grade_one(self, submission: Dict[str, Any], run_tag: str, total: int) -> bool:
+        student_name = submission['student_name'] or f"Student {submission['student_identifier']}"
+        display_name = anonymize_name(student_name, submission['student_identifier'])
+        start = time.perf_counter()
+        trace = None
+
+        try:
+            with start_trace('grading', submission_id=int(submission['id']), run_tag=run_tag,
+                             student=display_name) as trace:
+                with span('grade'):
+                    result = grade_submission_internal(self._grader(), submission, self.assignment['id'], self.db)
+
+                if self.validate:
+                    from grading_validator import GradingValidator
+                    with span('result.validate'):
+                        validator = GradingValidator()
+                        is_valid, errors = validator.validate_grading_result(result)
+                        if not is_valid:
+                            result = validator.fix_calculation_errors(result)
+
+                with span('db.save'), self._save_lock:
+                    save_grading_result(self.db, submission['id'], result)
+            save_submission_trace(self.db, trace)
+        except Exception as e:
+            import traceback
+            traceback.print_exc(file=sys.stdout)  # With the rest of the grader output
+            if trace is not None:
+                save_submission_trace(self.db, trace)  # Its last span shows where it failed
+            with self._count_lock:
+                self.failed += 1
+                done = self.completed + self.failed
+            self.progress.emit('failed', submission_id=submission['id'], student=display_name,
+                               error=f"{type(e).__name__}: {e}", seconds=round(time.perf_counter() - start, 2),
+                               done=done, total=total)
+            return False
+
+        with self._count_lock:
+            self.completed += 1
+            done = self.completed + self.failed
+        self.progress.emit('graded', submission_id=submission['id'], student=display_name,
+                           score=result['final_score'], percentage=result.get('final_score_percentage'),
+                           fast_path=result.get('grading_stats', {}).get('fast_path'),
+                           seconds=round(time.perf_counter() - start, 2), done=done, total=total)
+        return True
+
+    def run(self, submissions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        from disaggregated_inference.metrics_collector import CollectorClient
+
+        # Tagged like a page run, so the metrics history and traces can compare them
+        run_tag = f"{self.assignment['id']}-{time.strftime('%Y%m%d-%H%M%S')}-cli"
+        metrics_client = CollectorClient()
+        metrics_client.start_run(run_tag, assignment=self.assignment['name'],
+                                 notes=f"{len(submissions)} submissions (grade_cli, {self.workers} workers)")
+        self.progress.emit('start', run_tag=run_tag, assignment=self.assignment['name'],
+                           assignment_id=self.assignment['id'], submissions=len(submissions), workers=self.workers,
+                           rubric=self.rubric_path, solution=self.solution_path)
+
+        wall_start = time.perf_counter()
+        interrupted = False
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='grade')
+        try:
+            futures = [executor.submit(self.grade_one, submission, run_tag, len(submissions))
+                       for submission in submissions]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except KeyboardInterrupt:
+            # Let running submissions finish (and save); drop the queued ones
+            interrupted = True
+            executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            executor.shutdown(wait=True)
+
+        wall_seconds = time.perf_counter() - wall_start
+        metrics_client.end_run(run_tag, submissions=self.completed)
+        summary = {
+            'run_tag': run_tag,
+            'graded': self.completed,
+            'failed': self.failed,
+            'skipped': len(submissions) - self.completed - self.failed,
+            'interrupted': interrupted,
+            'wall_seconds': round(wall_seconds, 2),
+            'submissions_per_minute': round(self.completed / wall_seconds * 60, 2) if wall_seconds else 0.0
+        }
+        self.progress.emit('done', **summary)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade submissions without the Streamlit app (JSON-lines progress)')
+    parser.add_argument('--assignment', required=True, help='Assignment id or name')
+    parser.add_argument('--db', default='grading_database.db', help='Grading database')
+    parser.add_argument('--regrade', action='store_true', help='Include submissions that already have a grade')
+    parser.add_argument('--submission-ids', type=int, nargs='+', help='Only these submissions (graded or not)')
+    parser.add_argument('--students', nargs='+', help='Only these student ids')
+    parser.add_argument('--limit', type=int, help='Grade at most this many')
+    parser.add_argument('--workers', type=int, default=1, help='Submissions graded at the same time')
+    parser.add_argument('--backend', choices=['auto', 'ollama'], default='auto',
+                        help='auto: distributed MLX when distributed_config.json is up, else Ollama')
+    parser.add_argument('--ollama-url', default='http://localhost:11434')
+    parser.add_argument('--fast-path', action='store_true', help='Grade template-only/perfect submissions from validation')
+    parser.add_argument('--feedback-cascade', nargs='+', metavar='MODEL', help='Smaller models that draft the feedback first')
+    parser.add_argument('--no-validate', action='store_true', help='Skip the result consistency check')
+    parser.add_argument('--progress', default='-', help='JSON-lines progress file (default: stdout)')
+    parser.add_argument('--quiet', action='store_true', help="Drop the grader's own output instead of sending it to stderr")
+    parser.add_argument('--dry-run', action='store_true', help='List the selected submissions and exit')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"❌ Database not found: {args.db}")
+    assignment = load_assignment(args.db, args.assignment)
+    submissions = select_submissions(args.db, assignment['id'], regrade=args.regrade,
+                                     submission_ids=args.submission_ids, students=args.students, limit=args.limit)
+
+    progress_stream = sys.stdout if args.progress == '-' else open(args.progress, 'a', encoding='utf-8')
+    progress = ProgressWriter(progress_stream)
+
+    if args.dry_run:
+        for submission in submissions:
+            progress.emit('selected', submission_id=submission['id'], notebook=submission['notebook_path'],
+                          exists=bool(submission['notebook_path']) and os.path.exists(submission['notebook_path']))
+        return
+    if not submissions:
+        progress.emit('done', graded=0, failed=0, skipped=0, interrupted=False, wall_seconds=0.0,
+                      submissions_per_minute=0.0)
+        return
+
+    # Keep stdout for progress: the grader prints freely
+    chatter = sys.stderr
+    if args.quiet:
+        chatter = open(os.devnull, 'w')
+        logging.disable(logging.WARNING)  # Executor, health monitor and Streamlit bare-mode logs
+        warnings.simplefilter('ignore')
+    with contextlib.redirect_stdout(chatter):
+        runner = GradingRunner(args.db, assignment, progress, workers=args.workers, backend=args.backend,
+                               ollama_url=args.ollama_url, validate=not args.no_validate,
+                               fast_path=args.fast_path, feedback_cascade=args.feedback_cascade)
+        summary = runner.run(submissions)
+
+    if progress_stream is not sys.stdout:
+        progress_stream.close()
+    sys.exit(1 if summary['failed'] or summary['interrupted'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,29 @@ import sqlite3
 import nbformat
 import json
 import re
-from nbconvert import HTMLExporter
 import os
 from datetime import datetime
-from report_generator import PDFReportGenerator
 from anonymization_utils import anonymize_name, anonymize_student_id
+from utils.lazy_imports import lazy
+
+# Loaded when a notebook preview or PDF report is first needed
+notebook_export = lazy('notebook_export')
+pdf = lazy('pdf')
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _notebook_html(notebook_path, mtime_ns):
+    """Notebook rendered to HTML, cached per file version"""
+    with open(notebook_path, 'r', encoding='utf-8') as f:
+        nb = nbformat.read(f, as_version=4)
+    
+    html_exporter = notebook_export.HTMLExporter()
+    html_exporter.template_name = 'classic'
+    (body, resources) = html_exporter.from_notebook_node(nb)
+    return body
+
+def notebook_html(notebook_path):
+    """HTML preview of a notebook - nbconvert takes seconds, so each file is rendered once until it changes"""
+    return _notebook_html(notebook_path, os.stat(notebook_path).st_mtime_ns)
 
 def parse_old_feedback_format(feedback_list):
     """Parse old feedback format (list of strings) into structured data"""
@@ -313,12 +331,7 @@ def view_results_page(grader):
             # Display notebook
             if selected_submission['notebook_path'] and os.path.exists(selected_submission['notebook_path']):
                 try:
-                    with open(selected_submission['notebook_path'], 'r', encoding='utf-8') as f:
-                        nb = nbformat.read(f, as_version=4)
-                    
-                    html_exporter = HTMLExporter()
-                    html_exporter.template_name = 'classic'
-                    (body, resources) = html_exporter.from_notebook_node(nb)
+                    body = notebook_html(selected_submission['notebook_path'])
                     
                     st.components.v1.html(body, height=800, scrolling=True)
                 except Exception as e:
@@ -634,7 +647,7 @@ def generate_student_reports_interface(grader, assignment_id: int, assignment_na
     if st.button("Generate PDF Reports for All Students"):
         with st.spinner("Generating detailed PDF reports for all students..."):
             try:
-                report_generator = PDFReportGenerator()
+                report_generator = pdf.PDFReportGenerator()
                 
                 # Get all graded submissions for this assignment
                 conn = sqlite3.connect(grader.db_path)
@@ -953,12 +966,7 @@ def view_submission_detail(grader):
     if os.path.exists(submission['notebook_path']):
         try:
             # Convert notebook to HTML for display
-            with open(submission['notebook_path'], 'r', encoding='utf-8') as f:
-                nb = nbformat.read(f, as_version=4)
-            
-            html_exporter = HTMLExporter()
-            html_exporter.template_name = 'classic'
-            (body, resources) = html_exporter.from_notebook_node(nb)
+            body = notebook_html(submission['notebook_path'])
             
             # Display HTML
             st.components.v1.html(body, height=800, scrolling=True)
@@ -1097,12 +1105,7 @@ def manual_grading_interface(grader):
     with st.expander("View Notebook", expanded=False):
         if os.path.exists(submission['notebook_path']):
             try:
-                with open(submission['notebook_path'], 'r', encoding='utf-8') as f:
-                    nb = nbformat.read(f, as_version=4)
-                
-                html_exporter = HTMLExporter()
-                html_exporter.template_name = 'classic'
-                (body, resources) = html_exporter.from_notebook_node(nb)
+                body = notebook_html(submission['notebook_path'])
                 
                 st.components.v1.html(body, height=600, scrolling=True)
                 
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Grading Pipeline
+The per-submission steps shared by the Streamlit grading pages and the
+headless runner (grade_cli.py): notebook execution, slimming,
+preprocessing, output comparison, grading and the database save. Nothing
+here touches the page, so it runs the same under nohup or cron.
+"""
+
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from ai_grader import filter_ai_feedback_for_storage
+from notebook_executor import NotebookExecutor
+from submission_preprocessor import SubmissionPreprocessor
+from utils.notebook_truncator import slim_notebook_if_needed
+from utils.solution_cache import get_solution_artifact
+from utils.tracing import save_trace, span
+
+
+# Used when an assignment has no rubric file of its own
+FALLBACK_RUBRIC_PATH = "rubrics/assignment_6_rubric.json"
+
+def find_validation_paths(assignment_row):
+    """
+    Rubric JSON and solution notebook paths for the 4-layer validators (None when missing)
+    
+    An assignment whose rubric isn't a JSON file and has no rubrics/<name>_rubric.json
+    falls back to FALLBACK_RUBRIC_PATH, with a warning
+    """
+    rubric_path = None
+    solution_path = None
+    
+    # Try to find rubric JSON file
+    if assignment_row.get('rubric'):
+        rubric_str = assignment_row['rubric']
+        if rubric_str.endswith('.json') and os.path.exists(rubric_str):
+            rubric_path = rubric_str
+        else:
+            assignment_name = assignment_row['name'].lower().replace(' ', '_')
+            potential_rubric = f"rubrics/{assignment_name}_rubric.json"
+            if os.path.exists(potential_rubric):
+                rubric_path = potential_rubric
+            elif os.path.exists(FALLBACK_RUBRIC_PATH):
+                print(f"⚠️ No rubric file for '{assignment_row['name']}' - falling back to {FALLBACK_RUBRIC_PATH}")
+                rubric_path = FALLBACK_RUBRIC_PATH
+    
+    # Get solution notebook path
+    if assignment_row.get('solution_notebook') and os.path.exists(assignment_row['solution_notebook']):
+        solution_path = assignment_row['solution_notebook']
+    
+    return rubric_path, solution_path
+
+def grade_submission_internal(business_grader, submission, assignment_id, grader):
+    """Internal function to grade a single submission"""
+    
+    # Extract notebook content
+    notebook_path = submission['notebook_path']
+    
+    # Execute notebook if needed
+    try:
+        executor = NotebookExecutor(data_folder='data', timeout=30)
+        notebook_to_use, exec_info = executor.execute_if_needed(notebook_path)
+    except Exception as e:
+        print(f"⚠️ Notebook execution failed. Using original notebook.")
+        notebook_to_use = notebook_path
+        exec_info = {'needed_execution': False, 'message': 'Execution skipped due to error'}
+    
+    # Slim oversized notebooks (plots, huge printed tables) so every later step reads a bounded copy
+    with span('notebook.slim'):
+        notebook_to_use, slim_info = slim_notebook_if_needed(notebook_to_use)
+    
+    # 🔧 PREPROCESSING: Clean and normalize submission before AI grading
+    print("🔧 Preprocessing submission...")
+    preprocessor = SubmissionPreprocessor()
+    with span('preprocess'):
+        student_code, student_markdown, fixes_applied = preprocessor.preprocess_notebook(notebook_to_use)
+    
+    if fixes_applied:
+        print(f"✅ Applied {len(fixes_applied)} preprocessing fixes:")
+        for fix in fixes_applied:
+            print(f"   • {fix}")
+    else:
+        print("✅ No preprocessing needed - submission was clean")
+    
+    # Get assignment info from database (including template and solution notebooks)
+    with span('assignment.load'):
+        conn = sqlite3.connect(grader.db_path)
+        assignment_info_df = pd.read_sql_query("""
+            SELECT name, description, rubric, template_notebook, solution_notebook, total_points FROM assignments WHERE id = ?
+        """, conn, params=(assignment_id,))
+        conn.close()
+    
+    if assignment_info_df.empty:
+        raise ValueError(f"Assignment {assignment_id} not found")
+    
+    assignment_row = assignment_info_df.iloc[0]
+    
+    # Prepare assignment info (include rubric for weight extraction)
+    assignment_info = {
+        "title": assignment_row['name'],
+        "name": assignment_row['name'],
+        "description": assignment_row['description'],
+        "student_name": submission['student_name'] or f"Student {submission['student_identifier']}",
+        "rubric": assignment_row['rubric']  # Include rubric for weight extraction
+    }
+    
+    # Rubric is now handled internally by the grader with fixed weights
+    
+    # Load template code (what students received) - CRITICAL for score validation
+    template_code = ""
+    if assignment_row.get('template_notebook') and os.path.exists(assignment_row['template_notebook']):
+        try:
+            # Parsed once per template file and reused for every student
+            template_code = get_solution_artifact(assignment_row['template_notebook']).code
+            
+            print(f"✅ Batch grading: Loaded template notebook: {os.path.basename(assignment_row['template_notebook'])}")
+        except Exception as e:
+            print(f"⚠️ Batch grading: Could not load template notebook: {e}")
+    
+    # Load solution code from solution notebook
+    solution_code = ""
+    solution_markdown = ""
+    
+    if assignment_row['solution_notebook'] and os.path.exists(assignment_row['solution_notebook']):
+        try:
+            # Code and markdown from the cached solution artifact
+            solution_artifact = get_solution_artifact(assignment_row['solution_notebook'])
+            solution_code = solution_artifact.code
+            solution_markdown = solution_artifact.markdown
+            
+            print(f"✅ Batch grading: Loaded solution notebook: {os.path.basename(assignment_row['solution_notebook'])}")
+        except Exception as e:
+            print(f"⚠️ Batch grading: Could not load solution notebook: {e}")
+            solution_code = "# Solution notebook not available\n# Grading based on general criteria"
+    else:
+        print("⚠️ Batch grading: No solution notebook found for this assignment")
+        solution_code = "# Solution notebook not available\n# Grading based on general criteria"
+    
+    # Compare outputs to solution if available
+    output_comparison = None
+    if assignment_row['solution_notebook'] and os.path.exists(assignment_row['solution_notebook']):
+        try:
+            print("📊 Comparing outputs to solution...")
+            from output_comparator import compare_notebook_outputs
+            with span('output_comparison'):
+                output_comparison = compare_notebook_outputs(notebook_to_use, assignment_row['solution_notebook'])
+            print(f"   Match rate: {output_comparison['match_rate']:.1f}% ({output_comparison['matches']}/{output_comparison['total_comparisons']})")
+        except Exception as e:
+            print(f"⚠️ Output comparison failed: {e}")
+            output_comparison = None
+    
+    # Prepare preprocessing info with penalty and output comparison
+    preprocessing_info = {
+        'fixes_applied': fixes_applied,
+        'needs_manual_review': len(fixes_applied) > 5,
+        'penalty_points': preprocessor.calculate_penalty(),
+        'penalty_explanation': preprocessor.get_penalty_explanation(),
+        'output_comparison': output_comparison,
+        'slimming': slim_info
+    }
+    
+    # Grade the submission (now includes template_code for validation and preprocessing info)
+    return business_grader.grade_submission(
+        student_code=student_code,
+        student_markdown=student_markdown,
+        template_code=template_code,
+        solution_code=solution_code,
+        assignment_info=assignment_info,
+        notebook_path=notebook_to_use,
+        preprocessing_info=preprocessing_info
+    )
+
+def save_submission_trace(grader, trace):
+    """Store a submission's stage timings without letting a tracing problem fail the grading"""
+    try:
+        save_trace(grader.db_path, trace)
+    except Exception as e:
+        print(f"⚠️ Could not save grading trace: {e}")
+
+def save_grading_result(grader, submission_id, result):
+    """Save grading result to database"""
+    
+    conn = sqlite3.connect(grader.db_path)
+    cursor = conn.cursor()
+    
+    # Prepare feedback data
+    feedback_data = {
+        'final_score': result['final_score'],
+        'component_scores': result['component_scores'],
+        'component_percentages': result['component_percentages'],
+        'technical_analysis': result.get('technical_analysis', {}),
+        'comprehensive_feedback': result.get('comprehensive_feedback', {}),
+        'grading_stats': result.get('grading_stats', {}),
+        'preprocessing': result.get('preprocessing', {})  # Include preprocessing info
+    }
+    
+    # Filter AI feedback to remove internal monologue before storing
+    filtered_feedback = filter_ai_feedback_for_storage(feedback_data)
+    
+    # Update submission
+    cursor.execute("""
+        UPDATE submissions 
+        SET ai_score = ?, ai_feedback = ?, final_score = ?, graded_date = ?
+        WHERE id = ?
+    """, (
+        result['final_score'],
+        json.dumps(filtered_feedback),
+        result['final_score'],
+        result.get('grading_timestamp'),
+        submission_id
+    ))
+    
+    conn.commit()
+    conn.close()
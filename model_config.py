@@ -71,9 +71,26 @@ MODEL_SETTINGS = {
         "temperature": 0.3,
         "max_tokens": 2000,
         "description": "Best for code analysis"
+    },
+    # Small models for drafting feedback in the cascade
+    "gemma3:4b": {
+        "temperature": 0.3,
+        "max_tokens": 2000,
+        "description": "Ollama Gemma 4B - Fast feedback drafts (cascade tier 1)"
+    },
+    "gemma3:12b": {
+        "temperature": 0.3,
+        "max_tokens": 2000,
+        "description": "Ollama Gemma 12B - Feedback drafts (cascade tier 2)"
     }
 }
 
+# Feedback cascade: these models draft feedback smallest first; a draft that
+# fails the cheap checks (score_validator.check_feedback_draft) goes to the
+# next tier, and finally to the grader's feedback model
+# (BusinessAnalyticsGrader(feedback_cascade=FEEDBACK_CASCADE_MODELS))
+FEEDBACK_CASCADE_MODELS = ["gemma3:4b", "gemma3:12b"]
+
 def get_model_config(model_name=None):
     """Get configuration for specified model or primary model"""
     if model_name is None:
@@ -12,6 +12,9 @@ import asyncio
 import aiohttp
 from concurrent.futures import ThreadPoolExecutor
 
+from disaggregated_inference.health_monitor import get_health_monitor
+from utils.tracing import add_phases, propagate, traced
+
 class DistributedMLXClient:
     """Distributed MLX client for two Mac Studios"""
     
@@ -28,6 +31,13 @@ class DistributedMLXClient:
         self.gemma_server_url = gemma_server_url
         self.last_response_times = {}
         
+        # Shared health cache + circuit breakers (one per process); the background
+        # probe thread only starts with the first generation request
+        self.health_monitor = get_health_monitor(start=False)
+        # /status carries the model info the sidebar shows, so cache that payload
+        self.health_monitor.register(qwen_server_url, health_path='/status')
+        self.health_monitor.register(gemma_server_url, health_path='/status')
+        
         # Initialize server manager for auto-restart
         try:
             import sys
@@ -42,21 +52,8 @@ class DistributedMLXClient:
             self.auto_restart_enabled = False
         
     def check_server_status(self, server_url: str, model_name: str) -> bool:
-        """Check if a model server is available"""
-        try:
-            response = requests.get(f"{server_url}/health", timeout=3)
-            return response.status_code == 200
-        except:
-            # Try a simple ping to the generate endpoint
-            try:
-                response = requests.post(
-                    f"{server_url}/generate",
-                    json={"prompt": "test", "max_tokens": 1},
-                    timeout=5
-                )
-                return response.status_code == 200
-            except:
-                return False
+        """Check if a model server is available (cached by the background health monitor)"""
+        return self.health_monitor.is_available(server_url)
     
     def auto_restart_server(self, server_name: str) -> bool:
         """Auto-restart a server if it's down"""
@@ -68,6 +65,9 @@ class DistributedMLXClient:
             success = self.server_manager.auto_restart_if_needed(server_name)
             if success:
                 print(f"✅ {server_name} restarted successfully")
+                # Give the restarted server a clean circuit breaker
+                url = self.qwen_server_url if server_name == 'qwen' else self.gemma_server_url
+                self.health_monitor.reset(url)
             else:
                 print(f"❌ Failed to restart {server_name}")
             return success
@@ -75,11 +75,85 @@ class DistributedMLXClient:
             print(f"❌ Auto-restart failed: {e}")
             return False
     
+    def _record_metrics(self, name: str, prompt: str, response_text: str, result: Dict[str, Any],
+                        generation_time: float, model: str, prompt_eval_share: float):
+        """Store per-request token/timing metrics, using the server's exact counts when it sends them"""
+        usage = result.get('usage') or {}
+        
+        if usage:
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            output_tokens = usage.get('generated_tokens', 0)
+            prefill_tokens = usage.get('prefill_tokens', prompt_tokens)
+            cached_tokens = usage.get('cached_tokens', 0)
+        else:
+            # Older servers: fall back to rough word counts
+            prompt_tokens = len(prompt.split())
+            output_tokens = len(response_text.split()) if response_text else 0
+            prefill_tokens = prompt_tokens
+            cached_tokens = 0
+        
+        tokens_per_second = output_tokens / generation_time if generation_time > 0 else 0
+        
+        self.last_response_times[f'{name}_metrics'] = {
+            'prompt_tokens': prompt_tokens,
+            'prefill_tokens': prefill_tokens,
+            'cached_tokens': cached_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': prompt_tokens + output_tokens,
+            'token_counts_exact': bool(usage),
+            'generation_time': generation_time,
+            'server_generation_time': result.get('generation_time', generation_time),
+            'tokens_per_second': tokens_per_second,
+            'prompt_eval_time': generation_time * prompt_eval_share,  # Estimated share for prompt processing
+            'model': model
+        }
+        return self.last_response_times[f'{name}_metrics']
+    
+    def _trace_phases(self, result: Dict[str, Any], request_time: float):
+        """Split a traced request into queue/network, time to first token and decode"""
+        server_time = result.get('generation_time', request_time)
+        timings = result.get('timings') or {}
+        phases = [('queue', request_time - server_time)]
+        if 'first_token' in timings:
+            phases.append(('time_to_first_token', timings['first_token']))
+            phases.append(('decode', timings.get('decode', server_time - timings['first_token'])))
+        else:
+            phases.append(('generate', server_time))
+        add_phases(phases)
+    
+    def _reset_token_usage(self):
+        """Forget the previous submission's counts, so a failed request reports 0 rather than stale tokens"""
+        self.last_response_times.pop('qwen_metrics', None)
+        self.last_response_times.pop('gemma_metrics', None)
+    
+    def get_token_usage(self) -> Dict[str, Any]:
+        """Token counts for the most recent code analysis + feedback requests (one submission)"""
+        usage = {}
+        for name in ('qwen', 'gemma'):
+            metrics = self.last_response_times.get(f'{name}_metrics', {})
+            usage[name] = {
+                'prompt_tokens': metrics.get('prompt_tokens', 0),
+                'prefill_tokens': metrics.get('prefill_tokens', 0),
+                'generated_tokens': metrics.get('output_tokens', 0),
+                'cached_tokens': metrics.get('cached_tokens', 0),
+                'exact': metrics.get('token_counts_exact', False)
+            }
+        
+        for key in ('prompt_tokens', 'prefill_tokens', 'generated_tokens', 'cached_tokens'):
+            usage[key] = usage['qwen'][key] + usage['gemma'][key]
+        usage['exact'] = usage['qwen']['exact'] and usage['gemma']['exact']
+        return usage
+    
+    @traced('llm.qwen')
     def generate_code_analysis(self, prompt: str, max_tokens: int = 1800, retry_count: int = 0) -> Optional[str]:
         """Generate code analysis using Qwen on Mac Studio 1"""
+        self.health_monitor.start()
+        if not self.health_monitor.allow_request(self.qwen_server_url):
+            print(f"⛔ Qwen server circuit open - skipping request")
+            return None
+        
         try:
             start_time = time.time()
-            prompt_tokens = len(prompt.split())  # Rough token count
             
             response = requests.post(
                 f"{self.qwen_server_url}/generate",
@@ -92,31 +166,24 @@ class DistributedMLXClient:
             )
             
             if response.status_code == 200:
+                self.health_monitor.record_success(self.qwen_server_url)
                 result = response.json()
                 generation_time = time.time() - start_time
                 self.last_response_times['qwen'] = generation_time
                 
                 # Calculate performance metrics
                 response_text = result.get('response', '')
-                output_tokens = len(response_text.split())
-                tokens_per_second = output_tokens / generation_time if generation_time > 0 else 0
+                metrics = self._record_metrics('qwen', prompt, response_text, result,
+                                               generation_time, 'Qwen-30B-Coder', 0.1)
+                self._trace_phases(result, generation_time)
                 
-                # Store performance metrics
-                self.last_response_times['qwen_metrics'] = {
-                    'prompt_tokens': prompt_tokens,
-                    'output_tokens': output_tokens,
-                    'total_tokens': prompt_tokens + output_tokens,
-                    'generation_time': generation_time,
-                    'tokens_per_second': tokens_per_second,
-                    'prompt_eval_time': generation_time * 0.1,  # Estimate 10% for prompt processing
-                    'model': 'Qwen-30B-Coder'
-                }
-                
-                print(f"🔧 [QWEN] {output_tokens} tokens in {generation_time:.1f}s ({tokens_per_second:.1f} tok/s)")
+                print(f"🔧 [QWEN] {metrics['prompt_tokens']} prompt + {metrics['output_tokens']} output tokens "
+                      f"in {generation_time:.1f}s ({metrics['tokens_per_second']:.1f} tok/s)")
                 
                 return response_text
             else:
                 print(f"❌ Qwen server returned status {response.status_code}")
+                self.health_monitor.record_failure(self.qwen_server_url, f"HTTP {response.status_code}")
                 # Try auto-restart if enabled and this is first attempt
                 if retry_count == 0 and self.auto_restart_enabled:
                     print("🔄 Attempting to auto-restart Qwen server...")
@@ -126,10 +193,12 @@ class DistributedMLXClient:
                 return None
                 
         except requests.exceptions.Timeout:
+            self.health_monitor.record_failure(self.qwen_server_url, 'timeout')
             print(f"⏰ Qwen server timeout after 180 seconds")
             st.error(f"⏰ Qwen server timeout - request took too long")
             return None
         except requests.exceptions.ConnectionError as e:
+            self.health_monitor.record_failure(self.qwen_server_url, str(e))
             print(f"❌ Qwen server connection error: {e}")
             # Try auto-restart if enabled and this is first attempt
             if retry_count == 0 and self.auto_restart_enabled:
@@ -144,11 +213,16 @@ class DistributedMLXClient:
             st.error(f"❌ Qwen server error: {e}")
             return None
     
+    @traced('llm.gpt_oss')
     def generate_feedback(self, prompt: str, max_tokens: int = 3000, retry_count: int = 0) -> Optional[str]:
         """Generate feedback using Gemma on Mac Studio 1"""
+        self.health_monitor.start()
+        if not self.health_monitor.allow_request(self.gemma_server_url):
+            print(f"⛔ Gemma server circuit open - skipping request")
+            return None
+        
         try:
             start_time = time.time()
-            prompt_tokens = len(prompt.split())  # Rough token count
             
             response = requests.post(
                 f"{self.gemma_server_url}/generate",
@@ -161,6 +235,7 @@ class DistributedMLXClient:
             )
             
             if response.status_code == 200:
+                self.health_monitor.record_success(self.gemma_server_url)
                 result = response.json()
                 generation_time = time.time() - start_time
                 self.last_response_times['gemma'] = generation_time
@@ -171,26 +246,18 @@ class DistributedMLXClient:
                 print(f"🔍 DEBUG: Response text length: {len(response_text)}")
                 print(f"🔍 DEBUG: Response preview: {response_text[:200] if response_text else 'EMPTY!'}")
                 
-                output_tokens = len(response_text.split()) if response_text else 0
-                tokens_per_second = output_tokens / generation_time if generation_time > 0 else 0
-                
-                # Store performance metrics
-                self.last_response_times['gemma_metrics'] = {
-                    'prompt_tokens': prompt_tokens,
-                    'output_tokens': output_tokens,
-                    'total_tokens': prompt_tokens + output_tokens,
-                    'generation_time': generation_time,
-                    'tokens_per_second': tokens_per_second,
-                    'prompt_eval_time': generation_time * 0.15,  # Estimate 15% for prompt processing
-                    'model': 'Gemma-3-27B'
-                }
+                metrics = self._record_metrics('gemma', prompt, response_text, result,
+                                               generation_time, 'Gemma-3-27B', 0.15)
+                self._trace_phases(result, generation_time)
                 
-                print(f"📝 [GEMMA] {output_tokens} tokens in {generation_time:.1f}s ({tokens_per_second:.1f} tok/s)")
+                print(f"📝 [GEMMA] {metrics['prompt_tokens']} prompt + {metrics['output_tokens']} output tokens "
+                      f"in {generation_time:.1f}s ({metrics['tokens_per_second']:.1f} tok/s)")
                 print(f"   Response preview: {response_text[:100]}...")
                 
                 return response_text
             else:
                 print(f"❌ Gemma server returned status {response.status_code}")
+                self.health_monitor.record_failure(self.gemma_server_url, f"HTTP {response.status_code}")
                 # Try auto-restart if enabled and this is first attempt
                 if retry_count == 0 and self.auto_restart_enabled:
                     print("🔄 Attempting to auto-restart Gemma server...")
@@ -200,10 +267,12 @@ class DistributedMLXClient:
                 return None
                 
         except requests.exceptions.Timeout:
+            self.health_monitor.record_failure(self.gemma_server_url, 'timeout')
             print(f"⏰ Gemma server timeout after 200 seconds")
             st.error(f"⏰ Gemma server timeout - request took too long")
             return None
         except requests.exceptions.ConnectionError as e:
+            self.health_monitor.record_failure(self.gemma_server_url, str(e))
             print(f"❌ Gemma server connection error: {e}")
             # Try auto-restart if enabled and this is first attempt
             if retry_count == 0 and self.auto_restart_enabled:
@@ -224,6 +293,7 @@ class DistributedMLXClient:
         """Generate both responses in parallel using async"""
         
         async def fetch_qwen():
+            request_start = time.time()
             async with aiohttp.ClientSession() as session:
                 async with session.post(
                     f"{self.qwen_server_url}/generate",
@@ -232,10 +302,15 @@ class DistributedMLXClient:
                 ) as response:
                     if response.status == 200:
                         result = await response.json()
+                        generation_time = time.time() - request_start
+                        self.last_response_times['qwen'] = generation_time
+                        self._record_metrics('qwen', code_prompt, result.get('response', ''), result,
+                                             generation_time, 'Qwen-30B-Coder', 0.1)
                         return result.get('response', '')
                     return None
         
         async def fetch_gemma():
+            request_start = time.time()
             async with aiohttp.ClientSession() as session:
                 async with session.post(
                     f"{self.gemma_server_url}/generate",
@@ -244,9 +319,14 @@ class DistributedMLXClient:
                 ) as response:
                     if response.status == 200:
                         result = await response.json()
+                        generation_time = time.time() - request_start
+                        self.last_response_times['gemma'] = generation_time
+                        self._record_metrics('gemma', feedback_prompt, result.get('response', ''), result,
+                                             generation_time, 'Gemma-3-27B', 0.15)
                         return result.get('response', '')
                     return None
         
+        self._reset_token_usage()
         start_time = time.time()
         
         # Run both requests in parallel
@@ -273,15 +353,17 @@ class DistributedMLXClient:
             print(f"   Qwen server: {self.qwen_server_url}")
             print(f"   Gemma server: {self.gemma_server_url}")
             
+            self._reset_token_usage()
+            
             # Use ThreadPoolExecutor for true parallel execution
             with ThreadPoolExecutor(max_workers=2) as executor:
                 start_time = time.time()
                 
                 # Submit both tasks
                 print(f"📤 Submitting Qwen task (code analysis)...")
-                qwen_future = executor.submit(self.generate_code_analysis, code_prompt)
+                qwen_future = executor.submit(propagate(self.generate_code_analysis), code_prompt)
                 print(f"📤 Submitting Gemma task (feedback)...")
-                gemma_future = executor.submit(self.generate_feedback, feedback_prompt)
+                gemma_future = executor.submit(propagate(self.generate_feedback), feedback_prompt)
                 
                 # Get results with increased timeout
                 print(f"⏳ Waiting for Qwen result...")
@@ -348,6 +430,7 @@ class DistributedMLXClient:
                         'qwen': qwen_metrics,
                         'gemma': gemma_metrics,
                         'total_tokens': qwen_metrics.get('total_tokens', 0) + gemma_metrics.get('total_tokens', 0),
+                        'token_usage': self.get_token_usage(),
                         'combined_tokens_per_second': (
                             qwen_metrics.get('output_tokens', 0) + gemma_metrics.get('output_tokens', 0)
                         ) / total_time if total_time > 0 else 0
@@ -380,27 +463,9 @@ class DistributedMLXClient:
         qwen_status = self.check_server_status(self.qwen_server_url, "Qwen")
         gemma_status = self.check_server_status(self.gemma_server_url, "Gemma")
         
-        # Get model information from servers
-        qwen_info = {}
-        gemma_info = {}
-        
-        if qwen_status:
-            try:
-                import requests
-                response = requests.get(f"{self.qwen_server_url}/status", timeout=3)
-                if response.status_code == 200:
-                    qwen_info = response.json()
-            except:
-                pass
-        
-        if gemma_status:
-            try:
-                import requests
-                response = requests.get(f"{self.gemma_server_url}/status", timeout=3)
-                if response.status_code == 200:
-                    gemma_info = response.json()
-            except:
-                pass
+        # Model information from the last /status probe
+        qwen_info = self.health_monitor.status(self.qwen_server_url)['details'] if qwen_status else {}
+        gemma_info = self.health_monitor.status(self.gemma_server_url)['details'] if gemma_status else {}
         
         return {
             'qwen_available': qwen_status,
@@ -423,8 +488,11 @@ class DistributedMLXClient:
                 'model': qwen_metrics.get('model', 'Qwen-30B-Coder'),
                 'server': 'Mac Studio 2',
                 'prompt_tokens': qwen_metrics.get('prompt_tokens', 0),
+                'prefill_tokens': qwen_metrics.get('prefill_tokens', 0),
+                'cached_tokens': qwen_metrics.get('cached_tokens', 0),
                 'output_tokens': qwen_metrics.get('output_tokens', 0),
                 'total_tokens': qwen_metrics.get('total_tokens', 0),
+                'token_counts_exact': qwen_metrics.get('token_counts_exact', False),
                 'generation_time_seconds': qwen_metrics.get('generation_time', 0),
                 'tokens_per_second': qwen_metrics.get('tokens_per_second', 0),
                 'prompt_eval_time_seconds': qwen_metrics.get('prompt_eval_time', 0),
@@ -434,8 +502,11 @@ class DistributedMLXClient:
                 'model': gemma_metrics.get('model', 'GPT-OSS-120B'),
                 'server': 'Mac Studio 1',
                 'prompt_tokens': gemma_metrics.get('prompt_tokens', 0),
+                'prefill_tokens': gemma_metrics.get('prefill_tokens', 0),
+                'cached_tokens': gemma_metrics.get('cached_tokens', 0),
                 'output_tokens': gemma_metrics.get('output_tokens', 0),
                 'total_tokens': gemma_metrics.get('total_tokens', 0),
+                'token_counts_exact': gemma_metrics.get('token_counts_exact', False),
                 'generation_time_seconds': gemma_metrics.get('generation_time', 0),
                 'tokens_per_second': gemma_metrics.get('tokens_per_second', 0),
                 'prompt_eval_time_seconds': gemma_metrics.get('prompt_eval_time', 0),
@@ -445,6 +516,7 @@ class DistributedMLXClient:
                 'total_tokens_processed': qwen_metrics.get('total_tokens', 0) + gemma_metrics.get('total_tokens', 0),
                 'total_output_tokens': qwen_metrics.get('output_tokens', 0) + gemma_metrics.get('output_tokens', 0),
                 'parallel_efficiency': self.last_response_times.get('parallel_efficiency', 0),
+                'token_usage': self.get_token_usage(),
                 'combined_throughput_tokens_per_second': (
                     qwen_metrics.get('output_tokens', 0) + gemma_metrics.get('output_tokens', 0)
                 ) / max(qwen_metrics.get('generation_time', 1), gemma_metrics.get('generation_time', 1))
@@ -475,18 +547,9 @@ def show_distributed_status():
     client = DistributedMLXClient(qwen_url, gemma_url)
     status = client.get_system_status()
     
-    # Get actual model information from servers
-    def get_server_info(url):
-        try:
-            response = requests.get(f"{url}/status", timeout=3)
-            if response.status_code == 200:
-                return response.json()
-        except:
-            pass
-        return {}
-    
-    qwen_info = get_server_info(qwen_url)
-    gemma_info = get_server_info(gemma_url)
+    # Actual model information from the cached /status probes
+    qwen_info = status['qwen_info']
+    gemma_info = status['gemma_info']
     
     st.sidebar.markdown("---")
     st.sidebar.subheader("🖥️ Distributed MLX System")
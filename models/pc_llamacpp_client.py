@@ -8,10 +8,20 @@ import time
 import streamlit as st
 from typing import Optional, Dict, Any, List
 import os
+import sys
 import glob
 import json
 from pathlib import Path
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.structured_output import MalformedJSONError, StreamingJSONParser
+
+# Stop tokens for the model families we run
+STOP_TOKENS = ["</s>", "<|im_end|>", "<|endoftext|>"]
+
+# Generations to try per structured request (a malformed stream is retried once)
+STRUCTURED_ATTEMPTS = 2
+
 class PCLlamaCppClient:
     """PC-based llama.cpp AI client optimized for Windows/Linux"""
     
@@ -25,6 +35,7 @@ class PCLlamaCppClient:
         self.model = None
         self.model_loaded_in_memory = False
         self.last_response_time = None
+        self._grammars = {}  # JSON schema -> compiled LlamaGrammar
         
         if model_path and os.path.exists(model_path):
             self.model_path = model_path
@@ -335,16 +346,18 @@ class PCLlamaCppClient:
         except ImportError:
             return False
     
-    def generate_response(self, prompt: str, max_tokens: int = 2000, show_progress: bool = False) -> Optional[str]:
+    def generate_response(self, prompt: str, max_tokens: int = 2000, show_progress: bool = False,
+                          schema: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Generate response using llama.cpp
         
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate
             show_progress: Show progress indicator
+            schema: JSON schema to constrain the output to (via a llama.cpp grammar)
             
         Returns:
-            Generated response or None if failed
+            Generated response (just the JSON text with a schema) or None if failed
         """
         if not self.model_loaded_in_memory:
             if show_progress:
@@ -363,14 +376,18 @@ class PCLlamaCppClient:
                 status_text.text("🚀 Generating response with llama.cpp...")
             
             # Generate response
-            response = self.model(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=0.3,
-                top_p=0.9,
-                echo=False,
-                stop=["</s>", "<|im_end|>", "<|endoftext|>"]  # Common stop tokens
-            )
+            if schema is not None:
+                response_text = self._generate_structured(prompt, max_tokens, schema)
+            else:
+                response = self.model(
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=0.3,
+                    top_p=0.9,
+                    echo=False,
+                    stop=STOP_TOKENS
+                )
+                response_text = response['choices'][0]['text'].strip()
             
             end_time = time.time()
             self.last_response_time = end_time - start_time
@@ -379,13 +396,39 @@ class PCLlamaCppClient:
                 progress_bar.progress(1.0)
                 status_text.text(f"✅ Response generated in {self.last_response_time:.1f}s")
             
-            return response['choices'][0]['text'].strip()
+            return response_text
             
         except Exception as e:
             if show_progress:
                 st.error(f"❌ llama.cpp generation failed: {e}")
             return None
     
+    def _json_grammar(self, schema: Dict[str, Any]):
+        """Grammar for a schema, compiled once per client"""
+        key = json.dumps(schema, sort_keys=True)
+        if key not in self._grammars:
+            from llama_cpp import LlamaGrammar
+            self._grammars[key] = LlamaGrammar.from_json_schema(key, verbose=False)
+        return self._grammars[key]
+    
+    def _generate_structured(self, prompt: str, max_tokens: int, schema: Dict[str, Any]) -> Optional[str]:
+        """Grammar-constrained streaming generation, retried when the JSON goes wrong mid-stream"""
+        grammar = self._json_grammar(schema)
+        
+        for attempt in range(1, STRUCTURED_ATTEMPTS + 1):
+            parser = StreamingJSONParser(schema, strict=True)
+            try:
+                # Leaving the loop early stops the generation
+                for chunk in self.model(prompt, max_tokens=max_tokens, temperature=0.3, top_p=0.9,
+                                        echo=False, stop=STOP_TOKENS, grammar=grammar, stream=True):
+                    if parser.feed(chunk['choices'][0]['text']) is not None:
+                        break
+                parser.finish()
+                return parser.text
+            except MalformedJSONError as e:
+                print(f"⚠️ {self.model_name}: malformed JSON (attempt {attempt}/{STRUCTURED_ATTEMPTS}): {e}")
+        return None
+    
     def preload_model(self) -> bool:
         """Preload model into memory"""
         if not self.model_loaded_in_memory:
@@ -9,6 +9,48 @@ import time
 from typing import Dict, List, Any, Optional
 from pc_llamacpp_client import PCLlamaCppClient
 
+# Output schemas for the two prompts below (passed to llama.cpp as grammars)
+SCORE = {"type": "integer", "minimum": 0, "maximum": 100}
+TEXT_LIST = {"type": "array", "items": {"type": "string"}}
+CODE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "technical_score": SCORE,
+        "syntax_correctness": SCORE,
+        "logic_correctness": SCORE,
+        "code_efficiency": SCORE,
+        "best_practices": SCORE,
+        "technical_issues": TEXT_LIST,
+        "technical_strengths": TEXT_LIST,
+        "code_suggestions": TEXT_LIST
+    },
+    "required": ["technical_score", "syntax_correctness", "logic_correctness", "code_efficiency",
+                 "best_practices", "technical_issues", "technical_strengths", "code_suggestions"]
+}
+FEEDBACK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": SCORE,
+        "conceptual_understanding": SCORE,
+        "communication_clarity": SCORE,
+        "data_interpretation": SCORE,
+        "methodology_appropriateness": SCORE,
+        "detailed_feedback": {
+            "type": "object",
+            "properties": {
+                "strengths": TEXT_LIST,
+                "areas_for_improvement": TEXT_LIST,
+                "suggestions": TEXT_LIST
+            },
+            "required": ["strengths", "areas_for_improvement", "suggestions"]
+        },
+        "rubric_scores": {"type": "object", "additionalProperties": {"type": "number"}},
+        "instructor_comments": {"type": "string"}
+    },
+    "required": ["overall_score", "conceptual_understanding", "communication_clarity", "data_interpretation",
+                 "methodology_appropriateness", "detailed_feedback", "rubric_scores", "instructor_comments"]
+}
+
 class PCTwoModelGrader:
     """PC-optimized two-model grading system using llama.cpp"""
     
@@ -119,7 +161,7 @@ class PCTwoModelGrader:
         )
         
         response = self.code_analyzer.generate_response(
-            prompt, max_tokens=1500, show_progress=True
+            prompt, max_tokens=1500, show_progress=True, schema=CODE_ANALYSIS_SCHEMA
         )
         
         if not response:
@@ -153,7 +195,7 @@ class PCTwoModelGrader:
         )
         
         response = self.feedback_generator.generate_response(
-            prompt, max_tokens=2000, show_progress=True
+            prompt, max_tokens=2000, show_progress=True, schema=FEEDBACK_SCHEMA
         )
         
         if not response:
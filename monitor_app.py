@@ -1,19 +1,23 @@
 #!/usr/bin/env python3
 """
 Real-Time Performance Monitor App
-Live dashboard showing Mac Studio metrics with historical charts
+Live dashboard showing Mac Studio metrics with historical charts, read
+from the metrics collector the per-server agents push to
 """
 
 import streamlit as st
 import pandas as pd
-import subprocess
-import requests
 import time
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from pathlib import Path
 
+from disaggregated_inference.metrics_collector import DEFAULT_COLLECTOR_URL, CollectorClient
+from utils.tracing import load_traces, stage_totals
+
+GRADING_DB = "grading_database.db"
+
 # Page config
 st.set_page_config(
     page_title="Mac Studio Monitor",
@@ -22,205 +26,41 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state for history
-if 'history' not in st.session_state:
-    st.session_state.history = []
-if 'max_history' not in st.session_state:
-    st.session_state.max_history = 60  # Keep last 60 data points
+def get_mac_stats(name: str, sample: dict) -> dict:
+    """Dashboard stats for one host from its latest collector sample"""
+    mem_total = sample.get('mem_total_gb', 0.0)
+    mem_used = sample.get('mem_used_gb', 0.0)
+    return {
+        'name': name,
+        'ip': sample.get('ip', ''),
+        'timestamp': datetime.fromtimestamp(sample.get('ts', time.time())),
+        'cpu_user': sample.get('cpu_user', 0.0),
+        'cpu_system': sample.get('cpu_system', 0.0),
+        'cpu_idle': sample.get('cpu_idle', 100.0),
+        'mem_used_gb': mem_used,
+        'mem_free_gb': mem_total - mem_used,
+        'mem_total_gb': mem_total,
+        'mem_percent': (mem_used / mem_total) * 100 if mem_total > 0 else 0.0,
+        'gpu_active_percent': sample.get('gpu_active_percent', 0.0),
+        'power_watts': sample.get('power_watts', 0.0),
+        'thermal_pressure': sample.get('thermal_pressure', 'Unknown'),
+        'active_users': sample.get('active_users', 0),
+        'server_status': '✅' if sample.get('server_up') else '❌',
+        'tokens_per_sec': sample.get('tokens_per_sec', 0.0),
+        'active_requests': sample.get('active_requests', 0),
+        'age': sample.get('age', 0.0)
+    }
 
-def get_mac_stats(user: str, ip: str, name: str) -> dict:
-    """Get stats from a Mac Studio"""
-    print(f"🔍 Getting stats from {name} ({ip})...")
-    try:
-        # Get CPU and Memory
-        cmd = f"""ssh {user}@{ip} "top -l 1 | head -20" """
-        print(f"  Running: {cmd[:80]}...")
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=10)
-        print(f"  Result: returncode={result.returncode}, stdout length={len(result.stdout)}")
-        
-        stats = {
-            'name': name,
-            'ip': ip,
-            'timestamp': datetime.now(),
-            'cpu_user': 0.0,
-            'cpu_system': 0.0,
-            'cpu_idle': 100.0,
-            'mem_used_gb': 0.0,
-            'mem_free_gb': 0.0,
-            'mem_total_gb': 0.0,
-            'mem_percent': 0.0,
-            'gpu_active_percent': 0.0,
-            'power_watts': 0.0,
-            'thermal_pressure': 'Unknown',
-            'active_users': 0,
-            'server_status': '❌',
-            'tokens_per_sec': 0.0,
-            'active_requests': 0
-        }
-        
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if 'CPU usage' in line:
-                    parts = line.split()
-                    if len(parts) >= 7:
-                        stats['cpu_user'] = float(parts[2].rstrip('%'))
-                        stats['cpu_system'] = float(parts[4].rstrip('%'))
-                        stats['cpu_idle'] = float(parts[6].rstrip('%'))
-                elif 'PhysMem' in line:
-                    parts = line.split()
-                    if len(parts) >= 6:
-                        # Parse memory (e.g., "123G" -> 123.0, "3376K" -> 0.003376)
-                        mem_used_str = parts[1]
-                        mem_free_str = parts[5]
-                        
-                        # Convert to GB
-                        def parse_memory(mem_str):
-                            if mem_str.endswith('G'):
-                                return float(mem_str.rstrip('G'))
-                            elif mem_str.endswith('M'):
-                                return float(mem_str.rstrip('M')) / 1024.0
-                            elif mem_str.endswith('K'):
-                                return float(mem_str.rstrip('K')) / (1024.0 * 1024.0)
-                            else:
-                                return 0.0
-                        
-                        stats['mem_used_gb'] = parse_memory(mem_used_str)
-                        stats['mem_free_gb'] = parse_memory(mem_free_str)
-                        stats['mem_total_gb'] = stats['mem_used_gb'] + stats['mem_free_gb']
-                        if stats['mem_total_gb'] > 0:
-                            stats['mem_percent'] = (stats['mem_used_gb'] / stats['mem_total_gb']) * 100
-        
-        # Get GPU and Power stats using powermetrics (single call for efficiency)
-        # Skip for now if causing timeouts - can be enabled later
-        try:
-            power_cmd = f"""ssh {user}@{ip} "sudo powermetrics -i 200 -n 1 --samplers gpu_power,cpu_power,thermal 2>/dev/null | grep -E 'GPU Power|CPU Power|Combined Power|GPU HW active frequency|GPU HW active residency|GPU idle residency|pressure level'" """
-            power_result = subprocess.run(power_cmd, shell=True, capture_output=True, text=True, timeout=10)
-            
-            if power_result.returncode == 0 and power_result.stdout:
-                print(f"🔍 DEBUG {name} powermetrics output:")
-                print(power_result.stdout)
-                print("---")
-                
-                for line in power_result.stdout.split('\n'):
-                    # Parse GPU HW active residency (the actual field name)
-                    if 'GPU HW active residency' in line:
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            try:
-                                # Extract just the percentage (first value after colon)
-                                gpu_val = parts[1].strip().split('%')[0].strip()
-                                stats['gpu_active_percent'] = float(gpu_val)
-                                print(f"✅ Parsed GPU: {gpu_val}% -> {stats['gpu_active_percent']}")
-                            except Exception as e:
-                                print(f"❌ Failed to parse GPU from: {line} - {e}")
-                                pass
-                    
-                    # Also try GPU idle residency as fallback (100 - idle = active)
-                    elif 'GPU idle residency' in line and stats['gpu_active_percent'] == 0.0:
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            try:
-                                idle_val = float(parts[1].strip().rstrip('%'))
-                                stats['gpu_active_percent'] = 100.0 - idle_val
-                                print(f"✅ Calculated GPU from idle: {idle_val}% idle -> {stats['gpu_active_percent']}% active")
-                            except Exception as e:
-                                print(f"❌ Failed to parse GPU idle from: {line} - {e}")
-                                pass
-                    
-                    # Parse thermal pressure level
-                    elif 'pressure level' in line.lower():
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            pressure = parts[1].strip()
-                            stats['thermal_pressure'] = pressure
-                            print(f"✅ Thermal pressure: {pressure}")
-                    
-                    # Parse CPU Power (in mW)
-                    elif 'CPU Power:' in line and 'mW' in line:
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            try:
-                                mw_str = parts[1].strip().split()[0]
-                                stats['power_watts'] = float(mw_str) / 1000.0
-                            except:
-                                pass
-                    
-                    # Parse Combined Power (total system power)
-                    elif 'Combined Power' in line and 'mW' in line:
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            try:
-                                mw_str = parts[1].strip().split()[0]
-                                # Store combined power separately if you want
-                                combined_watts = float(mw_str) / 1000.0
-                                # Use combined power as the main power metric
-                                stats['power_watts'] = combined_watts
-                            except:
-                                pass
-            else:
-                print(f"⚠️ Powermetrics returned no output for {name} (returncode: {power_result.returncode})")
-                if power_result.stderr:
-                    print(f"   stderr: {power_result.stderr}")
-        except Exception as e:
-            # Powermetrics can be slow, don't let it break the whole function
-            print(f"⚠️ Powermetrics failed for {name}: {e}")
-            import traceback
-            traceback.print_exc()
-            pass
-        
-        # Get active users count
-        try:
-            users_cmd = f"""ssh {user}@{ip} "who | wc -l" """
-            users_result = subprocess.run(users_cmd, shell=True, capture_output=True, text=True, timeout=5)
-            if users_result.returncode == 0:
-                stats['active_users'] = int(users_result.stdout.strip())
-        except:
-            pass
-        
-        # Check server health
-        port = '5001' if '0.1' in ip else '5002'
-        try:
-            response = requests.get(f"http://{ip}:{port}/health", timeout=3)
-            if response.status_code == 200:
-                stats['server_status'] = '✅'
-                try:
-                    data = response.json()
-                    stats['tokens_per_sec'] = data.get('tokens_per_second', data.get('throughput', 0))
-                    stats['active_requests'] = data.get('active_requests', data.get('requests', 0))
-                    print(f"✅ {name} health: {data}")
-                except:
-                    # Health endpoint returned 200 but not JSON
-                    pass
-        except Exception as e:
-            print(f"⚠️ Health check failed for {name}: {e}")
-            pass
-        
-        return stats
-        
-    except Exception as e:
-        print(f"⚠️ Error getting stats from {name}: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'name': name,
-            'ip': ip,
-            'timestamp': datetime.now(),
-            'cpu_user': 0.0,
-            'cpu_system': 0.0,
-            'cpu_idle': 0.0,
-            'mem_used_gb': 0.0,
-            'mem_free_gb': 0.0,
-            'mem_total_gb': 0.0,
-            'mem_percent': 0.0,
-            'gpu_active_percent': 0.0,
-            'power_watts': 0.0,
-            'active_users': 0,
-            'server_status': '❌',
-            'tokens_per_sec': 0.0,
-            'active_requests': 0,
-            'error': str(e)
-        }
+def get_history_df(client: CollectorClient, seconds: int = None, start: float = None,
+                   end: float = None, host: str = None) -> pd.DataFrame:
+    """Live samples from the last seconds, or stored (downsampled) samples between start and end"""
+    history = client.history(host=host, seconds=seconds, start=start, end=end)
+    if not history:
+        return pd.DataFrame(columns=['name', 'timestamp'])
+    history_df = pd.DataFrame(history).rename(columns={'host': 'name'})
+    history_df['timestamp'] = pd.to_datetime(history_df['ts'], unit='s')
+    history_df['mem_percent'] = (history_df['mem_used_gb'] / history_df['mem_total_gb'].where(history_df['mem_total_gb'] > 0)).fillna(0) * 100
+    return history_df
 
 def create_cpu_chart(history_df, mac_name):
     """Create CPU usage chart"""
@@ -359,7 +199,181 @@ def create_power_chart(history_df, mac_name):
     
     return fig
 
+def show_host(stats: dict, history_df: pd.DataFrame):
+    """Status card and charts for one host"""
+    st.markdown(f"### {stats['server_status']} {stats['name']}")
+    st.caption(f"IP: {stats['ip']} | Active Users: {stats['active_users']} | Last sample: {stats['age']:.0f}s ago")
+    
+    metric_col1, metric_col2, metric_col3, metric_col4, metric_col5 = st.columns(5)
+    with metric_col1:
+        st.metric("CPU User", f"{stats['cpu_user']:.1f}%")
+    with metric_col2:
+        st.metric("Memory", f"{stats['mem_used_gb']:.0f}G / {stats['mem_total_gb']:.0f}G", f"{stats['mem_percent']:.1f}%")
+    with metric_col3:
+        st.metric("GPU", f"{stats['gpu_active_percent']:.1f}%")
+    with metric_col4:
+        st.metric("Power", f"{stats['power_watts']:.1f}W")
+    with metric_col5:
+        # Thermal pressure with emoji indicator
+        thermal_emoji = "🟢" if stats['thermal_pressure'] == "Nominal" else "🟡" if stats['thermal_pressure'] == "Moderate" else "🔴"
+        st.metric("Thermal", f"{thermal_emoji} {stats['thermal_pressure']}")
+    
+    # Charts in tabs
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["CPU", "Memory", "GPU", "Power", "Throughput"])
+    
+    if len(history_df[history_df['name'] == stats['name']]) > 1:
+        with tab1:
+            st.plotly_chart(create_cpu_chart(history_df, stats['name']), use_container_width=True)
+        with tab2:
+            st.plotly_chart(create_memory_chart(history_df, stats['name']), use_container_width=True)
+        with tab3:
+            st.plotly_chart(create_gpu_chart(history_df, stats['name']), use_container_width=True)
+        with tab4:
+            st.plotly_chart(create_power_chart(history_df, stats['name']), use_container_width=True)
+        with tab5:
+            st.plotly_chart(create_tokens_chart(history_df, stats['name']), use_container_width=True)
+
+def span_rows(spans: list) -> list:
+    """
+    Flame chart row for every span: one level below its parent, moved down
+    further when it overlaps a sibling that ran at the same time (parallel
+    model calls), so no two bars on a row overlap
+    """
+    rows = {}
+    row_ends = {}  # row -> end times of bars already placed there
+    for record in sorted(spans, key=lambda r: (r['start'], r['id'])):
+        parent = record['parent']
+        row = rows[parent] + 1 if parent is not None else 0
+        end = record['start'] + (record['duration'] or 0.0)
+        while any(placed_end > record['start'] + 1e-9 for placed_end in row_ends.get(row, [])):
+            row += 1
+        rows[record['id']] = row
+        row_ends.setdefault(row, []).append(end)
+    return [rows[record['id']] for record in spans]
+
+def create_flame_chart(trace: dict):
+    """Timeline of one submission's spans, nested stages stacked below their parent"""
+    fig = go.Figure()
+    spans = trace['spans']
+    rows = span_rows(spans)
+    colors = ['#FF6B6B', '#4ECDC4', '#95E1D3', '#F38181', '#AA96DA', '#FCBAD3', '#FFD93D', '#6BCB77']
+    names = sorted({record['name'] for record in spans})
+    
+    for record, row in zip(spans, rows):
+        details = ', '.join(f"{key}={value}" for key, value in record['attrs'].items())
+        fig.add_trace(go.Bar(
+            y=[row],
+            x=[record['duration'] or 0.0],
+            base=[record['start']],
+            orientation='h',
+            marker=dict(color=colors[names.index(record['name']) % len(colors)]),
+            text=record['name'],
+            textposition='inside',
+            insidetextanchor='start',
+            hovertext=f"{record['name']}: {record['duration'] or 0.0:.2f}s (at {record['start']:.2f}s) {details}",
+            hoverinfo='text',
+            showlegend=False
+        ))
+    
+    fig.update_layout(
+        title=f"Submission {trace['submission_id']} - {trace['kind']} ({trace['total_seconds'] or 0.0:.1f}s)",
+        xaxis_title="Seconds",
+        yaxis=dict(autorange='reversed', showticklabels=False),
+        barmode='overlay',
+        height=120 + 30 * (max(rows) + 1 if rows else 1),
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    
+    return fig
+
+def create_stage_totals_chart(traces: list):
+    """Self time per stage summed over the traces, largest first"""
+    totals = {}
+    for trace in traces:
+        for name, seconds in stage_totals(trace['spans']).items():
+            totals[name] = totals.get(name, 0.0) + seconds
+    ordered = sorted(totals.items(), key=lambda item: item[1])
+    
+    fig = go.Figure(go.Bar(
+        x=[seconds / 60 for _, seconds in ordered],
+        y=[name for name, _ in ordered],
+        orientation='h',
+        marker=dict(color='#FF6B6B')
+    ))
+    fig.update_layout(
+        title=f"Where the minutes go ({len(traces)} traces)",
+        xaxis_title="Minutes (self time)",
+        height=120 + 25 * len(ordered),
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    
+    return fig
+
+def show_traces():
+    """Per-submission grading traces stored in the grading database"""
+    st.title("🔥 Grading Traces")
+    st.caption("Where each submission's grading time goes, stage by stage")
+    
+    with st.sidebar:
+        st.header("⚙️ Settings")
+        db_path = st.text_input("Grading Database", GRADING_DB)
+        limit = st.slider("Traces loaded", 10, 1000, 200)
+    
+    if not Path(db_path).exists():
+        st.warning(f"⚠️ {db_path} not found")
+        return
+    
+    traces = load_traces(db_path, limit=limit)
+    if not traces:
+        st.info("No traces yet - they are recorded as submissions are graded")
+        return
+    
+    with st.sidebar:
+        st.markdown("---")
+        run_tags = sorted({trace['run_tag'] for trace in traces if trace['run_tag']}, reverse=True)
+        run_tag = st.selectbox("Grading run", ["All"] + run_tags)
+        kinds = st.multiselect("Kinds", sorted({trace['kind'] for trace in traces}), default=['grading'])
+    
+    selected = [trace for trace in traces
+                if (run_tag == "All" or trace['run_tag'] == run_tag) and trace['kind'] in kinds]
+    if not selected:
+        st.info("No traces match the filters")
+        return
+    
+    total_col1, total_col2, total_col3 = st.columns(3)
+    durations = [trace['total_seconds'] or 0.0 for trace in selected]
+    with total_col1:
+        st.metric("Traces", len(selected))
+    with total_col2:
+        st.metric("Total", f"{sum(durations) / 60:.1f} min")
+    with total_col3:
+        st.metric("Avg per submission", f"{sum(durations) / len(durations):.1f}s")
+    
+    st.plotly_chart(create_stage_totals_chart(selected), use_container_width=True)
+    
+    st.markdown("---")
+    st.subheader("📋 Submission")
+    trace = st.selectbox(
+        "Trace", selected,
+        format_func=lambda t: f"#{t['submission_id']} {t.get('attrs', {}).get('student', '')} - "
+                              f"{t['kind']} {t['started_at']} ({t['total_seconds'] or 0.0:.1f}s)"
+    )
+    st.plotly_chart(create_flame_chart(trace), use_container_width=True)
+    
+    with st.expander("Spans"):
+        st.dataframe(pd.DataFrame([
+            {'Stage': record['name'], 'Start (s)': record['start'], 'Seconds': record['duration'],
+             'Thread': record['thread'], 'Details': record['attrs']}
+            for record in trace['spans']
+        ]), use_container_width=True, hide_index=True)
+
 def main():
+    with st.sidebar:
+        page = st.radio("Page", ["🖥️ Servers", "🔥 Traces"], horizontal=True)
+    if page == "🔥 Traces":
+        show_traces()
+        return
+    
     st.title("🖥️ Mac Studio Performance Monitor")
     st.caption("Real-time monitoring of distributed AI grading system")
     
@@ -367,6 +381,7 @@ def main():
     with st.sidebar:
         st.header("⚙️ Settings")
         
+        collector_url = st.text_input("Metrics Collector", DEFAULT_COLLECTOR_URL)
         refresh_rate = st.slider("Refresh Rate (seconds)", 1, 10, 3)
         
         # Disable auto-refresh option
@@ -376,113 +391,58 @@ def main():
         
         if st.button("🔄 Manual Refresh"):
             st.rerun()
-        
-        if st.button("🗑️ Clear History"):
-            st.session_state.history = []
-            st.rerun()
-        
-        st.markdown("---")
-        st.subheader("📊 History")
-        st.metric("Data Points", len(st.session_state.history))
-        
-        if st.session_state.history:
-            oldest = st.session_state.history[0]['timestamp']
-            duration = datetime.now() - oldest
-            st.metric("Duration", f"{duration.seconds}s")
     
-    # Get current stats
-    mac1_stats = get_mac_stats("humphrjk", "10.55.0.1", "Mac Studio 1 (GPT-OSS)")
-    mac2_stats = get_mac_stats("jamiehumphries", "10.55.0.2", "Mac Studio 2 (Qwen)")
+    # Agents push samples to the collector; one request gets every host
+    client = CollectorClient(collector_url)
+    latest = client.latest()
     
-    # Fix memory percentage based on actual total RAM
-    # Mac 1: 512GB, Mac 2: 128GB
-    mac1_stats['mem_total_gb'] = 512.0
-    mac1_stats['mem_percent'] = (mac1_stats['mem_used_gb'] / 512.0) * 100
-    
-    mac2_stats['mem_total_gb'] = 128.0
-    mac2_stats['mem_percent'] = (mac2_stats['mem_used_gb'] / 128.0) * 100
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("🕒 Time Range")
+        view = st.radio("Show", ["Live", "Grading run", "Date range"], horizontal=True)
+        host_filter = st.selectbox("Host", ["All hosts"] + sorted(latest))
+        host = None if host_filter == "All hosts" else host_filter
+        runs = client.runs(summary=True) if view == "Grading run" else []
+        
+        if view == "Live":
+            history_minutes = st.slider("History (minutes)", 1, 60, 5)
+            history_df = get_history_df(client, seconds=history_minutes * 60, host=host)
+        elif view == "Grading run":
+            run = st.selectbox("Run", runs, format_func=lambda r: f"{r['tag']} ({r.get('submissions') or '…'} submissions)")
+            history_df = get_history_df(client, start=run['started_at'], end=run['ended_at'] or time.time(),
+                                        host=host) if run else pd.DataFrame(columns=['name', 'timestamp'])
+        else:
+            today = datetime.now().date()
+            dates = st.date_input("Dates", (today - timedelta(days=7), today))
+            first, last = (dates if isinstance(dates, tuple) and len(dates) == 2 else (today, today))
+            start = datetime.combine(first, datetime.min.time()).timestamp()
+            end = datetime.combine(last, datetime.max.time()).timestamp()
+            history_df = get_history_df(client, start=start, end=end, host=host)
     
-    # Add to history
-    st.session_state.history.append(mac1_stats)
-    st.session_state.history.append(mac2_stats)
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("📊 History")
+        st.metric("Data Points", len(history_df))
+        st.metric("Hosts", len(latest))
     
-    # Trim history
-    if len(st.session_state.history) > st.session_state.max_history * 2:
-        st.session_state.history = st.session_state.history[-st.session_state.max_history * 2:]
+    if not latest:
+        if client.error:
+            st.error(f"❌ Metrics collector unreachable at {collector_url}: {client.error}")
+        else:
+            st.warning("⚠️ No metrics agents have reported yet")
+        st.info("Start the collector with `python disaggregated_inference/metrics_collector.py` "
+                "and an agent next to each server with `python disaggregated_inference/metrics_agent.py`")
     
-    # Convert to DataFrame
-    history_df = pd.DataFrame(st.session_state.history)
+    all_stats = [get_mac_stats(name, sample) for name, sample in sorted(latest.items()) if host in (None, name)]
     
     # Current Status Cards
     st.subheader("📡 Current Status")
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown(f"### {mac1_stats['server_status']} Mac Studio 1 (GPT-OSS)")
-        st.caption(f"IP: {mac1_stats['ip']} | Active Users: {mac1_stats['active_users']}")
-        
-        metric_col1, metric_col2, metric_col3, metric_col4, metric_col5 = st.columns(5)
-        with metric_col1:
-            st.metric("CPU User", f"{mac1_stats['cpu_user']:.1f}%")
-        with metric_col2:
-            st.metric("Memory", f"{mac1_stats['mem_used_gb']:.0f}G / 512G", f"{mac1_stats['mem_percent']:.1f}%")
-        with metric_col3:
-            st.metric("GPU", f"{mac1_stats['gpu_active_percent']:.1f}%")
-        with metric_col4:
-            st.metric("Power", f"{mac1_stats['power_watts']:.1f}W")
-        with metric_col5:
-            # Thermal pressure with emoji indicator
-            thermal_emoji = "🟢" if mac1_stats['thermal_pressure'] == "Nominal" else "🟡" if mac1_stats['thermal_pressure'] == "Moderate" else "🔴"
-            st.metric("Thermal", f"{thermal_emoji} {mac1_stats['thermal_pressure']}")
-        
-        # Charts in tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["CPU", "Memory", "GPU", "Power", "Throughput"])
-        
-        if len(history_df[history_df['name'] == mac1_stats['name']]) > 1:
-            with tab1:
-                st.plotly_chart(create_cpu_chart(history_df, mac1_stats['name']), use_container_width=True)
-            with tab2:
-                st.plotly_chart(create_memory_chart(history_df, mac1_stats['name']), use_container_width=True)
-            with tab3:
-                st.plotly_chart(create_gpu_chart(history_df, mac1_stats['name']), use_container_width=True)
-            with tab4:
-                st.plotly_chart(create_power_chart(history_df, mac1_stats['name']), use_container_width=True)
-            with tab5:
-                st.plotly_chart(create_tokens_chart(history_df, mac1_stats['name']), use_container_width=True)
-    
-    with col2:
-        st.markdown(f"### {mac2_stats['server_status']} Mac Studio 2 (Qwen)")
-        st.caption(f"IP: {mac2_stats['ip']} | Active Users: {mac2_stats['active_users']}")
-        
-        metric_col1, metric_col2, metric_col3, metric_col4, metric_col5 = st.columns(5)
-        with metric_col1:
-            st.metric("CPU User", f"{mac2_stats['cpu_user']:.1f}%")
-        with metric_col2:
-            st.metric("Memory", f"{mac2_stats['mem_used_gb']:.0f}G / 128G", f"{mac2_stats['mem_percent']:.1f}%")
-        with metric_col3:
-            st.metric("GPU", f"{mac2_stats['gpu_active_percent']:.1f}%")
-        with metric_col4:
-            st.metric("Power", f"{mac2_stats['power_watts']:.1f}W")
-        with metric_col5:
-            # Thermal pressure with emoji indicator
-            thermal_emoji = "🟢" if mac2_stats['thermal_pressure'] == "Nominal" else "🟡" if mac2_stats['thermal_pressure'] == "Moderate" else "🔴"
-            st.metric("Thermal", f"{thermal_emoji} {mac2_stats['thermal_pressure']}")
-        
-        # Charts in tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["CPU", "Memory", "GPU", "Power", "Throughput"])
-        
-        if len(history_df[history_df['name'] == mac2_stats['name']]) > 1:
-            with tab1:
-                st.plotly_chart(create_cpu_chart(history_df, mac2_stats['name']), use_container_width=True)
-            with tab2:
-                st.plotly_chart(create_memory_chart(history_df, mac2_stats['name']), use_container_width=True)
-            with tab3:
-                st.plotly_chart(create_gpu_chart(history_df, mac2_stats['name']), use_container_width=True)
-            with tab4:
-                st.plotly_chart(create_power_chart(history_df, mac2_stats['name']), use_container_width=True)
-            with tab5:
-                st.plotly_chart(create_tokens_chart(history_df, mac2_stats['name']), use_container_width=True)
+    for row_start in range(0, len(all_stats), 2):
+        columns = st.columns(2)
+        for column, stats in zip(columns, all_stats[row_start:row_start + 2]):
+            with column:
+                show_host(stats, history_df)
     
     # System Health
     st.markdown("---")
@@ -491,27 +451,45 @@ def main():
     health_col1, health_col2, health_col3, health_col4 = st.columns(4)
     
     with health_col1:
-        both_online = mac1_stats['server_status'] == '✅' and mac2_stats['server_status'] == '✅'
+        all_online = bool(all_stats) and all(stats['server_status'] == '✅' for stats in all_stats)
         st.metric(
             "System Status",
-            "🟢 Online" if both_online else "🔴 Degraded",
-            delta="Both servers" if both_online else "Check servers"
+            "🟢 Online" if all_online else "🔴 Degraded",
+            delta="All servers" if all_online else "Check servers"
         )
     
     with health_col2:
-        total_throughput = mac1_stats['tokens_per_sec'] + mac2_stats['tokens_per_sec']
+        total_throughput = sum(stats['tokens_per_sec'] for stats in all_stats)
         st.metric("Combined Throughput", f"{total_throughput:.1f} tok/s")
     
     with health_col3:
-        avg_cpu = (mac1_stats['cpu_user'] + mac2_stats['cpu_user']) / 2
+        avg_cpu = sum(stats['cpu_user'] for stats in all_stats) / len(all_stats) if all_stats else 0.0
         st.metric("Avg CPU Usage", f"{avg_cpu:.1f}%")
     
     with health_col4:
-        total_requests = mac1_stats['active_requests'] + mac2_stats['active_requests']
+        total_requests = sum(stats['active_requests'] for stats in all_stats)
         st.metric("Active Requests", total_requests)
     
-    # Auto-refresh only if enabled
-    if auto_refresh:
+    # Throughput per grading run, to trace regressions to a batch
+    if runs:
+        st.markdown("---")
+        st.subheader("🏁 Grading Runs")
+        run_rows = []
+        for run in runs:
+            row = {
+                'Run': run['tag'],
+                'Assignment': run.get('assignment'),
+                'Started': datetime.fromtimestamp(run['started_at']).strftime("%Y-%m-%d %H:%M"),
+                'Minutes': ((run['ended_at'] or time.time()) - run['started_at']) / 60,
+                'Submissions': run.get('submissions')
+            }
+            for host_name, summary in run.get('hosts', {}).items():
+                row[f"{host_name} tok/s"] = summary.get('tokens_per_sec')
+            run_rows.append(row)
+        st.dataframe(pd.DataFrame(run_rows), use_container_width=True, hide_index=True)
+    
+    # Auto-refresh only if enabled (history views don't change)
+    if auto_refresh and view == "Live":
         time.sleep(refresh_rate)
         st.rerun()
 
@@ -17,6 +17,8 @@ from pathlib import Path
 from typing import Dict, Tuple, Optional
 import logging
 
+from utils.tracing import span
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -282,7 +284,8 @@ print(f"Working directory set to: {{os.getcwd()}}")
         Returns:
             (notebook_to_use, execution_info)
         """
-        needs_exec, total_cells, executed_cells = self.needs_execution(notebook_path)
+        with span('notebook.read'):
+            needs_exec, total_cells, executed_cells = self.needs_execution(notebook_path)
         
         execution_info = {
             'needed_execution': needs_exec,
@@ -301,7 +304,10 @@ print(f"Working directory set to: {{os.getcwd()}}")
         logger.info(f"Notebook needs execution ({executed_cells}/{total_cells} cells run)")
         execution_info['execution_attempted'] = True
         
-        success, executed_path, error_msg = self.execute_notebook(notebook_path)
+        with span('notebook.execute', cells=total_cells) as record:
+            success, executed_path, error_msg = self.execute_notebook(notebook_path)
+            if record is not None:
+                record['attrs']['success'] = success
         
         execution_info['execution_success'] = success
         execution_info['executed_notebook_path'] = executed_path
@@ -9,6 +9,97 @@ from typing import Dict, List, Tuple, Any
 import re
 from difflib import SequenceMatcher
 
+from utils.solution_cache import get_solution_artifact
+
+# Outputs longer than this (normalized chars) skip SequenceMatcher, which is
+# quadratic on long tibble printouts, and are compared by token shingles
+FUZZY_MATCH_MAX_CHARS = 1000
+SHINGLE_SIZE = 3
+
+NUMBER_PATTERN = re.compile(r'\d+\.?\d*')
+ROW_COUNT_PATTERN = re.compile(r'(\d+)\s+rows?')
+COLUMN_COUNT_PATTERN = re.compile(r'(\d+)\s+columns?')
+
+# Errors to ignore (not student's fault)
+IGNORABLE_ERRORS = (
+    'Error in parse(text = input): <text>:1:1: unexpected',  # Jupyter/R markdown issue
+    'Unknown or uninitialised column',  # Warning, not critical
+)
+
+
+def jaccard(a: set, b: set) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union > 0 else 0
+
+
+class OutputSignature:
+    """Everything the comparison needs from one output, extracted in a single pass"""
+    
+    __slots__ = ('text', 'normalized', 'numbers', 'row_counts', 'column_counts',
+                 'has_tibble', 'has_dataframe', 'has_error', '_shingles')
+    
+    def __init__(self, text: str):
+        self.text = text
+        lower = text.lower()
+        self.normalized = ' '.join(lower.split())
+        self.numbers = set(NUMBER_PATTERN.findall(text))
+        self.row_counts = set(ROW_COUNT_PATTERN.findall(lower))
+        self.column_counts = set(COLUMN_COUNT_PATTERN.findall(lower))
+        self.has_tibble = '# A tibble:' in text or 'tibble' in lower
+        self.has_dataframe = 'data.frame' in lower or 'DataFrame' in text
+        # Only count real errors
+        self.has_error = ('Error:' in text or 'error' in lower) and \
+            not any(ignore in text for ignore in IGNORABLE_ERRORS)
+        self._shingles = None
+    
+    @property
+    def shingles(self) -> set:
+        """Token n-grams of the normalized text (built on first use)"""
+        if self._shingles is None:
+            tokens = self.normalized.split()
+            if len(tokens) < SHINGLE_SIZE:
+                self._shingles = {tuple(tokens)}
+            else:
+                self._shingles = set(zip(*(tokens[i:] for i in range(SHINGLE_SIZE))))
+        return self._shingles
+    
+    def metrics(self) -> dict:
+        return {
+            'numbers': self.numbers,
+            'row_counts': self.row_counts,
+            'column_counts': self.column_counts,
+            'has_tibble': self.has_tibble,
+            'has_dataframe': self.has_dataframe,
+            'has_error': self.has_error
+        }
+
+
+def text_similarity(a: OutputSignature, b: OutputSignature) -> float:
+    """SequenceMatcher ratio for short outputs, shingle Dice coefficient for long ones"""
+    if a.normalized == b.normalized:
+        return 1.0
+    if max(len(a.normalized), len(b.normalized)) <= FUZZY_MATCH_MAX_CHARS:
+        return SequenceMatcher(None, a.normalized, b.normalized).ratio()
+    
+    shingles_a, shingles_b = a.shingles, b.shingles
+    total = len(shingles_a) + len(shingles_b)
+    return 2 * len(shingles_a & shingles_b) / total if total else 1.0
+
+
+def signature_similarity(a: OutputSignature, b: OutputSignature) -> float:
+    """Similarity between two outputs (0-1) from their precomputed signatures"""
+    if not a.text and not b.text:
+        return 1.0
+    if not a.text or not b.text:
+        return 0.0
+    
+    # If both have numbers and they match well (>80%), it's a match even if order differs
+    if a.numbers and b.numbers and jaccard(a.numbers, b.numbers) > 0.8:
+        return max(0.85, text_similarity(a, b))
+    
+    return text_similarity(a, b)
+
+
 class OutputComparator:
     """Compares notebook cell outputs between student and solution"""
     
@@ -19,8 +110,12 @@ class OutputComparator:
         with open(student_notebook_path, 'r', encoding='utf-8') as f:
             self.student_nb = nbformat.read(f, as_version=4)
         
-        with open(solution_notebook_path, 'r', encoding='utf-8') as f:
-            self.solution_nb = nbformat.read(f, as_version=4)
+        # Parsed once per solution file and shared across students
+        self.solution_artifact = get_solution_artifact(solution_notebook_path)
+        self.solution_nb = self.solution_artifact.notebook
+        
+        self._signatures = {}
+        self._solution_signatures = self.solution_artifact.memo('output_comparator.signatures', dict)
     
     def extract_code_cells(self, notebook) -> List[Dict]:
         """Extract code cells with their outputs"""
@@ -51,91 +146,48 @@ class OutputComparator:
                     outputs.append(data['text/plain'])
         return outputs
 
+    def _signature(self, text: str, solution: bool = False) -> 'OutputSignature':
+        """Signature for an output, built once (solution ones are shared across students)"""
+        cache = self._solution_signatures if solution else self._signatures
+        signature = cache.get(text)
+        if signature is None:
+            signature = cache[text] = OutputSignature(text)
+        return signature
+
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two text outputs (0-1) - semantic comparison"""
-        if not text1 and not text2:
-            return 1.0
-        if not text1 or not text2:
-            return 0.0
-        
-        # Normalize whitespace and case for comparison
-        text1_norm = ' '.join(text1.lower().split())
-        text2_norm = ' '.join(text2.lower().split())
-        
-        # Extract numbers for numerical comparison
-        import re
-        numbers1 = set(re.findall(r'\d+\.?\d*', text1))
-        numbers2 = set(re.findall(r'\d+\.?\d*', text2))
-        
-        # If both have numbers, check if they match (order-independent)
-        if numbers1 and numbers2:
-            # Calculate Jaccard similarity for numbers
-            intersection = len(numbers1.intersection(numbers2))
-            union = len(numbers1.union(numbers2))
-            number_similarity = intersection / union if union > 0 else 0
-            
-            # If numbers match well (>80%), consider it a match even if order differs
-            if number_similarity > 0.8:
-                return max(0.85, SequenceMatcher(None, text1_norm, text2_norm).ratio())
-        
-        # Use SequenceMatcher for fuzzy matching
-        return SequenceMatcher(None, text1_norm, text2_norm).ratio()
+        return signature_similarity(self._signature(text1), self._signature(text2))
     
     def extract_key_metrics(self, text: str) -> dict:
         """Extract key metrics from output for semantic comparison"""
-        import re
-        
-        # Errors to ignore (not student's fault)
-        ignore_errors = [
-            'Error in parse(text = input): <text>:1:1: unexpected',  # Jupyter/R markdown issue
-            'Unknown or uninitialised column',  # Warning, not critical
-        ]
-        
-        # Check if error should be ignored
-        has_real_error = False
-        if 'Error:' in text or 'error' in text.lower():
-            # Check if it's an ignorable error
-            has_real_error = not any(ignore in text for ignore in ignore_errors)
-        
-        metrics = {
-            'numbers': set(re.findall(r'\d+\.?\d*', text)),
-            'row_counts': set(re.findall(r'(\d+)\s+rows?', text.lower())),
-            'column_counts': set(re.findall(r'(\d+)\s+columns?', text.lower())),
-            'has_tibble': '# A tibble:' in text or 'tibble' in text.lower(),
-            'has_dataframe': 'data.frame' in text.lower() or 'DataFrame' in text,
-            'has_error': has_real_error  # Only count real errors
-        }
-        return metrics
+        return self._signature(text).metrics()
     
     def semantic_compare(self, student_out: str, solution_out: str) -> tuple:
         """
         Semantic comparison of outputs - checks if they contain same information
         Returns (similarity_score, is_match, reason)
         """
-        # Extract metrics from both outputs
-        student_metrics = self.extract_key_metrics(student_out)
-        solution_metrics = self.extract_key_metrics(solution_out)
+        student = self._signature(student_out)
+        solution = self._signature(solution_out, solution=True)
         
         # If student has error but solution doesn't, it's a mismatch
-        if student_metrics['has_error'] and not solution_metrics['has_error']:
+        if student.has_error and not solution.has_error:
             return (0.0, False, "Student output contains error")
         
         # If both have data structures, compare key metrics
-        if (student_metrics['has_tibble'] or student_metrics['has_dataframe']) and \
-           (solution_metrics['has_tibble'] or solution_metrics['has_dataframe']):
+        if (student.has_tibble or student.has_dataframe) and \
+           (solution.has_tibble or solution.has_dataframe):
             
             # Compare row counts if present
-            if student_metrics['row_counts'] and solution_metrics['row_counts']:
-                if student_metrics['row_counts'] == solution_metrics['row_counts']:
+            if student.row_counts and solution.row_counts:
+                if student.row_counts == solution.row_counts:
                     return (0.95, True, "Row counts match")
                 else:
-                    return (0.3, False, f"Row count mismatch: {student_metrics['row_counts']} vs {solution_metrics['row_counts']}")
+                    return (0.3, False, f"Row count mismatch: {student.row_counts} vs {solution.row_counts}")
         
         # Compare numbers (order-independent)
-        if student_metrics['numbers'] and solution_metrics['numbers']:
-            intersection = len(student_metrics['numbers'].intersection(solution_metrics['numbers']))
-            union = len(student_metrics['numbers'].union(solution_metrics['numbers']))
-            number_similarity = intersection / union if union > 0 else 0
+        if student.numbers and solution.numbers:
+            number_similarity = jaccard(student.numbers, solution.numbers)
             
             if number_similarity > 0.8:
                 return (0.90, True, "Key numbers match")
@@ -143,7 +195,7 @@ class OutputComparator:
                 return (0.70, False, "Some numbers match but not all")
         
         # Fall back to text similarity
-        similarity = self.calculate_similarity(student_out, solution_out)
+        similarity = signature_similarity(student, solution)
         is_match = similarity >= 0.75  # Slightly lower threshold for semantic matching
         reason = "Text similarity" if is_match else "Text differs significantly"
         
@@ -152,7 +204,9 @@ class OutputComparator:
     def compare_outputs(self) -> Dict[str, Any]:
         """Compare all outputs between student and solution with semantic matching"""
         student_cells = self.extract_code_cells(self.student_nb)
-        solution_cells = self.extract_code_cells(self.solution_nb)
+        solution_cells = self.solution_artifact.memo(
+            'output_comparator.code_cells', lambda: self.extract_code_cells(self.solution_nb)
+        )
         
         comparisons = []
         total_similarity = 0
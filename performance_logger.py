@@ -1,23 +1,29 @@
 #!/usr/bin/env python3
 """
 Performance Logger for Mac Studios
-Captures metrics and saves to CSV for later analysis
+Captures metrics from the metrics collector and saves to CSV for later analysis
 """
 
-import subprocess
 import time
 import csv
 import json
-import requests
 from datetime import datetime
 from pathlib import Path
 
+from disaggregated_inference.metrics_collector import DEFAULT_COLLECTOR_URL, CollectorClient
+
+# Names the agents on each Mac Studio report under (mac1_*, mac2_* columns)
+DEFAULT_HOSTS = ("Mac Studio 1 (GPT-OSS)", "Mac Studio 2 (Qwen)")
+
 class PerformanceLogger:
     """Logs performance metrics from both Mac Studios"""
     
-    def __init__(self, log_dir: str = "performance_logs"):
+    def __init__(self, log_dir: str = "performance_logs", collector_url: str = DEFAULT_COLLECTOR_URL,
+                 hosts: tuple = DEFAULT_HOSTS):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
+        self.client = CollectorClient(collector_url)
+        self.hosts = hosts
         
         # Create timestamped log file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -41,56 +47,9 @@ class PerformanceLogger:
         
         print(f"📊 Logging to: {self.log_file}")
     
-    def get_mac_stats(self, user: str, ip: str, name: str) -> dict:
-        """Get stats from a Mac Studio"""
-        try:
-            # Get CPU and Memory
-            cmd = f"""ssh {user}@{ip} "top -l 1 | head -20" """
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
-            
-            stats = {
-                'name': name,
-                'cpu_user': '0%',
-                'cpu_system': '0%',
-                'cpu_idle': '100%',
-                'mem_used': '0G',
-                'mem_free': '0G',
-                'server_status': '❌',
-                'tokens_per_sec': 0,
-                'active_requests': 0
-            }
-            
-            if result.returncode == 0:
-                lines = result.stdout.split('\n')
-                for line in lines:
-                    if 'CPU usage' in line:
-                        parts = line.split()
-                        if len(parts) >= 7:
-                            stats['cpu_user'] = parts[2]
-                            stats['cpu_system'] = parts[4]
-                            stats['cpu_idle'] = parts[6]
-                    elif 'PhysMem' in line:
-                        parts = line.split()
-                        if len(parts) >= 6:
-                            stats['mem_used'] = parts[1]
-                            stats['mem_free'] = parts[5]
-            
-            # Check server health and get performance metrics
-            port = '5001' if '0.1' in ip else '5002'
-            try:
-                response = requests.get(f"http://{ip}:{port}/health", timeout=3)
-                if response.status_code == 200:
-                    stats['server_status'] = '✅'
-                    data = response.json()
-                    stats['tokens_per_sec'] = data.get('tokens_per_second', 0)
-                    stats['active_requests'] = data.get('active_requests', 0)
-            except:
-                pass
-            
-            return stats
-            
-        except Exception as e:
-            print(f"⚠️ Error getting stats from {name}: {e}")
+    def get_mac_stats(self, name: str, sample: dict = None) -> dict:
+        """Stats for one host from its latest collector sample"""
+        if not sample:
             return {
                 'name': name,
                 'cpu_user': 'ERROR',
@@ -102,39 +61,33 @@ class PerformanceLogger:
                 'tokens_per_sec': 0,
                 'active_requests': 0
             }
+        
+        return {
+            'name': name,
+            'cpu_user': f"{sample.get('cpu_user', 0):.1f}%",
+            'cpu_system': f"{sample.get('cpu_system', 0):.1f}%",
+            'cpu_idle': f"{sample.get('cpu_idle', 100):.1f}%",
+            'mem_used': f"{sample.get('mem_used_gb', 0):.0f}G",
+            'mem_free': f"{sample.get('mem_total_gb', 0) - sample.get('mem_used_gb', 0):.0f}G",
+            'server_status': '✅' if sample.get('server_up') else '❌',
+            'tokens_per_sec': sample.get('tokens_per_sec', 0),
+            'active_requests': sample.get('active_requests', 0)
+        }
     
     def log_snapshot(self, event: str = "", notes: str = ""):
         """Log a single snapshot of both Mac Studios"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Get stats from both Macs
-        mac1_stats = self.get_mac_stats("humphrjk", "10.55.0.1", "Mac Studio 1 (GPT-OSS)")
-        mac2_stats = self.get_mac_stats("jamiehumphries", "10.55.0.2", "Mac Studio 2 (Qwen)")
+        # One request to the collector covers both Macs
+        latest = self.client.latest()
+        if not latest and self.client.error:
+            print(f"⚠️ Metrics collector unreachable: {self.client.error}")
         
-        # Create log entry
-        entry = {
-            'timestamp': timestamp,
-            'mac1_name': mac1_stats['name'],
-            'mac1_cpu_user': mac1_stats['cpu_user'],
-            'mac1_cpu_system': mac1_stats['cpu_system'],
-            'mac1_cpu_idle': mac1_stats['cpu_idle'],
-            'mac1_mem_used': mac1_stats['mem_used'],
-            'mac1_mem_free': mac1_stats['mem_free'],
-            'mac1_server_status': mac1_stats['server_status'],
-            'mac1_tokens_per_sec': mac1_stats['tokens_per_sec'],
-            'mac1_active_requests': mac1_stats['active_requests'],
-            'mac2_name': mac2_stats['name'],
-            'mac2_cpu_user': mac2_stats['cpu_user'],
-            'mac2_cpu_system': mac2_stats['cpu_system'],
-            'mac2_cpu_idle': mac2_stats['cpu_idle'],
-            'mac2_mem_used': mac2_stats['mem_used'],
-            'mac2_mem_free': mac2_stats['mem_free'],
-            'mac2_server_status': mac2_stats['server_status'],
-            'mac2_tokens_per_sec': mac2_stats['tokens_per_sec'],
-            'mac2_active_requests': mac2_stats['active_requests'],
-            'event': event,
-            'notes': notes
-        }
+        entry = {'timestamp': timestamp, 'event': event, 'notes': notes}
+        for prefix, name in zip(('mac1', 'mac2'), self.hosts):
+            stats = self.get_mac_stats(name, latest.get(name))
+            for key, value in stats.items():
+                entry[f"{prefix}_{key}"] = value
         
         # Write to CSV
         with open(self.log_file, 'a', newline='') as f:
@@ -176,10 +129,12 @@ def main():
     parser.add_argument('--single', action='store_true', help='Log single snapshot and exit')
     parser.add_argument('--event', type=str, default='', help='Event name for single snapshot')
     parser.add_argument('--notes', type=str, default='', help='Notes for single snapshot')
+    parser.add_argument('--collector', type=str, default=DEFAULT_COLLECTOR_URL, help='Metrics collector URL')
+    parser.add_argument('--hosts', nargs=2, default=list(DEFAULT_HOSTS), help='Agent names logged as mac1/mac2')
     
     args = parser.parse_args()
     
-    logger = PerformanceLogger(log_dir=args.log_dir)
+    logger = PerformanceLogger(log_dir=args.log_dir, collector_url=args.collector, hosts=tuple(args.hosts))
     
     if args.single:
         entry = logger.log_snapshot(event=args.event, notes=args.notes)
@@ -2,16 +2,72 @@
 """
 Prompt Manager
 Manages general and assignment-specific prompts, and generates rubrics using AI
+
+Prompt files are read once and re-read only when their mtime changes, and
+get_combined_prompt compiles each template with the assignment-level fields
+(title, rubric, solution, instructions, correction learning) filled in, so
+grading a cohort only inserts each student's own fields.
 """
 
 import streamlit as st
 import os
 import json
+import threading
 import pandas as pd
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
+from string import Formatter
+from typing import Any, Dict, Optional, Tuple
 import requests
 
+# Prompt fields that differ per student; every other field is the same
+# across an assignment and is rendered when the template is compiled
+STUDENT_FIELDS = frozenset({'student_code', 'student_markdown', 'student_code_summary', 'validation_context'})
+
+# Compiled templates kept (one per assignment and prompt type in use)
+COMPILED_CACHE_SIZE = 32
+
+# Shared by every PromptManager: path -> ((mtime_ns, size), text),
+# compiled key -> CompiledPrompt, assignment id -> (fingerprint, summary)
+_file_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_compiled_cache: "OrderedDict[Any, CompiledPrompt]" = OrderedDict()
+_correction_cache: Dict[Any, Tuple[Tuple, str]] = {}
+_cache_lock = threading.Lock()
+
+
+class CompiledPrompt:
+    """A prompt template with the assignment-level fields already rendered"""
+    
+    def __init__(self, template: str, fields: Dict[str, Any]):
+        """Raises KeyError, like str.format, for a non-student field that isn't in fields"""
+        formatter = Formatter()
+        self.parts = []  # Literal text, then (field, conversion, spec) slots for student fields
+        literal = ""
+        for text, name, spec, conversion in formatter.parse(template):
+            literal += text
+            if name is None:
+                continue
+            if name in STUDENT_FIELDS:
+                self.parts.append(literal)
+                self.parts.append((name, conversion, spec))
+                literal = ""
+            else:
+                literal += formatter.format_field(formatter.convert_field(fields[name], conversion), spec)
+        self.parts.append(literal)
+    
+    def fill(self, **student_fields) -> str:
+        """The full prompt for one student (KeyError if one of their fields is missing)"""
+        formatter = Formatter()
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+            else:
+                name, conversion, spec = part
+                pieces.append(formatter.format_field(formatter.convert_field(student_fields[name], conversion), spec))
+        return "".join(pieces)
+
+
 class PromptManager:
     """Manages prompts and rubrics for assignments"""
     
@@ -25,15 +81,29 @@ class PromptManager:
         self.assignment_prompts_dir.mkdir(exist_ok=True)
         self.rubrics_dir.mkdir(exist_ok=True)
     
+    def _read_prompt_file(self, prompt_file: Path) -> Optional[str]:
+        """File contents, from the cache unless the file changed since it was read"""
+        try:
+            stat = prompt_file.stat()
+        except FileNotFoundError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = str(prompt_file.resolve())
+        cached = _file_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        with open(prompt_file, 'r') as f:
+            text = f.read()
+        with _cache_lock:
+            _file_cache[key] = (version, text)
+        return text
+    
     def load_general_prompt(self, prompt_type: str) -> str:
         """Load general prompt template"""
         prompt_file = self.prompt_templates_dir / f"general_{prompt_type}_prompt.txt"
         
-        if prompt_file.exists():
-            with open(prompt_file, 'r') as f:
-                return f.read()
-        else:
-            return ""
+        text = self._read_prompt_file(prompt_file)
+        return text if text is not None else ""
     
     def save_general_prompt(self, prompt_type: str, content: str):
         """Save general prompt template"""
@@ -46,11 +116,7 @@ class PromptManager:
         """Load assignment-specific prompt"""
         prompt_file = self.assignment_prompts_dir / f"{assignment_name}_{prompt_type}_prompt.txt"
         
-        if prompt_file.exists():
-            with open(prompt_file, 'r') as f:
-                return f.read()
-        else:
-            return None
+        return self._read_prompt_file(prompt_file)
     
     def save_assignment_prompt(self, assignment_name: str, prompt_type: str, content: str):
         """Save assignment-specific prompt"""
@@ -73,12 +139,7 @@ class PromptManager:
             kwargs['assignment_specific_instructions'] = ""
         
         # Add correction learning from previous assignments
-        from correction_analyzer import CorrectionAnalyzer
-        analyzer = CorrectionAnalyzer()
-        
-        # Get assignment_id if available
-        assignment_id = kwargs.get('assignment_id')
-        correction_summary = analyzer.get_correction_summary_for_prompt(assignment_id, limit=5)
+        correction_summary = self._correction_summary(kwargs.get('assignment_id'))
         
         if correction_summary:
             kwargs['correction_learning'] = f"\n{correction_summary}\n"
@@ -86,14 +147,52 @@ class PromptManager:
             kwargs['correction_learning'] = ""
         
         # Format the prompt with provided variables
+        student_fields = {key: value for key, value in kwargs.items() if key in STUDENT_FIELDS}
         try:
-            return general_prompt.format(**kwargs)
+            return self._compile(general_prompt, kwargs).fill(**student_fields)
         except KeyError as e:
             # If correction_learning or other new variables aren't in the template, that's ok
             if str(e) not in ["'correction_learning'"]:
                 st.error(f"Missing required variable in prompt: {e}")
             return general_prompt
     
+    def _compile(self, template: str, fields: Dict[str, Any]) -> CompiledPrompt:
+        """Compiled template for these assignment-level fields (cached, least recently used dropped)"""
+        assignment_fields = {key: value for key, value in fields.items() if key not in STUDENT_FIELDS}
+        try:
+            key = (template, tuple(sorted(assignment_fields.items())))
+            hash(key)
+        except TypeError:
+            return CompiledPrompt(template, assignment_fields)  # Unhashable field value - compile uncached
+        
+        with _cache_lock:
+            compiled = _compiled_cache.get(key)
+            if compiled is not None:
+                _compiled_cache.move_to_end(key)
+                return compiled
+        
+        compiled = CompiledPrompt(template, assignment_fields)
+        with _cache_lock:
+            _compiled_cache[key] = compiled
+            while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+                _compiled_cache.popitem(last=False)
+        return compiled
+    
+    def _correction_summary(self, assignment_id: Optional[int] = None) -> str:
+        """Recent human corrections for the prompt, rebuilt only when the corrections change"""
+        from correction_analyzer import CorrectionAnalyzer
+        analyzer = CorrectionAnalyzer()
+        
+        fingerprint = analyzer.get_corrections_fingerprint(assignment_id)
+        cached = _correction_cache.get(assignment_id)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        
+        summary = analyzer.get_correction_summary_for_prompt(assignment_id, limit=5)
+        with _cache_lock:
+            _correction_cache[assignment_id] = (fingerprint, summary)
+        return summary
+    
     def generate_rubric_with_ai(self, assignment_description: str, total_points: float, 
                                 ollama_url: str = "http://localhost:11434") -> Dict:
         """Generate a rubric using AI based on assignment description"""
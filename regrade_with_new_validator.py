@@ -1,12 +1,29 @@
 #!/usr/bin/env python3
 """
 Regrade submissions using the new flexible partial credit validator
+
+Usage:
+  python regrade_with_new_validator.py                      # full regrade of a7v3 (calls the models)
+  python regrade_with_new_validator.py --simulate a7v3      # what-if: deterministic layers only
+  python regrade_with_new_validator.py --simulate a7 --rubric rubrics/assignment_7_rubric_v3.json \
+      --output a7_whatif.json
+
+--simulate never writes to the database. It replays systematic validation
+(with partial credit) and output validation on each stored notebook, reuses
+the AI analysis saved with the previous grade, and reports score deltas.
 """
 
+import argparse
+import contextlib
+import io
+import os
 import sqlite3
 import json
+import statistics
+import time
 from validators.rubric_driven_validator import RubricDrivenValidator
 from business_analytics_grader_v2 import BusinessAnalyticsGraderV2
+from grading_pipeline import find_validation_paths
 
 def regrade_assignment_7_submissions():
     """Regrade all Assignment 7 v3 submissions with new validator"""
@@ -103,5 +120,175 @@ def regrade_assignment_7_submissions():
     
     conn.close()
 
+def simulate_regrade(assignment_name: str, rubric_path: str = None, solution_path: str = None,
+                     db_path: str = 'grading_database.db', output_path: str = None,
+                     verbose: bool = False) -> dict:
+    """
+    What-if regrade of a cohort without the models
+
+    Returns:
+        {'assignment', 'rubric_path', 'solution_path', 'students': [...], 'summary': {...}}
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name, rubric, solution_notebook FROM assignments WHERE name = ?", (assignment_name,))
+    assignment = cursor.fetchone()
+    if not assignment:
+        conn.close()
+        raise ValueError(f"Assignment not found: {assignment_name}")
+    
+    if not (rubric_path and solution_path):
+        # Same lookup as the grading page (warns when it falls back to the a6 rubric)
+        default_rubric, default_solution = find_validation_paths(
+            dict(zip(('name', 'rubric', 'solution_notebook'), assignment)))
+        rubric_path = rubric_path or default_rubric
+        solution_path = solution_path or default_solution
+    
+    cursor.execute("""
+        SELECT s.id, s.student_id, s.notebook_path, s.ai_score, s.human_score, s.ai_feedback
+        FROM submissions s
+        JOIN assignments a ON s.assignment_id = a.id
+        WHERE a.name = ?
+        ORDER BY s.student_id
+    """, (assignment_name,))
+    submissions = cursor.fetchall()
+    conn.close()
+    
+    print(f"🔁 Simulating regrade of {assignment_name}: {len(submissions)} submissions")
+    print(f"📋 Rubric: {rubric_path}")
+    print(f"📊 Solution: {solution_path}")
+    
+    if not rubric_path:
+        raise ValueError(f"No rubric found for {assignment_name} - pass --rubric")
+    
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        grader = BusinessAnalyticsGraderV2(
+            rubric_path=rubric_path,
+            solution_path=solution_path,
+            connect_models=False
+        )
+    
+    students = []
+    for sub_id, student_id, nb_path, old_score, human_score, ai_feedback in submissions:
+        entry = {'id': sub_id, 'student_id': student_id, 'notebook_path': nb_path,
+                 'old_score': old_score, 'human_score': human_score}
+        
+        if not nb_path or not os.path.exists(nb_path):
+            entry['error'] = 'Notebook not found'
+            students.append(entry)
+            continue
+        
+        try:
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                result = grader.replay_submission(nb_path, ai_feedback)
+            if verbose:
+                print(log.getvalue())
+        except Exception as e:
+            entry['error'] = str(e)
+            students.append(entry)
+            continue
+        
+        entry['new_score'] = result['final_score']
+        entry['new_percentage'] = result['final_score_percentage']
+        entry['cached_ai_analysis'] = grader.grading_stats['cached_ai_analysis']
+        entry['change'] = entry['new_score'] - old_score if old_score is not None else None
+        students.append(entry)
+    
+    elapsed = time.time() - start_time
+    summary = _summarize_deltas(students)
+    summary['elapsed_seconds'] = round(elapsed, 2)
+    
+    report = {
+        'assignment': assignment_name,
+        'rubric_path': rubric_path,
+        'solution_path': solution_path,
+        'students': students,
+        'summary': summary
+    }
+    _print_delta_report(report)
+    
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {output_path}")
+    
+    return report
+
+
+def _summarize_deltas(students: list) -> dict:
+    """Cohort-level view of a simulated regrade"""
+    scored = [s for s in students if 'new_score' in s]
+    compared = [s for s in scored if s['change'] is not None]
+    changes = [s['change'] for s in compared]
+    
+    summary = {
+        'submissions': len(students),
+        'rescored': len(scored),
+        'errors': len(students) - len(scored),
+        'changed': sum(1 for c in changes if abs(c) >= 0.05),
+        'raised': sum(1 for c in changes if c >= 0.05),
+        'lowered': sum(1 for c in changes if c <= -0.05),
+        'mean_change': round(statistics.mean(changes), 2) if changes else 0.0,
+        'mean_abs_change': round(statistics.mean(abs(c) for c in changes), 2) if changes else 0.0,
+        'mean_old_score': round(statistics.mean(s['old_score'] for s in compared), 2) if compared else None,
+        'mean_new_score': round(statistics.mean(s['new_score'] for s in scored), 2) if scored else None
+    }
+    
+    # Agreement with instructor scores, where there are any
+    reviewed = [s for s in compared if s['human_score'] is not None]
+    if reviewed:
+        summary['human_reviewed'] = len(reviewed)
+        summary['old_mae_vs_human'] = round(statistics.mean(abs(s['old_score'] - s['human_score']) for s in reviewed), 2)
+        summary['new_mae_vs_human'] = round(statistics.mean(abs(s['new_score'] - s['human_score']) for s in reviewed), 2)
+    return summary
+
+
+def _print_delta_report(report: dict):
+    summary = report['summary']
+    
+    print("\n" + "="*80)
+    print(f"WHAT-IF REGRADE: {report['assignment']}")
+    print("="*80)
+    print(f"{'Student':<12} {'Old':>7} {'New':>7} {'Change':>8} {'Human':>7}")
+    print("-"*80)
+    
+    def fmt(value, spec='.1f'):
+        return format(value, spec) if value is not None else '-'
+    
+    for s in sorted(report['students'], key=lambda s: -abs(s.get('change') or 0)):
+        if 'error' in s:
+            print(f"{s['student_id']:<12} {fmt(s['old_score']):>7} {'❌':>7}  {s['error']}")
+            continue
+        print(f"{s['student_id']:<12} {fmt(s['old_score']):>7} {fmt(s['new_score']):>7} "
+              f"{fmt(s['change'], '+.1f'):>8} {fmt(s['human_score']):>7}")
+    
+    print("-"*80)
+    print(f"Rescored: {summary['rescored']}/{summary['submissions']} in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['errors']} errors)")
+    print(f"Changed: {summary['changed']} ({summary['raised']} up, {summary['lowered']} down) | "
+          f"mean change {summary['mean_change']:+.2f} | mean |change| {summary['mean_abs_change']:.2f}")
+    print(f"Mean score: {fmt(summary['mean_old_score'], '.2f')} → {fmt(summary['mean_new_score'], '.2f')} / 37.5")
+    if 'human_reviewed' in summary:
+        print(f"MAE vs instructor ({summary['human_reviewed']} reviewed): "
+              f"{summary['old_mae_vs_human']:.2f} → {summary['new_mae_vs_human']:.2f}")
+    print("="*80)
+
+
 if __name__ == '__main__':
-    regrade_assignment_7_submissions()
+    parser = argparse.ArgumentParser(description='Regrade stored submissions')
+    parser.add_argument('--simulate', metavar='ASSIGNMENT',
+                        help='What-if regrade of an assignment without the models (read-only)')
+    parser.add_argument('--rubric', help='Rubric to simulate with (default: the assignment\'s rubric)')
+    parser.add_argument('--solution', help='Solution notebook (default: the assignment\'s solution)')
+    parser.add_argument('--db', default='grading_database.db')
+    parser.add_argument('--output', help='Save the delta report as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Show validator output for each student')
+    args = parser.parse_args()
+    
+    if args.simulate:
+        simulate_regrade(args.simulate, args.rubric, args.solution, args.db, args.output, args.verbose)
+    else:
+        regrade_assignment_7_submissions()
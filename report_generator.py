@@ -16,6 +16,11 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from utils.structured_output import extract_json_object
+from utils.feedback_sanitizer import (
+    COMMENT_ARTIFACT_PATTERN, PROMPT_ECHO_PATTERN, REPORT_DIALOG_PATTERN, REPORT_LINE_FILTER, scrub
+)
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -64,21 +69,7 @@ class PDFReportGenerator:
             text = str(text)
         
         # Remove internal AI dialog and reasoning patterns
-        internal_patterns = [
-            r"What I'm looking for:.*?(?=\n|$)",
-            r"What to focus on:.*?(?=\n|$)",
-            r"Internal reasoning:.*?(?=\n|$)",
-            r"AI thinking:.*?(?=\n|$)",
-            r"Model dialog:.*?(?=\n|$)",
-            r"Express version:.*?(?=\n|$)",
-            r"Quick assessment:.*?(?=\n|$)",
-            r"\[Internal:.*?\]",
-            r"\[AI:.*?\]",
-            r"\[Reasoning:.*?\]"
-        ]
-        
-        for pattern in internal_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+        text = REPORT_DIALOG_PATTERN.sub('', text)
         
         # Replace bullet point characters with hyphens (preserve word spacing)
         bullet_chars = r'[■▪▫●○]'
@@ -100,42 +91,9 @@ class PDFReportGenerator:
     
     def _extract_json_from_response(self, ai_response: str) -> Optional[Dict[str, Any]]:
         """Extract only the JSON content from AI response, ignoring all internal monologue"""
-        if not ai_response:
-            return None
-        
         try:
-            # Find JSON content - look for the last complete JSON object
-            import re
-            
-            # Pattern to find JSON objects
-            json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-            json_matches = re.findall(json_pattern, ai_response, re.DOTALL)
-            
-            if not json_matches:
-                return None
-            
-            # Try to parse each JSON match, starting from the last one
-            for json_text in reversed(json_matches):
-                try:
-                    # Clean up the JSON text
-                    clean_json = json_text.strip()
-                    
-                    # Remove any trailing text after the JSON
-                    if clean_json.endswith('```'):
-                        clean_json = clean_json[:-3].strip()
-                    
-                    # Parse the JSON
-                    parsed_json = json.loads(clean_json)
-                    
-                    # Validate it has the expected structure
-                    if isinstance(parsed_json, dict) and ('detailed_feedback' in parsed_json or 'instructor_comments' in parsed_json):
-                        return parsed_json
-                        
-                except json.JSONDecodeError:
-                    continue
-            
-            return None
-            
+            # Last complete object with feedback keys, at any nesting depth
+            return extract_json_object(ai_response, any_of=('detailed_feedback', 'instructor_comments'))
         except Exception as e:
             logger.error(f"Error extracting JSON from AI response: {e}")
             return None
@@ -145,29 +103,8 @@ class PDFReportGenerator:
         if not comments:
             return ""
         
-        # Remove AI artifacts
-        clean_comments = comments
-        
         # Remove internal reasoning patterns
-        patterns_to_remove = [
-            r"We need to.*?\.",
-            r"Let's.*?\.",
-            r"First,.*?\.",
-            r"Now.*?\.",
-            r"The student provided.*?\.",
-            r"They have.*?\.",
-            r"<\|.*?\|>",
-            r"\{.*?\}",
-            r"JSON.*?"
-        ]
-        
-        for pattern in patterns_to_remove:
-            clean_comments = re.sub(pattern, '', clean_comments, flags=re.IGNORECASE | re.DOTALL)
-        
-        # Clean up whitespace
-        clean_comments = re.sub(r'\s+', ' ', clean_comments).strip()
-        
-        return clean_comments
+        return scrub(comments, COMMENT_ARTIFACT_PATTERN)
     
     def _clean_instructor_comments_thoroughly(self, comments: str) -> str:
         """Thoroughly clean instructor comments - remove ALL prompt text and artifacts"""
@@ -175,31 +112,7 @@ class PDFReportGenerator:
             return ""
         
         # Remove prompt text patterns
-        prompt_patterns = [
-            r"Must reference specific.*?(?=\n|$)",
-            r"Provide reflection assessment.*?(?=\n|$)",
-            r"Must be pure.*?(?=\n|$)",
-            r"Student's reflection.*?(?=\n\n|\Z)",
-            r"Reflection assessment items:.*?(?=\n\n|\Z)",
-            r"Analytical strengths:.*?(?=\n\n|\Z)",
-            r"Business application:.*?(?=\n\n|\Z)",
-            r"Learning demonstration:.*?(?=\n\n|\Z)",
-            r"Areas for development:.*?(?=\n\n|\Z)",
-            r"Recommendations:.*?(?=\n\n|\Z)",
-            r"Instructor comments:.*?(?=\n\n|\Z)",
-            r"assistantfinal\{.*?\}",
-            r"Make sure.*?(?=\n|$)",
-            r"Ensure.*?(?=\n|$)",
-            r"- \".*?\"",  # Remove quoted items
-            r"■",  # Remove special characters
-        ]
-        
-        clean_comments = comments
-        for pattern in prompt_patterns:
-            clean_comments = re.sub(pattern, '', clean_comments, flags=re.IGNORECASE | re.DOTALL)
-        
-        # Clean up whitespace
-        clean_comments = re.sub(r'\s+', ' ', clean_comments).strip()
+        clean_comments = scrub(comments, PROMPT_ECHO_PATTERN)
         
         # If too short after cleaning, return empty (don't use fallback)
         if len(clean_comments) < 50:
@@ -628,41 +541,8 @@ class PDFReportGenerator:
             if 'instructor_comments' in json_data:
                 return self._clean_instructor_comments(json_data['instructor_comments'])
         
-        # Fallback: aggressive filtering of raw text
-        lines = feedback_text.split('\n')
-        clean_lines = []
-        
-        # Skip everything that looks like internal AI reasoning
-        for line in lines:
-            line = line.strip()
-            
-            # Skip lines with internal AI patterns
-            if any(pattern in line.lower() for pattern in [
-                "we need to", "let's", "first, check", "now evaluate", "now assign",
-                "now produce", "let's craft", "the student provided", "they have code",
-                "did they complete", "the assignment required", "good.", "thus they",
-                "reflection quality:", "business understanding:", "communication clarity:",
-                "data interpretation:", "methodology appropriateness:", "overall score:",
-                "maybe", "now produce json", "<|end|>", "<|start|>", "assistant", "channel",
-                "final", "message"
-            ]):
-                continue
-            
-            # Skip empty lines or very short lines
-            if len(line) < 15:
-                continue
-            
-            # Skip lines that are clearly internal reasoning
-            if line.startswith(("We ", "Let's ", "First ", "Now ", "The student ", "They ")):
-                continue
-            
-            # Include lines that look like actual feedback
-            if line and not any(skip_word in line.lower() for skip_word in [
-                "evaluate", "assess", "check completeness", "assign scores", "craft feedback"
-            ]):
-                clean_lines.append(line)
-        
-        return ' '.join(clean_lines[:3])  # Limit to first 3 clean lines
+        # Fallback: aggressive filtering of raw text (first 3 lines that read like feedback)
+        return REPORT_LINE_FILTER.filter(feedback_text)
     
     def _add_question_analysis(self, story, question_analysis: Dict[str, Any]):
         """Add clean reflection questions analysis - instructor feedback only"""
@@ -5,16 +5,15 @@ Prevents AI from giving inflated scores
 Now with smarter validation that checks for errors and required variables
 """
 
-def validate_and_adjust_scores(code_analysis: dict, feedback: dict, student_code: str, template_code: str = "", rubric: dict = None, output_comparison: dict = None) -> tuple:
+import json
+
+
+def completion_cap(student_code: str, template_code: str = "") -> tuple:
     """
-    Validate scores and adjust if AI was too generous
-    Now includes output comparison validation
-    Returns (adjusted_code_analysis, adjusted_feedback)
+    Highest score the completed work allows: 20 for what is essentially
+    the template, then 50/70/100 by the number of empty TODO sections
+    Returns (max_score, reason)
     """
-    print("="*80)
-    print("🔍 SCORE VALIDATOR CALLED")
-    print("="*80)
-    
     # Count TODO sections that are ACTUALLY incomplete (no working code after them)
     incomplete_todos = 0
     lines = student_code.split('\n')
@@ -61,6 +60,84 @@ def validate_and_adjust_scores(code_analysis: dict, feedback: dict, student_code
         max_score = 100
         reason = None
     
+    return max_score, reason
+
+
+# Feedback sections a usable draft fills in (of the six in the feedback schema)
+MIN_DRAFT_SECTIONS = 4
+FEEDBACK_SCORE_KEYS = ('overall_score', 'business_understanding', 'communication_clarity', 'data_interpretation',
+                       'methodology_appropriateness', 'reflection_quality')
+
+
+def check_feedback_draft(feedback: dict, student_code: str, template_code: str = "", rubric: dict = None,
+                         min_rubric_coverage: float = 1.0, max_score_spread: float = 30) -> list:
+    """
+    Cheap checks on feedback drafted by a small model, before trusting it
+    over the large model: structure, rubric coverage and score consistency
+    (the completion cap above, and component scores near the overall one).
+    By default every rubric element must be mentioned; a lower
+    min_rubric_coverage accepts drafts that cover that share of them
+    Returns the problems found (empty list = draft accepted)
+    """
+    if not isinstance(feedback, dict):
+        return ["Draft is not a JSON object"]
+    
+    problems = []
+    
+    # Structure
+    detailed = feedback.get('detailed_feedback')
+    comments = feedback.get('instructor_comments')
+    if not isinstance(comments, str) or len(comments.strip()) < 40:
+        problems.append("Instructor comments missing or too short")
+    if not isinstance(detailed, dict):
+        problems.append("No detailed feedback")
+        detailed = {}
+    filled = [key for key, entries in detailed.items() if isinstance(entries, list) and any(str(e).strip() for e in entries)]
+    if len(filled) < MIN_DRAFT_SECTIONS:
+        problems.append(f"Only {len(filled)} detailed feedback sections filled in")
+    
+    # Rubric coverage: each rubric element should come up somewhere in the text
+    if rubric and rubric.get('rubric_elements'):
+        text = json.dumps(feedback).lower()
+        covered = []
+        for element in rubric['rubric_elements']:
+            stems = [word[:5] for word in element.lower().split('_') if len(word) >= 4]
+            if not stems or any(stem in text for stem in stems):
+                covered.append(element)
+        coverage = len(covered) / len(rubric['rubric_elements'])
+        if coverage < min_rubric_coverage:
+            missing = [e for e in rubric['rubric_elements'] if e not in covered]
+            problems.append(f"Covers {coverage:.0%} of the rubric (missing: {', '.join(missing[:4])})")
+    
+    # Score consistency
+    scores = {key: feedback.get(key) for key in FEEDBACK_SCORE_KEYS if isinstance(feedback.get(key), (int, float))}
+    overall = scores.get('overall_score')
+    if overall is None:
+        problems.append("No overall score")
+    elif not 0 <= overall <= 100:
+        problems.append(f"Overall score {overall} outside 0-100")
+    else:
+        max_score, reason = completion_cap(student_code, template_code)
+        if overall > max_score:
+            problems.append(f"Overall score {overall} above the {max_score} cap: {reason}")
+        components = [value for key, value in scores.items() if key != 'overall_score']
+        if components and abs(overall - sum(components) / len(components)) > max_score_spread:
+            problems.append(f"Overall score {overall} far from its components (mean {sum(components) / len(components):.0f})")
+    
+    return problems
+
+def validate_and_adjust_scores(code_analysis: dict, feedback: dict, student_code: str, template_code: str = "", rubric: dict = None, output_comparison: dict = None) -> tuple:
+    """
+    Validate scores and adjust if AI was too generous
+    Now includes output comparison validation
+    Returns (adjusted_code_analysis, adjusted_feedback)
+    """
+    print("="*80)
+    print("🔍 SCORE VALIDATOR CALLED")
+    print("="*80)
+    
+    max_score, reason = completion_cap(student_code, template_code)
+    
     # Adjust code analysis scores
     original_technical = code_analysis.get('technical_score', 0)
     if original_technical > max_score:
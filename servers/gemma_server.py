@@ -5,7 +5,7 @@ Serves the Gemma 3.0 model via HTTP API
 """
 
 from flask import Flask, request, jsonify
-from mlx_lm import load, generate
+from mlx_lm import load, stream_generate
 import time
 import logging
 
@@ -68,17 +68,13 @@ def generate_text():
         logger.info(f"🚀 Generating response (max_tokens: {max_tokens})")
         start_time = time.time()
         
-        # Generate response
-        response_generator = generate(
-            model=model,
-            tokenizer=tokenizer,
-            prompt=prompt,
-            max_tokens=max_tokens,
-            verbose=False
-        )
-        
-        # Collect all tokens
-        response_text = ''.join(response_generator)
+        # Stream so we get exact prompt/generated token counts from MLX
+        response_text = ''
+        prompt_tokens = generated_tokens = 0
+        for chunk in stream_generate(model, tokenizer, prompt, max_tokens=max_tokens):
+            response_text += chunk.text
+            prompt_tokens = chunk.prompt_tokens
+            generated_tokens = chunk.generation_tokens
         
         generation_time = time.time() - start_time
         logger.info(f"✅ Response generated in {generation_time:.2f}s")
@@ -86,7 +82,13 @@ def generate_text():
         return jsonify({
             'response': response_text,
             'generation_time': generation_time,
-            'tokens': len(response_text.split()),
+            'tokens': generated_tokens,
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'prefill_tokens': prompt_tokens,
+                'generated_tokens': generated_tokens,
+                'cached_tokens': 0
+            },
             'model': 'Qwen3-Coder-30B-A3B-Instruct-bf16'
         })
         
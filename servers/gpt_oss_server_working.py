@@ -5,10 +5,15 @@ Serves the Gemma 3.0 model via HTTP API
 """
 
 from flask import Flask, request, jsonify
-from mlx_lm import load, generate
+from mlx_lm import load, stream_generate
+import os
+import sys
 import time
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from disaggregated_inference.metrics_agent import GenerationCounter, start_server_agent
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +26,9 @@ tokenizer = None
 model_loaded = False
 MODEL_NAME = 'lmstudio-community/gpt-oss-120b-MLX-8bit'  # Dynamic model name
 
+# Requests and tokens for /health and the metrics agent
+generation_counter = GenerationCounter()
+
 def load_model():
     """Load the GPT-OSS model"""
     global model, tokenizer, model_loaded
@@ -42,7 +50,8 @@ def health_check():
     return jsonify({
         'status': 'healthy' if model_loaded else 'loading',
         'model': MODEL_NAME,
-        'loaded': model_loaded
+        'loaded': model_loaded,
+        **generation_counter.stats()
     })
 
 @app.route('/generate', methods=['POST'])
@@ -69,17 +78,20 @@ def generate_text():
         logger.info(f"🚀 Generating response (max_tokens: {max_tokens})")
         start_time = time.time()
         
-        # Generate response
-        response_generator = generate(
-            model=model,
-            tokenizer=tokenizer,
-            prompt=prompt,
-            max_tokens=max_tokens,
-            verbose=False
-        )
-        
-        # Collect all tokens
-        response_text = ''.join(response_generator)
+        # Stream so we get exact prompt/generated token counts from MLX
+        response_text = ''
+        prompt_tokens = generated_tokens = 0
+        first_token_time = None
+        generation_counter.started()
+        try:
+            for chunk in stream_generate(model, tokenizer, prompt, max_tokens=max_tokens):
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                response_text += chunk.text
+                prompt_tokens = chunk.prompt_tokens
+                generated_tokens = chunk.generation_tokens
+        finally:
+            generation_counter.finished(generated_tokens)
         
         generation_time = time.time() - start_time
         logger.info(f"✅ Response generated in {generation_time:.2f}s")
@@ -87,7 +99,17 @@ def generate_text():
         return jsonify({
             'response': response_text,
             'generation_time': generation_time,
-            'tokens': len(response_text.split()),
+            'timings': {
+                'first_token': first_token_time or 0.0,
+                'decode': generation_time - (first_token_time or 0.0)
+            },
+            'tokens': generated_tokens,
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'prefill_tokens': prompt_tokens,
+                'generated_tokens': generated_tokens,
+                'cached_tokens': 0
+            },
             'model': MODEL_NAME
         })
         
@@ -115,6 +137,8 @@ if __name__ == '__main__':
     # Load model on startup
     if load_model():
         print("🚀 Server ready! Starting Flask app...")
+        # Pushes local metrics to the dashboards when METRICS_COLLECTOR_URL is set
+        start_server_agent("Mac Studio 1 (GPT-OSS)", generation_counter)
         app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
     else:
         print("❌ Failed to start server - model loading failed")
\ No newline at end of file
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Mock Model Server
+Deterministic HTTP stand-in for every model API the grading system
+calls, so the clients, orchestrator and benchmarks can be load-tested
+without GPUs:
+
+  - MLX model servers:              POST /generate, GET /health, /status
+  - disaggregated prefill/decode:   POST /prefill, /decode
+  - Ollama:                         POST /api/generate, GET /api/tags
+
+Nothing is generated. Each request sleeps for a time to first token and
+a decode time, drawn from configurable distributions. Responses come
+from a file (--responses) or are schema-valid JSON
+(utils/structured_output.py) with scores seeded from the prompt. The
+same seed and prompts give the same responses and latencies on every
+run.
+
+Failures are injected at set rates: HTTP 500s, 503 backpressure, hung
+requests, and responses cut off half way (truncated JSON; streams end
+without 'done'). Settings can be changed while the server runs
+(POST /mock/config) to ramp a load test. GET /mock/stats counts the
+outcome of every request.
+
+    python servers/mock_model_server.py --port 5002 --ttft normal:0.5,0.1 --tokens-per-sec 40 --fail busy=0.05
+"""
+
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from disaggregated_inference.metrics_agent import GenerationCounter
+from disaggregated_inference.server_runtime import token_usage
+from utils.structured_output import CODE_ANALYSIS_SCHEMA, FEEDBACK_SCHEMA
+
+SCHEMAS = {'code_analysis': CODE_ANALYSIS_SCHEMA, 'feedback': FEEDBACK_SCHEMA}
+
+# Ollama model names the graders ask for, mapped to the response they expect
+DEFAULT_OLLAMA_MODELS = {
+    'hopephoto/qwen3-coder-30b-a3b-instruct_q8:latest': 'code_analysis',
+    'gemma3:27b-it-q8_0': 'feedback'
+}
+
+# Injected failure modes, checked in this order
+FAILURES = ('error', 'busy', 'hang', 'truncate')
+
+CHARS_PER_TOKEN = 4
+FILLER = "The analysis applies the assignment's data wrangling steps and explains the business result clearly."
+
+
+class Distribution:
+    """
+    Seconds (or tokens/sec) drawn per request from a spec: '0.5' (fixed),
+    'uniform:0.2,0.8', 'normal:0.5,0.1' (mean, sd) or 'exp:0.5' (mean)
+    """
+
+    PARAMETERS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'exp': 1}
+
+    def __init__(self, spec: Any):
+        self.spec = str(spec)
+        kind, _, params = self.spec.rpartition(':')
+        self.kind = kind or 'fixed'
+        try:
+            self.params = [float(p) for p in params.split(',')]
+        except ValueError:
+            raise ValueError(f"bad distribution '{self.spec}'")
+        if len(self.params) != self.PARAMETERS.get(self.kind, -1):
+            raise ValueError(f"bad distribution '{self.spec}' (use one of: 0.5, uniform:a,b, normal:mean,sd, exp:mean)")
+
+    def sample(self, rng: random.Random) -> float:
+        """A draw, never negative"""
+        if self.kind == 'uniform':
+            value = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            value = rng.gauss(*self.params)
+        elif self.kind == 'exp':
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        else:
+            value = self.params[0]
+        return max(0.0, value)
+
+
+def example_for_schema(schema: Dict[str, Any], score: int = 85) -> Any:
+    """A value that satisfies the schema (every property filled in)"""
+    kind = schema.get('type')
+    if kind == 'object':
+        return {key: example_for_schema(value, score) for key, value in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [example_for_schema(schema.get('items', {'type': 'string'}), score) for _ in range(2)]
+    if kind in ('integer', 'number'):
+        return score
+    if kind == 'boolean':
+        return True
+    return FILLER
+
+
+def canned_response(schema: Dict[str, Any], tokens: int, score: int = 85) -> str:
+    """Schema-valid JSON text of about `tokens` tokens (string lists padded with filler)"""
+    value = example_for_schema(schema, score)
+    lists = _string_lists(value)
+    text = json.dumps(value, indent=2)
+    while lists and len(text) < tokens * CHARS_PER_TOKEN:
+        for items in lists:
+            items.append(FILLER)
+        text = json.dumps(value, indent=2)
+    return text
+
+
+def _string_lists(value: Any) -> List[List]:
+    if isinstance(value, dict):
+        return [items for child in value.values() for items in _string_lists(child)]
+    if isinstance(value, list) and value and isinstance(value[0], str):
+        return [value]
+    return []
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class MockModel:
+    """Latency, response and failure settings for one mock server"""
+
+    def __init__(self, name: str = 'mock', role: str = 'code_analysis', ttft: Any = 0.5,
+                 tokens_per_sec: Any = 40.0, response_tokens: int = 400, seed: int = 0,
+                 failures: Optional[Dict[str, float]] = None, max_concurrency: int = 0,
+                 hang_seconds: float = 30.0, responses: Optional[Dict[str, Any]] = None,
+                 ollama_models: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            name: Model name reported by /status and /health
+            role: Response shape for /generate and /decode ('code_analysis' or 'feedback')
+            ttft: Time to first token distribution (seconds)
+            tokens_per_sec: Decode speed distribution
+            response_tokens: Approximate length of generated responses
+            seed: Same seed + same prompts = same responses and latencies
+            failures: Failure mode -> rate (0-1), see FAILURES
+            max_concurrency: Requests served at once before 503s (0 = unlimited)
+            hang_seconds: How long a 'hang' failure stalls before answering
+            responses: Role -> canned response text (or list of texts to pick from)
+            ollama_models: Ollama model name -> role, for /api/tags and /api/generate
+        """
+        self.name = name
+        self.role = role
+        self.responses = responses or {}
+        self.ollama_models = ollama_models or dict(DEFAULT_OLLAMA_MODELS)
+        self.available = True
+        self.counter = GenerationCounter()
+        self.stats = Counter()
+        self._seen = Counter()
+        self._texts = {}
+        self._lock = threading.Lock()
+        self.configure(ttft=ttft, tokens_per_sec=tokens_per_sec, response_tokens=response_tokens,
+                       seed=seed, failures=failures or {}, max_concurrency=max_concurrency,
+                       hang_seconds=hang_seconds)
+
+    def configure(self, **settings) -> Dict[str, Any]:
+        """Change settings (also at runtime through POST /mock/config); raises ValueError"""
+        unknown = set(settings) - {'ttft', 'tokens_per_sec', 'response_tokens', 'seed', 'failures',
+                                   'max_concurrency', 'hang_seconds', 'available', 'role'}
+        if unknown:
+            raise ValueError(f"unknown settings: {', '.join(sorted(unknown))}")
+        failures = settings.get('failures', {})
+        if set(failures) - set(FAILURES) or not all(0 <= rate <= 1 for rate in failures.values()):
+            raise ValueError(f"failures must map {', '.join(FAILURES)} to rates between 0 and 1")
+        if settings.get('role', self.role) not in SCHEMAS:
+            raise ValueError(f"role must be one of {', '.join(SCHEMAS)}")
+
+        for key in ('ttft', 'tokens_per_sec'):
+            if key in settings:
+                settings[key] = Distribution(settings[key])
+        with self._lock:
+            for key, value in settings.items():
+                setattr(self, key, value)
+            self._texts.clear()
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            'name': self.name, 'role': self.role, 'ttft': self.ttft.spec, 'tokens_per_sec': self.tokens_per_sec.spec,
+            'response_tokens': self.response_tokens, 'seed': self.seed, 'failures': dict(self.failures),
+            'max_concurrency': self.max_concurrency, 'hang_seconds': self.hang_seconds, 'available': self.available
+        }
+
+    def reset(self):
+        """Forget request history, so a rerun draws the same sequence again"""
+        with self._lock:
+            self.stats.clear()
+            self._seen.clear()
+
+    def plan(self, endpoint: str, prompt: str) -> Dict[str, Any]:
+        """
+        Everything random about one request, from a generator seeded by the
+        prompt and how many times it has been seen (not by arrival order,
+        so concurrent requests draw the same values on every run)
+        """
+        digest = hashlib.sha256(prompt.encode('utf-8', 'replace')).hexdigest()[:16]
+        with self._lock:
+            self._seen[(endpoint, digest)] += 1
+            rng = random.Random(f"{self.seed}:{endpoint}:{digest}:{self._seen[(endpoint, digest)]}")
+        failure = None
+        for mode in FAILURES:
+            if rng.random() < self.failures.get(mode, 0.0) and failure is None:
+                failure = mode
+        return {
+            'rng': rng,
+            'failure': failure,
+            'ttft': self.ttft.sample(rng),
+            'tokens_per_sec': max(0.1, self.tokens_per_sec.sample(rng)),
+            'prompt_tokens': count_tokens(prompt)
+        }
+
+    def text_for(self, plan: Dict[str, Any], role: str, schema: Optional[Dict] = None,
+                 max_tokens: Optional[int] = None) -> str:
+        """Canned or generated response, cut to max_tokens (and in half for a 'truncate' failure)"""
+        rng = plan['rng']
+        canned = self.responses.get(role)
+        if canned is not None:
+            text = canned if isinstance(canned, str) else rng.choice(canned)
+        else:
+            schema = schema or SCHEMAS[role]
+            key = (json.dumps(schema, sort_keys=True), rng.randint(60, 98))
+            with self._lock:
+                text = self._texts.get(key)
+            if text is None:
+                text = canned_response(schema, self.response_tokens, score=key[1])
+                with self._lock:
+                    self._texts[key] = text
+        if max_tokens:
+            text = text[:max_tokens * CHARS_PER_TOKEN]
+        if plan['failure'] == 'truncate':
+            text = text[:len(text) // 2]
+        return text
+
+    def admit(self) -> bool:
+        """Start a request unless max_concurrency are already running"""
+        with self._lock:
+            if self.max_concurrency and self.counter.active_requests >= self.max_concurrency:
+                return False
+            self.counter.started()
+            return True
+
+    def record(self, endpoint: str, outcome: str):
+        with self._lock:
+            self.stats[f"{endpoint} {outcome}"] += 1
+
+    def wait_first_token(self, plan: Dict[str, Any]):
+        if plan['failure'] == 'hang':
+            time.sleep(self.hang_seconds)
+        time.sleep(plan['ttft'])
+
+    def chunks(self, text: str, plan: Dict[str, Any], chunk_tokens: int = 8) -> Iterator[str]:
+        """The response in pieces of about chunk_tokens tokens, at the planned decode speed"""
+        step = chunk_tokens * CHARS_PER_TOKEN
+        for i in range(0, len(text), step):
+            chunk = text[i:i + step]
+            time.sleep(count_tokens(chunk) / plan['tokens_per_sec'])
+            yield chunk
+
+
+def create_mock_app(model: MockModel) -> Flask:
+    app = Flask(__name__)
+
+    def rejection(endpoint: str, plan: Dict[str, Any]):
+        """Error response for unavailable/failed/busy requests, else None (and the request is admitted)"""
+        if not model.available:
+            model.record(endpoint, 'unavailable')
+            return jsonify({'error': 'Model not loaded'}), 503
+        if plan['failure'] == 'error':
+            model.record(endpoint, 'error')
+            return jsonify({'error': 'Injected failure'}), 500
+        if plan['failure'] == 'busy' or not model.admit():
+            model.record(endpoint, 'busy')
+            return jsonify({'error': 'Queue full', 'queue': model.counter.stats()}), 503, {'Retry-After': '1'}
+        return None
+
+    def finish(endpoint: str, plan: Dict[str, Any], text: str, complete: bool = True):
+        model.counter.finished(count_tokens(text))
+        model.record(endpoint, (plan['failure'] or 'ok') if complete else 'truncate')
+
+    def timed(endpoint: str, plan: Dict[str, Any], text: str, prefill: bool = True) -> Dict[str, float]:
+        """Sleep through a whole generation; returns its timings"""
+        start = time.time()
+        try:
+            if prefill:
+                model.wait_first_token(plan)
+            first_token = time.time() - start
+            time.sleep(count_tokens(text) / plan['tokens_per_sec'])
+        finally:
+            finish(endpoint, plan, text)
+        return {'first_token': first_token, 'decode': time.time() - start - first_token,
+                'total': time.time() - start}
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'healthy' if model.available else 'loading', 'model': model.name,
+                        'loaded': model.available, **model.counter.stats()})
+
+    @app.route('/status', methods=['GET'])
+    def status():
+        if not model.available:
+            return jsonify({'error': 'Model not loaded'}), 503
+        return jsonify({'server': 'Mock Model Server', 'model': model.name, 'loaded': True,
+                        'purpose': model.role, 'mock': True})
+
+    @app.route('/generate', methods=['POST'])
+    def generate():
+        data = request.get_json(force=True, silent=True) or {}
+        prompt = data.get('prompt', '')
+        if not prompt:
+            return jsonify({'error': 'No prompt provided'}), 400
+        plan = model.plan('/generate', prompt)
+        rejected = rejection('/generate', plan)
+        if rejected:
+            return rejected
+        text = model.text_for(plan, model.role, max_tokens=data.get('max_tokens'))
+
+        if data.get('stream'):
+            def lines():
+                start = time.time()
+                sent = ''
+                try:
+                    model.wait_first_token(plan)
+                    first_token = time.time() - start
+                    for chunk in model.chunks(text, plan):
+                        sent += chunk
+                        yield json.dumps({'text': chunk}) + '\n'
+                    if plan['failure'] != 'truncate':
+                        yield json.dumps({'done': True, 'generation_time': time.time() - start,
+                                          'timings': {'first_token': first_token,
+                                                      'decode': time.time() - start - first_token},
+                                          'usage': token_usage(plan['prompt_tokens'], count_tokens(sent)),
+                                          'model': model.name}) + '\n'
+                finally:
+                    finish('/generate', plan, sent, complete=sent == text)
+            return Response(lines(), mimetype='application/x-ndjson')
+
+        timings = timed('/generate', plan, text)
+        return jsonify({
+            'response': text,
+            'generation_time': timings['total'],
+            'timings': {'first_token': timings['first_token'], 'decode': timings['decode']},
+            'tokens': count_tokens(text),
+            'usage': token_usage(plan['prompt_tokens'], count_tokens(text)),
+            'model': model.name
+        })
+
+    @app.route('/prefill', methods=['POST'])
+    def prefill():
+        data = request.get_json(force=True, silent=True) or {}
+        prompt = data.get('prompt', '')
+        if not prompt:
+            return jsonify({'error': 'No prompt provided'}), 400
+        plan = model.plan('/prefill', prompt)
+        rejected = rejection('/prefill', plan)
+        if rejected:
+            return rejected
+        start = time.time()
+        try:
+            model.wait_first_token(plan)
+        finally:
+            finish('/prefill', plan, '')
+        prefill_time = time.time() - start
+        return jsonify({
+            'context': prompt,
+            'prompt': prompt,
+            'prefill_time': prefill_time,
+            'model': model.name,
+            'backend': 'Mock',
+            'usage': token_usage(plan['prompt_tokens'], 0),
+            'metrics': {
+                'prompt_eval_count': plan['prompt_tokens'],
+                'prompt_tokens_per_sec': plan['prompt_tokens'] / prefill_time if prefill_time > 0 else 0,
+                'prompt_chars': len(prompt)
+            }
+        })
+
+    @app.route('/decode', methods=['POST'])
+    def decode():
+        data = request.get_json(force=True, silent=True) or {}
+        prompt = data.get('prompt') or data.get('context') or ''
+        if not prompt and not data.get('kv_cache'):
+            return jsonify({'error': 'No KV cache or prompt provided'}), 400
+        plan = model.plan('/decode', prompt or str(data.get('input_ids')))
+        rejected = rejection('/decode', plan)
+        if rejected:
+            return rejected
+        text = model.text_for(plan, model.role, max_tokens=data.get('max_new_tokens', 100))
+        timings = timed('/decode', plan, text, prefill=False)
+        generated = count_tokens(text)
+        return jsonify({
+            'generated_text': text,
+            'decode_time': timings['total'],
+            'kv_cache_used': False,
+            'cached_tokens': 0,
+            'tokens_generated': generated,
+            'tokens_per_sec': generated / timings['total'] if timings['total'] > 0 else 0,
+            'usage': token_usage(plan['prompt_tokens'], generated)
+        })
+
+    @app.route('/api/tags', methods=['GET'])
+    def tags():
+        return jsonify({'models': [{'name': name} for name in model.ollama_models]})
+
+    @app.route('/api/generate', methods=['POST'])
+    def ollama_generate():
+        data = request.get_json(force=True, silent=True) or {}
+        name = data.get('model', model.name)
+        prompt = data.get('prompt', '')
+        requested = data.get('format') if isinstance(data.get('format'), dict) else None
+        role = model.ollama_models.get(name) or next((r for r, schema in SCHEMAS.items() if schema == requested),
+                                                     model.role)
+        num_predict = (data.get('options') or {}).get('num_predict')
+
+        plan = model.plan('/api/generate', f"{name}\n{prompt}")
+        rejected = rejection('/api/generate', plan)
+        if rejected:
+            return rejected
+        text = '' if num_predict == 0 else model.text_for(plan, role, requested, max_tokens=num_predict)
+
+        if not data.get('stream', True) or num_predict == 0:
+            timings = timed('/api/generate', plan, text)
+            return jsonify({'model': name, 'response': text, 'done': True,
+                            'prompt_eval_count': plan['prompt_tokens'],
+                            'prompt_eval_duration': int(timings['first_token'] * 1e9),
+                            'eval_count': count_tokens(text), 'eval_duration': int(timings['decode'] * 1e9),
+                            'total_duration': int(timings['total'] * 1e9)})
+
+        def lines():
+            start = time.time()
+            sent = ''
+            try:
+                model.wait_first_token(plan)
+                first_token = time.time() - start
+                for chunk in model.chunks(text, plan):
+                    sent += chunk
+                    yield json.dumps({'model': name, 'response': chunk, 'done': False}) + '\n'
+                if plan['failure'] != 'truncate':
+                    yield json.dumps({'model': name, 'response': '', 'done': True,
+                                      'prompt_eval_count': plan['prompt_tokens'],
+                                      'prompt_eval_duration': int(first_token * 1e9),
+                                      'eval_count': count_tokens(sent),
+                                      'eval_duration': int((time.time() - start - first_token) * 1e9),
+                                      'total_duration': int((time.time() - start) * 1e9)}) + '\n'
+            finally:
+                finish('/api/generate', plan, sent, complete=sent == text)
+
+        return Response(lines(), mimetype='application/x-ndjson')
+
+    @app.route('/mock/config', methods=['GET', 'POST'])
+    def config():
+        if request.method == 'GET':
+            return jsonify(model.settings())
+        try:
+            return jsonify(model.configure(**(request.get_json(force=True, silent=True) or {})))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/mock/stats', methods=['GET'])
+    def stats():
+        return jsonify({'requests': dict(model.stats), **model.counter.stats()})
+
+    @app.route('/mock/reset', methods=['POST'])
+    def reset():
+        model.reset()
+        return jsonify({'reset': True})
+
+    return app
+
+
+def serve_in_thread(app: Flask, host: str = '127.0.0.1', port: int = 0) -> Tuple[str, Any]:
+    """Run an app on a background thread (port 0 picks a free one); returns (url, server)"""
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mock model server for benchmarks and load tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=5002, help='Port to listen on')
+    parser.add_argument('--name', default='mock-model', help='Model name to report')
+    parser.add_argument('--role', choices=sorted(SCHEMAS), default='code_analysis',
+                        help='Response shape for /generate and /decode')
+    parser.add_argument('--ttft', default='0.5', help="Seconds to first token, e.g. 0.5, uniform:0.2,0.8, normal:0.5,0.1, exp:0.5")
+    parser.add_argument('--tokens-per-sec', default='40', help='Decode speed (same forms as --ttft)')
+    parser.add_argument('--response-tokens', type=int, default=400, help='Approximate response length')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for responses, latencies and failures')
+    parser.add_argument('--fail', action='append', default=[], metavar='MODE=RATE',
+                        help=f"Inject failures ({', '.join(FAILURES)}), e.g. --fail busy=0.05")
+    parser.add_argument('--max-concurrency', type=int, default=0, help='Concurrent requests before 503s (0 = unlimited)')
+    parser.add_argument('--hang-seconds', type=float, default=30.0, help="How long a 'hang' failure stalls")
+    parser.add_argument('--responses', help='JSON file mapping role to a canned response (or a list of them)')
+    args = parser.parse_args()
+
+    try:
+        failures = {mode: float(rate) for mode, rate in (item.split('=', 1) for item in args.fail)}
+    except ValueError:
+        parser.error("--fail takes MODE=RATE")
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    try:
+        model = MockModel(args.name, args.role, args.ttft, args.tokens_per_sec, args.response_tokens,
+                          seed=args.seed, failures=failures, max_concurrency=args.max_concurrency,
+                          hang_seconds=args.hang_seconds, responses=responses)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"🎭 Mock model server '{args.name}' on {args.host}:{args.port} "
+          f"(TTFT {args.ttft}s, {args.tokens_per_sec} tok/s, ~{args.response_tokens} tokens, seed {args.seed})")
+    if failures:
+        print(f"💥 Injecting failures: {', '.join(f'{mode} {rate:.0%}' for mode, rate in failures.items())}")
+    create_mock_app(model).run(host=args.host, port=args.port, debug=False, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -74,6 +74,12 @@ def prefill():
         return jsonify({
             'prompt': prompt,
             'context': result.get('context', []),  # KV cache for decode
+            'usage': {
+                'prompt_tokens': prompt_eval_count,
+                'prefill_tokens': prompt_eval_count,
+                'generated_tokens': result.get('eval_count', 0),
+                'cached_tokens': 0
+            },
             'metrics': {
                 'prompt_eval_count': prompt_eval_count,
                 'prompt_eval_duration_ns': prompt_eval_duration,
@@ -5,10 +5,15 @@ Serves the Qwen 3.0 Coder model via HTTP API
 """
 
 from flask import Flask, request, jsonify
-from mlx_lm import load, generate
+from mlx_lm import load, stream_generate
+import os
+import sys
 import time
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from disaggregated_inference.metrics_agent import GenerationCounter, start_server_agent
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,6 +25,9 @@ model = None
 tokenizer = None
 model_loaded = False
 
+# Requests and tokens for /health and the metrics agent
+generation_counter = GenerationCounter()
+
 def load_model():
     """Load the Qwen model"""
     global model, tokenizer, model_loaded
@@ -41,7 +49,8 @@ def health_check():
     return jsonify({
         'status': 'healthy' if model_loaded else 'loading',
         'model': 'Qwen3-Coder-30B-A3B-Instruct-bf16',
-        'loaded': model_loaded
+        'loaded': model_loaded,
+        **generation_counter.stats()
     })
 
 @app.route('/generate', methods=['POST'])
@@ -66,24 +75,24 @@ def generate_text():
         logger.info(f"📝 Prompt preview: {prompt[:200]}...")
         start_time = time.time()
         
-        # Generate response (returns a generator)
+        # Stream so we get exact prompt/generated token counts from MLX
         # Note: MLX-LM 0.28.1 doesn't support temp parameter in generate_step
         # Temperature control would require upgrading MLX-LM or using different sampling
-        response_generator = generate(
-            model=model,
-            tokenizer=tokenizer,
-            prompt=prompt,
-            max_tokens=max_tokens,
-            verbose=False
-        )
-        
-        # Collect all generated tokens into a list first, then join
-        tokens = []
-        for token in response_generator:
-            tokens.append(token)
-        response_text = ''.join(tokens)
+        response_text = ''
+        prompt_tokens = generated_tokens = 0
+        first_token_time = None
+        generation_counter.started()
+        try:
+            for chunk in stream_generate(model, tokenizer, prompt, max_tokens=max_tokens):
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                response_text += chunk.text
+                prompt_tokens = chunk.prompt_tokens
+                generated_tokens = chunk.generation_tokens
+        finally:
+            generation_counter.finished(generated_tokens)
         
-        logger.info(f"🔍 Collected {len(tokens)} tokens from generator")
+        logger.info(f"🔍 {prompt_tokens} prompt tokens, {generated_tokens} generated tokens")
         
         generation_time = time.time() - start_time
         logger.info(f"✅ Response generated in {generation_time:.2f}s")
@@ -93,7 +102,17 @@ def generate_text():
         return jsonify({
             'response': response_text,
             'generation_time': generation_time,
-            'tokens': len(response_text.split()),
+            'timings': {
+                'first_token': first_token_time or 0.0,
+                'decode': generation_time - (first_token_time or 0.0)
+            },
+            'tokens': generated_tokens,
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'prefill_tokens': prompt_tokens,
+                'generated_tokens': generated_tokens,
+                'cached_tokens': 0
+            },
             'model': 'Qwen3-Coder-30B-A3B-Instruct-bf16'
         })
         
@@ -121,6 +140,8 @@ if __name__ == '__main__':
     # Load model on startup
     if load_model():
         print("🚀 Server ready! Starting Flask app...")
+        # Pushes local metrics to the dashboards when METRICS_COLLECTOR_URL is set
+        start_server_agent("Mac Studio 2 (Qwen)", generation_counter)
         app.run(host='0.0.0.0', port=5002, debug=False, threaded=True)
     else:
         print("❌ Failed to start server - model loading failed")
\ No newline at end of file
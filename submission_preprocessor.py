@@ -9,6 +9,8 @@ import json
 import nbformat
 from typing import Dict, List, Any, Tuple
 
+from utils.prompt_packer import DEFAULT_PROMPT_TOKENS, pack_notebook_cells
+
 
 class SubmissionPreprocessor:
     """Preprocess submissions to fix common issues before AI grading"""
@@ -24,6 +26,9 @@ class SubmissionPreprocessor:
     def __init__(self):
         self.fixes_applied = []
         self.fix_types = []  # Track types for penalty calculation
+        self.cells = []  # [{'code', 'output'}] from the last preprocessed notebook
+        self.markdown_cells = []
+        self.notebook_text = ("", "")  # (cleaned_code, cleaned_markdown) the cells above came from
     
     def preprocess_notebook(self, notebook_path: str) -> Tuple[str, str, List[str]]:
         """
@@ -33,6 +38,9 @@ class SubmissionPreprocessor:
             Tuple of (cleaned_code, cleaned_markdown, list_of_fixes_applied)
         """
         self.fixes_applied = []
+        self.cells = []
+        self.markdown_cells = []
+        self.notebook_text = ("", "")
         
         try:
             with open(notebook_path, 'r', encoding='utf-8') as f:
@@ -50,20 +58,24 @@ class SubmissionPreprocessor:
                 cleaned_code += code_content + "\n\n"
                 
                 # Include outputs (already clean)
+                output_text = ""
                 if hasattr(cell, 'outputs') and cell.outputs:
-                    cleaned_code += "# OUTPUT:\n"
                     for output in cell.outputs:
                         if output.output_type == 'stream':
-                            cleaned_code += output.text + "\n"
+                            output_text += output.text + "\n"
                         elif output.output_type == 'execute_result' and 'text/plain' in output.data:
-                            cleaned_code += output.data['text/plain'] + "\n"
+                            output_text += output.data['text/plain'] + "\n"
                         elif output.output_type == 'display_data' and 'text/plain' in output.data:
-                            cleaned_code += output.data['text/plain'] + "\n"
-                    cleaned_code += "\n"
+                            output_text += output.data['text/plain'] + "\n"
+                    cleaned_code += "# OUTPUT:\n" + output_text + "\n"
+                
+                self.cells.append({'code': code_content, 'output': output_text})
                     
             elif cell.cell_type == 'markdown':
                 cleaned_markdown += cell.source + "\n\n"
+                self.markdown_cells.append(cell.source)
         
+        self.notebook_text = (cleaned_code, cleaned_markdown)
         return cleaned_code, cleaned_markdown, self.fixes_applied
     
     def _clean_code_cell(self, code: str) -> str:
@@ -140,35 +152,47 @@ class SubmissionPreprocessor:
         cleaned = self._clean_code_cell(code)
         return cleaned, self.fixes_applied
     
-    def format_for_ai(self, code: str, markdown: str, max_code_length: int = 15000) -> Dict[str, Any]:
+    def format_for_ai(self, code: str, markdown: str, max_tokens: int = DEFAULT_PROMPT_TOKENS,
+                      tokenizer=None, rubric: str = "", solution: str = "") -> Dict[str, Any]:
         """
         Format cleaned content for AI consumption
         
         Args:
             code: Cleaned code content
             markdown: Cleaned markdown content
-            max_code_length: Maximum code length to send to AI
+            max_tokens: Token budget for everything packed here (see utils/prompt_packer.py)
+            tokenizer: Backend tokenizer for exact counts (approximated when None)
+            rubric / solution: Optional reference text to pack ahead of student work
             
         Returns:
             Dict with formatted content and metadata
         """
-        # Truncate if too long (but keep structure)
-        if len(code) > max_code_length:
-            # Try to keep complete cells
-            code_parts = code.split('\n\n')
-            truncated_code = ""
-            for part in code_parts:
-                if len(truncated_code) + len(part) < max_code_length:
-                    truncated_code += part + "\n\n"
-                else:
-                    break
-            
-            code = truncated_code + "\n\n# [Code truncated for AI processing]"
-            self.fixes_applied.append(f"Truncated code to {max_code_length} chars")
+        # Cells from preprocess_notebook when it produced this code; anything else is packed by blank-line blocks
+        notebook_code, notebook_markdown = self.notebook_text
+        cells = (self.cells if self.cells and code == notebook_code
+                 else [{'code': part, 'output': ''} for part in code.split('\n\n')])
+        markdown_units = (self.markdown_cells if self.markdown_cells and markdown == notebook_markdown
+                          else markdown.split('\n\n'))
+        
+        packed = pack_notebook_cells(cells, max_tokens, markdown_units=markdown_units,
+                                     rubric=rubric, solution=solution, tokenizer=tokenizer)
+        sections = packed['sections']
+        
+        omitted = sum(s['units_omitted'] for s in sections.values())
+        trimmed = sum(s['units_trimmed'] for s in sections.values())
+        if omitted or trimmed:
+            self.fixes_applied.append(
+                f"Packed submission into {packed['total_tokens']}/{max_tokens} tokens "
+                f"({omitted} cells omitted, {trimmed} trimmed)"
+            )
         
         return {
-            'code': code,
-            'markdown': markdown,
+            'code': packed['code'],
+            'markdown': sections['markdown']['text'],
+            'rubric': sections['rubric']['text'],
+            'solution': sections['solution']['text'],
+            'token_counts': {name: s['tokens'] for name, s in sections.items()},
+            'total_tokens': packed['total_tokens'],
             'preprocessing_applied': self.fixes_applied,
             'needs_manual_review': len(self.fixes_applied) > 5  # Flag if many issues
         }
@@ -237,6 +261,7 @@ def preprocess_submission_for_grading(notebook_path: str) -> Dict[str, Any]:
         'cleaned_markdown': formatted['markdown'],
         'fixes_applied': fixes,
         'needs_manual_review': formatted['needs_manual_review'],
+        'prompt_tokens': formatted['total_tokens'],
         'preprocessing_summary': preprocessor.get_preprocessing_summary(),
         'penalty_points': preprocessor.calculate_penalty(),
         'penalty_explanation': preprocessor.get_penalty_explanation()
@@ -263,6 +288,7 @@ if __name__ == "__main__":
         print(f"\n📊 Stats:")
         print(f"  Code length: {len(result['cleaned_code'])} chars")
         print(f"  Markdown length: {len(result['cleaned_markdown'])} chars")
+        print(f"  Prompt tokens: {result['prompt_tokens']}")
         print(f"  Fixes applied: {len(result['fixes_applied'])}")
     else:
         print("Usage: python submission_preprocessor.py <notebook_path>")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test the per-server circuit breaker in disaggregated_inference/health_monitor.py
+and that graders which only use Ollama never start the health monitor
+"""
+
+import logging
+import subprocess
+import sys
+import time
+sys.path.append('.')
+
+from disaggregated_inference.health_monitor import CLOSED, HALF_OPEN, OPEN, HealthMonitor
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+
+URL = 'http://127.0.0.1:9'  # Never contacted: these tests only report outcomes
+
+
+def open_breaker(monitor, url=URL):
+    for _ in range(monitor.failure_threshold):
+        monitor.record_failure(url, 'timeout')
+
+
+def test_opens_after_threshold():
+    monitor = HealthMonitor(failure_threshold=3, reset_timeout=60)
+    monitor.record_failure(URL, 'timeout')
+    monitor.record_failure(URL, 'timeout')
+    assert monitor.status(URL)['state'] == CLOSED
+    assert monitor.allow_request(URL)
+
+    monitor.record_failure(URL, 'timeout')
+    assert monitor.status(URL)['state'] == OPEN
+    assert not monitor.allow_request(URL)
+
+
+def test_success_resets_failure_count():
+    monitor = HealthMonitor(failure_threshold=2, reset_timeout=60)
+    monitor.record_failure(URL, 'timeout')
+    monitor.record_success(URL)
+    monitor.record_failure(URL, 'timeout')
+    assert monitor.status(URL)['state'] == CLOSED
+
+
+def test_half_open_admits_one_trial():
+    monitor = HealthMonitor(failure_threshold=1, reset_timeout=0.05)
+    open_breaker(monitor)
+    time.sleep(0.06)
+
+    assert monitor.allow_request(URL)
+    assert monitor.status(URL)['state'] == HALF_OPEN
+    assert not monitor.allow_request(URL)
+    assert not monitor.allow_request(URL)
+
+
+def test_trial_success_closes():
+    monitor = HealthMonitor(failure_threshold=1, reset_timeout=0.05)
+    open_breaker(monitor)
+    time.sleep(0.06)
+    assert monitor.allow_request(URL)
+
+    monitor.record_success(URL)
+    assert monitor.status(URL)['state'] == CLOSED
+    assert monitor.allow_request(URL) and monitor.allow_request(URL)
+
+
+def test_trial_failure_reopens():
+    monitor = HealthMonitor(failure_threshold=3, reset_timeout=0.05)
+    open_breaker(monitor)
+    time.sleep(0.06)
+    assert monitor.allow_request(URL)
+
+    monitor.record_failure(URL, 'timeout')  # One failure is enough while half-open
+    assert monitor.status(URL)['state'] == OPEN
+    assert not monitor.allow_request(URL)
+
+
+def test_lost_trial_expires():
+    monitor = HealthMonitor(failure_threshold=1, reset_timeout=0.05)
+    open_breaker(monitor)
+    time.sleep(0.06)
+    assert monitor.allow_request(URL)
+
+    # The trial never reported back; another caller may try after reset_timeout
+    time.sleep(0.06)
+    assert monitor.allow_request(URL)
+    assert not monitor.allow_request(URL)
+
+
+def test_reset_closes():
+    monitor = HealthMonitor(failure_threshold=1, reset_timeout=60)
+    open_breaker(monitor)
+    monitor.reset(URL)
+    assert monitor.status(URL)['state'] == CLOSED
+    assert monitor.allow_request(URL)
+
+
+def test_half_open_probe_does_not_take_the_trial():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    model = MockModel('mock', 'code_analysis', ttft='0.01', tokens_per_sec=1000, response_tokens=10, seed=1)
+    url, server = serve_in_thread(create_mock_app(model))
+    try:
+        monitor = HealthMonitor(failure_threshold=1, reset_timeout=0.05)
+        open_breaker(monitor, url)
+        time.sleep(0.06)
+
+        assert monitor.is_available(url)  # Probes the healthy server, which closes the breaker
+        assert monitor.status(url)['state'] == CLOSED
+        assert monitor.allow_request(url)
+    finally:
+        server.shutdown()
+
+
+def test_ollama_grader_does_not_start_monitor():
+    # Fresh interpreter: the monitor is process-wide
+    probe = (
+        "import json, os, sys\n"
+        "from business_analytics_grader import BusinessAnalyticsGrader\n"
+        "from business_analytics_grader_v2 import BusinessAnalyticsGraderV2\n"
+        "import disaggregated_inference.health_monitor as hm\n"
+        "assert os.path.exists('distributed_config.json')\n"
+        "offline = BusinessAnalyticsGrader(connect_models=False)\n"
+        "v2 = BusinessAnalyticsGraderV2(connect_models=False)\n"
+        "v2._get_ai_grader()\n"
+        "print(json.dumps({'client': offline.distributed_client is None, 'monitor': hm._default_monitor is None}))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.rstrip('\n').split('\n')[-1] == '{"client": true, "monitor": true}'
+
+
+def test_client_starts_monitor_on_first_request():
+    probe = (
+        "import logging; logging.disable(logging.WARNING)\n"
+        "from models.distributed_mlx_client import DistributedMLXClient\n"
+        "client = DistributedMLXClient('http://127.0.0.1:9', 'http://127.0.0.1:9')\n"
+        "before = client.health_monitor._thread is None\n"
+        "client.generate_code_analysis('x')\n"
+        "print(before, client.health_monitor._thread.is_alive())\n"
+    )
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.rstrip('\n').split('\n')[-1] == 'True True'
+
+
+if __name__ == "__main__":
+    test_opens_after_threshold()
+    test_success_resets_failure_count()
+    test_half_open_admits_one_trial()
+    test_trial_success_closes()
+    test_trial_failure_reopens()
+    test_lost_trial_expires()
+    test_reset_closes()
+    test_half_open_probe_does_not_take_the_trial()
+    test_ollama_grader_does_not_start_monitor()
+    test_client_starts_monitor_on_first_request()
+    print("✅ Circuit breaker and lazy health monitor tests passed")
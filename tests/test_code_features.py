@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test the required-literal prefilter in validators/code_features.py: a
+pattern's literal must be in every text the pattern matches, so the
+substring check never rules out a real match
+"""
+
+import random
+import re
+import sys
+sys.path.append('.')
+
+from validators.code_features import RULE_FLAGS, CodeFeatures, required_literal
+
+# Pattern pieces the fuzzed patterns are built from
+ATOMS = ['a', 'b', 'k', 's', 'mu', 'te', 'join', 'mutate', '_', r'\(', r'\.', r'\s', r'\d', '.', '[ab]', '[^k]', '(ab|c)', '(?:te)',
+         r'\x61', r'\N{LATIN SMALL LETTER B}', r'\b', '^', '$', '{', '}', '(?=a)']
+QUANTIFIERS = ['', '', '', '*', '+', '?', '{2}', '{0,2}', '*?', '+?']
+# Text the fuzzed code is built from, including characters that case-fold to ASCII letters
+TEXT = ['a', 'b', 'k', 's', 'mu', 'te', 'TE', 'MU', 'join', 'JOIN', 'mutate', '_', '(', '.', ' ', '\n', '1', 'c', 'K', 'ſ', 'ı']
+
+
+def fuzzed_patterns(count=3000, seed=37):
+    rng = random.Random(seed)
+    for _ in range(count):
+        pattern = ''.join(rng.choice(ATOMS) + rng.choice(QUANTIFIERS) for _ in range(rng.randint(1, 8)))
+        try:
+            re.compile(pattern)
+        except re.error:
+            continue
+        yield pattern
+
+
+def test_known_literals():
+    assert required_literal(r'parse_date_time\s*\(', 0) == 'parse_date_time'
+    assert required_literal(r'parse_date_time\s*\(', RULE_FLAGS) == 'e_date_t'
+    assert required_literal(r'mutate\(.*?ymd', 0) == 'mutate('
+    assert required_literal(r'abcd?ef', 0) == 'abc'
+    assert required_literal(r'[abc]xyz{2,3}qq', 0) is None  # 'xy' and 'qq' are too short
+    assert required_literal(r'\x41bcdef', 0) == 'bcdef'
+
+
+def test_no_literal_when_none_is_required():
+    assert required_literal(r'left_join|inner_join', RULE_FLAGS) is None
+    assert required_literal(r'(?x) left _join', 0) is None
+    assert required_literal(r'(unclosed', 0) is None
+
+
+def test_case_folding_letters_excluded():
+    # Under IGNORECASE 's' also matches 'ſ' and 'k' matches 'K' (Kelvin sign)
+    assert required_literal(r'(?i)summarise', 0) == 'ummar'
+    assert required_literal('sk_learn', RULE_FLAGS) == '_learn'
+    assert CodeFeatures('ſummarise(x)').has('summarise', RULE_FLAGS)
+
+
+def test_literal_in_every_match():
+    rng = random.Random(11)
+    texts = [''.join(rng.choice(TEXT) for _ in range(rng.randint(0, 30))) for _ in range(150)]
+    for pattern in fuzzed_patterns():
+        for flags in (0, RULE_FLAGS):
+            literal = required_literal(pattern, flags)
+            if literal is None:
+                continue
+            compiled = re.compile(pattern, flags)
+            for text in texts:
+                if compiled.search(text):
+                    haystack = text.lower() if flags & re.IGNORECASE else text
+                    assert literal in haystack, f"{pattern!r} matched {text!r} without {literal!r}"
+
+
+if __name__ == "__main__":
+    test_known_literals()
+    test_no_literal_when_none_is_required()
+    test_case_folding_letters_excluded()
+    test_literal_in_every_match()
+    print("✅ Code feature prefilter tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test fast-path grading decisions for template-only and perfect submissions
+(BusinessAnalyticsGraderV2 with fast_path=True)
+"""
+
+import sys
+sys.path.append('.')
+
+from business_analytics_grader_v2 import BusinessAnalyticsGraderV2
+
+
+def validation_results(score, issues=(), passed=10, total=10):
+    """Merged validation results as _merge_validation_results returns them"""
+    return {
+        'adjusted_score': score,
+        'base_score': score,
+        'issues': list(issues),
+        'systematic_results': {
+            'section_breakdown': {'part_1': {'name': 'Part 1', 'status': 'complete' if score > 50 else 'incomplete',
+                                             'points_earned': score / 10, 'points_possible': 10}},
+            'variable_check': {'found': 5, 'total_required': 5, 'missing': []},
+            'cell_stats': {'execution_rate': 1.0}
+        },
+        'output_results': {'overall_match': passed / total if total else 0, 'passed_checks': passed, 'total_checks': total}
+    }
+
+
+TEMPLATE = "\n".join(f"# TODO: step {i}\n\n\n\n\n" for i in range(12))
+STUDENT = "library(dplyr)\n" + "\n".join(f"step_{i} <- {i}" for i in range(30))
+
+
+def grader():
+    return BusinessAnalyticsGraderV2(connect_models=False, fast_path=True)
+
+
+def decision(results, student=STUDENT, template=""):
+    return grader()._fast_path_decision(results, student, template)[0]
+
+
+def test_template_only_skips_the_models():
+    assert decision(validation_results(45), TEMPLATE, TEMPLATE) == 'template'
+
+
+def test_score_at_the_floor_is_low_score_not_template():
+    assert decision(validation_results(8)) == 'low_score'
+
+
+def test_perfect_submission_takes_the_fast_path():
+    assert decision(validation_results(100)) == 'complete'
+
+
+def test_failed_output_check_needs_the_models():
+    assert decision(validation_results(100, passed=9)) is None
+
+
+def test_validation_issues_need_the_models():
+    assert decision(validation_results(100, issues=["Missing required variable: x"])) is None
+
+
+def test_middle_of_the_cohort_needs_the_models():
+    assert decision(validation_results(75)) is None
+
+
+def test_legacy_validation_never_takes_the_fast_path():
+    assert decision({'total_penalty_percent': 10}) is None
+
+
+def test_score_above_completion_cap_needs_the_models():
+    unfinished = STUDENT + "\n" + "\n".join(f"# TODO: step {i}\n\n\n\n\n" for i in range(3))
+    assert decision(validation_results(100), unfinished) is None
+
+
+def test_template_fast_path_keeps_the_completion_cap():
+    g = grader()
+    fast_path, max_score = g._fast_path_decision(validation_results(45), TEMPLATE, TEMPLATE)
+    feedback = g._create_fast_path_feedback(validation_results(45), fast_path, max_score)
+    assert max_score <= 20 and feedback['final_score_percentage'] == max_score
+
+
+def test_score_still_comes_from_validation():
+    g = grader()
+    assert g._create_fast_path_feedback(validation_results(8), 'low_score')['final_score_percentage'] == 8
+    assert g._create_fast_path_feedback(validation_results(100), 'complete')['final_score'] == 37.5
+
+
+def test_template_feedback_says_template():
+    feedback = grader()._create_fast_path_feedback(validation_results(15), 'template')
+    assert feedback['grading_system'].endswith('(fast path: template)')
+    assert 'unmodified assignment template' in feedback['comprehensive_feedback']['instructor_comments']
+
+
+def test_low_score_feedback_does_not_call_it_the_template():
+    feedback = grader()._create_fast_path_feedback(validation_results(8), 'low_score')
+    comments = feedback['comprehensive_feedback']['instructor_comments']
+    assert feedback['grading_system'].endswith('(fast path: low_score)')
+    assert 'template' not in comments and 'very few of the automated checks' in comments
+
+
+def test_perfect_work_gets_no_complete_all_sections_advice():
+    feedback = grader()._create_fast_path_feedback(validation_results(100), 'complete')
+    recommendations = feedback['comprehensive_feedback']['detailed_feedback']['recommendations']
+    assert not any('completing all required sections' in r for r in recommendations)
+
+
+if __name__ == "__main__":
+    test_template_only_skips_the_models()
+    test_score_at_the_floor_is_low_score_not_template()
+    test_perfect_submission_takes_the_fast_path()
+    test_failed_output_check_needs_the_models()
+    test_validation_issues_need_the_models()
+    test_middle_of_the_cohort_needs_the_models()
+    test_legacy_validation_never_takes_the_fast_path()
+    test_score_above_completion_cap_needs_the_models()
+    test_template_fast_path_keeps_the_completion_cap()
+    test_score_still_comes_from_validation()
+    test_template_feedback_says_template()
+    test_low_score_feedback_does_not_call_it_the_template()
+    test_perfect_work_gets_no_complete_all_sections_advice()
+    print("✅ Fast-path grading tests passed")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test the feedback model cascade: small-model drafts checked by
+score_validator.check_feedback_draft, escalating to the large model
+(BusinessAnalyticsGrader(feedback_cascade=...) against the mock Ollama API)
+"""
+
+import json
+import sys
+sys.path.append('.')
+
+from business_analytics_grader import BusinessAnalyticsGrader
+from score_validator import check_feedback_draft
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+
+RUBRIC = {'rubric_elements': {'technical_execution': {'weight': 0.4}, 'join_operations': {'weight': 0.4},
+                              'business_thinking': {'weight': 0.2}}}
+
+GOOD_DRAFT = {
+    'overall_score': 82, 'business_understanding': 80, 'communication_clarity': 84, 'data_interpretation': 78,
+    'methodology_appropriateness': 82, 'reflection_quality': 80,
+    'detailed_feedback': {
+        'reflection_assessment': ["Your reflections connect the results to the business question"],
+        'analytical_strengths': ["Clean technical execution: every join runs and the outputs are printed"],
+        'business_application': ["Good business thinking about which customers have no orders"],
+        'learning_demonstration': ["You chose left_join vs inner_join for the right reasons"],
+        'areas_for_development': ["Check row counts after each join"],
+        'recommendations': ["Use anti_join to find unmatched records"]
+    },
+    'instructor_comments': "Strong work on the joins - your code runs cleanly and your business interpretation is thoughtful."
+}
+BAD_DRAFT = {'overall_score': 95, 'detailed_feedback': {}, 'instructor_comments': "Great job!"}
+
+
+ASSIGNMENT_INFO = {'name': 'a6', 'title': 'Assignment 6', 'rubric': json.dumps(RUBRIC)}
+STUDENT_CODE = "library(dplyr)\n" + "\n".join(f"joined_{i} <- left_join(a, b)" for i in range(20))
+TEMPLATE = "\n".join(f"# TODO: step {i}\n\n\n\n\n" for i in range(12))
+
+
+def run_cascade(tiers):
+    """(feedback, grader, requests per outcome) after one feedback generation through the cascade tiers"""
+    model = MockModel('mock-ollama', 'feedback', ttft='0.01', tokens_per_sec=20000, response_tokens=300,
+                      responses={'good': json.dumps(GOOD_DRAFT), 'bad': json.dumps(BAD_DRAFT)},
+                      ollama_models={'draft-bad': 'bad', 'draft-good': 'good', 'big-model': 'feedback',
+                                     'code-model': 'code_analysis'})
+    url, server = serve_in_thread(create_mock_app(model))
+    try:
+        grader = BusinessAnalyticsGrader('code-model', 'big-model', ollama_url=url, feedback_cascade=tiers)
+        feedback = grader._execute_business_feedback_generation(STUDENT_CODE, "## Reflection", ASSIGNMENT_INFO)
+    finally:
+        server.shutdown()
+    return feedback, grader, model.stats
+
+
+def test_good_draft_passes_the_checks():
+    assert check_feedback_draft(GOOD_DRAFT, STUDENT_CODE, rubric=RUBRIC) == []
+
+
+def test_bad_draft_fails_on_structure():
+    assert any('sections' in p for p in check_feedback_draft(BAD_DRAFT, STUDENT_CODE))
+
+
+def test_score_above_the_template_cap_fails():
+    assert any('cap' in p for p in check_feedback_draft(GOOD_DRAFT, TEMPLATE, TEMPLATE))
+
+
+def test_missing_rubric_elements_fail():
+    other_rubric = {'rubric_elements': {'pivot_longer': {}, 'tidyr_reshaping': {}}}
+    assert any('rubric' in p for p in check_feedback_draft(GOOD_DRAFT, STUDENT_CODE, rubric=other_rubric))
+
+
+def test_every_rubric_element_needed_unless_lower_coverage_allowed():
+    partly_covered = {'rubric_elements': {**RUBRIC['rubric_elements'], 'pivot_longer': {}}}
+    assert any('rubric' in p for p in check_feedback_draft(GOOD_DRAFT, STUDENT_CODE, rubric=partly_covered))
+    assert check_feedback_draft(GOOD_DRAFT, STUDENT_CODE, rubric=partly_covered, min_rubric_coverage=0.75) == []
+
+
+def test_first_passing_draft_is_used():
+    feedback, grader, _ = run_cascade(['draft-bad', 'draft-good'])
+    assert feedback.get('overall_score') == 82
+    assert grader.grading_stats['feedback_cascade']['accepted_tier'] == 'draft-good'
+
+
+def test_failed_tier_recorded_as_an_escalation():
+    _, grader, _ = run_cascade(['draft-bad', 'draft-good'])
+    assert [e['model'] for e in grader.grading_stats['feedback_cascade']['escalations']] == ['draft-bad']
+
+
+def test_large_model_skipped_when_a_draft_passes():
+    _, grader, stats = run_cascade(['draft-bad', 'draft-good'])
+    assert grader.cascade_summary()['tiers']['big-model']['calls'] == 0
+    assert sum(stats.values()) == 2
+
+
+def test_per_tier_hit_rates():
+    _, grader, _ = run_cascade(['draft-bad', 'draft-good'])
+    tiers = grader.cascade_summary()['tiers']
+    assert tiers['draft-bad']['hit_rate'] == 0 and tiers['draft-good']['hit_rate'] == 1
+
+
+def test_all_drafts_failing_escalates_to_the_large_model():
+    feedback, grader, stats = run_cascade(['draft-bad'])
+    assert feedback.get('overall_score') != 95
+    assert grader.cascade_summary()['tiers']['big-model']['calls'] == 1
+    assert sum(stats.values()) == 2
+
+
+def test_savings_estimated_once_the_large_model_has_run():
+    _, accepted, _ = run_cascade(['draft-bad', 'draft-good'])
+    _, escalated, _ = run_cascade(['draft-bad'])
+    assert accepted.cascade_summary()['estimated_seconds_saved'] is None
+    assert escalated.cascade_summary()['estimated_seconds_saved'] is not None
+
+
+if __name__ == "__main__":
+    test_good_draft_passes_the_checks()
+    test_bad_draft_fails_on_structure()
+    test_score_above_the_template_cap_fails()
+    test_missing_rubric_elements_fail()
+    test_every_rubric_element_needed_unless_lower_coverage_allowed()
+    test_first_passing_draft_is_used()
+    test_failed_tier_recorded_as_an_escalation()
+    test_large_model_skipped_when_a_draft_passes()
+    test_per_tier_hit_rates()
+    test_all_drafts_failing_escalates_to_the_large_model()
+    test_savings_estimated_once_the_large_model_has_run()
+    print("✅ Feedback cascade tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test that the shared feedback sanitizer (utils/feedback_sanitizer.py)
+removes exactly what the old one-re.sub-per-pattern loops in ai_grader
+and report_generator removed, including on inputs where one removal
+exposes text for the next
+"""
+
+import random
+import re
+import sys
+sys.path.append('.')
+
+from utils.feedback_sanitizer import (
+    COMMENT_ARTIFACT_PATTERN, PROMPT_ECHO_PATTERN, REPORT_DIALOG_PATTERN, STORED_COMMENT_ARTIFACT_PATTERN
+)
+
+# The pattern lists as the old code looped over them
+OLD_COMMENT_PATTERNS = [
+    r"We need to.*?\.", r"Let's.*?\.", r"First,.*?\.", r"Now.*?\.", r"The student provided.*?\.",
+    r"They have.*?\.", r"<\|.*?\|>", r"\{.*?\}", r"JSON.*?"
+]
+OLD_STORED_PATTERNS = OLD_COMMENT_PATTERNS + [
+    r"Overall score:.*?\.", r"Business understanding:.*?\.", r"Communication clarity:.*?\.",
+    r"Data interpretation:.*?\.", r"Methodology appropriateness:.*?\.", r"Reflection quality:.*?\.",
+    r"Now produce.*?\.", r"Let's craft.*?\.", r"<think>.*?</think>", r"<reasoning>.*?</reasoning>",
+    r"\[thinking\].*?\[/thinking\]", r"\[internal\].*?\[/internal\]",
+]
+OLD_PROMPT_PATTERNS = [
+    r"Must reference specific.*?(?=\n|$)", r"Provide reflection assessment.*?(?=\n|$)", r"Must be pure.*?(?=\n|$)",
+    r"Student's reflection.*?(?=\n\n|\Z)", r"Reflection assessment items:.*?(?=\n\n|\Z)",
+    r"Analytical strengths:.*?(?=\n\n|\Z)", r"Business application:.*?(?=\n\n|\Z)",
+    r"Learning demonstration:.*?(?=\n\n|\Z)", r"Areas for development:.*?(?=\n\n|\Z)",
+    r"Recommendations:.*?(?=\n\n|\Z)", r"Instructor comments:.*?(?=\n\n|\Z)", r"assistantfinal\{.*?\}",
+    r"Make sure.*?(?=\n|$)", r"Ensure.*?(?=\n|$)", r"- \".*?\"", r"■",
+]
+OLD_DIALOG_PATTERNS = [
+    r"What I'm looking for:.*?(?=\n|$)", r"What to focus on:.*?(?=\n|$)", r"Internal reasoning:.*?(?=\n|$)",
+    r"AI thinking:.*?(?=\n|$)", r"Model dialog:.*?(?=\n|$)", r"Express version:.*?(?=\n|$)",
+    r"Quick assessment:.*?(?=\n|$)", r"\[Internal:.*?\]", r"\[AI:.*?\]", r"\[Reasoning:.*?\]"
+]
+
+ADVERSARIAL = [
+    "Strong work on the joins. The student provided {Let's see. more} detail in the reflection, "
+    "which is great to see here.",
+    "Now {we need to. fix} this. Good joins overall.",
+    "<|start|>Let's {go. on}|> and JSON {x} remains.",
+    "<think>Now check. </think> The analysis is thorough. {Overall score: 80.}",
+    "[thinking] We need to grade. [/thinking] Let's craft. Solid work.",
+    "Instructor comments: {Ensure it.}\n\nMust be pure JSON\n- \"quoted\" ■ kept text",
+    "Quick assessment: [AI: Internal reasoning: x] done\n[Reasoning: What to focus on: y]",
+]
+
+# Fragments the fuzzed inputs are built from: pattern openers, closers and plain text
+FRAGMENTS = [
+    "We need to", "Let's", "First,", "Now", "The student provided", "They have", "<|", "|>", "{", "}", "JSON",
+    "Overall score:", "Let's craft", "<think>", "</think>", "[thinking]", "[/thinking]", "Instructor comments:",
+    "Make sure", "Ensure", "- \"", "\"", "■", "[AI:", "[Internal:", "]", "Quick assessment:", ".", ". ", "\n",
+    "\n\n", " good joins ", " the reflection ", "x",
+]
+
+
+def old_sub(patterns, text):
+    for pattern in patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+    return text
+
+
+def fuzzed_inputs(count=2000, seed=40):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 14))) for _ in range(count)]
+
+
+def test_feedback_sanitizer():
+    pairs = [(COMMENT_ARTIFACT_PATTERN, OLD_COMMENT_PATTERNS), (STORED_COMMENT_ARTIFACT_PATTERN, OLD_STORED_PATTERNS),
+             (PROMPT_ECHO_PATTERN, OLD_PROMPT_PATTERNS), (REPORT_DIALOG_PATTERN, OLD_DIALOG_PATTERNS)]
+
+    for new, old in pairs:
+        for text in ADVERSARIAL + fuzzed_inputs():
+            assert new.sub('', text) == old_sub(old, text), f"output differs from the old loop for {text!r}"
+
+    # The reasoning fragment must not leak into stored feedback
+    from ai_grader import _filter_instructor_comments
+    assert _filter_instructor_comments(ADVERSARIAL[0]) == ""
+
+
+if __name__ == "__main__":
+    test_feedback_sanitizer()
+    print("✅ Feedback sanitizer matches the old per-pattern filtering")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test the headless grading runner (grade_cli.py) end to end against the
+mock Ollama API, on a copy of the grading database
+"""
+
+import functools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+sys.path.append('.')
+
+from grade_cli import select_submissions
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+
+
+def run_cli(*args):
+    result = subprocess.run([sys.executable, 'grade_cli.py', *args], capture_output=True, text=True, timeout=600)
+    events = [json.loads(line) for line in result.stdout.splitlines() if line.startswith('{')]
+    return result.returncode, events, result.stdout
+
+
+def prepare_db(work_dir):
+    """Copy of the grading database where the first two assignment 12 submissions are ungraded"""
+    db_path = os.path.join(work_dir, 'grading_database.db')
+    shutil.copy('grading_database.db', db_path)
+    conn = sqlite3.connect(db_path)
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM submissions WHERE assignment_id = 12 ORDER BY id LIMIT 3").fetchall()]
+    conn.execute("UPDATE submissions SET ai_score = 50 WHERE assignment_id = 12")
+    conn.execute(f"UPDATE submissions SET ai_score = NULL, ai_feedback = NULL WHERE id IN ({ids[0]}, {ids[1]})")
+    conn.commit()
+    conn.close()
+    return db_path, ids
+
+
+@functools.lru_cache(maxsize=None)
+def cli_runs():
+    """Dry run, real run and unknown-assignment run against the mock Ollama API (run once, shared by the tests)"""
+    work_dir = tempfile.mkdtemp(prefix='grade_cli_test_')
+    db_path, ids = prepare_db(work_dir)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    model = MockModel('mock-ollama', 'feedback', ttft='0.01', tokens_per_sec=20000, response_tokens=300, seed=3)
+    url, server = serve_in_thread(create_mock_app(model))
+    common = ['--db', db_path, '--backend', 'ollama', '--ollama-url', url, '--quiet']
+    try:
+        dry = run_cli('--assignment', 'a6', '--dry-run', *common)
+        graded = run_cli('--assignment', '12', '--workers', '2', *common)
+        missing = run_cli('--assignment', 'no-such-assignment', *common)
+    finally:
+        server.shutdown()
+
+    conn = sqlite3.connect(db_path)
+    scores = dict(conn.execute(f"SELECT id, ai_score FROM submissions WHERE id IN ({ids[0]}, {ids[1]})").fetchall())
+    events = graded[1]
+    traced = conn.execute("SELECT COUNT(*) FROM grading_traces WHERE run_tag = ?",
+                          (events[0].get('run_tag') if events else '',)).fetchone()[0]
+    conn.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {'ids': ids, 'dry': dry, 'graded': graded, 'missing': missing, 'scores': scores, 'traced': traced}
+
+
+def graded_events():
+    return [e for e in cli_runs()['graded'][1] if e['event'] == 'graded']
+
+
+def test_default_selection_is_the_ungraded_submissions():
+    work_dir = tempfile.mkdtemp(prefix='grade_cli_test_')
+    try:
+        db_path, ids = prepare_db(work_dir)
+        assert {s['id'] for s in select_submissions(db_path, 12)} == {ids[0], ids[1]}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_explicit_ids_include_graded_submissions():
+    work_dir = tempfile.mkdtemp(prefix='grade_cli_test_')
+    try:
+        db_path, ids = prepare_db(work_dir)
+        assert [s['id'] for s in select_submissions(db_path, 12, submission_ids=[ids[2]])] == [ids[2]]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_limit_applied():
+    work_dir = tempfile.mkdtemp(prefix='grade_cli_test_')
+    try:
+        db_path, _ = prepare_db(work_dir)
+        assert len(select_submissions(db_path, 12, regrade=True, limit=2)) == 2
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_dry_run_lists_without_grading():
+    code, events, _ = cli_runs()['dry']
+    assert code == 0 and {e['event'] for e in events} == {'selected'}
+
+
+def test_stdout_is_only_json_lines():
+    _, _, stdout = cli_runs()['graded']
+    assert all(line.startswith('{') for line in stdout.splitlines())
+
+
+def test_start_graded_and_done_events():
+    runs = cli_runs()
+    events = runs['graded'][1]
+    assert events and events[0]['event'] == 'start' and events[-1]['event'] == 'done'
+    assert {e['submission_id'] for e in graded_events()} == set(runs['ids'][:2])
+
+
+def test_progress_counts_up_to_the_total():
+    graded = graded_events()
+    assert sorted(e['done'] for e in graded) == list(range(1, len(graded) + 1))
+
+
+def test_scores_saved_to_the_database():
+    runs = cli_runs()
+    assert all(runs['scores'][i] is not None for i in runs['ids'][:2])
+
+
+def test_traces_saved_under_the_run_tag():
+    assert cli_runs()['traced'] == len(graded_events())
+
+
+def test_exit_code_0_when_nothing_failed():
+    code, events, _ = cli_runs()['graded']
+    assert code == 0 and events[-1]['failed'] == 0
+
+
+def test_unknown_assignment_exits_non_zero():
+    assert cli_runs()['missing'][0] != 0
+
+
+if __name__ == "__main__":
+    test_default_selection_is_the_ungraded_submissions()
+    test_explicit_ids_include_graded_submissions()
+    test_limit_applied()
+    test_dry_run_lists_without_grading()
+    test_stdout_is_only_json_lines()
+    test_start_graded_and_done_events()
+    test_progress_counts_up_to_the_total()
+    test_scores_saved_to_the_database()
+    test_traces_saved_under_the_run_tag()
+    test_exit_code_0_when_nothing_failed()
+    test_unknown_assignment_exits_non_zero()
+    print("✅ Headless grading runner tests passed")
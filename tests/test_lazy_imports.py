@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test lazy loading of heavy subsystems (utils/lazy_imports.py) and that
+starting the app does not import them
+"""
+
+import importlib.util
+import subprocess
+import sys
+sys.path.append('.')
+
+from utils.lazy_imports import SUBSYSTEMS, lazy, load_times
+
+HEAVY_MODULES = ['sklearn', 'reportlab', 'nbconvert', 'aiohttp', 'ai_grader', 'business_analytics_grader',
+                 'grading_interface', 'connect_web_interface', 'nbformat']
+
+
+def run_probe(probe):
+    """Last line a fresh interpreter prints for probe, or None if it failed"""
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True)
+    return result.stdout.rstrip('\n').split('\n')[-1] if result.returncode == 0 else None
+
+
+def test_app_starts_without_heavy_subsystems():
+    probe = ("import sys, app; print(','.join(m for m in %r if m in sys.modules))" % HEAVY_MODULES)
+    assert run_probe(probe) == ''
+
+
+def test_subsystem_imported_on_first_use():
+    probe = ("import sys\n"
+             "from utils.lazy_imports import lazy\n"
+             "ml = lazy('ml_training')\n"
+             "before = 'sklearn.ensemble' in sys.modules\n"
+             "forest = ml.RandomForestRegressor\n"
+             "print(before, forest.__name__, 'sklearn.ensemble' in sys.modules)\n")
+    assert run_probe(probe) == 'False RandomForestRegressor True'
+
+
+def test_name_cached_on_the_handle():
+    ml = lazy('ml_training')
+    ml.RandomForestRegressor
+    assert 'RandomForestRegressor' in vars(ml)
+
+
+def test_load_time_recorded():
+    lazy('ml_training').RandomForestRegressor
+    assert load_times().get('ml_training:sklearn.ensemble', 0) > 0
+
+
+def test_unknown_subsystem_rejected():
+    try:
+        lazy('gpu_kernels')
+    except KeyError:
+        return
+    raise AssertionError("lazy() accepted an unknown subsystem")
+
+
+def test_unregistered_name_rejected():
+    try:
+        lazy('ml_training').LinearRegression
+    except AttributeError:
+        return
+    raise AssertionError("lazy handle returned a name its subsystem does not register")
+
+
+def test_every_registered_module_exists():
+    assert all(importlib.util.find_spec(module) for names in SUBSYSTEMS.values() for module in names.values())
+
+
+if __name__ == "__main__":
+    test_app_starts_without_heavy_subsystems()
+    test_subsystem_imported_on_first_use()
+    test_name_cached_on_the_handle()
+    test_load_time_recorded()
+    test_unknown_subsystem_rejected()
+    test_unregistered_name_rejected()
+    test_every_registered_module_exists()
+    print("✅ Lazy import tests passed")
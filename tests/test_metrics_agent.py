@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the push-based metrics agent and collector with a local stand-in
+model server (disaggregated_inference/metrics_agent.py, metrics_collector.py)
+"""
+
+import sys
+import threading
+sys.path.append('.')
+
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from disaggregated_inference.metrics_agent import SAMPLE_FIELDS, GenerationCounter, MetricsAgent
+from disaggregated_inference.metrics_collector import CollectorClient, MetricsCollector, create_collector_app
+
+
+def serve(app):
+    """Run a Flask app on a free local port; returns (url, server)"""
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def stand_in_server(counter):
+    """Stand-in model server reporting its counters on /health; returns (url, server)"""
+    stand_in = Flask('stand_in')
+    stand_in.add_url_rule('/health', 'health', lambda: jsonify({'status': 'healthy', **counter.stats()}))
+    return serve(stand_in)
+
+
+def pushed_sample():
+    """(latest sample, history) from the collector after an agent pushed a buffered and a new sample"""
+    counter = GenerationCounter()
+    server_url, server = stand_in_server(counter)
+    collector_url, collector_server = serve(create_collector_app(MetricsCollector()))
+    try:
+        agent = MetricsAgent("Local", "http://127.0.0.1:9", server_url=server_url)
+        agent.pending.append(agent.sample())
+        agent.push()
+
+        agent.collector_url = collector_url
+        counter.started()
+        counter.started()
+        counter.finished(500)
+        agent.pending.append(agent.sample())
+        assert agent.push() and len(agent.pending) == 0
+
+        client = CollectorClient(collector_url)
+        return client.latest().get("Local", {}), client.history("Local")
+    finally:
+        collector_server.shutdown()
+        server.shutdown()
+
+
+def test_samples_buffered_while_collector_is_down():
+    server_url, server = stand_in_server(GenerationCounter())
+    try:
+        agent = MetricsAgent("Local", "http://127.0.0.1:9", server_url=server_url)
+        agent.pending.append(agent.sample())
+        assert not agent.push()
+    finally:
+        server.shutdown()
+    assert len(agent.pending) == 1
+
+
+def test_buffered_and_new_samples_pushed_together():
+    _, history = pushed_sample()
+    assert len(history) == 2
+
+
+def test_sample_has_every_field():
+    latest, _ = pushed_sample()
+    assert set(SAMPLE_FIELDS) <= set(latest)
+
+
+def test_memory_sampled_locally():
+    latest, _ = pushed_sample()
+    assert latest.get('mem_total_gb', 0) > 0
+
+
+def test_server_counters_read_from_health():
+    latest, _ = pushed_sample()
+    assert latest.get('server_up') is True and latest.get('active_requests') == 1
+
+
+def test_tokens_per_sec_from_generation_counter():
+    latest, _ = pushed_sample()
+    assert latest.get('tokens_per_sec', 0) > 0
+
+
+def test_unreachable_collector_reads_as_empty():
+    unreachable = CollectorClient("http://127.0.0.1:9", timeout=0.5)
+    assert unreachable.latest() == {} and unreachable.error is not None
+
+
+if __name__ == "__main__":
+    test_samples_buffered_while_collector_is_down()
+    test_buffered_and_new_samples_pushed_together()
+    test_sample_has_every_field()
+    test_memory_sampled_locally()
+    test_server_counters_read_from_health()
+    test_tokens_per_sec_from_generation_counter()
+    test_unreachable_collector_reads_as_empty()
+    print("✅ Metrics agent tests passed")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the SQLite metrics time series (disaggregated_inference/metrics_store.py)
+"""
+
+import sys
+import tempfile
+sys.path.append('.')
+
+from disaggregated_inference.metrics_store import MetricsStore
+
+DAY = 86400
+
+
+NOW = 1_800_000_000.0  # on a whole hour
+START = NOW - 3 * DAY
+
+# One sample a second for two minutes, three days ago: 10 tok/s then 30 tok/s
+SAMPLES = [{'ts': START + i, 'tokens_per_sec': 10.0 if i < 60 else 30.0, 'cpu_user': 50.0, 'server_up': True}
+           for i in range(120)]
+
+
+def filled_store():
+    store = MetricsStore(tempfile.mkdtemp() + "/metrics.db")
+    store.append("Qwen", SAMPLES)
+    store.start_run("a7-batch", assignment="Assignment 7", started_at=START + 60)
+    store.end_run("a7-batch", submissions=23, ended_at=START + 119)
+    return store
+
+
+def maintained_store():
+    """Three days later: rolled up to minutes and hours, raw rows past retention dropped"""
+    store = filled_store()
+    store.maintain(now=NOW, force=True)
+    return store
+
+
+def test_raw_samples_appended():
+    store = MetricsStore(tempfile.mkdtemp() + "/metrics.db")
+    assert store.append("Qwen", SAMPLES) == 120
+    assert len(store.query("Qwen", START, START + 120, resolution=0, max_points=10 ** 6)) == 120
+
+
+def test_repushed_samples_ignored():
+    assert filled_store().append("Qwen", SAMPLES[-10:]) == 0
+
+
+def test_run_summary_over_its_span():
+    assert abs(filled_store().run_summary("a7-batch")["Qwen"]['tokens_per_sec'] - 30.0) < 1e-6
+
+
+def test_rolled_up_to_minute_averages_with_sample_counts():
+    minutes = maintained_store().query("Qwen", START, START + 120, resolution=60)
+    assert [round(r['tokens_per_sec']) for r in minutes] == [10, 30]
+    assert [r['n'] for r in minutes] == [60, 60]
+
+
+def test_rolled_up_to_hour_averages():
+    hours = maintained_store().query("Qwen", START - 3600, START + 3600, resolution=3600)
+    assert len(hours) == 1 and round(hours[0]['tokens_per_sec']) == 20
+
+
+def test_raw_rows_dropped_after_retention():
+    assert maintained_store().query("Qwen", START, START + 120, resolution=0) == []
+
+
+def test_roll_up_is_incremental():
+    store = maintained_store()
+    store.maintain(now=NOW + 120, force=True)
+    assert len(store.query("Qwen", START, START + 120, resolution=60)) == 2
+
+
+def test_range_query_picks_a_retained_tier():
+    store = filled_store()
+    assert store.resolution_for(START, START + 120, now=NOW) == 60
+    assert store.resolution_for(NOW - 20 * DAY, NOW, now=NOW) == 3600
+
+
+def test_run_listed():
+    assert [r['tag'] for r in filled_store().runs()] == ["a7-batch"]
+
+
+if __name__ == "__main__":
+    test_raw_samples_appended()
+    test_repushed_samples_ignored()
+    test_run_summary_over_its_span()
+    test_rolled_up_to_minute_averages_with_sample_counts()
+    test_rolled_up_to_hour_averages()
+    test_raw_rows_dropped_after_retention()
+    test_roll_up_is_incremental()
+    test_range_query_picks_a_retained_tier()
+    test_run_listed()
+    print("✅ Metrics store tests passed")
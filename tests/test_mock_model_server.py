@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the mock model server against the real clients: distributed MLX
+client, Ollama streaming, and the prefill/decode orchestrator
+(servers/mock_model_server.py)
+"""
+
+import asyncio
+import json
+import sys
+sys.path.append('.')
+
+import requests
+
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+from utils.structured_output import FEEDBACK_SCHEMA, extract_json_object
+
+
+def mock_server():
+    """(model, url, server) for a fast seeded code-analysis mock"""
+    model = MockModel('mock-qwen', 'code_analysis', ttft='uniform:0.01,0.05', tokens_per_sec=5000,
+                      response_tokens=200, seed=7)
+    url, server = serve_in_thread(create_mock_app(model))
+    return model, url, server
+
+
+def test_same_seed_and_prompt_repeat_exactly():
+    model, url, server = mock_server()
+    try:
+        first = requests.post(f"{url}/generate", json={'prompt': 'grade this'}).json()
+        model.reset()
+        again = requests.post(f"{url}/generate", json={'prompt': 'grade this'}).json()
+    finally:
+        server.shutdown()
+    assert first['response'] == again['response']
+    assert abs(first['timings']['first_token'] - again['timings']['first_token']) < 0.01
+
+
+def test_different_prompts_get_different_scores():
+    _, url, server = mock_server()
+    try:
+        others = {requests.post(f"{url}/generate", json={'prompt': f'grade student {i}'}).json()['response']
+                  for i in range(4)}
+    finally:
+        server.shutdown()
+    assert len(others) > 1
+
+
+def test_mlx_response_fits_the_code_analysis_schema():
+    _, url, server = mock_server()
+    try:
+        response = requests.post(f"{url}/generate", json={'prompt': 'grade this'}).json()['response']
+    finally:
+        server.shutdown()
+    assert extract_json_object(response, required=['technical_score']) is not None
+
+
+def test_distributed_client_reads_exact_token_usage():
+    from models.distributed_mlx_client import DistributedMLXClient
+    _, url, server = mock_server()
+    try:
+        client = DistributedMLXClient(url, url)
+        analysis = client.generate_code_analysis('analyze this code')
+    finally:
+        server.shutdown()
+    assert bool(analysis) and client.last_response_times['qwen_metrics']['token_counts_exact']
+
+
+def test_ollama_stream_ends_with_done_and_valid_json():
+    _, url, server = mock_server()
+    try:
+        # Ollama streaming with a schema, as the grader asks for it
+        stream = requests.post(f"{url}/api/generate", stream=True, json={
+            'model': 'gemma3:27b-it-q8_0', 'prompt': 'feedback please', 'stream': True, 'format': FEEDBACK_SCHEMA
+        })
+        lines = [json.loads(line) for line in stream.iter_lines() if line]
+    finally:
+        server.shutdown()
+    streamed = ''.join(line.get('response', '') for line in lines)
+    assert lines[-1].get('done') is True
+    assert extract_json_object(streamed, required=['overall_score']) is not None
+
+
+def test_orchestrator_runs_prefill_then_decode():
+    from disaggregated_inference.orchestrator import DisaggregatedInference
+    _, url, server = mock_server()
+    try:
+        host, port = url.split('//')[1].split(':')
+        orchestrator = DisaggregatedInference({
+            'prefill_servers': [{'host': host, 'port': int(port), 'model': 'qwen'}],
+            'decode_servers': [{'host': host, 'port': int(port), 'model': 'qwen'}]
+        })
+        disaggregated = asyncio.run(orchestrator.generate('orchestrated prompt', 'qwen', max_tokens=50))
+    finally:
+        server.shutdown()
+    assert disaggregated.get('method') == 'disaggregated' and bool(disaggregated.get('response'))
+
+
+def test_injected_error_returns_500_and_is_counted():
+    model, url, server = mock_server()
+    try:
+        model.configure(failures={'error': 1.0})
+        status = requests.post(f"{url}/prefill", json={'prompt': 'x'}).status_code
+        stats = requests.get(f"{url}/mock/stats").json()['requests']
+    finally:
+        server.shutdown()
+    assert status == 500
+    assert stats.get('/prefill error') == 1
+
+
+def test_truncated_stream_has_no_done_message():
+    model, url, server = mock_server()
+    try:
+        model.configure(failures={'truncate': 1.0})
+        truncated = requests.post(f"{url}/api/generate", json={'model': 'gemma3:27b-it-q8_0', 'prompt': 'y'},
+                                  stream=True)
+        lines = [json.loads(line) for line in truncated.iter_lines() if line]
+    finally:
+        server.shutdown()
+    assert not any(line.get('done') for line in lines)
+
+
+def test_over_max_concurrency_returns_503_and_is_counted():
+    model, url, server = mock_server()
+    try:
+        model.configure(max_concurrency=1)
+        model.counter.started()  # One request already running
+        busy = requests.post(f"{url}/decode", json={'prompt': 'z'})
+        model.counter.finished()
+        stats = requests.get(f"{url}/mock/stats").json()['requests']
+    finally:
+        server.shutdown()
+    assert busy.status_code == 503 and busy.headers.get('Retry-After') == '1'
+    assert stats.get('/decode busy') == 1
+
+
+def test_bad_config_rejected():
+    _, url, server = mock_server()
+    try:
+        status = requests.post(f"{url}/mock/config", json={'failures': {'explode': 0.5}}).status_code
+    finally:
+        server.shutdown()
+    assert status == 400
+
+
+if __name__ == "__main__":
+    test_same_seed_and_prompt_repeat_exactly()
+    test_different_prompts_get_different_scores()
+    test_mlx_response_fits_the_code_analysis_schema()
+    test_distributed_client_reads_exact_token_usage()
+    test_ollama_stream_ends_with_done_and_valid_json()
+    test_orchestrator_runs_prefill_then_decode()
+    test_injected_error_returns_500_and_is_counted()
+    test_truncated_stream_has_no_done_message()
+    test_over_max_concurrency_returns_503_and_is_counted()
+    test_bad_config_rejected()
+    print("✅ Mock model server tests passed")
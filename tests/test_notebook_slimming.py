@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test the large-notebook slimming stage
+"""
+
+import sys
+import os
+import json
+import base64
+import tempfile
+sys.path.append('.')
+
+import utils.notebook_truncator as notebook_truncator
+from utils.notebook_truncator import prune_slim_cache, slim_notebook_if_needed
+
+
+def build_large_notebook(path):
+    """Notebook with plot images and a huge printed tibble"""
+    fake_png = base64.b64encode(os.urandom(150 * 1024)).decode('ascii')
+    tibble = "".join(f"{i:>6} Store_{i % 40:<4} {i * 3.5:>10.2f}\n" for i in range(6000))
+
+    nb = {
+        "nbformat": 4, "nbformat_minor": 5, "metadata": {},
+        "cells": [
+            {"cell_type": "markdown", "metadata": {}, "source": "# Lesson 7 analysis"},
+            {"cell_type": "code", "metadata": {}, "execution_count": 1, "source": "print(sales)",
+             "outputs": [{"output_type": "stream", "name": "stdout", "text": tibble}]},
+            {"cell_type": "code", "metadata": {}, "execution_count": 2, "source": "ggplot(sales)",
+             "outputs": [{"output_type": "display_data", "metadata": {},
+                          "data": {"image/png": fake_png, "text/plain": "plot without title"}}
+                         for _ in range(3)]},
+            {"cell_type": "code", "metadata": {}, "execution_count": 3, "source": "mean(sales$revenue)",
+             "outputs": [{"output_type": "execute_result", "execution_count": 3, "metadata": {},
+                          "data": {"text/plain": "[1] 10497.25", "text/html": "<span>10497.25</span>"}}]}
+        ]
+    }
+    with open(path, 'w') as f:
+        json.dump(nb, f)
+
+
+def build_medium_notebook(path):
+    """A 300 KB notebook: under the skip limit the grader always graded in full"""
+    tibble = "".join(f"{i:>6} Store_{i % 40:<4} {i * 3.5:>10.2f}\n" for i in range(10000))
+    nb = {"nbformat": 4, "nbformat_minor": 5, "metadata": {},
+          "cells": [{"cell_type": "code", "metadata": {}, "execution_count": 1, "source": "print(sales)",
+                     "outputs": [{"output_type": "stream", "name": "stdout", "text": tibble}]}]}
+    with open(path, 'w') as f:
+        json.dump(nb, f)
+
+
+def slimmed(tmp):
+    """(info, slimmed notebook) for a freshly built large notebook"""
+    original = os.path.join(tmp, "large.ipynb")
+    build_large_notebook(original)
+    slimmed_path, info = slim_notebook_if_needed(original, output_path=os.path.join(tmp, "slim.ipynb"))
+    with open(slimmed_path) as f:
+        return info, json.load(f)
+
+
+def test_large_notebook_slimmed_within_target():
+    with tempfile.TemporaryDirectory() as tmp:
+        info, _ = slimmed(tmp)
+    assert info['original_kb'] > 600
+    assert info['within_target']
+
+
+def test_images_removed_but_plot_outputs_kept():
+    with tempfile.TemporaryDirectory() as tmp:
+        info, nb = slimmed(tmp)
+    plot_outputs = nb['cells'][2]['outputs']
+    assert info['images_removed'] == 3 and all('image/png' not in o['data'] for o in plot_outputs)
+    assert len(plot_outputs) == 3
+
+
+def test_long_output_keeps_its_head():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, nb = slimmed(tmp)
+    stream_text = nb['cells'][1]['outputs'][0]['text']
+    assert "Store_1" in stream_text and "lines omitted" in stream_text
+
+
+def test_small_result_untouched():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, nb = slimmed(tmp)
+    assert nb['cells'][3]['outputs'][0]['data']['text/plain'] == "[1] 10497.25"
+
+
+def test_notebook_under_the_old_skip_limit_graded_as_is():
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "medium.ipynb")
+        build_medium_notebook(original)
+        with open(original, 'rb') as f:
+            before = f.read()
+        path, info = slim_notebook_if_needed(original)
+        with open(path, 'rb') as f:
+            after = f.read()
+    assert 200 < info['original_kb'] < 600
+    assert path == original and not info['slimmed'] and after == before
+
+
+def test_slimmed_copy_reused_from_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = notebook_truncator.SLIM_CACHE_DIR
+        notebook_truncator.SLIM_CACHE_DIR = os.path.join(tmp, "cache")
+        try:
+            original = os.path.join(tmp, "large.ipynb")
+            build_large_notebook(original)
+            first_path, first = slim_notebook_if_needed(original)
+            second_path, second = slim_notebook_if_needed(original)
+        finally:
+            notebook_truncator.SLIM_CACHE_DIR = cache_dir
+    assert os.path.dirname(first_path) == os.path.join(tmp, "cache")
+    assert second_path == first_path and second.get('cached') and not first.get('cached')
+    assert second['images_removed'] == first['images_removed'] == 3
+
+
+def test_changed_notebook_gets_a_fresh_copy_and_cache_is_pruned():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = notebook_truncator.SLIM_CACHE_DIR
+        notebook_truncator.SLIM_CACHE_DIR = os.path.join(tmp, "cache")
+        try:
+            original = os.path.join(tmp, "large.ipynb")
+            build_large_notebook(original)
+            first_path, _ = slim_notebook_if_needed(original)
+
+            build_large_notebook(original)
+            os.utime(original, ns=(0, os.stat(original).st_mtime_ns + 10**9))
+            second_path, second = slim_notebook_if_needed(original)
+
+            prune_slim_cache(max_entries=1)
+            remaining = sorted(os.listdir(notebook_truncator.SLIM_CACHE_DIR))
+        finally:
+            notebook_truncator.SLIM_CACHE_DIR = cache_dir
+    assert second_path != first_path and not second.get('cached')
+    assert remaining == sorted([os.path.basename(second_path),
+                                os.path.basename(second_path)[:-len('.ipynb')] + '.json'])
+
+
+if __name__ == "__main__":
+    test_large_notebook_slimmed_within_target()
+    test_images_removed_but_plot_outputs_kept()
+    test_long_output_keeps_its_head()
+    test_small_result_untouched()
+    test_notebook_under_the_old_skip_limit_graded_as_is()
+    test_slimmed_copy_reused_from_cache()
+    test_changed_notebook_gets_a_fresh_copy_and_cache_is_pruned()
+    print("✅ Notebook slimming tests passed")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the vectorized tolerance matching in validators/numeric_matching.py
+"""
+
+import sys
+sys.path.append('.')
+
+import numpy as np
+
+from validators.numeric_matching import OutputNumberIndex, align_multiset, first_match, to_array
+
+
+def test_align_multiset_counts_each_student_value_once():
+    # The student printed 100 once, so only one of the two expected 100s is satisfied
+    result = align_multiset(to_array([100]), to_array([100, 100]))
+    assert result['matched'] == 1 and result['coverage'] == 0.5
+    assert result['unmatched_expected'] == [100.0]
+
+
+def test_align_multiset_duplicates_printed_twice_both_match():
+    result = align_multiset(to_array([100, 100]), to_array([100, 100]))
+    assert result['matched'] == 2 and result['unmatched_expected'] == []
+
+
+def test_align_multiset_within_tolerance():
+    expected = to_array([1000.0, 50.0])
+    student = to_array([50.4, 1009.0])
+    assert align_multiset(student, expected, rel_tol=0.01)['matched'] == 2
+    assert align_multiset(student, expected, rel_tol=0.001)['unmatched_expected'] == [1000.0, 50.0]
+
+
+def test_align_multiset_overlapping_windows_find_the_maximum_matching():
+    # 10.5 fits both windows; taking it for 10 would leave 11 unmatched
+    result = align_multiset(to_array([10.5, 9.6]), to_array([11, 10]), abs_tol=0.5)
+    assert result['matched'] == 2
+
+
+def test_align_multiset_no_match():
+    result = align_multiset(to_array([1, 2, 3]), to_array([500]))
+    assert result['matched'] == 0 and result['coverage'] == 0.0 and result['unmatched_expected'] == [500.0]
+    assert align_multiset(to_array([]), to_array([5]))['matched'] == 0
+    assert align_multiset(to_array([5]), to_array([]))['coverage'] == 0.0
+
+
+def test_first_match_returns_the_loop_order_pair():
+    # First expected value with any match, then its first matching student value
+    student = to_array([7, 3, 3, 42])
+    assert first_match(student, to_array([99, 3, 42])) == (1, 1)
+
+
+def test_first_match_within_tolerance():
+    assert first_match(to_array([201.9]), to_array([200]), abs_tol=2) == (0, 0)
+    assert first_match(to_array([201.9]), to_array([200]), abs_tol=1) is None
+    assert first_match(to_array([1010]), to_array([1000]), rel_tol=0.01) == (0, 0)
+
+
+def test_first_match_no_match():
+    assert first_match(to_array([1, 2]), to_array([5])) is None
+    assert first_match(np.empty(0), to_array([5])) is None
+    assert first_match(to_array([5]), np.empty(0)) is None
+
+
+def test_number_after_label():
+    index = OutputNumberIndex(["Rows: 1,250\nTop customer total: $ 8471.51\n"])
+    assert index.number_after(r'top customer total') == 8471.51
+    assert index.number_after(r'rows:') == 1250.0
+
+
+def test_number_after_duplicate_labels_takes_the_first():
+    index = OutputNumberIndex(["Total: 10\n", "Total: 20\nTotal: 30"])
+    assert index.number_after(r'total') == 10.0
+
+
+def test_number_after_skips_labels_with_no_number_on_their_line():
+    index = OutputNumberIndex(["Total: n/a\n42\nTotal: , 17"])
+    assert index.number_after(r'total') == 17.0
+
+
+def test_number_after_no_match():
+    index = OutputNumberIndex(["Rows: 1,250"])
+    assert index.number_after(r'missing label') is None
+    assert OutputNumberIndex([]).number_after(r'rows') is None
+
+
+if __name__ == "__main__":
+    test_align_multiset_counts_each_student_value_once()
+    test_align_multiset_duplicates_printed_twice_both_match()
+    test_align_multiset_within_tolerance()
+    test_align_multiset_overlapping_windows_find_the_maximum_matching()
+    test_align_multiset_no_match()
+    test_first_match_returns_the_loop_order_pair()
+    test_first_match_within_tolerance()
+    test_first_match_no_match()
+    test_number_after_label()
+    test_number_after_duplicate_labels_takes_the_first()
+    test_number_after_skips_labels_with_no_number_on_their_line()
+    test_number_after_no_match()
+    print("✅ Numeric matching tests passed")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test rubric-driven output checks (validators/output_check_plan.py)
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+sys.path.append('.')
+
+from validators.output_check_plan import load_check_plan
+from validators.output_validator import OutputValidator
+
+
+def code_cell(source, text):
+    outputs = [{"output_type": "stream", "name": "stdout", "text": text}] if text else []
+    return {"cell_type": "code", "metadata": {}, "execution_count": 1, "source": source, "outputs": outputs}
+
+
+def build_rubric(path, inner_expected=200):
+    rubric = {"output_validation": {"expected_outputs": {"sections": {
+        "part2_inner_join": {"description": "Inner join results", "checks": [
+            {"type": "row_count", "variable": "customer_orders", "expected": inner_expected, "tolerance": 5,
+             "patterns": ["Inner Join Result:\\s*(\\d+)"]}]},
+        "part2_right_join": {"description": "Right join results", "checks": [
+            {"type": "row_count", "variable": "customer_orders_right", "expected": 250, "tolerance": 5},
+            {"type": "count_value", "description": "orders with invalid customers",
+             "aliases": ["Orders with invalid customer IDs"], "expected": 50, "tolerance": 5}]},
+        "part5_customer_metrics": {"description": "Customer metrics analysis", "checks": [
+            {"type": "numerical_value", "description": "top customer total spent",
+             "expected": 8471.51, "tolerance_percent": 5}]}
+    }}}}
+    with open(path, 'w') as f:
+        json.dump(rubric, f)
+
+
+def build_notebook(path):
+    """Row counts only visible in the cell of the variable they belong to"""
+    nb = {
+        "nbformat": 4, "nbformat_minor": 5, "metadata": {},
+        "cells": [
+            code_cell("customers <- read_csv('customers.csv')", "\x1b[1mRows: \x1b[22m\x1b[34m100\x1b[39m Columns: 5\n"),
+            {"cell_type": "markdown", "metadata": {}, "source": "## Part 2"},
+            code_cell("customer_orders <- inner_join(customers, orders)", "Inner Join Result: 200 \n"),
+            code_cell("customer_orders_right <- right_join(customers, orders)", ""),
+            code_cell("nrow(customer_orders_right)", "[1] 250 rows\nOrders with invalid customer IDs: 50 \n"),
+            code_cell("customer_metrics <- summarise(...)", "Top customer total spent: $ 8471.51 \n"),
+        ]
+    }
+    with open(path, 'w') as f:
+        json.dump(nb, f)
+
+
+def validated():
+    """Section results of the built notebook checked against the built rubric"""
+    with tempfile.TemporaryDirectory() as tmp:
+        rubric_path = os.path.join(tmp, "rubric.json")
+        notebook_path = os.path.join(tmp, "student.ipynb")
+        build_rubric(rubric_path)
+        build_notebook(notebook_path)
+        return OutputValidator(notebook_path, rubric_path=rubric_path).validate_student_outputs(notebook_path)
+
+
+def test_all_checks_passed():
+    result = validated()
+    assert result['passed_checks'] == result['total_checks'] == 4
+
+
+def test_row_count_read_from_the_variables_own_cell():
+    assert validated()['section_results']['part2_inner_join']['checks'][0]['cell_index'] == 2
+
+
+def test_row_count_read_from_the_next_cell():
+    assert validated()['section_results']['part2_right_join']['checks'][0]['found'] == 250
+
+
+def test_alias_matched():
+    assert validated()['section_results']['part2_right_join']['checks'][1]['found'] == 50
+
+
+def test_numerical_value_found():
+    assert validated()['section_results']['part5_customer_metrics']['checks'][0]['found'] == 8471.51
+
+
+def test_plan_cached_per_rubric_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        rubric_path = os.path.join(tmp, "rubric.json")
+        build_rubric(rubric_path)
+        assert load_check_plan(rubric_path) is load_check_plan(rubric_path)
+
+
+def test_plan_recompiled_after_edit():
+    with tempfile.TemporaryDirectory() as tmp:
+        rubric_path = os.path.join(tmp, "rubric.json")
+        build_rubric(rubric_path)
+        plan = load_check_plan(rubric_path)
+        time.sleep(0.01)
+        build_rubric(rubric_path, inner_expected=300)
+        changed = load_check_plan(rubric_path)
+    assert changed is not plan and changed.checks[0].expected == 300
+
+
+if __name__ == "__main__":
+    test_all_checks_passed()
+    test_row_count_read_from_the_variables_own_cell()
+    test_row_count_read_from_the_next_cell()
+    test_alias_matched()
+    test_numerical_value_found()
+    test_plan_cached_per_rubric_file()
+    test_plan_recompiled_after_edit()
+    print("✅ Output check plan tests passed")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test compiled prompt templates and the prompt file cache (prompt_manager.py)
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.append('.')
+
+import prompt_manager
+from correction_analyzer import CorrectionAnalyzer
+from prompt_manager import CompiledPrompt, PromptManager
+
+TEMPLATE = ("Assignment: {assignment_title}\nRubric: {rubric_criteria}{correction_learning}\n"
+            "Code:\n{student_code}\nSolution:\n{solution_code}\n{{not a field}}\n{assignment_specific_instructions}")
+FIELDS = {'assignment_title': 'A6 {joins}', 'rubric_criteria': 'Joins: 40%', 'solution_code': 'x <- 1'}
+
+
+def manager_with_template():
+    """PromptManager reading from fresh directories, and its general code-analysis template file"""
+    manager = PromptManager()
+    manager.prompt_templates_dir = Path(tempfile.mkdtemp())
+    manager.assignment_prompts_dir = Path(tempfile.mkdtemp())
+    template_file = manager.prompt_templates_dir / "general_code_analysis_prompt.txt"
+    template_file.write_text(TEMPLATE)
+    return manager, template_file
+
+
+def test_same_result_as_str_format():
+    manager, _ = manager_with_template()
+    prompt = manager.get_combined_prompt('a6', 'code_analysis', student_code="y <- 0", **FIELDS)
+    correction = manager._correction_summary(None)
+    assert prompt == TEMPLATE.format(student_code="y <- 0", assignment_specific_instructions="",
+                                     correction_learning=f"\n{correction}\n" if correction else "", **FIELDS)
+
+
+def test_students_share_one_compiled_template():
+    manager, _ = manager_with_template()
+    prompt_manager._compiled_cache.clear()
+    prompts = [manager.get_combined_prompt('a6', 'code_analysis', student_code=f"y <- {i}", **FIELDS)
+               for i in range(3)]
+    assert len(prompt_manager._compiled_cache) == 1
+    assert prompts[1].count("y <- 1") == 1
+
+
+def test_edited_template_file_is_reloaded():
+    manager, template_file = manager_with_template()
+    manager.get_combined_prompt('a6', 'code_analysis', student_code="y", **FIELDS)
+    time.sleep(0.01)
+    template_file.write_text("Changed: {assignment_title} / {student_code}")
+    os.utime(template_file, ns=(time.time_ns(), time.time_ns()))
+    assert manager.get_combined_prompt('a6', 'code_analysis', student_code="z", **FIELDS) == "Changed: A6 {joins} / z"
+
+
+def test_assignment_instructions_included():
+    manager, _ = manager_with_template()
+    (manager.assignment_prompts_dir / "a6_code_analysis_prompt.txt").write_text("Check the anti_join")
+    prompt = manager.get_combined_prompt('a6', 'code_analysis', student_code="z", **FIELDS)
+    assert "ASSIGNMENT-SPECIFIC INSTRUCTIONS:\nCheck the anti_join" in prompt
+
+
+def test_conversions_and_format_specs_kept():
+    compiled = CompiledPrompt("{title}: {student_markdown!r:>8}", {'title': 'T'})
+    assert compiled.fill(student_markdown='ab') == "T:     'ab'"
+
+
+def test_missing_field_falls_back_to_the_raw_template():
+    manager, _ = manager_with_template()
+    assert manager.get_combined_prompt('a6', 'code_analysis', **FIELDS) == TEMPLATE
+
+
+def test_corrections_fingerprint_changes_on_same_length_edit():
+    work_dir = tempfile.mkdtemp(prefix='prompt_cache_test_')
+    db_path = os.path.join(work_dir, 'grading_database.db')
+    shutil.copy('grading_database.db', db_path)
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE submissions SET human_score = 30, ai_score = 20, human_feedback = 'Check the joins' "
+                     "WHERE id = (SELECT MIN(id) FROM submissions)")
+        conn.commit()
+        analyzer = CorrectionAnalyzer(db_path)
+        before = analyzer.get_corrections_fingerprint()
+        unchanged = analyzer.get_corrections_fingerprint()
+
+        conn.execute("UPDATE submissions SET human_feedback = 'Check the dates' "
+                     "WHERE id = (SELECT MIN(id) FROM submissions)")
+        conn.commit()
+        conn.close()
+        after = analyzer.get_corrections_fingerprint()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    assert unchanged == before
+    assert after != before
+
+
+if __name__ == "__main__":
+    test_same_result_as_str_format()
+    test_students_share_one_compiled_template()
+    test_edited_template_file_is_reloaded()
+    test_assignment_instructions_included()
+    test_conversions_and_format_specs_kept()
+    test_missing_field_falls_back_to_the_raw_template()
+    test_corrections_fingerprint_changes_on_same_length_edit()
+    print("✅ Prompt cache tests passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test that packed grading prompts stay within their token budget
+(utils/prompt_packer.py), markers included
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+sys.path.append('.')
+
+from submission_preprocessor import SubmissionPreprocessor
+from utils.prompt_packer import count_tokens, pack_notebook_cells, truncate_to_tokens
+
+
+def random_notebook(rng):
+    cells = []
+    for _ in range(rng.randint(1, 25)):
+        lines = [f"result_{i} <- left_join(orders, customers, by = 'id')" for i in range(rng.randint(1, 60))]
+        output = '' if rng.random() < 0.3 else ' '.join(str(rng.random()) for _ in range(rng.randint(1, 400)))
+        cells.append({'code': '\n'.join(lines), 'output': output})
+    return cells
+
+
+def test_truncate_to_tokens():
+    # One enormous line: the " ... [truncated]" marker is counted
+    cut = truncate_to_tokens('a' * 100000, 500)
+    assert count_tokens(cut) <= 500
+    assert cut.startswith('aaaa') and cut.endswith('[truncated]')
+
+    # Many lines: head and tail kept around the omission marker
+    text = '\n'.join(f"line {i} of the printed table" for i in range(2000))
+    cut = truncate_to_tokens(text, 300)
+    assert count_tokens(cut) <= 300
+    assert cut.startswith('line 0') and 'lines omitted' in cut and cut.endswith('line 1999 of the printed table')
+
+    assert truncate_to_tokens('short', 100) == 'short'
+
+
+def test_single_huge_cell_is_trimmed_not_dropped():
+    packed = pack_notebook_cells([{'code': 'a' * 100000}], 500)
+    assert packed['code'].startswith('aaaa')
+    assert packed['sections']['code']['units_omitted'] == 0
+    assert count_tokens(packed['code']) <= 500
+
+
+def test_packed_prompt_within_budget():
+    rng = random.Random(32)
+    for _ in range(150):
+        cells = random_notebook(rng)
+        budget = rng.choice([200, 500, 1500, 6000])
+        packed = pack_notebook_cells(cells, budget, markdown_units=["## Reflection\nJoins keep unmatched rows."],
+                                     rubric="Joins: 40%\nBusiness thinking: 20%")
+        sections = packed['sections']
+        prompt_tokens = sum(count_tokens(sections[name]['text']) for name in ('rubric', 'solution', 'markdown'))
+        prompt_tokens += count_tokens(packed['code'])
+
+        assert packed['total_tokens'] <= budget, (budget, packed['total_tokens'])
+        assert prompt_tokens <= budget, (budget, prompt_tokens)
+        # Outputs are only packed for code cells that were kept
+        assert set(sections['outputs']['units']) <= set(sections['code']['units'])
+        if sections['code']['units_omitted']:
+            assert packed['code'].endswith('code cells omitted to fit the prompt budget]')
+
+
+def test_output_marker_kept_with_its_cell():
+    packed = pack_notebook_cells([{'code': 'x <- 1\nprint(x)', 'output': '[1] 1'}], 1000)
+    assert packed['code'] == 'x <- 1\nprint(x)\n# OUTPUT:\n[1] 1'
+
+
+def write_notebook(path, code):
+    nb = {"nbformat": 4, "nbformat_minor": 5, "metadata": {},
+          "cells": [{"cell_type": "code", "metadata": {}, "execution_count": 1, "source": code, "outputs": []}]}
+    with open(path, 'w') as f:
+        json.dump(nb, f)
+
+
+def test_reused_preprocessor_packs_the_code_it_is_given():
+    preprocessor = SubmissionPreprocessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('first_student', 'second_student'):
+            write_notebook(os.path.join(tmp, f"{name}.ipynb"), f"{name} <- read_csv('sales.csv')")
+        preprocessor.preprocess_notebook(os.path.join(tmp, "first_student.ipynb"))
+        code, markdown, _ = preprocessor.preprocess_notebook(os.path.join(tmp, "second_student.ipynb"))
+
+    assert 'second_student' in preprocessor.format_for_ai(code, markdown)['code']
+    # A code string that did not come from the last notebook is packed as given
+    packed = preprocessor.format_for_ai("third_student <- 1", "")['code']
+    assert 'third_student' in packed and 'second_student' not in packed
+
+
+if __name__ == "__main__":
+    test_truncate_to_tokens()
+    test_single_huge_cell_is_trimmed_not_dropped()
+    test_packed_prompt_within_budget()
+    test_output_marker_kept_with_its_cell()
+    test_reused_preprocessor_packs_the_code_it_is_given()
+    print("✅ Prompt packing stays within budget")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test the what-if regrade (regrade_with_new_validator.simulate_regrade)
+on a copy of the grading database
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+sys.path.append('.')
+
+from regrade_with_new_validator import simulate_regrade
+
+ASSIGNMENT = 'a6v2'  # One submission, graded with the models
+
+
+def simulate_with_feedback(ai_feedback=None):
+    """simulate_regrade's only student, after replacing its stored ai_feedback (None keeps it)"""
+    work_dir = tempfile.mkdtemp(prefix='regrade_test_')
+    db_path = os.path.join(work_dir, 'grading_database.db')
+    shutil.copy('grading_database.db', db_path)
+    if ai_feedback is not None:
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE submissions SET ai_feedback = ? WHERE assignment_id = "
+                     "(SELECT id FROM assignments WHERE name = ?)", (ai_feedback, ASSIGNMENT))
+        conn.commit()
+        conn.close()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = simulate_regrade(ASSIGNMENT, db_path=db_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    [student] = report['students']
+    assert 'error' not in student, student.get('error')
+    return student
+
+
+def test_stored_ai_analysis_reused():
+    assert simulate_with_feedback()['cached_ai_analysis'] is True
+
+
+def test_validation_only_result_is_not_cached_ai():
+    stored = {'technical_analysis': {}, 'comprehensive_feedback': {'instructor_comments': 'Validation only'}}
+    assert simulate_with_feedback(json.dumps(stored))['cached_ai_analysis'] is False
+
+
+def test_unreadable_feedback_is_not_cached_ai():
+    assert simulate_with_feedback('not json')['cached_ai_analysis'] is False
+
+
+if __name__ == "__main__":
+    test_stored_ai_analysis_reused()
+    test_validation_only_result_is_not_cached_ai()
+    test_unreadable_feedback_is_not_cached_ai()
+    print("✅ What-if regrade tests passed")
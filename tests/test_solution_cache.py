@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the shared solution notebook cache (utils/solution_cache.py)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+
+from utils.solution_cache import clear_solution_cache, get_cache_stats, get_solution_artifact
+
+
+def write_solution(path, code):
+    nb = {"nbformat": 4, "nbformat_minor": 5, "metadata": {},
+          "cells": [{"cell_type": "code", "metadata": {}, "execution_count": 1, "source": code, "outputs": []}]}
+    with open(path, 'w') as f:
+        json.dump(nb, f)
+
+
+def test_unchanged_notebook_parsed_once():
+    clear_solution_cache()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solution.ipynb")
+        write_solution(path, "orders <- read_csv('orders.csv')")
+        loads = get_cache_stats()['loads']
+        first = get_solution_artifact(path)
+        second = get_solution_artifact(path)
+    assert second is first
+    assert get_cache_stats()['loads'] == loads + 1
+
+
+def test_rebuilt_when_mtime_changes():
+    clear_solution_cache()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solution.ipynb")
+        write_solution(path, "orders <- read_csv('orders.csv')")
+        first = get_solution_artifact(path)
+
+        # Same size, new content: only the mtime tells them apart
+        write_solution(path, "orders <- read_csv('orderz.csv')")
+        os.utime(path, ns=(0, first.mtime_ns + 10**9))
+        second = get_solution_artifact(path)
+    assert second is not first
+    assert 'orderz.csv' in second.code and 'orders.csv' in first.code
+
+
+def test_memo_runs_each_step_once_per_artifact():
+    clear_solution_cache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'orders': 2}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solution.ipynb")
+        write_solution(path, "orders <- read_csv('orders.csv')")
+        artifact = get_solution_artifact(path)
+        values = [get_solution_artifact(path).memo('variable_outputs', build) for _ in range(5)]
+        other = artifact.memo('extracted_values', lambda: 'other step')
+
+        os.utime(path, ns=(0, artifact.mtime_ns + 10**9))
+        get_solution_artifact(path).memo('variable_outputs', build)
+    assert len(calls) == 2  # Once for the original artifact, once after it was rebuilt
+    assert all(value is values[0] for value in values)
+    assert other == 'other step'
+
+
+def test_memo_runs_once_when_graders_race():
+    clear_solution_cache()
+    calls = []
+
+    def slow_build():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solution.ipynb")
+        write_solution(path, "orders <- read_csv('orders.csv')")
+        artifact = get_solution_artifact(path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            values = list(executor.map(lambda _: artifact.memo('variable_outputs', slow_build), range(16)))
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+
+
+if __name__ == "__main__":
+    test_unchanged_notebook_parsed_once()
+    test_rebuilt_when_mtime_changes()
+    test_memo_runs_each_step_once_per_artifact()
+    test_memo_runs_once_when_graders_race()
+    print("✅ Solution cache tests passed")
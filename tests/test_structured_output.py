@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test streaming JSON parsing of model responses (utils/structured_output.py)
+"""
+
+import sys
+import json
+import logging
+sys.path.append('.')
+
+from flask import Flask, Response, jsonify, request
+
+from business_analytics_grader import STRUCTURED_ATTEMPTS, BusinessAnalyticsGrader
+from servers.mock_model_server import serve_in_thread
+from utils.structured_output import (
+    CODE_ANALYSIS_SCHEMA, FEEDBACK_SCHEMA, MalformedJSONError, StreamingJSONParser, extract_json_object
+)
+
+CODE_ANALYSIS = {
+    "technical_score": 85,
+    "code_strengths": ["You used \"parse_date_time()\" with orders = c(\"mdy HM\")"],
+    "code_suggestions": ["Add a check\nfor NA values"],
+    "technical_observations": ["Completion: 7 out of 8 sections (88%)."]
+}
+
+GPT_OSS_STYLE = (
+    'We need to produce JSON like {"overall_score": <score>}. Let me write it.\n'
+    '```json\n' + json.dumps({"overall_score": 82, "detailed_feedback": {"recommendations": ["Keep going"]},
+                               "instructor_comments": "Good work {on} this."}) + '\n```'
+)
+
+
+def fails_at(text, schema=CODE_ANALYSIS_SCHEMA, strict=True):
+    """Char position the parser rejected text at, or None"""
+    parser = StreamingJSONParser(schema, strict=strict)
+    try:
+        for i in range(0, len(text), 7):
+            parser.feed(text[i:i + 7])
+    except MalformedJSONError as e:
+        return e.position
+    return None
+
+
+def fake_ollama(handler):
+    """Grader pointed at an /api/generate that answers with handler(payload); also returns the payloads sent"""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app = Flask(__name__)
+    payloads = []
+
+    @app.route('/api/generate', methods=['POST'])
+    def generate():
+        payloads.append(request.get_json(force=True))
+        return handler(payloads[-1])
+
+    url, server = serve_in_thread(app)
+    return BusinessAnalyticsGrader(ollama_url=url, connect_models=False), server, payloads
+
+
+def stream(text, done_reason='stop'):
+    lines = [json.dumps({'response': text[i:i + 9], 'done': False}) for i in range(0, len(text), 9)]
+    lines.append(json.dumps({'response': '', 'done': True, 'done_reason': done_reason}))
+    return Response('\n'.join(lines) + '\n', mimetype='application/x-ndjson')
+
+
+def test_parses_while_streaming():
+    text = json.dumps(CODE_ANALYSIS)
+    parser = StreamingJSONParser(CODE_ANALYSIS_SCHEMA, strict=True)
+    chunks_used = 0
+    for i in range(0, len(text) + 50, 4):
+        chunks_used += 1
+        if parser.feed((text + ' ' * 50)[i:i + 4]) is not None:
+            break
+
+    assert parser.value == CODE_ANALYSIS
+    assert chunks_used == len(text) // 4 + 1  # Stopped when the object closed
+
+
+def test_thinking_text_and_example_skipped():
+    feedback = extract_json_object(GPT_OSS_STYLE, any_of=FEEDBACK_SCHEMA['properties'])
+    assert feedback is not None and feedback['overall_score'] == 82
+
+
+def test_braces_inside_strings_kept():
+    feedback = extract_json_object(GPT_OSS_STYLE, any_of=FEEDBACK_SCHEMA['properties'])
+    assert feedback['instructor_comments'] == "Good work {on} this."
+
+
+def test_malformed_stream_caught_early():
+    # Breaks after the first member: rejected at the break, not at the end of the generation
+    broken = '{"technical_score": 85, "code_strengths": ["ok"] "code_suggestions": [' + '"more" ,' * 400
+    assert fails_at(broken) == broken.index('"code_suggestions"')
+
+
+def test_wrong_type_caught_at_the_value():
+    assert fails_at('{"technical_score": "high"') == 20
+
+
+def test_text_before_object_rejected_when_constrained():
+    assert fails_at('Sure! {"technical_score": 1') == 0
+
+
+def test_truncated_response_rejected():
+    parser = StreamingJSONParser(CODE_ANALYSIS_SCHEMA, strict=True)
+    parser.feed('{"technical_score": 85, "code_strengths": ["cut')
+    try:
+        parser.finish()
+    except MalformedJSONError:
+        return
+    raise AssertionError("finish() accepted a truncated object")
+
+
+def test_no_object_returns_none():
+    assert extract_json_object("No JSON here {at all}") is None
+
+
+def test_schema_rejected_falls_back_to_plain_generation():
+    def handler(payload):
+        if 'format' in payload:
+            return jsonify({'error': 'invalid format'}), 400
+        return jsonify({'response': GPT_OSS_STYLE, 'done': True})
+
+    grader, server, payloads = fake_ollama(handler)
+    try:
+        text = grader.generate_with_ollama('m', 'prompt', 1000, schema=FEEDBACK_SCHEMA)
+    finally:
+        server.shutdown()
+    assert json.loads(text)['overall_score'] == 82
+    assert ['format' in p for p in payloads] == [True, False]
+
+
+def test_repeated_malformed_json_falls_back_to_plain_generation():
+    def handler(payload):
+        if 'format' in payload:
+            return stream('Sure! ' + json.dumps(CODE_ANALYSIS))
+        return jsonify({'response': 'Sure! ' + json.dumps(CODE_ANALYSIS), 'done': True})
+
+    grader, server, payloads = fake_ollama(handler)
+    try:
+        text = grader.generate_with_ollama('m', 'prompt', 1000, schema=CODE_ANALYSIS_SCHEMA)
+    finally:
+        server.shutdown()
+    assert json.loads(text) == CODE_ANALYSIS
+    assert ['format' in p for p in payloads] == [True] * STRUCTURED_ATTEMPTS + [False]
+
+
+def test_length_cutoff_retried_with_more_tokens():
+    full = json.dumps(CODE_ANALYSIS)
+
+    def handler(payload):
+        if payload['options']['num_predict'] < 2000:
+            return stream(full[:40], done_reason='length')
+        return stream(full)
+
+    grader, server, payloads = fake_ollama(handler)
+    try:
+        text = grader.generate_with_ollama('m', 'prompt', 1000, schema=CODE_ANALYSIS_SCHEMA)
+    finally:
+        server.shutdown()
+    assert json.loads(text) == CODE_ANALYSIS
+    assert [p['options']['num_predict'] for p in payloads] == [1000, 2000]
+
+
+def test_feedback_glyphs_replaced_in_every_field():
+    grader = BusinessAnalyticsGrader(connect_models=False)
+    response = json.dumps({'overall_score': 85, 'detailed_feedback': {'rubric_notes': '■ Joins ▪ done ● well'}},
+                          ensure_ascii=False)
+    result = grader._parse_feedback_response(response)
+    assert result['detailed_feedback']['rubric_notes'] == '- Joins - done - well'
+
+
+if __name__ == "__main__":
+    test_parses_while_streaming()
+    test_thinking_text_and_example_skipped()
+    test_braces_inside_strings_kept()
+    test_malformed_stream_caught_early()
+    test_wrong_type_caught_at_the_value()
+    test_text_before_object_rejected_when_constrained()
+    test_truncated_response_rejected()
+    test_no_object_returns_none()
+    test_schema_rejected_falls_back_to_plain_generation()
+    test_repeated_malformed_json_falls_back_to_plain_generation()
+    test_length_cutoff_retried_with_more_tokens()
+    test_feedback_glyphs_replaced_in_every_field()
+    print("✅ Structured output parsing tests passed")
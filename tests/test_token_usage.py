@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test per-submission token usage from the distributed client
+(models/distributed_mlx_client.py get_token_usage)
+"""
+
+import asyncio
+import logging
+import sys
+sys.path.append('.')
+
+from models.distributed_mlx_client import DistributedMLXClient
+from servers.mock_model_server import MockModel, create_mock_app, serve_in_thread
+
+
+def serve(name, role):
+    model = MockModel(name, role, ttft='0.01', tokens_per_sec=1000, response_tokens=20, seed=1)
+    return serve_in_thread(create_mock_app(model))
+
+
+def test_parallel_generation_reports_tokens():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    (qwen_url, qwen), (gemma_url, gemma) = serve('qwen', 'code_analysis'), serve('gemma', 'feedback')
+    try:
+        client = DistributedMLXClient(qwen_url, gemma_url)
+        asyncio.run(client.generate_parallel('code prompt', 'feedback prompt'))
+        usage = client.get_token_usage()
+        assert usage['qwen']['generated_tokens'] > 0 and usage['gemma']['generated_tokens'] > 0
+    finally:
+        qwen.shutdown()
+        gemma.shutdown()
+
+
+def test_failed_submission_does_not_report_previous_tokens():
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    (qwen_url, qwen), (gemma_url, gemma) = serve('qwen', 'code_analysis'), serve('gemma', 'feedback')
+    client = DistributedMLXClient(qwen_url, gemma_url)
+    try:
+        asyncio.run(client.generate_parallel('code prompt', 'feedback prompt'))
+    finally:
+        qwen.shutdown()
+        gemma.shutdown()
+
+    # Next submission: both servers gone, so nothing was generated for it
+    try:
+        asyncio.run(client.generate_parallel('code prompt', 'feedback prompt'))
+    except Exception:
+        pass
+    usage = client.get_token_usage()
+    assert usage['prompt_tokens'] == 0 and usage['generated_tokens'] == 0
+
+
+if __name__ == "__main__":
+    test_parallel_generation_reports_tokens()
+    test_failed_submission_does_not_report_previous_tokens()
+    print("✅ Token usage tests passed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test per-submission grading traces (utils/tracing.py)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+
+from utils.tracing import add_phases, load_traces, propagate, save_trace, span, stage_totals, start_trace
+
+
+def _timed(name, seconds):
+    with span(name):
+        time.sleep(seconds)
+        add_phases([('queue', 0.01), ('decode', seconds - 0.01)])
+
+
+def grading_trace():
+    """A trace shaped like one submission: nested spans, two parallel model calls and a failed parse"""
+    with start_trace('grading', submission_id=7, run_tag='run-1', student='Test Student') as trace:
+        with span('grade'):
+            with span('llm') as llm:
+                llm['attrs']['backend'] = 'test'
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [executor.submit(propagate(lambda name: _timed(name, 0.05)), name)
+                               for name in ('llm.qwen', 'llm.gpt_oss')]
+                    for future in futures:
+                        future.result()
+            try:
+                with span('parse'):
+                    raise ValueError("bad json")
+            except ValueError:
+                pass
+    return trace, {record['name']: record for record in trace.spans}
+
+
+def test_span_outside_a_trace_is_a_noop():
+    with span('untraced') as untraced:
+        pass
+    assert untraced is None
+
+
+def test_spans_nest_under_their_parent():
+    _, by_name = grading_trace()
+    assert by_name['llm']['parent'] == by_name['grade']['id']
+    assert by_name['parse']['parent'] == by_name['grade']['id']
+
+
+def test_executor_work_keeps_its_parent():
+    _, by_name = grading_trace()
+    assert by_name['llm.qwen']['parent'] == by_name['llm']['id']
+    assert by_name['llm.gpt_oss']['parent'] == by_name['llm']['id']
+
+
+def test_parallel_calls_overlap_in_time():
+    _, by_name = grading_trace()
+    assert by_name['llm.gpt_oss']['start'] < by_name['llm.qwen']['start'] + by_name['llm.qwen']['duration']
+
+
+def test_phases_laid_out_back_to_back():
+    trace, by_name = grading_trace()
+    phases = [record for record in trace.spans if record['parent'] == by_name['llm.qwen']['id']]
+    assert [p['name'] for p in phases] == ['queue', 'decode']
+    assert abs(phases[1]['start'] - phases[0]['start'] - 0.01) < 1e-9
+
+
+def test_attrs_and_errors_recorded():
+    _, by_name = grading_trace()
+    assert by_name['llm']['attrs'] == {'backend': 'test'}
+    assert by_name['parse']['attrs'] == {'error': 'ValueError'}
+
+
+def test_stage_totals_never_negative():
+    trace, _ = grading_trace()
+    totals = stage_totals(trace.spans)
+    assert totals['llm'] == 0.0 and totals['llm.qwen'] > 0.0
+
+
+def test_trace_saved_and_loaded_by_run():
+    trace, _ = grading_trace()
+    db_path = os.path.join(tempfile.mkdtemp(), 'grading.db')
+    save_trace(db_path, trace)
+    loaded = load_traces(db_path, run_tag='run-1')
+
+    assert len(loaded) == 1 and loaded[0]['submission_id'] == 7
+    assert loaded[0]['attrs']['student'] == 'Test Student'
+    assert len(loaded[0]['spans']) == len(trace.spans)
+    assert load_traces(db_path, submission_id=8) == []  # Other submissions filtered out
+
+
+if __name__ == "__main__":
+    test_span_outside_a_trace_is_a_noop()
+    test_spans_nest_under_their_parent()
+    test_executor_work_keeps_its_parent()
+    test_parallel_calls_overlap_in_time()
+    test_phases_laid_out_back_to_back()
+    test_attrs_and_errors_recorded()
+    test_stage_totals_never_negative()
+    test_trace_saved_and_loaded_by_run()
+    print("✅ Grading trace tests passed")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test the shared rubric/solution lookup (grading_pipeline.find_validation_paths)
+used by the grading pages, grade_cli and the regrade replay
+"""
+
+import contextlib
+import io
+import sys
+sys.path.append('.')
+
+from grading_pipeline import FALLBACK_RUBRIC_PATH, find_validation_paths
+
+
+def lookup(row):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        paths = find_validation_paths(row)
+    return paths, log.getvalue()
+
+
+def test_rubric_file_used_directly():
+    (rubric, solution), log = lookup({'name': 'a7v3', 'rubric': 'rubrics/assignment_7_rubric_v2.json',
+                                      'solution_notebook': 'no/such/solution.ipynb'})
+    assert rubric == 'rubrics/assignment_7_rubric_v2.json'
+    assert solution is None
+    assert log == ''
+
+
+def test_fallback_rubric_warns():
+    (rubric, _), log = lookup({'name': 'a7', 'rubric': '{"assignment_info": {}}', 'solution_notebook': None})
+    assert rubric == FALLBACK_RUBRIC_PATH
+    assert "falling back" in log and "'a7'" in log
+
+
+def test_no_rubric():
+    (rubric, solution), log = lookup({'name': 'a7', 'rubric': '', 'solution_notebook': None})
+    assert (rubric, solution) == (None, None)
+
+
+if __name__ == "__main__":
+    test_rubric_file_used_directly()
+    test_fallback_rubric_warns()
+    test_no_rubric()
+    print("✅ Validation path lookup tests passed")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Feedback Sanitizer
+Removes the model's internal reasoning ("We need to...", "Now produce
+JSON", channel markers, echoed prompt text) from feedback before it is
+stored (ai_grader.filter_ai_feedback_for_storage) and before it is
+rendered (PDFReportGenerator).
+
+Each phrase list is compiled once into a single regex whose alternatives
+share their common prefixes, so a line is lowercased once and scanned
+once however many phrases there are. Removal patterns are compiled once
+and applied one after another in list order: an earlier removal can
+expose text for a later one, so they cannot be merged into a single
+alternation without changing the output.
+"""
+
+import re
+from typing import Iterable, Optional, Sequence
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def phrase_pattern(phrases: Iterable[str]) -> re.Pattern:
+    """
+    One regex matching any of phrases, with the alternatives arranged as a
+    trie (e.g. "they (?:a(?:lso|nswered)|...)") so matching at a position
+    walks the shared prefixes once instead of trying every phrase
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        if list(node) == ['']:
+            return ''
+        branches = []
+        optional = '' in node
+        for char in sorted(c for c in node if c):
+            branches.append(re.escape(char) + build(node[char]))
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if optional else body
+
+    return re.compile(build(trie))
+
+
+class RemovalPatterns:
+    """
+    Precompiled removal patterns applied in order, one re.sub pass each -
+    the same result as looping re.sub over the pattern strings
+    """
+
+    def __init__(self, patterns: Sequence[str], flags: int = re.IGNORECASE | re.DOTALL):
+        self.patterns = [re.compile(p, flags) for p in patterns]
+
+    def sub(self, repl: str, text: str) -> str:
+        for pattern in self.patterns:
+            text = pattern.sub(repl, text)
+        return text
+
+
+class LineFilter:
+    """
+    Keeps the lines of a response that read like feedback: drops lines
+    containing any forbidden phrase (case-insensitive), starting with a
+    reasoning marker, shorter than min_length or matching skip_pattern,
+    and joins the first max_lines that remain
+    """
+
+    def __init__(self, phrases: Iterable[str], prefixes: Sequence[str] = (),
+                 skip_pattern: Optional[str] = None, min_length: int = 15, max_lines: int = 3):
+        self.phrases = phrase_pattern(phrase.lower() for phrase in phrases)
+        self.prefixes = tuple(prefixes)
+        self.skip_pattern = re.compile(skip_pattern) if skip_pattern else None
+        self.min_length = min_length
+        self.max_lines = max_lines
+
+    def keeps(self, line: str) -> bool:
+        """Whether a stripped line survives the filter"""
+        if self.phrases.search(line.lower()):
+            return False
+        if len(line) < self.min_length:
+            return False
+        if self.prefixes and line.startswith(self.prefixes):
+            return False
+        if self.skip_pattern and self.skip_pattern.search(line):
+            return False
+        return True
+
+    def filter(self, text: str) -> str:
+        clean_lines = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if self.keeps(line):
+                clean_lines.append(line)
+                if len(clean_lines) == self.max_lines:
+                    break
+        return ' '.join(clean_lines)
+
+
+# Phrases that mark a line of model reasoning rather than feedback
+REASONING_PHRASES = [
+    "we need to", "let's", "first, check", "now evaluate", "now assign",
+    "now produce", "let's craft", "the student provided", "they have code",
+    "did they complete", "the assignment required", "good.", "thus they",
+    "reflection quality:", "business understanding:", "communication clarity:",
+    "data interpretation:", "methodology appropriateness:", "overall score:",
+    "maybe", "now produce json", "<|end|>", "<|start|>", "assistant", "channel"
+]
+REASONING_PREFIXES = ("We ", "Let's ", "First ", "Now ", "The student ", "They ")
+
+# Stored feedback: reasoning plus the model's notes on individual questions
+STORAGE_LINE_FILTER = LineFilter(
+    REASONING_PHRASES + [
+        "they answered", "they gave", "they completed", "they did", "they also",
+        "they wrote", "they provided", "they used", "they could", "they should",
+        "part 1:", "part 2:", "part 3:", "part 4:", "part 5:",
+        "q1 (", "q2 (", "q3 (", "q4 (", "q5 (",
+        "missing value strategy", "outlier interpretation", "data quality impact",
+        "ethical considerations", "thorough answers", "gave thorough"
+    ],
+    prefixes=REASONING_PREFIXES + ("Part ",),
+    skip_pattern=r'\bQ\d+\b'
+)
+
+# Report fallback when feedback has no JSON: reasoning plus the grading steps themselves
+REPORT_LINE_FILTER = LineFilter(
+    REASONING_PHRASES + ["final", "message",
+                         "evaluate", "assess", "check completeness", "assign scores", "craft feedback"],
+    prefixes=REASONING_PREFIXES
+)
+
+# A detailed_feedback item mentioning any of these is the model talking to itself
+DETAILED_ITEM_PHRASES = phrase_pattern([
+    "we need", "let's", "the student", "they have", "first,", "now",
+    "good.", "thus", "maybe", "overall score:", "business understanding:",
+    "communication clarity:", "data interpretation:", "methodology appropriateness:",
+    "reflection quality:", "now produce", "let's craft",
+    "they answered", "they gave", "they completed", "they did", "they also",
+    "they wrote", "they provided", "they used", "they could", "they should",
+    "part 1:", "part 2:", "part 3:", "part 4:", "part 5:",
+    "q1", "q2", "q3", "q4", "q5",
+    "missing value strategy", "outlier interpretation", "data quality impact",
+    "ethical considerations", "thorough answers"
+])
+
+# Reasoning sentences, channel markers and stray JSON inside instructor comments
+COMMENT_ARTIFACTS = [
+    r"We need to.*?\.",
+    r"Let's.*?\.",
+    r"First,.*?\.",
+    r"Now.*?\.",
+    r"The student provided.*?\.",
+    r"They have.*?\.",
+    r"<\|.*?\|>",
+    r"\{.*?\}",
+    r"JSON.*?"
+]
+COMMENT_ARTIFACT_PATTERN = RemovalPatterns(COMMENT_ARTIFACTS)
+
+# ...plus score lines and thinking blocks (stored comments are scrubbed harder)
+STORED_COMMENT_ARTIFACT_PATTERN = RemovalPatterns(COMMENT_ARTIFACTS + [
+    r"Overall score:.*?\.",
+    r"Business understanding:.*?\.",
+    r"Communication clarity:.*?\.",
+    r"Data interpretation:.*?\.",
+    r"Methodology appropriateness:.*?\.",
+    r"Reflection quality:.*?\.",
+    r"Now produce.*?\.",
+    r"Let's craft.*?\.",
+    r"<think>.*?</think>",
+    r"<reasoning>.*?</reasoning>",
+    r"\[thinking\].*?\[/thinking\]",
+    r"\[internal\].*?\[/internal\]",
+])
+
+# Prompt text the model echoes back into its comments
+PROMPT_ECHO_PATTERN = RemovalPatterns([
+    r"Must reference specific.*?(?=\n|$)",
+    r"Provide reflection assessment.*?(?=\n|$)",
+    r"Must be pure.*?(?=\n|$)",
+    r"Student's reflection.*?(?=\n\n|\Z)",
+    r"Reflection assessment items:.*?(?=\n\n|\Z)",
+    r"Analytical strengths:.*?(?=\n\n|\Z)",
+    r"Business application:.*?(?=\n\n|\Z)",
+    r"Learning demonstration:.*?(?=\n\n|\Z)",
+    r"Areas for development:.*?(?=\n\n|\Z)",
+    r"Recommendations:.*?(?=\n\n|\Z)",
+    r"Instructor comments:.*?(?=\n\n|\Z)",
+    r"assistantfinal\{.*?\}",
+    r"Make sure.*?(?=\n|$)",
+    r"Ensure.*?(?=\n|$)",
+    r"- \".*?\"",  # Quoted items
+    r"■",
+])
+
+# Labelled notes to self in report text
+REPORT_DIALOG_PATTERN = RemovalPatterns([
+    r"What I'm looking for:.*?(?=\n|$)",
+    r"What to focus on:.*?(?=\n|$)",
+    r"Internal reasoning:.*?(?=\n|$)",
+    r"AI thinking:.*?(?=\n|$)",
+    r"Model dialog:.*?(?=\n|$)",
+    r"Express version:.*?(?=\n|$)",
+    r"Quick assessment:.*?(?=\n|$)",
+    r"\[Internal:.*?\]",
+    r"\[AI:.*?\]",
+    r"\[Reasoning:.*?\]"
+])
+
+
+def scrub(text: str, pattern: RemovalPatterns) -> str:
+    """Apply removal patterns and collapse whitespace"""
+    return WHITESPACE.sub(' ', pattern.sub('', text)).strip()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Lazy Imports
+Heavy subsystems (scikit-learn for ML training, reportlab for PDF reports,
+nbconvert for notebook previews, the model backends with aiohttp) cost
+seconds to import, and Streamlit pages and CLI scripts used to pay that on
+every start even when they never used them. Modules take a handle at import
+time instead:
+
+    pdf = lazy('pdf')
+    ...
+    pdf.PDFReportGenerator()   # report_generator is imported here, once
+
+Load times are recorded per subsystem (see benchmarks/startup_benchmark.py).
+"""
+
+import importlib
+import threading
+import time
+from typing import Any, Dict
+
+# Subsystem -> name it provides -> module that defines it
+SUBSYSTEMS = {
+    'ml_training': {
+        'TfidfVectorizer': 'sklearn.feature_extraction.text',
+        'cosine_similarity': 'sklearn.metrics.pairwise',
+        'RandomForestRegressor': 'sklearn.ensemble'
+    },
+    'pdf': {
+        'PDFReportGenerator': 'report_generator'
+    },
+    'notebook_export': {
+        'HTMLExporter': 'nbconvert'
+    },
+    'model_backends': {
+        'BusinessAnalyticsGrader': 'business_analytics_grader',
+        'DistributedMLXClient': 'models.distributed_mlx_client',
+        'show_distributed_status': 'models.distributed_mlx_client',
+        'show_two_model_status': 'model_status_display',
+        'DisaggregatedInference': 'disaggregated_inference.orchestrator'
+    }
+}
+
+_load_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+class LazySubsystem:
+    """Handle on a subsystem; each name is imported on first attribute access"""
+
+    def __init__(self, subsystem: str):
+        if subsystem not in SUBSYSTEMS:
+            raise KeyError(f"Unknown subsystem '{subsystem}' (known: {', '.join(SUBSYSTEMS)})")
+        self._subsystem = subsystem
+
+    def __getattr__(self, name: str) -> Any:
+        module_name = SUBSYSTEMS[self._subsystem].get(name)
+        if module_name is None:
+            raise AttributeError(f"'{self._subsystem}' subsystem has no '{name}'")
+
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        seconds = time.perf_counter() - start
+        with _lock:
+            key = f"{self._subsystem}:{module_name}"
+            _load_times[key] = _load_times.get(key, 0.0) + seconds
+
+        value = getattr(module, name)
+        setattr(self, name, value)  # Later lookups skip __getattr__
+        return value
+
+    def __repr__(self):
+        return f"<lazy subsystem '{self._subsystem}'>"
+
+
+def lazy(subsystem: str) -> LazySubsystem:
+    """Handle on a registered subsystem, imported on first use"""
+    return LazySubsystem(subsystem)
+
+
+def load_times() -> Dict[str, float]:
+    """Seconds spent importing each 'subsystem:module' so far in this process"""
+    with _lock:
+        return dict(_load_times)
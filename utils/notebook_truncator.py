@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Notebook Slimmer
+Shrinks oversized student notebooks before grading by dropping embedded
+images and cutting long printed outputs (big tibbles, runaway loops) down
+to their head and tail. Submissions over the old 600 KB skip limit get a
+slimmed copy that every later grading layer reads instead of being skipped
+for manual review; anything smaller is graded as-is.
+
+Copies go to a shared cache directory keyed by the source notebook's path,
+mtime and size, so regrading reuses them and the directory stays bounded.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Anything over this is slimmed (notebooks up to it were always graded in full);
+# it is also the size the slimmed copy aims for
+DEFAULT_TARGET_KB = 600
+
+# Binary / rich payloads that carry no gradeable text
+IMAGE_MIME_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/svg+xml', 'application/pdf')
+# Rich text reprs that duplicate text/plain (R prints tibbles as HTML + LaTeX + markdown)
+DUPLICATE_MIME_TYPES = ('text/html', 'text/latex', 'text/markdown')
+
+INLINE_IMAGE_PATTERN = re.compile(r'!\[([^\]]*)\]\(data:image/[^;]+;base64,[A-Za-z0-9+/=\s]+\)')
+
+# Slimmed copies written without an explicit output_path (oldest pruned past the limit)
+SLIM_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'grader_slim_notebooks')
+SLIM_CACHE_MAX_ENTRIES = 200
+
+
+def _text(value: Any) -> str:
+    """nbformat stores multi-line strings either as a str or a list of lines"""
+    if isinstance(value, list):
+        return ''.join(value)
+    return value if isinstance(value, str) else str(value)
+
+
+class NotebookSlimmer:
+    """Drop image payloads and summarize long outputs in a notebook"""
+
+    def __init__(self, target_kb: int = DEFAULT_TARGET_KB, max_output_lines: int = 60,
+                 head_lines: int = 25, tail_lines: int = 10, max_output_chars: int = 6000,
+                 max_traceback_lines: int = 15):
+        """
+        Args:
+            target_kb: Size the slimmed notebook should fit in
+            max_output_lines: Outputs longer than this keep only head + tail lines
+            head_lines / tail_lines: Lines kept from the start / end of a long output
+            max_output_chars: Hard cap per output text after line trimming
+            max_traceback_lines: Error tracebacks keep only their last lines
+        """
+        self.target_bytes = target_kb * 1024
+        self.max_output_lines = max_output_lines
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.max_output_chars = max_output_chars
+        self.max_traceback_lines = max_traceback_lines
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {
+            'images_removed': 0,
+            'image_bytes_removed': 0,
+            'rich_outputs_removed': 0,
+            'outputs_truncated': 0,
+            'lines_omitted': 0,
+            'attachments_removed': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Per-output slimming
+    # ------------------------------------------------------------------
+
+    def _trim_text(self, text: str) -> str:
+        """Keep the head and tail of a long output and say what was cut"""
+        lines = text.splitlines(keepends=True)
+        if len(lines) > self.max_output_lines:
+            omitted = len(lines) - self.head_lines - self.tail_lines
+            self.stats['outputs_truncated'] += 1
+            self.stats['lines_omitted'] += omitted
+            text = (''.join(lines[:self.head_lines]) +
+                    f"... [{omitted} lines omitted] ...\n" +
+                    ''.join(lines[-self.tail_lines:]))
+
+        if len(text) > self.max_output_chars:
+            half = self.max_output_chars // 2
+            self.stats['outputs_truncated'] += 1
+            text = (text[:half] +
+                    f"\n... [{len(text) - self.max_output_chars} characters omitted] ...\n" +
+                    text[-half:])
+        return text
+
+    def _slim_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Slim a display_data / execute_result mime bundle"""
+        placeholders = []
+        for mime in list(data):
+            if mime in IMAGE_MIME_TYPES:
+                size = len(_text(data.pop(mime)))
+                self.stats['images_removed'] += 1
+                self.stats['image_bytes_removed'] += size
+                placeholders.append(f"[{mime} removed: {size / 1024:.0f} KB]")
+            elif mime in DUPLICATE_MIME_TYPES and 'text/plain' in data:
+                data.pop(mime)
+                self.stats['rich_outputs_removed'] += 1
+            elif mime.startswith('application/') and mime != 'application/json':
+                # Widget state / javascript bundles
+                data.pop(mime)
+                self.stats['rich_outputs_removed'] += 1
+
+        if 'text/plain' in data:
+            data['text/plain'] = self._trim_text(_text(data['text/plain']))
+        elif placeholders:
+            # Keep the output visible to "has output" checks
+            data['text/plain'] = ' '.join(placeholders)
+
+        for mime in DUPLICATE_MIME_TYPES:
+            if mime in data:
+                data[mime] = self._trim_text(_text(data[mime]))
+        return data
+
+    def slim_output(self, output: Dict[str, Any]) -> Dict[str, Any]:
+        """Slim one cell output in place"""
+        output_type = output.get('output_type')
+        if output_type == 'stream':
+            output['text'] = self._trim_text(_text(output.get('text', '')))
+        elif output_type in ('display_data', 'execute_result'):
+            output['data'] = self._slim_data(output.get('data', {}))
+        elif output_type == 'error':
+            traceback = output.get('traceback', [])
+            if len(traceback) > self.max_traceback_lines:
+                self.stats['outputs_truncated'] += 1
+                self.stats['lines_omitted'] += len(traceback) - self.max_traceback_lines
+                output['traceback'] = traceback[-self.max_traceback_lines:]
+        return output
+
+    def _slim_cell(self, cell: Dict[str, Any]) -> Dict[str, Any]:
+        if 'attachments' in cell:
+            self.stats['attachments_removed'] += len(cell['attachments'] or {})
+            cell.pop('attachments')
+        if cell.get('cell_type') == 'markdown':
+            source = _text(cell.get('source', ''))
+            slimmed = INLINE_IMAGE_PATTERN.sub(r'[inline image removed: \1]', source)
+            if slimmed != source:
+                self.stats['images_removed'] += 1
+                self.stats['image_bytes_removed'] += len(source) - len(slimmed)
+                cell['source'] = slimmed
+        return cell
+
+    def _object_hook(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Called by json.load for every object as it is decoded, so outputs are slimmed while parsing"""
+        if 'output_type' in obj:
+            return self.slim_output(obj)
+        if 'cell_type' in obj:
+            return self._slim_cell(obj)
+        return obj
+
+    # ------------------------------------------------------------------
+    # Whole notebooks
+    # ------------------------------------------------------------------
+
+    def _tighten(self):
+        """Halve the output limits for another pass when still over target"""
+        self.max_output_lines = max(10, self.max_output_lines // 2)
+        self.head_lines = max(5, self.head_lines // 2)
+        self.tail_lines = max(2, self.tail_lines // 2)
+        self.max_output_chars = max(500, self.max_output_chars // 2)
+
+    def _all_outputs(self, nb: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [output for cell in nb.get('cells', []) for output in cell.get('outputs', [])]
+
+    def _cache_key(self, notebook_path: str) -> str:
+        """Source path, mtime and size plus the settings that change the output"""
+        source = os.stat(notebook_path)
+        settings = (self.target_bytes, self.max_output_lines, self.head_lines, self.tail_lines,
+                    self.max_output_chars, self.max_traceback_lines)
+        key = f"{os.path.abspath(notebook_path)}|{source.st_mtime_ns}|{source.st_size}|{settings}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def slim_file(self, notebook_path: str, output_path: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Write a slimmed copy of a notebook (to SLIM_CACHE_DIR unless output_path
+        is given; an unchanged notebook reuses its cached copy)
+
+        Returns:
+            (slimmed_path, info) with before/after size and timing
+        """
+        start_time = time.time()
+        self._reset_stats()
+
+        info_path = None
+        if output_path is None:
+            os.makedirs(SLIM_CACHE_DIR, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(notebook_path))[0]
+            key = self._cache_key(notebook_path)
+            output_path = os.path.join(SLIM_CACHE_DIR, f"{stem}_{key[:16]}_slim.ipynb")
+            info_path = output_path[:-len('.ipynb')] + '.json'
+            try:
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                if os.path.exists(output_path):
+                    os.utime(output_path)  # Recently used - pruned last
+                    info.update({'cached': True, 'slim_time': time.time() - start_time})
+                    return output_path, info
+            except (OSError, ValueError):
+                pass
+
+        original_bytes = os.path.getsize(notebook_path)
+
+        with open(notebook_path, 'r', encoding='utf-8') as f:
+            nb = json.load(f, object_hook=self._object_hook)
+
+        serialized = json.dumps(nb, indent=1, ensure_ascii=False)
+        passes = 1
+        # Still too big (e.g. thousands of short outputs) - tighten and re-trim
+        while len(serialized.encode('utf-8')) > self.target_bytes and passes < 4:
+            self._tighten()
+            for output in self._all_outputs(nb):
+                self.slim_output(output)
+            serialized = json.dumps(nb, indent=1, ensure_ascii=False)
+            passes += 1
+
+        # Write then rename, so a parallel grader never reads a partial copy
+        partial_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            f.write(serialized)
+        os.replace(partial_path, output_path)
+
+        info = {
+            'slimmed': True,
+            'original_path': notebook_path,
+            'slimmed_path': output_path,
+            'original_kb': original_bytes / 1024,
+            'slimmed_kb': os.path.getsize(output_path) / 1024,
+            'within_target': os.path.getsize(output_path) <= self.target_bytes,
+            'passes': passes,
+            'slim_time': time.time() - start_time,
+            **self.stats
+        }
+        if info_path:
+            with open(info_path, 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+            prune_slim_cache()
+        return output_path, info
+
+
+def prune_slim_cache(max_entries: int = SLIM_CACHE_MAX_ENTRIES):
+    """Delete the least recently used slimmed copies beyond max_entries"""
+    try:
+        copies = [entry for entry in os.scandir(SLIM_CACHE_DIR) if entry.name.endswith('_slim.ipynb')]
+    except OSError:
+        return
+    copies.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in copies[max_entries:]:
+        for path in (entry.path, entry.path[:-len('.ipynb')] + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def slim_notebook_if_needed(notebook_path: str, target_kb: int = DEFAULT_TARGET_KB,
+                            output_path: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Slim a notebook only when it is larger than target_kb
+
+    Returns:
+        (notebook_to_use, slimming_info) - the original path is returned
+        unchanged for notebooks that are already small enough
+    """
+    size_kb = os.path.getsize(notebook_path) / 1024
+    if size_kb <= target_kb:
+        return notebook_path, {'slimmed': False, 'original_kb': size_kb}
+
+    print(f"✂️ Slimming large notebook ({size_kb:.1f} KB)...")
+    slimmed_path, info = NotebookSlimmer(target_kb=target_kb).slim_file(notebook_path, output_path)
+    print(f"✅ Slimmed {info['original_kb']:.1f} KB -> {info['slimmed_kb']:.1f} KB in {info['slim_time']:.2f}s "
+          f"({info['images_removed']} images removed, {info['lines_omitted']} output lines omitted)")
+    if not info['within_target']:
+        print(f"⚠️ Slimmed notebook is still over {target_kb} KB (mostly code/markdown)")
+    return slimmed_path, info
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python utils/notebook_truncator.py <notebook_path> [output_path]")
+        sys.exit(1)
+
+    path, info = slim_notebook_if_needed(sys.argv[1], output_path=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(json.dumps(info, indent=2))
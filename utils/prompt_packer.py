@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Prompt Packer
+Fits grading prompts into a token budget instead of cutting at a fixed
+character count. Each prompt section (rubric, solution, student code,
+outputs, markdown) gets a share of the budget; unused share flows to the
+other sections in priority order. Sections are packed cell by cell so the
+model sees whole cells, with oversized cells trimmed to head + tail.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# Tokens the student-facing part of a grading prompt may use unless the
+# caller sets its own budget (roughly what the old 15,000-char code cut allowed,
+# plus outputs and markdown)
+DEFAULT_PROMPT_TOKENS = 6000
+
+# Context windows the servers are run with (matched by substring of the model name)
+MODEL_CONTEXT_WINDOWS = {
+    'qwen3-coder': 32768,
+    'qwen': 32768,
+    'gpt-oss': 131072,
+    'gemma': 8192,
+    'llama': 8192
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Approximate counts are padded so a prompt never overflows on a tokenizer
+# that splits more finely than the estimate
+APPROX_SAFETY_MARGIN = 1.1
+
+# Cells smaller than this are never worth trimming - keep whole or drop
+MIN_TRIM_TOKENS = 48
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\n+|[^\sA-Za-z\d]")
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Fast BPE-style estimate: words count one token per ~6 letters, digits
+    one per 3, every symbol and newline run one. Runs in a single regex
+    pass, so it is cheap enough to call per cell.
+    """
+    count = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            count += 1 + (len(piece) - 1) // 6
+        elif first.isdigit():
+            count += math.ceil(len(piece) / 3)
+        else:
+            count += 1
+    return math.ceil(count * APPROX_SAFETY_MARGIN)
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model_name: str):
+    """
+    Load the backend's own tokenizer if transformers and a local copy of the
+    model are available; None means callers fall back to the approximation.
+    Never downloads - this runs on the grading host.
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, tokenizer=None) -> int:
+    """Exact count with a tokenizer, fast approximation without one"""
+    if not text:
+        return 0
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return approx_token_count(text)
+
+
+def context_window_for(model_name: Optional[str]) -> int:
+    """Context window for a model name like 'mlx-community/Qwen3-Coder-30B-A3B-Instruct-8bit'"""
+    name = (model_name or '').lower()
+    for key, window in MODEL_CONTEXT_WINDOWS.items():
+        if key in name:
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def budget_for_model(model_name: Optional[str], max_output_tokens: int = 0, fixed_prompt_tokens: int = 0,
+                     cap: int = DEFAULT_PROMPT_TOKENS) -> int:
+    """
+    Tokens left for packed sections: never more than the context window minus
+    the generation budget and the fixed prompt text, and never more than cap
+    (a bigger prompt only costs prefill time)
+    """
+    available = context_window_for(model_name) - max_output_tokens - fixed_prompt_tokens
+    return max(0, min(cap, available))
+
+
+def _cut_to_tokens(text: str, max_tokens: int, marker: str, tokenizer=None) -> str:
+    """Longest prefix of text that fits in max_tokens together with marker (dropped if even it won't fit)"""
+    if count_tokens(marker, tokenizer) > max_tokens:
+        marker = ''
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle] + marker, tokenizer) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + marker if low else ''
+
+
+def truncate_to_tokens(text: str, max_tokens: int, tokenizer=None) -> str:
+    """Keep the head and tail lines of text within max_tokens, marking the cut"""
+    if count_tokens(text, tokenizer) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    # The most lines the marker can report is len(lines), so this is its largest cost
+    marker_tokens = count_tokens(f"... [{len(lines)} lines omitted] ...\n", tokenizer)
+    head_budget = int((max_tokens - marker_tokens) * 0.7)
+    tail_budget = max_tokens - marker_tokens - head_budget
+
+    head, used = [], 0
+    for line in lines:
+        cost = count_tokens(line + '\n', tokenizer)
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        cost = count_tokens(line + '\n', tokenizer)
+        if used + cost > tail_budget:
+            break
+        tail.insert(0, line)
+        used += cost
+
+    if head or tail:
+        omitted = len(lines) - len(head) - len(tail)
+        truncated = '\n'.join(head + [f"... [{omitted} lines omitted] ..."] + tail)
+        if count_tokens(truncated, tokenizer) <= max_tokens:
+            return truncated
+
+    # One enormous line (e.g. a printed vector) - cut by characters
+    return _cut_to_tokens(text, max_tokens, " ... [truncated]", tokenizer)
+
+
+@dataclass
+class PromptSection:
+    """
+    One part of a prompt, split into units (usually notebook cells)
+
+    priority: lower fills first when spare budget is handed out
+    share: fraction of the budget reserved for this section
+    unit_prefix: text put in front of every kept unit (e.g. "# OUTPUT:"),
+    counted against the budget
+    """
+    name: str
+    units: List[str]
+    priority: int = 1
+    share: float = 0.25
+    separator: str = '\n\n'
+    unit_prefix: str = ''
+    unit_tokens: List[int] = field(default_factory=list)
+
+
+class PromptPacker:
+    """Pack prompt sections into a token budget by share and priority"""
+
+    def __init__(self, budget: int = DEFAULT_PROMPT_TOKENS, tokenizer=None):
+        self.budget = budget
+        self.tokenizer = tokenizer
+
+    def _allocate(self, sections: List[PromptSection], needs: Dict[str, int]) -> Dict[str, int]:
+        """Reserved share first, then leftover budget to sections in priority order"""
+        allowance = {s.name: min(needs[s.name], int(self.budget * s.share)) for s in sections}
+        leftover = self.budget - sum(allowance.values())
+
+        for section in sorted(sections, key=lambda s: s.priority):
+            if leftover <= 0:
+                break
+            extra = min(leftover, needs[section.name] - allowance[section.name])
+            allowance[section.name] += extra
+            leftover -= extra
+        return allowance
+
+    def _fill(self, section: PromptSection, allowance: int) -> Dict[str, Any]:
+        """Keep units in order while they fit; trim units too big to share the section"""
+        separator_tokens = count_tokens(section.separator, self.tokenizer) + \
+            count_tokens(section.unit_prefix, self.tokenizer)
+        # When the section doesn't fit, no single cell may take more than a
+        # quarter of it (a huge printed table shouldn't crowd out later cells)
+        units = sum(1 for unit in section.units if unit.strip())
+        unit_cap = allowance
+        if sum(section.unit_tokens) + units * separator_tokens > allowance:
+            unit_cap = max(MIN_TRIM_TOKENS, allowance // min(4, max(1, units)))
+
+        kept, used, omitted, trimmed = {}, 0, 0, 0
+        for index, (unit, tokens) in enumerate(zip(section.units, section.unit_tokens)):
+            if not unit.strip():
+                continue
+            if tokens + separator_tokens > unit_cap:
+                # The separator and prefix are paid for out of the same cap
+                unit = truncate_to_tokens(unit, max(0, unit_cap - separator_tokens), self.tokenizer)
+                tokens = count_tokens(unit, self.tokenizer)
+                trimmed += 1
+                if not unit:
+                    omitted += 1
+                    continue
+            cost = tokens + separator_tokens
+            if used + cost > allowance:
+                # Later, smaller cells may still fit
+                omitted += 1
+                continue
+            kept[index] = section.unit_prefix + unit
+            used += cost
+
+        return {
+            'units': kept,
+            'text': section.separator.join(kept.values()),
+            'tokens': used,
+            'original_tokens': sum(section.unit_tokens),
+            'allowance': allowance,
+            'units_total': len(section.units),
+            'units_omitted': omitted,
+            'units_trimmed': trimmed
+        }
+
+    def pack(self, sections: List[PromptSection]) -> Dict[str, Any]:
+        """
+        Returns:
+            {'sections': {name: {'text', 'units', 'tokens', ...}}, 'total_tokens', 'budget', 'exact'}
+        """
+        needs = {}
+        for section in sections:
+            if not section.unit_tokens:
+                section.unit_tokens = [count_tokens(unit, self.tokenizer) for unit in section.units]
+            separator_tokens = count_tokens(section.separator, self.tokenizer) + \
+                count_tokens(section.unit_prefix, self.tokenizer)
+            needs[section.name] = sum(t + separator_tokens for t in section.unit_tokens if t)
+
+        allowance = self._allocate(sections, needs)
+        packed = {s.name: self._fill(s, allowance[s.name]) for s in sections}
+
+        return {
+            'sections': packed,
+            'total_tokens': sum(p['tokens'] for p in packed.values()),
+            'budget': self.budget,
+            'exact': self.tokenizer is not None
+        }
+
+
+def pack_notebook_cells(cells: List[Dict[str, str]], budget: int, markdown_units: List[str] = None,
+                        rubric: str = '', solution: str = '', tokenizer=None) -> Dict[str, Any]:
+    """
+    Pack notebook content for a grading prompt
+
+    Args:
+        cells: [{'code': ..., 'output': ...}] in notebook order
+        markdown_units: Markdown cells (student explanations)
+        rubric / solution: Optional reference text packed ahead of student work
+
+    Returns:
+        Packer result plus 'code' (kept cells with their outputs, in order)
+    """
+    outputs = PromptSection('outputs', [c.get('output', '') for c in cells], priority=2, share=0.2,
+                            unit_prefix="\n# OUTPUT:\n")
+    sections = [
+        PromptSection('rubric', [rubric] if rubric else [], priority=0, share=0.15),
+        PromptSection('code', [c.get('code', '') for c in cells], priority=1, share=0.45),
+        outputs,
+        PromptSection('solution', [solution] if solution else [], priority=2, share=0.1),
+        PromptSection('markdown', markdown_units or [], priority=3, share=0.1)
+    ]
+    packer = PromptPacker(budget, tokenizer)
+    result = packer.pack(sections)
+
+    # When cells are dropped, the omission note is paid for out of the budget
+    # and the outputs of dropped cells give their share back. Repack until
+    # every output left belongs to a kept cell (each pass blanks at least one).
+    note_tokens = count_tokens("\n\n" + omission_note(len(cells)), tokenizer)
+    note_reserved = False
+    while result['sections']['code']['units_omitted']:
+        code_units = result['sections']['code']['units']
+        dropped = [index for index, unit in enumerate(outputs.units) if unit and index not in code_units]
+        if not dropped and note_reserved:
+            break
+        note_reserved = True
+        for index in dropped:
+            outputs.units[index] = ''
+            outputs.unit_tokens[index] = 0
+        packer.budget = max(0, budget - note_tokens)
+        result = packer.pack(sections)
+    result['budget'] = budget
+
+    code_units = result['sections']['code']['units']
+    output_units = result['sections']['outputs']['units']
+    parts = [code_units[index] + output_units.get(index, '') for index in sorted(code_units)]
+
+    omitted = result['sections']['code']['units_omitted']
+    if omitted:
+        parts.append(omission_note(omitted))
+        result['total_tokens'] += count_tokens("\n\n" + parts[-1], tokenizer)
+
+    result['code'] = '\n\n'.join(parts)
+    return result
+
+
+def omission_note(omitted: int) -> str:
+    return f"# [{omitted} code cells omitted to fit the prompt budget]"
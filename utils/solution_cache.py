@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Solution Artifact Cache
+Parses an assignment's solution (or template) notebook once and shares the
+result with every grade of that assignment. Entries are keyed by path and
+invalidated when the file's mtime or size changes, so editing a solution
+notebook takes effect on the next grade without restarting the app.
+
+Validators store their own derived data (variable -> output maps, extracted
+values) on the artifact with memo(), so that work is also done once per
+solution file instead of once per student.
+"""
+
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Hashable
+
+import nbformat
+
+
+class SolutionArtifact:
+    """Everything grading needs from one solution/template notebook, parsed once"""
+
+    def __init__(self, path: str, stat: os.stat_result):
+        start_time = time.time()
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        # Raw JSON for validators that walk cells as dicts, nbformat node for the rest
+        self.raw = json.loads(text)
+        self.notebook = nbformat.reads(text, as_version=4)
+
+        # Same joins the grading pages build for prompts
+        self.code = ""
+        self.markdown = ""
+        for cell in self.notebook.cells:
+            if cell.cell_type == 'code':
+                self.code += cell.source + "\n\n"
+            elif cell.cell_type == 'markdown':
+                self.markdown += cell.source + "\n\n"
+
+        self.code_lines = code_line_set(self.code)
+        self.load_time = time.time() - start_time
+
+        self._derived = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+    def memo(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Compute derived data once per artifact. The result is shared by every
+        caller, so treat it as read-only.
+        """
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Graders racing on the same key wait for the first one instead of repeating its work
+        with key_lock:
+            with self._lock:
+                if key in self._derived:
+                    return self._derived[key]
+            value = factory()
+            with self._lock:
+                self._derived[key] = value
+            return value
+
+
+_artifacts: Dict[str, SolutionArtifact] = {}
+_artifacts_lock = threading.Lock()
+_stats = {'hits': 0, 'loads': 0, 'invalidations': 0}
+
+
+def get_solution_artifact(path: str) -> SolutionArtifact:
+    """Cached artifact for a notebook, re-parsed only if the file changed"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    with _artifacts_lock:
+        artifact = _artifacts.get(path)
+        if artifact is not None and artifact.is_current(stat):
+            _stats['hits'] += 1
+            return artifact
+
+    if artifact is not None:
+        print(f"🔄 Solution notebook changed, reloading: {os.path.basename(path)}")
+
+    artifact = SolutionArtifact(path, stat)
+
+    with _artifacts_lock:
+        _stats['loads'] += 1
+        if path in _artifacts:
+            _stats['invalidations'] += 1
+        _artifacts[path] = artifact
+    return artifact
+
+
+def clear_solution_cache():
+    """Drop every cached artifact (e.g. after bulk-replacing solution files)"""
+    with _artifacts_lock:
+        _artifacts.clear()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    with _artifacts_lock:
+        return {**_stats, 'cached_notebooks': len(_artifacts)}
+
+
+@lru_cache(maxsize=32)
+def code_line_set(code: str) -> FrozenSet[str]:
+    """Lines of a template/solution code string, for student-vs-template diffs"""
+    return frozenset(code.split('\n'))
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Structured Output
+JSON schemas for the grader's two model responses, an incremental JSON
+parser for streamed generations, and a JSON extractor for complete ones.
+
+Backends that support constrained decoding get the schema (Ollama's
+"format", a llama.cpp grammar) so the model can only emit valid JSON. The
+streaming parser checks each chunk as it arrives: a response that can no
+longer become valid JSON is rejected mid-generation and retried, instead of
+being found out by json.loads after the full generation.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+SCORE = {"type": "integer", "minimum": 0, "maximum": 100}
+TEXT_LIST = {"type": "array", "items": {"type": "string"}}
+
+CODE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "technical_score": SCORE,
+        "syntax_correctness": SCORE,
+        "logic_correctness": SCORE,
+        "business_relevance": SCORE,
+        "effort_and_completion": SCORE,
+        "code_strengths": TEXT_LIST,
+        "code_suggestions": TEXT_LIST,
+        "technical_observations": TEXT_LIST
+    },
+    "required": ["technical_score", "code_strengths", "code_suggestions", "technical_observations"]
+}
+
+FEEDBACK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": SCORE,
+        "business_understanding": SCORE,
+        "communication_clarity": SCORE,
+        "data_interpretation": SCORE,
+        "methodology_appropriateness": SCORE,
+        "reflection_quality": SCORE,
+        "detailed_feedback": {
+            "type": "object",
+            "properties": {
+                "reflection_assessment": TEXT_LIST,
+                "analytical_strengths": TEXT_LIST,
+                "business_application": TEXT_LIST,
+                "learning_demonstration": TEXT_LIST,
+                "areas_for_development": TEXT_LIST,
+                "recommendations": TEXT_LIST
+            }
+        },
+        "instructor_comments": {"type": "string"}
+    },
+    "required": ["overall_score", "detailed_feedback", "instructor_comments"]
+}
+
+# JSON type of a value, from its first character
+_FIRST_CHAR_TYPES = {'{': 'object', '[': 'array', '"': 'string', 't': 'boolean', 'f': 'boolean', 'n': 'null'}
+_SCHEMA_TYPES = {'integer': ('number',), 'number': ('number',), 'string': ('string',),
+                 'array': ('array',), 'object': ('object',), 'boolean': ('boolean',)}
+
+_NUMBER_PREFIX = re.compile(r'-?(?:0|[1-9]\d*)?(?:\.\d*)?(?:[eE][+-]?\d*)?$')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+_KEYWORDS = ('true', 'false', 'null')
+_LITERAL_CHARS = set('0123456789+-.eEtrufalsn')
+_HEX = set('0123456789abcdefABCDEF')
+# String content up to the next quote or backslash (most of a response)
+_STRING_RUN = re.compile(r'[^"\\]+')
+
+
+class MalformedJSONError(ValueError):
+    """The response can no longer become the JSON object we asked for"""
+
+    def __init__(self, message: str, position: int = 0):
+        super().__init__(f"{message} (at char {position})")
+        self.position = position
+
+
+class StreamingJSONParser:
+    """
+    Incremental JSON object parser
+
+    feed() text as it is generated; it returns the parsed object as soon as
+    the outermost object closes and raises MalformedJSONError as soon as
+    the text can't be completed into valid JSON.
+
+    strict=True (constrained decoding): the response must be the object,
+    optionally surrounded by whitespace, and must satisfy the schema.
+    strict=False: text before the object (thinking, ```json fences) is
+    skipped, and objects that break or miss required keys before their
+    first member completes are treated as part of that preamble.
+    """
+
+    def __init__(self, schema: Optional[Dict] = None, strict: bool = False, max_preamble: Optional[int] = None):
+        self.schema = schema
+        self.strict = strict
+        self.max_preamble = max_preamble
+        self.value = None
+        self.object_start = None
+        self.object_end = None
+        self._buffer = ''
+        self._pos = 0
+        self._start_scan(0)
+
+    @property
+    def complete(self) -> bool:
+        return self.value is not None
+
+    @property
+    def text(self) -> str:
+        """The object's JSON text once complete"""
+        return self._buffer[self.object_start:self.object_end] if self.complete else ''
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add generated text; the parsed object once it is complete, else None"""
+        if self.complete:
+            return self.value
+        self._buffer += chunk
+        self._advance()
+        return self.value
+
+    def finish(self) -> Dict[str, Any]:
+        """The parsed object at end of generation (MalformedJSONError if it never closed)"""
+        if not self.complete:
+            state = 'inside' if self.object_start is not None else 'before'
+            raise MalformedJSONError(f"Response ended {state} the JSON object", len(self._buffer))
+        return self.value
+
+    def _start_scan(self, position: int):
+        self.object_start = None
+        self._pos = position
+        self._stack: List[str] = []
+        self._expect = 'object'
+        self._in_string = False
+        self._string_is_key = False
+        self._string_start = 0
+        self._escape = False
+        self._hex_left = 0
+        self._literal = None
+        self._key = None
+        self._member_type = None
+        self._members = 0
+
+    def _fail(self, message: str) -> bool:
+        """Reject the current object: False (don't advance) if scanning restarted, else raise"""
+        # Outside strict mode an object that hasn't completed a member yet
+        # may just be a brace in the model's preamble - keep scanning after it
+        if not self.strict and self._members == 0:
+            self._start_scan(self.object_start + 1)
+            return False
+        raise MalformedJSONError(message, self._pos)
+
+    def _advance(self):
+        buffer = self._buffer
+        while self._pos < len(buffer) and not self.complete:
+            c = buffer[self._pos]
+            if self.object_start is None:
+                advance = self._scan_preamble(c)
+            elif self._in_string:
+                if not (self._escape or self._hex_left):
+                    run = _STRING_RUN.match(buffer, self._pos)
+                    if run:
+                        self._pos = run.end()
+                        continue
+                advance = self._string_char(c)
+            elif self._literal is not None and c in _LITERAL_CHARS:
+                self._literal += c
+                advance = True
+                if not (_NUMBER_PREFIX.match(self._literal) or any(k.startswith(self._literal) for k in _KEYWORDS)):
+                    advance = self._fail(f"Invalid literal {self._literal!r}")
+            elif self._literal is not None:
+                # The literal ended at c; c itself is handled on the next pass
+                literal, self._literal = self._literal, None
+                if literal in _KEYWORDS or _NUMBER.match(literal):
+                    self._value_done()
+                else:
+                    self._fail(f"Invalid literal {literal!r}")
+                continue
+            else:
+                advance = c.isspace() or self._structural(c)
+            if advance:
+                self._pos += 1
+
+    def _scan_preamble(self, c: str) -> bool:
+        if c == '{':
+            self.object_start = self._pos
+            self._stack = ['{']
+            self._expect = 'key_or_close'
+        elif self.strict and not c.isspace():
+            raise MalformedJSONError(f"Expected '{{', got {c!r}", self._pos)
+        elif self.max_preamble is not None and self._pos >= self.max_preamble:
+            raise MalformedJSONError(f"No JSON object in the first {self.max_preamble} chars", self._pos)
+        return True
+
+    def _string_char(self, c: str) -> bool:
+        # Raw newlines inside strings are common in model output and
+        # json.loads(strict=False) accepts them, so control characters pass
+        if self._hex_left:
+            if c not in _HEX:
+                return self._fail("Invalid \\u escape")
+            self._hex_left -= 1
+        elif self._escape:
+            if c not in '"\\/bfnrtu':
+                return self._fail(f"Invalid escape \\{c}")
+            self._escape = False
+            self._hex_left = 4 if c == 'u' else 0
+        elif c == '\\':
+            self._escape = True
+        elif c == '"':
+            self._in_string = False
+            if not self._string_is_key:
+                return self._value_done()
+            if len(self._stack) == 1:
+                self._key = json.loads(self._buffer[self._string_start:self._pos + 1], strict=False)
+            self._expect = 'colon'
+        return True
+
+    def _start_value(self, c: str) -> bool:
+        """Begin a value at c; False if c can't start one"""
+        if len(self._stack) == 1:
+            self._member_type = _FIRST_CHAR_TYPES.get(c, 'number')
+            if not self._type_allowed(self._key, self._member_type):
+                return self._fail(f"'{self._key}' should be {self._schema_type(self._key)}, got {self._member_type}")
+        if c == '{':
+            self._stack.append('{')
+            self._expect = 'key_or_close'
+        elif c == '[':
+            self._stack.append('[')
+            self._expect = 'value_or_close'
+        elif c == '"':
+            self._in_string, self._string_is_key = True, False
+        elif c in '-0123456789tfn':
+            self._literal = c
+        else:
+            return self._fail(f"Unexpected {c!r} where a value should start")
+        return True
+
+    def _structural(self, c: str) -> bool:
+        """Handle c outside strings and literals; False if scanning restarted"""
+        expect = self._expect
+        if expect in ('value', 'value_or_close'):
+            if c == ']' and expect == 'value_or_close':
+                self._stack.pop()
+                return self._value_done()
+            return self._start_value(c)
+        if expect in ('key_or_close', 'key'):
+            if c == '"':
+                self._in_string, self._string_is_key = True, True
+                self._string_start = self._pos
+                return True
+            if c == '}' and expect == 'key_or_close':
+                self._stack.pop()
+                return self._value_done()
+            return self._fail(f"Expected a key, got {c!r}")
+        if expect == 'colon':
+            if c == ':':
+                self._expect = 'value'
+                return True
+            return self._fail(f"Expected ':', got {c!r}")
+        # comma_or_close
+        closer = '}' if self._stack[-1] == '{' else ']'
+        if c == ',':
+            self._expect = 'key' if self._stack[-1] == '{' else 'value'
+            return True
+        if c == closer:
+            self._stack.pop()
+            return self._value_done()
+        return self._fail(f"Expected ',' or {closer!r}, got {c!r}")
+
+    def _value_done(self) -> bool:
+        """A value (or container) just ended; False if scanning restarted"""
+        if not self._stack:
+            return self._object_done()
+        if len(self._stack) == 1:
+            self._members += 1
+        self._expect = 'comma_or_close'
+        return True
+
+    def _object_done(self) -> bool:
+        end = self._pos + 1
+        value = json.loads(self._buffer[self.object_start:end], strict=False)
+        missing = [key for key in (self.schema or {}).get('required', []) if key not in value]
+        if missing:
+            if self.strict:
+                raise MalformedJSONError(f"Missing required keys {missing}", self._pos)
+            # An example object in the preamble - keep looking
+            self._start_scan(self.object_start + 1)
+            return False
+        self.value = value
+        self.object_end = end
+        return True
+
+    def _schema_type(self, key: Optional[str]) -> Optional[str]:
+        prop = (self.schema or {}).get('properties', {}).get(key)
+        return prop.get('type') if prop else None
+
+    def _type_allowed(self, key: Optional[str], value_type: str) -> bool:
+        expected = self._schema_type(key)
+        return expected is None or value_type in _SCHEMA_TYPES.get(expected, (value_type,))
+
+
+def parse_stream(chunks: Iterable[str], schema: Optional[Dict] = None, strict: bool = False) -> StreamingJSONParser:
+    """
+    Feed chunks until the object completes. Stops reading as soon as it
+    does, so the caller can close the connection and end the generation.
+    Raises MalformedJSONError as soon as the stream goes wrong.
+    """
+    parser = StreamingJSONParser(schema, strict)
+    for chunk in chunks:
+        if parser.feed(chunk) is not None:
+            return parser
+    parser.finish()
+    return parser
+
+
+def iter_json_objects(text: str) -> Iterator[Dict[str, Any]]:
+    """Every parseable top-level JSON object in text, in order"""
+    start = 0
+    while start < len(text):
+        parser = StreamingJSONParser()
+        try:
+            value = parser.feed(text[start:])
+        except MalformedJSONError:
+            start += parser.object_start + 1
+            continue
+        if value is None:
+            return
+        yield value
+        start += parser.object_end
+
+
+def extract_json_object(text: str, required: Sequence[str] = (), any_of: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+    """
+    The last JSON object in a model response that has all of required and
+    at least one of any_of (models often restate an example before the
+    answer). Objects nested in a larger one count too, so a whole stored
+    grading result yields its feedback section.
+    """
+    if not text:
+        return None
+
+    def matches(value: Dict) -> bool:
+        return all(key in value for key in required) and (not any_of or any(key in value for key in any_of))
+
+    def find(value: Any) -> Optional[Dict[str, Any]]:
+        if isinstance(value, list):
+            children = value
+        elif isinstance(value, dict):
+            if matches(value):
+                return value
+            children = value.values()
+        else:
+            return None
+        found = None
+        for child in children:
+            found = find(child) or found
+        return found
+
+    found = None
+    for value in iter_json_objects(text):
+        found = find(value) or found
+    return found
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Grading Traces
+Span-style timing of a submission's whole trip through the grader:
+notebook read/execution, preprocessing, each validation layer, prompt
+building, each model call (queue, time to first token, decode), parsing,
+the database save and PDF generation.
+
+Code marks stages with `with span("stage"):`. Spans nest through a
+context variable, so a stage doesn't need to know who called it, and
+outside a trace (CLI scripts, regrades, tests) a span costs one lookup and
+records nothing. Work handed to a thread pool keeps its parent when
+submitted through propagate(). While tracemalloc is on (the throughput
+benchmark) each span also records its net allocation. Finished traces
+are stored per submission in the grading database and drawn as flame
+charts in monitor_app.py.
+"""
+
+import contextvars
+import functools
+import json
+import sqlite3
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_current_trace = contextvars.ContextVar('grading_trace', default=None)
+_current_span = contextvars.ContextVar('grading_span', default=None)
+
+TRACES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS grading_traces (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trace_id TEXT NOT NULL,
+    submission_id INTEGER,
+    kind TEXT NOT NULL,
+    run_tag TEXT,
+    started_at TEXT NOT NULL,
+    total_seconds REAL,
+    spans TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_grading_traces_submission ON grading_traces (submission_id);
+CREATE INDEX IF NOT EXISTS idx_grading_traces_run ON grading_traces (run_tag);
+"""
+
+
+class Trace:
+    """Spans recorded for one submission (thread-safe; times are seconds from the trace start)"""
+
+    def __init__(self, kind: str = 'grading', submission_id: Optional[int] = None,
+                 run_tag: Optional[str] = None, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.submission_id = submission_id
+        self.run_tag = run_tag
+        self.attrs = attrs
+        self.started_at = datetime.now()
+        self.total_seconds = None
+        self.spans: List[Dict[str, Any]] = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def open_span(self, name: str, parent: Optional[int], start: Optional[float] = None, **attrs) -> Dict[str, Any]:
+        with self._lock:
+            record = {
+                'id': len(self.spans),
+                'parent': parent,
+                'name': name,
+                'start': self.now() if start is None else start,
+                'duration': None,
+                'thread': threading.current_thread().name,
+                'attrs': attrs
+            }
+            self.spans.append(record)
+        return record
+
+
+@contextmanager
+def start_trace(kind: str = 'grading', submission_id: Optional[int] = None,
+                run_tag: Optional[str] = None, **attrs) -> Iterator[Trace]:
+    """Make a new trace current for the block"""
+    trace = Trace(kind, submission_id, run_tag, **attrs)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.total_seconds = trace.now()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Time a stage as a child of the current span; yields the span record
+    (add to record['attrs'] inside the block) or None outside a trace
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    record = trace.open_span(name, _current_span.get(), **attrs)
+    token = _current_span.set(record['id'])
+    memory_start = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    try:
+        yield record
+    except BaseException as e:
+        record['attrs']['error'] = type(e).__name__
+        raise
+    finally:
+        record['duration'] = trace.now() - record['start']
+        if memory_start is not None:
+            # Net allocation while the stage ran (process-wide, so parallel work is included)
+            record['attrs']['alloc_mb'] = round((tracemalloc.get_traced_memory()[0] - memory_start) / 1e6, 3)
+        _current_span.reset(token)
+
+
+def traced(name: str, **attrs) -> Callable:
+    """Decorator: run every call of the function inside span(name)"""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attrs):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_phases(phases: Sequence[Tuple[str, float]], **attrs):
+    """
+    Lay out consecutive child spans from the start of the current span,
+    for phases measured elsewhere (e.g. a server's time to first token)
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    if trace is None or parent is None:
+        return
+    start = trace.spans[parent]['start']
+    for name, seconds in phases:
+        if seconds is None or seconds < 0:
+            continue
+        record = trace.open_span(name, parent, start=start, **attrs)
+        record['duration'] = seconds
+        start += seconds
+
+
+def propagate(fn: Callable) -> Callable:
+    """Wrap fn to run in the submitting thread's trace context (for executor.submit)"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def stage_totals(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Self time per span name: a span's duration minus its children's, so
+    the totals add up to where the time went. Children that ran in
+    parallel can cover more than their parent; self time stops at zero.
+    """
+    child_time = {}
+    for record in spans:
+        if record['parent'] is not None:
+            child_time[record['parent']] = child_time.get(record['parent'], 0.0) + (record['duration'] or 0.0)
+    totals = {}
+    for record in spans:
+        own = max(0.0, (record['duration'] or 0.0) - child_time.get(record['id'], 0.0))
+        totals[record['name']] = totals.get(record['name'], 0.0) + own
+    return totals
+
+
+def save_trace(db_path: str, trace: Trace, submission_id: Optional[int] = None):
+    """Persist a finished trace to the grading database"""
+    if submission_id is not None:
+        trace.submission_id = submission_id
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(TRACES_SCHEMA)
+        conn.execute("""
+            INSERT INTO grading_traces (trace_id, submission_id, kind, run_tag, started_at, total_seconds, spans)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (trace.trace_id, trace.submission_id, trace.kind, trace.run_tag,
+              trace.started_at.isoformat(timespec='seconds'), trace.total_seconds,
+              json.dumps({'attrs': trace.attrs, 'spans': trace.spans}, default=str)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_traces(db_path: str, submission_id: Optional[int] = None, run_tag: Optional[str] = None,
+                limit: int = 200) -> List[Dict[str, Any]]:
+    """Stored traces, newest first, optionally for one submission or grading run"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.executescript(TRACES_SCHEMA)
+        sql = "SELECT * FROM grading_traces WHERE 1 = 1"
+        params = []
+        if submission_id is not None:
+            sql += " AND submission_id = ?"
+            params.append(submission_id)
+        if run_tag is not None:
+            sql += " AND run_tag = ?"
+            params.append(run_tag)
+        rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    finally:
+        conn.close()
+
+    traces = []
+    for row in rows:
+        trace = dict(row)
+        trace.update(json.loads(trace.pop('spans')))
+        traces.append(trace)
+    return traces
@@ -5,7 +5,9 @@ for common adaptation issues with Version 2 data
 """
 
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from validators.code_features import CodeFeatures, compile_pattern, score_cohort
 
 
 class Assignment7CustomScorer:
@@ -20,23 +22,45 @@ class Assignment7CustomScorer:
     def __init__(self):
         self.adjustments = []
     
-    def adjust_score(self, section_id: str, section_result: Dict, code: str, nb) -> Dict[str, Any]:
+    def adjust_scores(self, section_results: Dict[str, Dict], code: str, nb) -> Dict[str, Dict]:
+        """
+        Apply custom scoring adjustments to every section of one notebook,
+        scanning its code once for all of them
+        """
+        features = CodeFeatures(code, nb)
+        return {
+            section_id: self.adjust_score(section_id, result, code, nb, features=features)
+            for section_id, result in section_results.items()
+        }
+    
+    def adjust_cohort(self, submissions: Dict[str, Dict]) -> Dict[str, Dict[str, Any]]:
+        """
+        Apply custom scoring adjustments to a whole cohort
+        (see code_features.score_cohort for the input/output format)
+        """
+        return score_cohort(self.adjust_scores, submissions, self.adjustments)
+    
+    def adjust_score(self, section_id: str, section_result: Dict, code: str, nb,
+                     features: Optional[CodeFeatures] = None) -> Dict[str, Any]:
         """
         Apply custom scoring adjustments for specific sections
         
         Returns:
             Dict with adjusted score and explanation
         """
+        if features is None:
+            features = CodeFeatures(code, nb)
+        
         if section_id == 'part4_date_operations':
-            return self._adjust_date_parsing_score(section_result, code, nb)
+            return self._adjust_date_parsing_score(section_result, features)
         elif section_id == 'part6_combined_operations':
-            return self._adjust_customer_name_score(section_result, code, nb)
+            return self._adjust_customer_name_score(section_result, features)
         elif section_id == 'part7_business_intelligence':
-            return self._adjust_dashboard_score(section_result, code, nb)
+            return self._adjust_dashboard_score(section_result, features)
         else:
             return section_result
     
-    def _adjust_date_parsing_score(self, section_result: Dict, code: str, nb) -> Dict:
+    def _adjust_date_parsing_score(self, section_result: Dict, features: CodeFeatures) -> Dict:
         """
         Adjust score for date parsing based on approach used
         
@@ -49,21 +73,19 @@ class Assignment7CustomScorer:
         base_points = section_result['points']
         
         # Check what date parsing approach was used
-        has_parse_date_time = bool(re.search(r'parse_date_time\s*\(', code))
-        has_mdy = bool(re.search(r'\bmdy\s*\(', code))
-        has_ymd = bool(re.search(r'\bymd\s*\(', code))
+        has_parse_date_time = features.has(r'parse_date_time\s*\(')
+        has_mdy = features.has(r'\bmdy\s*\(')
+        has_ymd = features.has(r'\bymd\s*\(')
         
         # Check for format orders in parse_date_time
         if has_parse_date_time:
             # Look for the orders parameter
-            orders_match = re.search(r'orders\s*=\s*c\s*\((.*?)\)', code, re.DOTALL)
-            if orders_match:
-                orders_str = orders_match.group(1)
-                
+            orders_str = features.date_orders
+            if orders_str is not None:
                 # Count how many formats are included
-                has_mdy_format = bool(re.search(r'["\']mdy\s+HM["\']', orders_str, re.IGNORECASE))
-                has_dmy_format = bool(re.search(r'["\']dmy\s+HMS["\']', orders_str, re.IGNORECASE))
-                has_ymd_format = bool(re.search(r'["\']ymd[_\s]*HMS["\']', orders_str, re.IGNORECASE))
+                has_mdy_format = bool(compile_pattern(r'["\']mdy\s+HM["\']', re.IGNORECASE).search(orders_str))
+                has_dmy_format = bool(compile_pattern(r'["\']dmy\s+HMS["\']', re.IGNORECASE).search(orders_str))
+                has_ymd_format = bool(compile_pattern(r'["\']ymd[_\s]*HMS["\']', re.IGNORECASE).search(orders_str))
                 
                 format_count = sum([has_mdy_format, has_dmy_format, has_ymd_format])
                 
@@ -112,7 +134,7 @@ class Assignment7CustomScorer:
             'original_score': section_result['score']
         }
     
-    def _adjust_customer_name_score(self, section_result: Dict, code: str, nb) -> Dict:
+    def _adjust_customer_name_score(self, section_result: Dict, features: CodeFeatures) -> Dict:
         """
         Adjust score for customer name extraction
         
@@ -125,10 +147,10 @@ class Assignment7CustomScorer:
         base_points = section_result['points']
         
         # Check approach used
-        has_synthetic_names = bool(re.search(r'paste\s*\(["\']Customer["\']', code, re.IGNORECASE))
-        has_join = bool(re.search(r'(left_join|inner_join|merge)\s*\(', code))
-        uses_customerid_directly = bool(re.search(r'CustomerID', code))
-        extracts_digits = bool(re.search(r'str_extract\s*\(\s*CustomerID.*?\\d', code))
+        has_synthetic_names = features.has(r'paste\s*\(["\']Customer["\']', re.IGNORECASE)
+        has_join = features.has(r'(left_join|inner_join|merge)\s*\(')
+        uses_customerid_directly = features.has(r'CustomerID')
+        extracts_digits = features.has(r'str_extract\s*\(\s*CustomerID.*?\\d')
         
         if has_synthetic_names or has_join:
             multiplier = 1.0
@@ -160,7 +182,7 @@ class Assignment7CustomScorer:
             'original_score': section_result['score']
         }
     
-    def _adjust_dashboard_score(self, section_result: Dict, code: str, nb) -> Dict:
+    def _adjust_dashboard_score(self, section_result: Dict, features: CodeFeatures) -> Dict:
         """
         Adjust score for business intelligence dashboard
         
@@ -173,7 +195,7 @@ class Assignment7CustomScorer:
         deductions = []
         
         # Check most common category calculation
-        wrong_category_method = bool(re.search(r'category_clean\s*\[\s*1\s*\]', code))
+        wrong_category_method = features.has(r'category_clean\s*\[\s*1\s*\]')
         if wrong_category_method:
             deductions.append({
                 'issue': 'Takes first category instead of most common',
@@ -187,7 +209,7 @@ class Assignment7CustomScorer:
             })
         
         # Check date display formatting
-        wrong_date_display = bool(re.search(r'min\s*\(\s*na\.omit\s*\(\s*as\.Date', code))
+        wrong_date_display = features.has(r'min\s*\(\s*na\.omit\s*\(\s*as\.Date')
         if wrong_date_display:
             deductions.append({
                 'issue': 'Dates display as numeric epoch days',
@@ -201,8 +223,8 @@ class Assignment7CustomScorer:
             })
         
         # Check weekend percentage NA handling
-        missing_na_rm = bool(re.search(r'sum\s*\(\s*[^)]*is_weekend[^)]*\)\s*/.*\*\s*100', code))
-        has_na_rm = bool(re.search(r'na\.rm\s*=\s*TRUE', code))
+        missing_na_rm = features.has(r'sum\s*\(\s*[^)]*is_weekend[^)]*\)\s*/.*\*\s*100')
+        has_na_rm = features.has(r'na\.rm\s*=\s*TRUE')
         if missing_na_rm and not has_na_rm:
             deductions.append({
                 'issue': 'Weekend calculation doesn\'t handle NAs',
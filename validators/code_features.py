@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Code Features
+A student's notebook code with regex results memoised. Partial credit
+scorers ask the same questions of a notebook in several rules and sections
+("does it call parse_date_time()?", "what's in orders = c(...)?"); with one
+CodeFeatures per notebook each distinct pattern is searched once, however
+many rules and sections use it.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RULE_FLAGS = re.IGNORECASE | re.DOTALL
+
+# orders = c("mdy HM", "dmy HMS", ...) passed to parse_date_time()
+DATE_ORDERS_PATTERN = re.compile(r'orders\s*=\s*c\s*\((.*?)\)', re.DOTALL)
+
+# Under IGNORECASE these ASCII letters also match non-ASCII characters
+# (ı, ſ, K), so they can't be part of a literal checked against code.lower()
+CASE_FOLD_EXCEPTIONS = set('iskISK')
+
+# Literals shorter than this aren't worth a prefilter
+MIN_LITERAL_LENGTH = 3
+
+# Characters with a meaning of their own outside a character class
+SPECIAL_CHARS = set('.^$*+?{}[]()|\\')
+
+_UNSET = object()
+
+_compiled: Dict[Tuple[str, int], re.Pattern] = {}
+
+
+def compile_pattern(pattern: str, flags: int = 0) -> re.Pattern:
+    """Compile once per process (rubric patterns repeat for every student)"""
+    key = (pattern, flags)
+    if key not in _compiled:
+        _compiled[key] = re.compile(pattern, flags)
+    return _compiled[key]
+
+
+def _skip_class(pattern: str, i: int) -> int:
+    """Index just past the character class starting at pattern[i] == '['"""
+    i += 1
+    if i < len(pattern) and pattern[i] == '^':
+        i += 1
+    if i < len(pattern) and pattern[i] == ']':
+        i += 1  # A leading ] is a literal member
+    while i < len(pattern) and pattern[i] != ']':
+        i += 2 if pattern[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_group(pattern: str, i: int) -> int:
+    """Index just past the group starting at pattern[i] == '('"""
+    depth = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            i = _skip_class(pattern, i)
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _skip_escape(pattern: str, i: int) -> int:
+    """Index just past the letter/digit escape (\\d, \\x41, \\N{...}, \\12) at pattern[i]"""
+    kind = pattern[i + 1] if i + 1 < len(pattern) else ''
+    i += 2
+    if kind == 'N':
+        return pattern.find('}', i) + 1 or len(pattern)
+    width = {'x': 2, 'u': 4, 'U': 8}.get(kind, 2 if kind.isdigit() else 0)
+    return i + width if kind in 'xuU' else i + len(re.match(r'\d{0,%d}' % width, pattern[i:]).group())
+
+
+def _literal_runs(pattern: str) -> List[str]:
+    """
+    Runs of plain characters at the top level of pattern, each of which
+    every match contains. Scans the pattern string left to right: groups,
+    character classes, anchors, '.', quantifiers and escapes like \\d end a
+    run; an escaped punctuation character (\\( or \\.) is a literal; a
+    character followed by '*', '?' or '{m,n}' may be absent, so it is left out.
+    A top-level '|' means no run is required at all.
+    """
+    runs, run = [], ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '|':
+            return []
+        if char == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, i = pattern[i + 1], i + 2
+        elif char == '\\' or char in SPECIAL_CHARS:
+            if char == '[':
+                i = _skip_class(pattern, i)
+            elif char == '(':
+                i = _skip_group(pattern, i)
+            elif char == '\\':
+                i = _skip_escape(pattern, i)
+            elif char == '{':
+                quantifier = re.match(r'\{\d*,?\d*\}', pattern[i:])
+                i += len(quantifier.group()) if quantifier else 1
+            else:
+                i += 1
+            runs.append(run)
+            run = ''
+            continue
+        else:
+            literal, i = char, i + 1
+
+        if i < len(pattern) and pattern[i] in '*?{':
+            runs.append(run)
+            run = ''
+            continue
+        run += literal
+    runs.append(run)
+    return [run for run in runs if run]
+
+
+@lru_cache(maxsize=1024)
+def required_literal(pattern: str, flags: int = 0) -> Optional[str]:
+    """
+    Longest literal every match of pattern must contain (lowercased when
+    the pattern ignores case), or None. Only top-level literal runs count
+    (see _literal_runs), so a missing literal always means no match.
+    Verbose patterns, and anything the scan can't vouch for, get None
+    (no prefilter).
+    """
+    try:
+        compiled = compile_pattern(pattern, flags)
+        if compiled.flags & re.VERBOSE:
+            return None
+        ignore_case = bool(compiled.flags & re.IGNORECASE)
+
+        best = ''
+        for run in _literal_runs(pattern):
+            if ignore_case:
+                # Split at characters that may also match something non-ASCII
+                pieces = ['']
+                for char in run:
+                    if char.isascii() and char not in CASE_FOLD_EXCEPTIONS:
+                        pieces[-1] += char.lower()
+                    else:
+                        pieces.append('')
+                run = max(pieces, key=len)
+            if len(run) > len(best):
+                best = run
+    except Exception:
+        return None
+
+    if len(best) < MIN_LITERAL_LENGTH:
+        return None
+    return best
+
+
+class CodeFeatures:
+    """Memoised pattern checks over one notebook's code"""
+
+    def __init__(self, code: str, nb: Any = None):
+        self.code = code
+        self.nb = nb
+        self._found: Dict[Tuple[str, int], bool] = {}
+        self._lower_code = None
+        self._date_orders_match = _UNSET
+
+    @classmethod
+    def from_notebook(cls, nb) -> 'CodeFeatures':
+        """Code cells joined the way RubricDrivenValidator joins them"""
+        code = '\n'.join(cell.source for cell in nb.cells if cell.cell_type == 'code')
+        return cls(code, nb)
+
+    def has(self, pattern: str, flags: int = 0) -> bool:
+        """Whether pattern occurs anywhere in the code"""
+        key = (pattern, flags)
+        if key not in self._found:
+            self._found[key] = self._search(pattern, flags)
+        return self._found[key]
+
+    def _search(self, pattern: str, flags: int) -> bool:
+        # Most rule patterns don't occur in most notebooks: a substring check
+        # on their required literal rules them out without running the regex
+        literal = required_literal(pattern, flags)
+        if literal is not None:
+            compiled = compile_pattern(pattern, flags)
+            haystack = self.lower_code if compiled.flags & re.IGNORECASE else self.code
+            if literal not in haystack:
+                return False
+        return compile_pattern(pattern, flags).search(self.code) is not None
+
+    @property
+    def lower_code(self) -> str:
+        if self._lower_code is None:
+            self._lower_code = self.code.lower()
+        return self._lower_code
+
+    @property
+    def date_orders(self) -> Optional[str]:
+        """Contents of the first orders = c(...) argument, or None"""
+        if self._date_orders_match is _UNSET:
+            self._date_orders_match = DATE_ORDERS_PATTERN.search(self.code)
+        return self._date_orders_match.group(1) if self._date_orders_match else None
+
+
+def score_cohort(adjust_scores: Callable[[Dict[str, Dict], str, Any], Dict[str, Dict]],
+                 submissions: Dict[str, Dict], adjustments: List[Dict]) -> Dict[str, Dict[str, Any]]:
+    """
+    Run a scorer's adjust_scores over a cohort
+
+    Args:
+        adjust_scores: Scorer method taking (section_results, code, nb)
+        submissions: {student_id: {'nb': parsed notebook,
+                                   'section_results': {section_id: result},
+                                   'code': optional pre-joined code}}
+        adjustments: The scorer's running adjustment log
+
+    Returns:
+        {student_id: {'sections': adjusted section results,
+                      'adjustments': log entries added for that student}}
+    """
+    results = {}
+    for student_id, submission in submissions.items():
+        nb = submission['nb']
+        code = submission.get('code')
+        if code is None:
+            code = CodeFeatures.from_notebook(nb).code
+
+        first_adjustment = len(adjustments)
+        sections = adjust_scores(submission['section_results'], code, nb)
+        results[student_id] = {
+            'sections': sections,
+            'adjustments': adjustments[first_adjustment:]
+        }
+    return results
@@ -4,8 +4,9 @@ Flexible Partial Credit System
 Reads partial credit rules from the rubric JSON instead of hardcoding them
 """
 
-import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from validators.code_features import CodeFeatures, RULE_FLAGS, score_cohort
 
 
 class FlexiblePartialCreditScorer:
@@ -32,10 +33,38 @@ class FlexiblePartialCreditScorer:
         self.partial_credit_rules = rubric.get('partial_credit_rules', {})
         self.adjustments_made = []
         
+        # Sort rules by priority once (lower number = higher priority)
+        self.sorted_rules = {
+            section_id: sorted(rules.items(), key=lambda x: x[1].get('priority', 999))
+            for section_id, rules in self.partial_credit_rules.items()
+        }
+        
         if self.partial_credit_rules:
             print(f"✅ Loaded {len(self.partial_credit_rules)} partial credit rule sets")
     
-    def adjust_score(self, section_id: str, section_result: Dict, code: str, nb) -> Dict[str, Any]:
+    def adjust_scores(self, section_results: Dict[str, Dict], code: str, nb) -> Dict[str, Dict]:
+        """
+        Apply partial credit rules to every section of one notebook. Each
+        distinct pattern is searched once, however many rules use it.
+        
+        Returns:
+            {section_id: section_result (adjusted where a rule matched)}
+        """
+        features = CodeFeatures(code, nb)
+        return {
+            section_id: self.adjust_score(section_id, result, code, nb, features=features)
+            for section_id, result in section_results.items()
+        }
+    
+    def adjust_cohort(self, submissions: Dict[str, Dict]) -> Dict[str, Dict[str, Any]]:
+        """
+        Apply partial credit rules to a whole cohort, e.g. to regrade after a
+        rubric tweak without re-running validation (see code_features.score_cohort)
+        """
+        return score_cohort(self.adjust_scores, submissions, self.adjustments_made)
+    
+    def adjust_score(self, section_id: str, section_result: Dict, code: str, nb,
+                     features: Optional[CodeFeatures] = None) -> Dict[str, Any]:
         """
         Apply partial credit rules for a specific section
         
@@ -43,24 +72,19 @@ class FlexiblePartialCreditScorer:
             Updated section_result with adjusted score
         """
         # Check if this section has partial credit rules
-        if section_id not in self.partial_credit_rules:
+        if section_id not in self.sorted_rules:
             return section_result
         
-        rules = self.partial_credit_rules[section_id]
         base_points = section_result['points']
-        
-        # Sort rules by priority (lower number = higher priority)
-        sorted_rules = sorted(
-            rules.items(),
-            key=lambda x: x[1].get('priority', 999)
-        )
+        if features is None:
+            features = CodeFeatures(code, nb)
         
         # Find the first matching rule (highest priority)
         best_match = None
         best_multiplier = 0
         
-        for rule_name, rule_config in sorted_rules:
-            if self._check_rule_condition(rule_config, code, nb):
+        for rule_name, rule_config in self.sorted_rules[section_id]:
+            if self._check_rule_condition(rule_config, code, nb, features):
                 multiplier = rule_config.get('multiplier', 1.0)
                 best_multiplier = multiplier
                 best_match = rule_config
@@ -88,7 +112,8 @@ class FlexiblePartialCreditScorer:
         
         return section_result
     
-    def _check_rule_condition(self, rule_config: Dict, code: str, nb) -> bool:
+    def _check_rule_condition(self, rule_config: Dict, code: str, nb,
+                              features: Optional[CodeFeatures] = None) -> bool:
         """
         Check if a rule's condition is met
         
@@ -100,29 +125,31 @@ class FlexiblePartialCreditScorer:
         - not_patterns: Patterns that must NOT exist (works with all condition types)
         """
         condition_type = rule_config.get('condition_type', 'regex')
+        if features is None:
+            features = CodeFeatures(code, nb)
         
         # First check the main condition
         main_condition_met = False
         
         if condition_type == 'regex':
             pattern = rule_config.get('pattern', '')
-            main_condition_met = bool(re.search(pattern, code, re.IGNORECASE | re.DOTALL))
+            main_condition_met = features.has(pattern, RULE_FLAGS)
         
         elif condition_type == 'not_regex':
             pattern = rule_config.get('pattern', '')
-            main_condition_met = not bool(re.search(pattern, code, re.IGNORECASE | re.DOTALL))
+            main_condition_met = not features.has(pattern, RULE_FLAGS)
         
         elif condition_type == 'all_of':
             patterns = rule_config.get('patterns', [])
-            main_condition_met = all(re.search(p, code, re.IGNORECASE | re.DOTALL) for p in patterns)
+            main_condition_met = all(features.has(p, RULE_FLAGS) for p in patterns)
         
         elif condition_type == 'any_of':
             patterns = rule_config.get('patterns', [])
-            main_condition_met = any(re.search(p, code, re.IGNORECASE | re.DOTALL) for p in patterns)
+            main_condition_met = any(features.has(p, RULE_FLAGS) for p in patterns)
         
         elif condition_type == 'count_formats':
             # Special case for counting date formats
-            main_condition_met = self._count_date_formats(code, rule_config)
+            main_condition_met = self._count_date_formats(code, rule_config, features)
         
         # If main condition not met, return False
         if not main_condition_met:
@@ -132,18 +159,20 @@ class FlexiblePartialCreditScorer:
         not_patterns = rule_config.get('not_patterns', [])
         if not_patterns:
             for pattern in not_patterns:
-                if re.search(pattern, code, re.IGNORECASE | re.DOTALL):
+                if features.has(pattern, RULE_FLAGS):
                     return False  # Found a pattern that shouldn't exist
         
         return True
     
-    def _count_date_formats(self, code: str, rule_config: Dict) -> bool:
+    def _count_date_formats(self, code: str, rule_config: Dict,
+                            features: Optional[CodeFeatures] = None) -> bool:
         """Count how many date formats are included in parse_date_time"""
-        orders_match = re.search(r'orders\s*=\s*c\s*\((.*?)\)', code, re.DOTALL)
-        if not orders_match:
+        if features is None:
+            features = CodeFeatures(code)
+        orders_str = features.date_orders
+        if orders_str is None:
             return False
         
-        orders_str = orders_match.group(1)
         formats_to_check = rule_config.get('formats', [])
         
         count = sum(1 for fmt in formats_to_check if fmt.lower() in orders_str.lower())
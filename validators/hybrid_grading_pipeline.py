@@ -15,6 +15,10 @@ from typing import Dict, List, Any, Tuple
 from pathlib import Path
 from validators.assignment_6_systematic_validator import Assignment6SystematicValidator
 from validators.smart_output_validator import SmartOutputValidator
+from utils.prompt_packer import budget_for_model, count_tokens, get_tokenizer, pack_notebook_cells
+
+# Generation budget for the Qwen code analysis (DistributedMLXClient.generate_code_analysis default)
+QWEN_MAX_TOKENS = 1800
 
 
 class HybridGradingPipeline:
@@ -51,9 +55,11 @@ class HybridGradingPipeline:
                 qwen_server_url=config['urls']['qwen_server'],
                 gemma_server_url=config['urls']['gemma_server']
             )
+            self.qwen_model = config.get('mac_studio_2', {}).get('model')
             print("✅ Using Distributed MLX (Mac Studio 1 + 2)")
         else:
             self.mlx_client = None
+            self.qwen_model = None
             print("⚠️ MLX client not initialized")
     
     def grade_submission(self, notebook_path: str) -> Dict[str, Any]:
@@ -271,7 +277,7 @@ OBJECTIVE VALIDATION:
 
 STUDENT CODE (relevant sections):
 ```r
-{code[:5000]}
+{code}
 ```
 
 YOUR TASK AS CODE ANALYZER:
@@ -397,18 +403,34 @@ Remember: You're helping them learn, not just grading them.
         with open(notebook_path, 'r') as f:
             notebook = json.load(f)
         
-        # Extract code
-        code_cells = []
+        # Extract code cells with their text outputs
+        cells = []
         for cell in notebook['cells']:
             if cell['cell_type'] == 'code':
-                code_cells.append(''.join(cell['source']))
-        all_code = '\n\n'.join(code_cells[:20])  # First 20 cells
+                output = ''
+                for out in cell.get('outputs', []):
+                    if out.get('output_type') == 'stream':
+                        output += ''.join(out.get('text', ''))
+                    elif 'text/plain' in out.get('data', {}):
+                        output += ''.join(out['data']['text/plain']) + '\n'
+                cells.append({'code': ''.join(cell['source']), 'output': output})
         
         # Extract issues
         issues = self._extract_issues(validation_result)
         
+        # Pack as much of the notebook as Qwen's context allows after the fixed prompt text
+        tokenizer = get_tokenizer(self.qwen_model) if self.qwen_model else None
+        fixed_tokens = count_tokens(
+            self._build_qwen_prompt('', issues, validation_result, output_validation), tokenizer
+        )
+        budget = budget_for_model(self.qwen_model, QWEN_MAX_TOKENS, fixed_tokens)
+        packed = pack_notebook_cells(cells, budget, tokenizer=tokenizer)
+        code_section = packed['sections']['code']
+        print(f"  📦 Packed {len(code_section['units'])}/{len(cells)} code cells "
+              f"into {packed['total_tokens']}/{budget} tokens")
+        
         # Build prompts
-        qwen_prompt = self._build_qwen_prompt(all_code, issues, validation_result, output_validation)
+        qwen_prompt = self._build_qwen_prompt(packed['code'], issues, validation_result, output_validation)
         gpt_prompt = self._build_gpt_prompt(validation_result, {'raw_response': 'Analyzing...'}, output_validation)
         
         # Run in parallel
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Numeric Matching
+Vectorized tolerance matching for numbers extracted from notebook outputs.
+Values are converted to NumPy arrays once per notebook, then every check is
+a broadcast comparison instead of a nested Python loop, so a solution that
+prints hundreds of numbers costs the same few array operations as one that
+prints three.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Shared tolerances (previously repeated inline in each validator)
+COUNT_TOLERANCE = 2  # "customers without orders", "invalid IDs", ...
+
+# Same token the validators' "[\d,]+\.?\d*" patterns capture
+NUMBER_TOKEN = re.compile(r'[\d,]+\.?\d*')
+
+
+def to_array(values: Any) -> np.ndarray:
+    """Scalar, list or array -> 1-D float64 array (empty for None)"""
+    if values is None:
+        return np.empty(0)
+    return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+
+def numeric_arrays(values: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Convert an extracted-values dict ({'row_count', 'numbers', 'counts'}) to arrays once"""
+    return {key: to_array(value) for key, value in values.items()
+            if key in ('row_count', 'numbers', 'counts')}
+
+
+def tolerance_matrix(student: np.ndarray, expected: np.ndarray,
+                     rel_tol: float = 0.0, abs_tol: float = 0.0) -> np.ndarray:
+    """
+    Boolean matrix [expected x student]: |student - expected| <= max(abs_tol, rel_tol * |expected|)
+    """
+    tolerance = np.maximum(abs_tol, np.abs(expected) * rel_tol)
+    return np.abs(student[np.newaxis, :] - expected[:, np.newaxis]) <= tolerance[:, np.newaxis]
+
+
+def first_match(student: np.ndarray, expected: np.ndarray,
+                rel_tol: float = 0.0, abs_tol: float = 0.0) -> Optional[Tuple[int, int]]:
+    """
+    (expected_index, student_index) of the first expected value that any
+    student value matches - the same pair a loop over expected, then over
+    student values, would stop at. None when nothing matches.
+    """
+    if not len(student) or not len(expected):
+        return None
+    matches = tolerance_matrix(student, expected, rel_tol, abs_tol)
+    rows = np.flatnonzero(matches.any(axis=1))
+    if not len(rows):
+        return None
+    row = rows[0]
+    return int(row), int(np.argmax(matches[row]))
+
+
+def align_multiset(student: np.ndarray, expected: np.ndarray,
+                   rel_tol: float = 0.0, abs_tol: float = 0.0) -> Dict[str, Any]:
+    """
+    One-to-one alignment of expected values to student values within tolerance
+    (a number the student printed once can only satisfy one expected value).
+
+    Expected values are taken in order of the upper end of their tolerance
+    window and each claims the smallest unused student value inside it, which
+    gives a maximum matching for interval windows.
+    """
+    result = {'expected': len(expected), 'student': len(student), 'matched': 0,
+              'coverage': 0.0, 'unmatched_expected': []}
+    if not len(expected):
+        return result
+
+    order = np.argsort(student, kind='stable')
+    sorted_student = student[order]
+    tolerance = np.maximum(abs_tol, np.abs(expected) * rel_tol)
+    lo = np.searchsorted(sorted_student, expected - tolerance, side='left')
+    hi = np.searchsorted(sorted_student, expected + tolerance, side='right')
+
+    # next_free[i]: smallest unused sorted-student index >= i (path-compressed)
+    next_free = list(range(len(sorted_student) + 1))
+
+    def find(i):
+        root = i
+        while next_free[root] != root:
+            root = next_free[root]
+        while next_free[i] != root:
+            next_free[i], i = root, next_free[i]
+        return root
+
+    matched = np.zeros(len(expected), dtype=bool)
+    for index in np.argsort(expected + tolerance, kind='stable'):
+        slot = find(lo[index])
+        if slot < hi[index]:
+            matched[index] = True
+            next_free[slot] = slot + 1
+
+    result['matched'] = int(matched.sum())
+    result['coverage'] = result['matched'] / len(expected)
+    result['unmatched_expected'] = expected[~matched].tolist()
+    return result
+
+
+class OutputNumberIndex:
+    """
+    Every number in a notebook's outputs with its position, parsed once.
+    Lets label-anchored checks ("Top customer total: $ 8471.51") find the
+    number after a label with a binary search instead of a regex per check.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts: List[str] = []
+        self.positions: List[np.ndarray] = []
+        self.tokens: List[List[str]] = []
+
+        for text in texts:
+            spans = [(m.start(), m.group()) for m in NUMBER_TOKEN.finditer(text)]
+            self.texts.append(text)
+            self.positions.append(np.fromiter((start for start, _ in spans), dtype=np.int64, count=len(spans)))
+            self.tokens.append([token for _, token in spans])
+
+    def _number_on_line(self, index: int, start: int) -> Optional[float]:
+        """First parseable number at or after start, before the end of the line"""
+        text = self.texts[index]
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = len(text)
+
+        positions = self.positions[index]
+        for k in range(int(np.searchsorted(positions, start)), len(positions)):
+            if positions[k] >= line_end:
+                break
+            token = self.tokens[index][k].replace(',', '')
+            # A bare "," token is a separator, not a number - keep looking
+            try:
+                return float(token)
+            except ValueError:
+                continue
+        return None
+
+    def number_after(self, label_pattern: str, flags: int = re.IGNORECASE) -> Optional[float]:
+        """First number following a label match on the same line, across outputs in order"""
+        label = re.compile(label_pattern, flags)
+        for index, text in enumerate(self.texts):
+            for match in label.finditer(text):
+                value = self._number_on_line(index, match.end())
+                if value is not None:
+                    return value
+        return None
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Output Check Plan
+Compiles the expected-output checks in a rubric (output_validation ->
+expected_outputs) into a plan grouped by target cell. Regexes are compiled
+once per rubric file; per student the plan locates every target cell in
+one pass over the code and evaluates each cell's outputs once for all the
+checks that touch it.
+
+Rubric format:
+    "expected_outputs": {
+        "sections": {
+            "part2_inner_join": {
+                "description": "Inner join results",
+                "checks": [
+                    {"type": "row_count", "variable": "customer_orders", "expected": 200, "tolerance": 5,
+                     "patterns": ["Inner Join Result:\\s*(\\d+)"]},
+                    {"type": "count_value", "description": "customers without orders",
+                     "aliases": ["Customers with No Orders"], "expected": 0, "tolerance": 2},
+                    {"type": "numerical_value", "description": "top customer total spent",
+                     "expected": 8471.51, "tolerance_percent": 5}
+                ]
+            }
+        }
+    }
+
+row_count checks target the cell that assigns their variable plus the next
+2 cells (falling back to every cell if the assignment isn't found);
+count/numerical checks can set "variable" to be scoped the same way.
+"""
+
+import json
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from validators.numeric_matching import OutputNumberIndex, to_array, tolerance_matrix
+
+# Code cells, starting at the assigning one, whose outputs count for a
+# variable (students often print the result in the cell after the assignment)
+CELL_WINDOW = 3
+
+CHECK_TYPES = ('row_count', 'count_value', 'numerical_value')
+
+# Row-count formats any check may use, in priority order
+GENERIC_ROW_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'Rows:\s*(\d+)',           # "Rows: 310"
+    r'(\d+)\s*rows',            # "310 rows"
+    r'(\d+)\s*x\s*\d+',         # "310 x 15"
+)]
+RESULT_ROW_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'Step \d+ - .*?(\d+)\s*rows',
+    r'Step \d+ - Add .*?(\d+)\s*rows',
+    r'Inner Join Result:\s*(\d+)',
+    r'Total rows:\s*(\d+)',
+    r'Result:\s*(\d+)\s*rows',
+)]
+
+# R prints tibble headers and readr messages with colour codes ("Rows: \x1b[34m100")
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+ANY_CELL = None
+
+
+class CompiledCheck:
+    """One rubric check with its patterns compiled"""
+
+    def __init__(self, section_id: str, order: int, definition: Dict[str, Any], row_count_tolerance: int):
+        self.section_id = section_id
+        self.order = order
+        self.definition = definition
+        self.type = definition['type']
+        self.expected = definition['expected']
+        self.variable = definition.get('variable')
+        self.description = definition.get('description', '')
+
+        if self.type not in CHECK_TYPES:
+            raise ValueError(f"Unknown check type: {self.type}")
+
+        if self.type == 'row_count':
+            self.tolerance = definition.get('tolerance', row_count_tolerance)
+            name = re.escape(self.variable)
+            # The rubric's own patterns (what the solution prints) come first,
+            # variable-specific formats go between the generic and the result ones
+            self.patterns = [re.compile(p, re.IGNORECASE) for p in definition.get('patterns', [])]
+            self.patterns += GENERIC_ROW_PATTERNS + [re.compile(p, re.IGNORECASE) for p in (
+                rf'{name}.*?(\d+)\s*rows',
+                rf'nrow.*?{name}.*?(\d+)',
+                rf'{name}.*?(\d+)\s*x\s*\d+',
+            )] + RESULT_ROW_PATTERNS
+        elif self.type == 'count_value':
+            self.tolerance = definition.get('tolerance', 2)
+            self.patterns = [re.compile(rf'{self.description}.*?(\d+)', re.IGNORECASE),
+                             re.compile(rf'{self.description}:\s*(\d+)', re.IGNORECASE)]
+            self.patterns += [re.compile(rf'{re.escape(alias)}:\s*(\d+)', re.IGNORECASE)
+                              for alias in definition.get('aliases', [])]
+
+    def _found_int(self, cell: 'CellEvidence') -> Optional[int]:
+        for position in range(len(cell.outputs)):
+            for pattern in self.patterns:
+                value = cell.first_int(pattern, position)
+                if value is not None:
+                    return value
+        return None
+
+    def find_value(self, cells: List['CellEvidence']) -> Tuple[Optional[float], Optional[int]]:
+        """(value, cell_index) from the first target cell that has one"""
+        for cell in cells:
+            if self.type == 'numerical_value':
+                value = cell.numbers.number_after(self.description)
+            else:
+                value = self._found_int(cell)
+            if value is not None:
+                return value, cell.index
+        return None, None
+
+    def evaluate(self, cells: List['CellEvidence'], numerical_tolerance: float) -> Dict[str, Any]:
+        found, cell_index = self.find_value(cells)
+        expected = self.expected
+
+        if self.type == 'row_count':
+            label, unit = self.variable, ' rows'
+        else:
+            label, unit = self.description, ''
+
+        if found is None:
+            what = 'row count for' if self.type == 'row_count' else ('count for' if self.type == 'count_value' else 'value for')
+            target = self.variable if self.type == 'row_count' else f"'{self.description}'"
+            return {'passed': False, 'message': f"Could not find {what} {target}",
+                    'expected': expected, 'found': None}
+
+        diff = abs(found - expected)
+        if self.type == 'numerical_value':
+            tolerance_percent = self.definition.get('tolerance_percent', numerical_tolerance * 100)
+            passed = bool(tolerance_matrix(to_array(found), to_array(expected), rel_tol=tolerance_percent / 100)[0, 0])
+            return {
+                'passed': passed,
+                'message': f"{label}: {found:.2f} (expected {expected:.2f} ±{tolerance_percent}%)",
+                'expected': expected, 'found': found, 'difference': diff,
+                'tolerance_percent': tolerance_percent, 'cell_index': cell_index
+            }
+
+        return {
+            'passed': diff <= self.tolerance,
+            'message': f"{label}: {found}{unit} (expected {expected} ±{self.tolerance})",
+            'expected': expected, 'found': found, 'difference': diff,
+            'tolerance': self.tolerance, 'cell_index': cell_index
+        }
+
+
+class CellEvidence:
+    """
+    A code cell's text outputs. Pattern results and parsed numbers are kept,
+    so the generic row-count formats shared by every check run once per cell.
+    """
+
+    def __init__(self, index: int, outputs: List[str]):
+        self.index = index
+        self.outputs = [ANSI_ESCAPE.sub('', output) for output in outputs]
+        self._matches: Dict[Tuple[re.Pattern, int], Optional[int]] = {}
+        self._numbers = None
+
+    def first_int(self, pattern: re.Pattern, position: int) -> Optional[int]:
+        """First group of pattern in one output, as an int"""
+        key = (pattern, position)
+        if key not in self._matches:
+            match = pattern.search(self.outputs[position])
+            self._matches[key] = int(match.group(1)) if match else None
+        return self._matches[key]
+
+    @property
+    def numbers(self) -> OutputNumberIndex:
+        if self._numbers is None:
+            self._numbers = OutputNumberIndex(self.outputs)
+        return self._numbers
+
+
+class OutputCheckPlan:
+    """Checks from one rubric, compiled and grouped by target variable"""
+
+    def __init__(self, sections: Dict[str, Dict], row_count_tolerance: int = 5):
+        self.sections = sections
+        self.checks: List[CompiledCheck] = []
+        self.by_target: Dict[Optional[str], List[CompiledCheck]] = defaultdict(list)
+
+        for section_id, section in sections.items():
+            for check_def in section['checks']:
+                check = CompiledCheck(section_id, len(self.checks), check_def, row_count_tolerance)
+                self.checks.append(check)
+                self.by_target[check.variable].append(check)
+
+        # One regex finds the assigning cell of every target variable
+        variables = sorted((v for v in self.by_target if v), key=len, reverse=True)
+        self.assignment_pattern = None
+        if variables:
+            names = '|'.join(re.escape(v) for v in variables)
+            self.assignment_pattern = re.compile(rf'(?:^|#)\s*({names})\s*<-', re.MULTILINE)
+
+    def locate_targets(self, notebook: Dict) -> Tuple[List[int], Dict[str, int]]:
+        """
+        (code cell indices, variable -> position in that list of the first
+        cell assigning it), in a single pass over the code
+        """
+        code_cells, located = [], {}
+        for idx, cell in enumerate(notebook['cells']):
+            if cell['cell_type'] != 'code':
+                continue
+            if self.assignment_pattern:
+                source = cell['source'] if isinstance(cell['source'], str) else ''.join(cell['source'])
+                for match in self.assignment_pattern.finditer(source):
+                    located.setdefault(match.group(1), len(code_cells))
+            code_cells.append(idx)
+        return code_cells, located
+
+    def evaluate(self, notebook: Dict, outputs_by_cell: Dict[int, List[str]],
+                 numerical_tolerance: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Run every check against a student notebook
+
+        Returns:
+            {section_id: {'description', 'passed', 'checks', 'issues'}} in rubric order
+        """
+        evidence = {idx: CellEvidence(idx, outputs) for idx, outputs in outputs_by_cell.items()}
+        all_cells = [evidence[idx] for idx in sorted(evidence)]
+        code_cells, located = self.locate_targets(notebook)
+
+        results = [None] * len(self.checks)
+        for variable, checks in self.by_target.items():
+            if variable is ANY_CELL or variable not in located:
+                cells = all_cells
+            else:
+                start = located[variable]
+                cells = [evidence[idx] for idx in code_cells[start:start + CELL_WINDOW] if idx in evidence]
+            for check in checks:
+                results[check.order] = check.evaluate(cells, numerical_tolerance)
+
+        section_results = {}
+        for check, result in zip(self.checks, results):
+            section = section_results.setdefault(check.section_id, {
+                'description': self.sections[check.section_id]['description'],
+                'passed': True,
+                'checks': [],
+                'issues': []
+            })
+            section['checks'].append(result)
+            if not result['passed']:
+                section['passed'] = False
+                section['issues'].append({'section': check.section_id, 'check': check.definition, 'result': result})
+        return section_results
+
+
+@lru_cache(maxsize=16)
+def _load_plan(rubric_path: str, mtime_ns: int, row_count_tolerance: int) -> OutputCheckPlan:
+    with open(rubric_path, 'r', encoding='utf-8') as f:
+        rubric = json.load(f)
+    expected = rubric.get('output_validation', {}).get('expected_outputs')
+    if not expected or not expected.get('sections'):
+        raise ValueError(f"Rubric {rubric_path} has no output_validation.expected_outputs sections")
+    return OutputCheckPlan(expected['sections'], row_count_tolerance)
+
+
+def load_check_plan(rubric_path: str, row_count_tolerance: int = 5) -> OutputCheckPlan:
+    """Compiled plan for a rubric file, recompiled only when the file changes"""
+    rubric_path = os.path.abspath(rubric_path)
+    return _load_plan(rubric_path, os.stat(rubric_path).st_mtime_ns, row_count_tolerance)
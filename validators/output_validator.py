@@ -6,10 +6,13 @@ Allows for reasonable variation while ensuring correctness
 """
 
 import json
-import re
 from typing import Dict, List, Tuple, Any, Optional
 from pathlib import Path
 
+from validators.output_check_plan import load_check_plan
+
+DEFAULT_RUBRIC_PATH = 'rubrics/assignment_6_rubric.json'
+
 
 class OutputValidator:
     """
@@ -22,12 +25,17 @@ class OutputValidator:
         solution_notebook_path: str,
         numerical_tolerance: float = 0.01,  # 1% tolerance for numerical values
         row_count_tolerance: int = 5,        # Allow ±5 rows difference
-        allow_extra_columns: bool = True     # Allow students to add extra columns
+        allow_extra_columns: bool = True,    # Allow students to add extra columns
+        rubric_path: str = DEFAULT_RUBRIC_PATH
     ):
         self.solution_notebook_path = solution_notebook_path
         self.numerical_tolerance = numerical_tolerance
         self.row_count_tolerance = row_count_tolerance
         self.allow_extra_columns = allow_extra_columns
+        self.rubric_path = rubric_path
+        
+        # Expected outputs come from the rubric, compiled once per rubric file
+        self.check_plan = load_check_plan(rubric_path, row_count_tolerance)
         
         # Load solution notebook
         with open(solution_notebook_path, 'r') as f:
@@ -55,24 +63,11 @@ class OutputValidator:
         # Extract student outputs
         student_outputs = self._extract_outputs(student_notebook)
         
-        # Compare outputs section by section
-        section_results = {}
-        issues = []
-        
-        # Define expected outputs for each section
-        expected_outputs = self._define_expected_outputs()
-        
-        for section_id, expectations in expected_outputs.items():
-            result = self._validate_section(
-                section_id=section_id,
-                expectations=expectations,
-                student_outputs=student_outputs,
-                solution_outputs=self.solution_outputs
-            )
-            section_results[section_id] = result
-            
-            if not result['passed']:
-                issues.extend(result['issues'])
+        # Every check in the rubric, grouped by target cell and evaluated once per cell
+        section_results = self.check_plan.evaluate(
+            student_notebook, student_outputs, self.numerical_tolerance
+        )
+        issues = [issue for result in section_results.values() for issue in result['issues']]
         
         # Calculate overall match percentage
         total_checks = sum(len(r['checks']) for r in section_results.values())
@@ -113,469 +108,10 @@ class OutputValidator:
     
     def _define_expected_outputs(self) -> Dict[str, Dict]:
         """
-        Define what to check for each section
+        What to check for each section, as defined in the rubric's
+        output_validation.expected_outputs
         """
-        return {
-            'part1_data_import': {
-                'description': 'Data import and dimensions',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customers',
-                        'expected': 100,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'orders',
-                        'expected': 250,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'order_items',
-                        'expected': 400,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'products',
-                        'expected': 50,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'suppliers',
-                        'expected': 10,
-                        'tolerance': 0
-                    }
-                ]
-            },
-            'part2_inner_join': {
-                'description': 'Inner join results',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customer_orders',
-                        'expected': 200,
-                        'tolerance': 5
-                    }
-                ]
-            },
-            'part2_left_join': {
-                'description': 'Left join results',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customer_orders_left',
-                        'expected': 200,
-                        'tolerance': 5
-                    },
-                    {
-                        'type': 'count_value',
-                        'description': 'customers without orders',
-                        'expected': 0,
-                        'tolerance': 2
-                    }
-                ]
-            },
-            'part2_right_join': {
-                'description': 'Right join results',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customer_orders_right',
-                        'expected': 250,
-                        'tolerance': 5
-                    },
-                    {
-                        'type': 'count_value',
-                        'description': 'orders with invalid customers',
-                        'expected': 50,
-                        'tolerance': 5
-                    }
-                ]
-            },
-            'part2_full_join': {
-                'description': 'Full join results',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customer_orders_full',
-                        'expected': 250,
-                        'tolerance': 5
-                    }
-                ]
-            },
-            'part3_multi_table': {
-                'description': 'Multi-table join progression',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'orders_items',
-                        'expected': 400,
-                        'tolerance': 5
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'orders_customers_items',
-                        'expected': 310,
-                        'tolerance': 10
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'complete_order_data',
-                        'expected': 310,
-                        'tolerance': 10
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'complete_data',
-                        'expected': 310,
-                        'tolerance': 10
-                    }
-                ]
-            },
-            'part4_data_quality': {
-                'description': 'Data quality analysis',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customers_no_orders',
-                        'expected': 0,
-                        'tolerance': 2
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'orphaned_orders',
-                        'expected': 50,
-                        'tolerance': 5
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'products_never_ordered',
-                        'expected': 0,
-                        'tolerance': 2
-                    },
-                    {
-                        'type': 'row_count',
-                        'variable': 'active_customers',
-                        'expected': 100,
-                        'tolerance': 5
-                    }
-                ]
-            },
-            'part5_customer_metrics': {
-                'description': 'Customer metrics analysis',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'customer_metrics',
-                        'expected': 94,
-                        'tolerance': 10
-                    },
-                    {
-                        'type': 'numerical_value',
-                        'description': 'top customer total spent',
-                        'expected': 8471.51,
-                        'tolerance_percent': 5
-                    }
-                ]
-            },
-            'part5_product_metrics': {
-                'description': 'Product metrics analysis',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'product_metrics',
-                        'expected': 50,
-                        'tolerance': 5
-                    },
-                    {
-                        'type': 'numerical_value',
-                        'description': 'top product revenue',
-                        'expected': 11763.16,
-                        'tolerance_percent': 5
-                    }
-                ]
-            },
-            'part5_supplier_metrics': {
-                'description': 'Supplier metrics analysis',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'supplier_metrics',
-                        'expected': 10,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'numerical_value',
-                        'description': 'max products per supplier',
-                        'expected': 10,
-                        'tolerance_percent': 0
-                    }
-                ]
-            },
-            'part5_regional_analysis': {
-                'description': 'Regional analysis',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'regional_analysis',
-                        'expected': 5,
-                        'tolerance': 0
-                    },
-                    {
-                        'type': 'numerical_value',
-                        'description': 'highest city sales',
-                        'expected': 72277.52,
-                        'tolerance_percent': 5
-                    }
-                ]
-            },
-            'part6_top_customers': {
-                'description': 'Top 10% customers',
-                'checks': [
-                    {
-                        'type': 'row_count',
-                        'variable': 'top_customers',
-                        'expected': 10,
-                        'tolerance': 2
-                    },
-                    {
-                        'type': 'numerical_value',
-                        'description': 'top 10% threshold',
-                        'expected': 4931.51,
-                        'tolerance_percent': 5
-                    }
-                ]
-            }
-        }
-    
-    def _validate_section(
-        self,
-        section_id: str,
-        expectations: Dict,
-        student_outputs: Dict,
-        solution_outputs: Dict
-    ) -> Dict:
-        """Validate a single section"""
-        
-        checks = []
-        issues = []
-        
-        for check in expectations['checks']:
-            check_result = self._perform_check(check, student_outputs)
-            checks.append(check_result)
-            
-            if not check_result['passed']:
-                issues.append({
-                    'section': section_id,
-                    'check': check,
-                    'result': check_result
-                })
-        
-        passed = all(c['passed'] for c in checks)
-        
-        return {
-            'description': expectations['description'],
-            'passed': passed,
-            'checks': checks,
-            'issues': issues
-        }
-    
-    def _perform_check(self, check: Dict, student_outputs: Dict) -> Dict:
-        """Perform a single check"""
-        
-        check_type = check['type']
-        
-        if check_type == 'row_count':
-            return self._check_row_count(check, student_outputs)
-        elif check_type == 'count_value':
-            return self._check_count_value(check, student_outputs)
-        elif check_type == 'numerical_value':
-            return self._check_numerical_value(check, student_outputs)
-        else:
-            return {
-                'passed': False,
-                'message': f"Unknown check type: {check_type}"
-            }
-    
-    def _check_row_count(self, check: Dict, student_outputs: Dict) -> Dict:
-        """Check if row count matches expected value"""
-        
-        variable = check['variable']
-        expected = check['expected']
-        tolerance = check.get('tolerance', self.row_count_tolerance)
-        
-        # Search for row count in outputs
-        found_value = None
-        for cell_outputs in student_outputs.values():
-            for output in cell_outputs:
-                # Look for patterns like "310 rows" or "nrow: 310" or "Rows: 310"
-                patterns = [
-                    # Generic patterns
-                    rf'Rows:\s*(\d+)',  # "Rows: 310"
-                    rf'(\d+)\s*rows',   # "310 rows"
-                    rf'(\d+)\s*x\s*\d+',  # "310 x 15"
-                    
-                    # Variable-specific patterns
-                    rf'{variable}.*?(\d+)\s*rows',
-                    rf'nrow.*?{variable}.*?(\d+)',
-                    rf'{variable}.*?(\d+)\s*x\s*\d+',
-                    
-                    # Step patterns
-                    rf'Step \d+ - .*?(\d+)\s*rows',
-                    rf'Step \d+ - Add .*?(\d+)\s*rows',
-                    
-                    # Result patterns
-                    rf'Inner Join Result:\s*(\d+)',
-                    rf'Total rows:\s*(\d+)',
-                    rf'Result:\s*(\d+)\s*rows',
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, output, re.IGNORECASE)
-                    if match:
-                        found_value = int(match.group(1))
-                        break
-                
-                if found_value is not None:
-                    break
-            
-            if found_value is not None:
-                break
-        
-        if found_value is None:
-            return {
-                'passed': False,
-                'message': f"Could not find row count for {variable}",
-                'expected': expected,
-                'found': None
-            }
-        
-        # Check if within tolerance
-        diff = abs(found_value - expected)
-        passed = diff <= tolerance
-        
-        return {
-            'passed': passed,
-            'message': f"{variable}: {found_value} rows (expected {expected} ±{tolerance})",
-            'expected': expected,
-            'found': found_value,
-            'difference': diff,
-            'tolerance': tolerance
-        }
-    
-    def _check_count_value(self, check: Dict, student_outputs: Dict) -> Dict:
-        """Check a count value (like 'customers without orders: 0')"""
-        
-        description = check['description']
-        expected = check['expected']
-        tolerance = check.get('tolerance', 2)
-        
-        # Search for the count in outputs
-        found_value = None
-        for cell_outputs in student_outputs.values():
-            for output in cell_outputs:
-                # Look for patterns - try multiple variations
-                patterns = [
-                    rf'{description}.*?(\d+)',
-                    rf'{description}:\s*(\d+)',
-                    # Handle variations like "Customers with No Orders: 0"
-                    rf'Customers with No Orders:\s*(\d+)',
-                    rf'Customers without orders:\s*(\d+)',
-                    rf'Orders with invalid customer IDs:\s*(\d+)',
-                    rf'Orders without valid customers:\s*(\d+)',
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, output, re.IGNORECASE)
-                    if match:
-                        found_value = int(match.group(1))
-                        break
-                
-                if found_value is not None:
-                    break
-            
-            if found_value is not None:
-                break
-        
-        if found_value is None:
-            return {
-                'passed': False,
-                'message': f"Could not find count for '{description}'",
-                'expected': expected,
-                'found': None
-            }
-        
-        # Check if within tolerance
-        diff = abs(found_value - expected)
-        passed = diff <= tolerance
-        
-        return {
-            'passed': passed,
-            'message': f"{description}: {found_value} (expected {expected} ±{tolerance})",
-            'expected': expected,
-            'found': found_value,
-            'difference': diff,
-            'tolerance': tolerance
-        }
-    
-    def _check_numerical_value(self, check: Dict, student_outputs: Dict) -> Dict:
-        """Check a numerical value (like revenue, threshold, etc.)"""
-        
-        description = check['description']
-        expected = check['expected']
-        tolerance_percent = check.get('tolerance_percent', self.numerical_tolerance * 100)
-        
-        # Search for the value in outputs
-        found_value = None
-        for cell_outputs in student_outputs.values():
-            for output in cell_outputs:
-                # Look for patterns like "top customer total spent: $ 8471.51"
-                patterns = [
-                    rf'{description}.*?\$?\s*([\d,]+\.?\d*)',
-                    rf'{description}.*?(\d+\.?\d*)',
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, output, re.IGNORECASE)
-                    if match:
-                        value_str = match.group(1).replace(',', '')
-                        try:
-                            found_value = float(value_str)
-                            break
-                        except ValueError:
-                            continue
-                
-                if found_value is not None:
-                    break
-            
-            if found_value is not None:
-                break
-        
-        if found_value is None:
-            return {
-                'passed': False,
-                'message': f"Could not find value for '{description}'",
-                'expected': expected,
-                'found': None
-            }
-        
-        # Check if within tolerance percentage
-        tolerance_amount = expected * (tolerance_percent / 100)
-        diff = abs(found_value - expected)
-        passed = diff <= tolerance_amount
-        
-        return {
-            'passed': passed,
-            'message': f"{description}: {found_value:.2f} (expected {expected:.2f} ±{tolerance_percent}%)",
-            'expected': expected,
-            'found': found_value,
-            'difference': diff,
-            'tolerance_percent': tolerance_percent
-        }
+        return self.check_plan.sections
     
     def _calculate_score_adjustment(self, overall_match: float, issues: List[Dict]) -> int:
         """
@@ -647,7 +183,8 @@ def validate_outputs(
     student_notebook_path: str,
     solution_notebook_path: str,
     numerical_tolerance: float = 0.05,
-    row_count_tolerance: int = 5
+    row_count_tolerance: int = 5,
+    rubric_path: str = DEFAULT_RUBRIC_PATH
 ) -> Dict:
     """
     Convenience function to validate outputs
@@ -655,7 +192,8 @@ def validate_outputs(
     validator = OutputValidator(
         solution_notebook_path=solution_notebook_path,
         numerical_tolerance=numerical_tolerance,
-        row_count_tolerance=row_count_tolerance
+        row_count_tolerance=row_count_tolerance,
+        rubric_path=rubric_path
     )
     
     result = validator.validate_student_outputs(student_notebook_path)
@@ -111,8 +111,13 @@ class RubricDrivenValidator:
             'completion_rate': len(found_variables) / len(self.required_variables) if self.required_variables else 1.0
         }
     
-    def _check_sections(self, code: str, nb) -> Dict[str, Any]:
-        """Check completion status of each section"""
+    def _check_sections(self, code: str, nb, apply_partial_credit: bool = True) -> Dict[str, Any]:
+        """
+        Check completion status of each section
+        
+        apply_partial_credit=False returns the base results, e.g. to cache a
+        cohort and re-run the partial credit scorer after a rubric change
+        """
         section_results = {}
         
         for section_id, section_info in self.sections.items():
@@ -170,12 +175,12 @@ class RubricDrivenValidator:
                         result['status'] = 'incomplete'
                         result['score'] = 0
             
-            # Apply flexible partial credit scoring if available
-            if self.partial_credit_scorer:
-                result = self.partial_credit_scorer.adjust_score(section_id, result, code, nb)
-            
             section_results[section_id] = result
         
+        # Apply flexible partial credit scoring if available (all sections in one pass)
+        if self.partial_credit_scorer and apply_partial_credit:
+            section_results = self.partial_credit_scorer.adjust_scores(section_results, code, nb)
+        
         return section_results
     
     def _check_reflections(self, nb, section_info: Dict) -> Dict:
@@ -10,6 +10,9 @@ import re
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from utils.solution_cache import get_solution_artifact
+from validators.numeric_matching import COUNT_TOLERANCE, align_multiset, first_match, numeric_arrays
+
 
 class SmartOutputValidator:
     """
@@ -36,12 +39,22 @@ class SmartOutputValidator:
         # Get required variables from rubric
         self.required_variables = self.rubric.get('autograder_checks', {}).get('required_variables', [])
         
-        # Load solution notebook
-        with open(solution_notebook_path, 'r') as f:
-            self.solution_notebook = json.load(f)
+        # Load solution notebook (cached per file, shared by every grade of this assignment)
+        self.solution_artifact = get_solution_artifact(solution_notebook_path)
+        self.solution_notebook = self.solution_artifact.raw
         
-        # Extract solution outputs
-        self.solution_outputs = self._extract_all_outputs(self.solution_notebook)
+        # Extract solution outputs, values and their arrays once per solution file + variable list
+        self.solution_outputs, self.solution_values, self.solution_arrays = self.solution_artifact.memo(
+            ('smart_output_validator', tuple(self.required_variables)), self._analyze_solution
+        )
+    
+    def _analyze_solution(self):
+        """Solution-side outputs and extracted values for every required variable"""
+        outputs = self._extract_all_outputs(self.solution_notebook)
+        values = {variable: self._extract_values(variable_outputs)
+                  for variable, variable_outputs in outputs.items()}
+        arrays = {variable: numeric_arrays(variable_values) for variable, variable_values in values.items()}
+        return outputs, values, arrays
     
     def validate_student_outputs(self, student_notebook_path: str) -> Dict[str, Any]:
         """
@@ -144,7 +157,11 @@ class SmartOutputValidator:
             return None
         
         solution_output = solution_outputs.get(variable, [])
-        solution_values = self._extract_values(solution_output)
+        solution_values = self.solution_values.get(variable)
+        solution_arrays = self.solution_arrays.get(variable)
+        if solution_values is None or solution_outputs is not self.solution_outputs:
+            solution_values = self._extract_values(solution_output)
+            solution_arrays = None
         
         # Look in the specific cell(s) for this variable
         student_output = student_outputs.get(variable, [])
@@ -159,17 +176,21 @@ class SmartOutputValidator:
                 'solution_value': solution_values
             }
         
-        # Extract values from student output
+        # Extract values from student output (converted to arrays once for every check below)
         student_values = self._extract_values(student_output)
+        student_arrays = numeric_arrays(student_values)
+        solution_arrays = solution_arrays if solution_arrays is not None else numeric_arrays(solution_values)
         
         # Compare values
         match, issue, message = self._compare_values(
             student_values,
             solution_values,
-            variable
+            variable,
+            student_arrays=student_arrays,
+            solution_arrays=solution_arrays
         )
         
-        return {
+        comparison = {
             'variable': variable,
             'match': match,
             'issue': issue if not match else None,
@@ -177,6 +198,15 @@ class SmartOutputValidator:
             'student_value': student_values if not match else None,
             'solution_value': solution_values if not match else None
         }
+        
+        # How many of the solution's numbers the student reproduced (one-to-one)
+        solution_nums = solution_arrays.get('numbers')
+        if solution_nums is not None and len(solution_nums) > 1:
+            alignment = align_multiset(student_arrays.get('numbers', solution_nums[:0]), solution_nums,
+                                       rel_tol=self.numerical_tolerance)
+            comparison['numeric_coverage'] = alignment['coverage']
+        
+        return comparison
     
     def _extract_values(self, outputs: List[Dict]) -> Dict[str, Any]:
         """
@@ -239,75 +269,69 @@ class SmartOutputValidator:
         self,
         student_values: Dict,
         solution_values: Dict,
-        variable: str
+        variable: str,
+        student_arrays: Dict = None,
+        solution_arrays: Dict = None
     ) -> tuple:
         """
         Compare extracted values - LENIENT: if numbers match, format doesn't matter
         Returns: (match: bool, issue: str, message: str)
         """
+        if student_arrays is None:
+            student_arrays = numeric_arrays(student_values)
+        if solution_arrays is None:
+            solution_arrays = numeric_arrays(solution_values)
+        
         # Strategy: Look for ANY matching numbers between student and solution
         # If key numbers match, consider it correct regardless of format
         
         # Check row counts
         if 'row_count' in solution_values:
             solution_rows = solution_values['row_count']
+            expected = solution_arrays['row_count']
             
-            # Look for this number ANYWHERE in student output
-            if 'row_count' in student_values:
-                student_rows = student_values['row_count']
-                diff = abs(student_rows - solution_rows)
-                
-                if diff <= self.row_count_tolerance:
+            # Look for this number in the row count, then ANYWHERE in the numbers, then the counts
+            for key in ('row_count', 'numbers', 'counts'):
+                candidates = student_arrays.get(key)
+                if candidates is None:
+                    continue
+                found = first_match(candidates, expected, abs_tol=self.row_count_tolerance)
+                if found:
+                    student_rows = int(candidates[found[1]])
                     return True, None, f'{variable}: ✅ {student_rows} rows (matches {solution_rows})'
             
-            # Also check if the number appears in the 'numbers' list
-            if 'numbers' in student_values:
-                for num in student_values['numbers']:
-                    if abs(num - solution_rows) <= self.row_count_tolerance:
-                        return True, None, f'{variable}: ✅ {int(num)} rows (matches {solution_rows})'
-            
-            # If we have counts, check those too
-            if 'counts' in student_values:
-                for count in student_values['counts']:
-                    if abs(count - solution_rows) <= self.row_count_tolerance:
-                        return True, None, f'{variable}: ✅ {count} rows (matches {solution_rows})'
-            
             # Only fail if we couldn't find the number anywhere
             return False, 'row_count_mismatch', f'{variable}: Expected {solution_rows} rows, not found in output'
         
         # Check numerical values (revenue, thresholds, etc.)
         if 'numbers' in solution_values and solution_values['numbers']:
-            solution_nums = solution_values['numbers']
-            student_nums = student_values.get('numbers', [])
+            solution_nums = solution_arrays['numbers']
+            student_nums = student_arrays.get('numbers', solution_nums[:0])
             
             # Look for ANY solution number in student numbers
-            for solution_val in solution_nums:
-                tolerance = abs(solution_val * self.numerical_tolerance)
-                
-                for student_val in student_nums:
-                    diff = abs(student_val - solution_val)
-                    
-                    if diff <= tolerance:
-                        return True, None, f'{variable}: ✅ {student_val:.2f} (matches {solution_val:.2f})'
+            found = first_match(student_nums, solution_nums, rel_tol=self.numerical_tolerance)
+            if found:
+                solution_val, student_val = solution_nums[found[0]], student_nums[found[1]]
+                return True, None, f'{variable}: ✅ {student_val:.2f} (matches {solution_val:.2f})'
             
             # If no match found
-            if student_nums:
+            if len(student_nums):
                 return False, 'numerical_mismatch', f'{variable}: {student_nums[0]:.2f} (expected {solution_nums[0]:.2f} ±{self.numerical_tolerance*100}%)'
         
         # Check counts (customers without orders, etc.)
         if 'counts' in solution_values and solution_values['counts']:
-            solution_counts = solution_values['counts']
-            student_counts = student_values.get('counts', [])
+            solution_counts = solution_arrays['counts']
+            student_counts = student_arrays.get('counts', solution_counts[:0])
             
             # Look for ANY solution count in student counts
-            for solution_count in solution_counts:
-                for student_count in student_counts:
-                    if abs(student_count - solution_count) <= 2:
-                        return True, None, f'{variable}: ✅ count {student_count} (matches {solution_count})'
+            found = first_match(student_counts, solution_counts, abs_tol=COUNT_TOLERANCE)
+            if found:
+                student_count, solution_count = int(student_counts[found[1]]), int(solution_counts[found[0]])
+                return True, None, f'{variable}: ✅ count {student_count} (matches {solution_count})'
             
             # If no match found
-            if student_counts:
-                return False, 'count_mismatch', f'{variable}: count {student_counts[0]} (expected {solution_counts[0]})'
+            if len(student_counts):
+                return False, 'count_mismatch', f'{variable}: count {int(student_counts[0])} (expected {int(solution_counts[0])})'
         
         # If we got here and have any values, consider it a match
         # (This handles cases where format is different but we extracted something)